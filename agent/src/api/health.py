@@ -26,9 +26,9 @@ async def check_sicc() -> Dict[str, Any]:
         Dict com status e informações do SICC
     """
     try:
-        from ..services.sicc.sicc_service import SICCService
+        from ..services.sicc.sicc_service import get_sicc_service
         
-        sicc = SICCService()
+        sicc = get_sicc_service()
         
         # Verificar se SICC está inicializado
         if not hasattr(sicc, 'memory_service') or sicc.memory_service is None:
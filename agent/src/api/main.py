@@ -7,11 +7,25 @@ try:
     print("1. Importando FastAPI...", flush=True)
     from fastapi import FastAPI, Request, BackgroundTasks
     from fastapi.middleware.cors import CORSMiddleware
+    from contextlib import asynccontextmanager
     import json
     print("✅ FastAPI OK", flush=True)
     
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Serviços compartilhados (SICC, modelo de embeddings, pool Supabase)
+        # são criados uma vez por processo e finalizados no shutdown
+        from ..services.service_container import get_service_container
+        container = get_service_container()
+        try:
+            await container.startup()
+        except Exception as startup_error:
+            print(f"⚠️ Erro ao inicializar serviços compartilhados: {startup_error}", flush=True)
+        yield
+        await container.shutdown()
+    
     print("2. Criando app...", flush=True)
-    app = FastAPI(title="Slim Quality Agent", version="0.1.0")
+    app = FastAPI(title="Slim Quality Agent", version="0.1.0", lifespan=lifespan)
     print("✅ App OK", flush=True)
     
     # Configurar CORS para produção
@@ -198,11 +212,12 @@ try:
             
             # Importar SICC
             print("Importando SICC...", flush=True)
-            from src.services.sicc.sicc_service import SICCService
+            from src.services.sicc.sicc_service import get_sicc_service
             print("SICC importado com sucesso", flush=True)
             
-            sicc = SICCService()
-            print("SICC instanciado", flush=True)
+            # Instância compartilhada do processo (mantém conversas ativas e serviços carregados)
+            sicc = get_sicc_service()
+            print("SICC obtido", flush=True)
             
             # Processar mensagem
             print("Chamando process_message...", flush=True)
@@ -358,108 +373,17 @@ Seja empática, educativa e focada em ajudar o cliente com problemas de saúde e
     
     # Função para salvar conversa do WhatsApp no Supabase - CORRIGIDA
     async def save_whatsapp_conversation(phone: str, message: str, sender_type: str = 'customer'):
+        channel = 'site' if phone.startswith('site_') else 'whatsapp'
         try:
-            import os
-            from supabase import create_client, Client
-            
-            # Configurar Supabase
-            supabase_url = os.getenv("SUPABASE_URL")
-            supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-            
-            if not supabase_url or not supabase_key:
-                print("Supabase não configurado para salvar conversas", flush=True)
-                return
-            
-            supabase: Client = create_client(supabase_url, supabase_key)
-            
-            # Detectar se é conversa do site ou WhatsApp
-            is_site_conversation = phone.startswith('site_')
-            channel = 'site' if is_site_conversation else 'whatsapp'
-            
-            # Para conversas do site, usar sessionId como identificador
-            if is_site_conversation:
-                session_id = phone.replace('site_', '')
-                customer_name = f'Visitante Site {session_id[-8:]}'
-                customer_email = f'site_{session_id}@slimquality.temp'
-                customer_phone = None
-            else:
-                session_id = None
-                customer_name = f'Cliente WhatsApp {phone[-4:]}'
-                customer_email = f'whatsapp_{phone}@slimquality.temp'
-                customer_phone = phone
-            
-            # 1. BUSCAR OU CRIAR CUSTOMER PRIMEIRO
-            if is_site_conversation:
-                # Para site, buscar por email único
-                customer_result = supabase.table('customers').select('id').eq('email', customer_email).execute()
-            else:
-                # Para WhatsApp, buscar por telefone
-                customer_result = supabase.table('customers').select('id').eq('phone', phone).execute()
-            
-            if customer_result.data:
-                # Customer existe
-                customer_id = customer_result.data[0]['id']
-                print(f"✅ Customer encontrado: {customer_id} para {channel} {phone}", flush=True)
-            else:
-                # Criar novo customer
-                customer_data = {
-                    'name': customer_name,
-                    'email': customer_email,
-                    'phone': customer_phone,
-                    'source': channel,
-                    'status': 'active'
-                }
-                
-                customer_result = supabase.table('customers').insert(customer_data).execute()
-                
-                if customer_result.data:
-                    customer_id = customer_result.data[0]['id']
-                    print(f"✅ Customer criado: {customer_id} para {channel} {phone}", flush=True)
-                else:
-                    print(f"❌ Erro ao criar customer para {channel} {phone}", flush=True)
-                    return
+            # Pool compartilhado + cache de customer/conversa: um INSERT por
+            # mensagem com cache quente, uma RPC no primeiro contato
+            from ..services.conversation_store import get_conversation_store
             
-            # 2. BUSCAR OU CRIAR CONVERSA USANDO CUSTOMER_ID
-            conversation_result = supabase.table('conversations').select('id').eq('customer_id', customer_id).eq('channel', channel).eq('status', 'open').execute()
-            
-            if conversation_result.data:
-                # Conversa ativa existe
-                conversation_id = conversation_result.data[0]['id']
-                print(f"✅ Conversa ativa encontrada: {conversation_id}", flush=True)
-            else:
-                # Criar nova conversa usando schema correto
-                conversation_data = {
-                    'customer_id': customer_id,  # CAMPO CORRETO
-                    'channel': channel,  # 'site' ou 'whatsapp'
-                    'status': 'open',
-                    'subject': f'{channel.title()} {phone[-8:] if not is_site_conversation else session_id[-8:]}',
-                    'session_id': session_id  # Para conversas do site
-                }
-                
-                conversation_result = supabase.table('conversations').insert(conversation_data).execute()
-                
-                if conversation_result.data:
-                    conversation_id = conversation_result.data[0]['id']
-                    print(f"✅ Conversa criada: {conversation_id} para customer {customer_id} ({channel})", flush=True)
-                else:
-                    print(f"❌ Erro ao criar conversa para customer {customer_id} ({channel})", flush=True)
-                    return
-            
-            # 3. SALVAR MENSAGEM COM SENDER_ID CORRETO
-            message_data = {
-                'conversation_id': conversation_id,
-                'content': message,
-                'sender_type': sender_type,
-                'sender_id': customer_id  # Usar customer_id para ambos (customer e agent)
-            }
-            
-            message_result = supabase.table('messages').insert(message_data).execute()
-            
-            if message_result.data:
-                print(f"✅ Mensagem salva: {conversation_id} ({sender_type}) [{channel}] - {message[:50]}...", flush=True)
-            else:
-                print(f"❌ Erro ao salvar mensagem", flush=True)
+            conversation_id = await get_conversation_store().save_message(phone, message, sender_type)
+            print(f"✅ Mensagem salva: {conversation_id} ({sender_type}) [{channel}] - {message[:50]}...", flush=True)
             
+        except ValueError as e:
+            print(f"Supabase não configurado para salvar conversas: {e}", flush=True)
         except Exception as e:
             print(f"❌ Erro ao salvar conversa {channel}: {e}", flush=True)
             import traceback
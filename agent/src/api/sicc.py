@@ -310,6 +310,24 @@ async def get_sicc_alerts():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/intent-classifier", response_model=Dict[str, Any])
+async def get_intent_classifier_stats():
+    """
+    Obtém estatísticas do classificador de intent
+
+    Returns:
+        Respostas por camada (regras, centroides, LLM), exemplos por intenção
+        e estado do treino
+    """
+    try:
+        from ..services.sicc.intent_classifier import get_intent_classifier
+        return get_intent_classifier().get_stats()
+
+    except Exception as e:
+        logger.error("Erro ao obter estatísticas do classificador de intent", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/learnings", response_model=List[SICCLearning])
 async def get_sicc_learnings(status: str = "pending"):
     """
@@ -480,7 +498,14 @@ async def reject_sicc_learning(
                 )
             
             logger.info("Aprendizado rejeitado e persistido no banco", learning_id=learning_id)
-            
+
+            # Padrão rejeitado deixa de ser sugerido imediatamente
+            pattern_id = (result.data[0].get('pattern_data') or {}).get('pattern_id')
+            if pattern_id:
+                from ..services.sicc.behavior_service import get_behavior_service
+                if get_behavior_service().remove_pattern_from_index(pattern_id):
+                    logger.info("Padrão rejeitado removido do índice", pattern_id=pattern_id)
+
             return SuccessResponse(
                 success=True,
                 message=f"Aprendizado {learning_id} rejeitado com sucesso",
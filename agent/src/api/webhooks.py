@@ -137,9 +137,21 @@ async def process_message_webhook(payload: EvolutionWebhookPayload, request_id:
         
         # Processar com SICC
         try:
-            from ..services.sicc.sicc_service import SICCService
+            from ..services.sicc.sicc_service import get_sicc_service
             
-            sicc = SICCService()
+            # Instância compartilhada do processo (criada no lifespan da aplicação)
+            sicc = get_sicc_service()
+            
+            # Streaming: cada parágrafo é enviado assim que gerado
+            send_chunk = None
+            if get_settings().whatsapp_stream_responses:
+                async def send_chunk(chunk: str) -> None:
+                    await send_whatsapp_message(
+                        phone_number=phone_number,
+                        message=chunk,
+                        instance=payload.instance,
+                        request_id=request_id
+                    )
             
             # Processar mensagem
             response = await asyncio.wait_for(
@@ -151,13 +163,14 @@ async def process_message_webhook(payload: EvolutionWebhookPayload, request_id:
                         "platform": "whatsapp",
                         "instance": payload.instance,
                         "request_id": request_id
-                    }
+                    },
+                    on_chunk=send_chunk
                 ),
                 timeout=30.0  # 30 segundos timeout
             )
             
-            # Enviar resposta via Evolution API
-            if response and response.get('response'):
+            # Enviar resposta via Evolution API (se ainda não enviada em trechos)
+            if response and response.get('response') and not response.get('streamed'):
                 await send_whatsapp_message(
                     phone_number=phone_number,
                     message=response['response'],
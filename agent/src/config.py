@@ -15,6 +15,18 @@ class Settings(BaseSettings):
     # OpenAI (Principal)
     openai_api_key: str
     openai_model: str = "gpt-4o"
+    openai_timeout_seconds: float = 30.0
+    openai_max_retries: int = 2
+    openai_max_connections: int = 50
+    openai_max_keepalive_connections: int = 20
+    
+    # Resiliência dos provedores de IA (circuit breaker e hedging)
+    ai_breaker_failure_threshold: int = 5
+    ai_breaker_error_rate_threshold: float = 0.5
+    ai_breaker_recovery_seconds: float = 30.0
+    ai_hedging_enabled: bool = False
+    ai_hedge_delay_seconds: float = 2.0
+    ai_hedge_min_delay_seconds: float = 0.3
     
     # Claude AI (Opcional)
     claude_api_key: Optional[str] = None
@@ -43,6 +55,8 @@ class Settings(BaseSettings):
     evolution_url: str = "https://slimquality-evolution-api.wpjtfd.easypanel.host"
     evolution_api_key: Optional[str] = None
     evolution_instance: str = "Slim Quality"
+    # Enviar a resposta em parágrafos à medida que é gerada
+    whatsapp_stream_responses: bool = False
     
     # Google Workspace
     google_client_id: Optional[str] = None
@@ -7,7 +7,7 @@ from langgraph.graph import StateGraph, END
 from .state import AgentState
 from .nodes import discovery_node, sales_node, support_node
 from .edges import route_intent
-from .checkpointer import MultiTenantCheckpointer
+from .checkpointer import get_checkpointer
 
 logger = structlog.get_logger(__name__)
 
@@ -70,9 +70,8 @@ def build_graph() -> StateGraph:
     # Supervisor Approve → END
     workflow.add_edge("supervisor_approve", END)
     
-    # Compilar com checkpointer
-    checkpointer = MultiTenantCheckpointer()
-    graph = workflow.compile(checkpointer=checkpointer)
+    # Compilar com checkpointer (compartilhado: cache de checkpoints entre execuções)
+    graph = workflow.compile(checkpointer=get_checkpointer())
     
     logger.info("build_graph: StateGraph compilado com sucesso (SICC integrado, sem Router)")
     
@@ -1,54 +1,183 @@
 """
 Checkpointer Multi-Tenant - Persistência de estado isolada por tenant
 Implementação customizada de BaseCheckpointSaver para LangGraph 1.0.5
-Usa tabela multi_agent_conversations para isolamento de dados
+Usa tabela langgraph_checkpoints (versionada) para isolamento de dados
 """
-from typing import Optional, Iterator, Sequence
+import asyncio
+import base64
+import os
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
 import structlog
-from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointTuple, CheckpointMetadata
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    PendingWrite,
+    copy_checkpoint,
+)
 from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 from langchain_core.runnables import RunnableConfig
-from datetime import datetime
 
 from ..services.supabase_client import get_supabase_client
+from ..services.supabase_pool import get_supabase_pool
 
 logger = structlog.get_logger(__name__)
 
+# (thread_id, checkpoint_ns)
+ThreadKey = Tuple[str, str]
+
+# Função que monta a query a partir do cliente (sem chamar .execute())
+QueryBuilder = Callable[[Any], Any]
+
+# Canal do histórico de mensagens, gravado em linhas append-only
+MESSAGES_CHANNEL = "messages"
+
+# Payloads serializados a partir deste tamanho são comprimidos (zlib)
+COMPRESS_MIN_BYTES = 256
+COMPRESSED_SUFFIX = "+zlib"
+
+
+class CheckpointConflictError(RuntimeError):
+    """Checkpoint da thread gravado por outra réplica desde a última leitura"""
+
+
+@dataclass
+class _ThreadCheckpoint:
+    """Checkpoint mais recente de uma thread mantido em memória"""
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    config: RunnableConfig
+    parent_config: Optional[RunnableConfig]
+    tenant_id: int
+    conversation_id: int
+    version: int
+    persisted_version: int
+    # Writes das tasks por checkpoint de origem e (task_id, idx); inclui
+    # checkpoints mais novos cujo put ainda não chegou (puts rodam em background)
+    pending_writes: Dict[str, Dict[Tuple[str, int], PendingWrite]] = field(default_factory=dict)
+    # Histórico de mensagens já gravado em langgraph_checkpoint_messages
+    # (vazio = próxima gravação envia o histórico inteiro)
+    persisted_messages: List[Any] = field(default_factory=list)
+    # Identifica as gravações desta entrada: gravações da mesma entrada
+    # chegando fora de ordem não são conflito com outra réplica
+    writer_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # threading.Timer (uso síncrono) ou asyncio.Task (uso assíncrono)
+    timer: Optional[Any] = None
+    
+    @property
+    def dirty(self) -> bool:
+        return self.version > self.persisted_version
+
 
 class MultiTenantCheckpointer(BaseCheckpointSaver):
     """
     Salva e recupera checkpoints da conversação no Supabase com isolamento multi-tenant.
     
-    MUDANÇAS vs versão single-tenant:
-    - Usa tabela multi_agent_conversations (não conversations)
-    - Thread ID format: "tenant_{tenant_id}_conv_{conversation_id}"
-    - Filtra por tenant_id em TODAS as queries (isolamento garantido)
-    - Salva checkpoint em multi_agent_conversations.metadata
-    
-    Implementa BaseCheckpointSaver do LangGraph 1.0.5.
-    
-    Usa tabela multi_agent_conversations:
-    Campos relevantes:
-        - id: SERIAL (PK) - conversation_id
-        - tenant_id: INTEGER (FK) - ID do tenant (afiliado lojista)
-        - lead_phone: VARCHAR - Telefone do lead
-        - status: VARCHAR - Status da conversa (active, closed, etc)
-        - metadata: JSONB - Armazena checkpoint e metadata do LangGraph
-        - created_at: TIMESTAMPTZ
-        - updated_at: TIMESTAMPTZ
-    
     Estratégia:
     - thread_id = "tenant_{tenant_id}_conv_{conversation_id}"
     - Extrai tenant_id e conversation_id do thread_id
     - Filtra por tenant_id em TODAS as queries (RLS + application-level)
-    - checkpoint e metadata armazenados em metadata.langgraph_checkpoint
+    - Checkpoint mais recente de cada thread em langgraph_checkpoints, com
+      coluna `version` incrementada a cada checkpoint
+    - Writes das tasks em langgraph_checkpoint_writes, gravados assim que a
+      task termina (retomada após crash não refaz tasks concluídas)
+    
+    Gravação agrupada:
+    - O grafo gera um checkpoint por transição de node; `put` só atualiza o
+      cache da thread em memória (sem I/O)
+    - O checkpoint final da execução (nenhum node agendado) é gravado na
+      hora; checkpoints intermediários, após `flush_delay_seconds` sem um
+      novo checkpoint (ex.: execução interrompida)
+    - `get_tuple` é servido do cache, sem reler nem desserializar o banco
+    
+    Várias réplicas:
+    - Cada gravação informa a versão sobre a qual foi construída
+      (`persisted_version`); o RPC só aplica o checkpoint se a versão no banco
+      ainda for essa (compare-and-swap)
+    - Gravação rejeitada descarta a thread do cache e falha a execução com
+      CheckpointConflictError; a próxima execução relê o checkpoint do banco
+    
+    Formato compacto:
+    - Checkpoint e writes serializados em msgpack (serde do LangGraph),
+      comprimidos com zlib acima de COMPRESS_MIN_BYTES
+    - O canal `messages` fica fora do checkpoint, uma linha por mensagem em
+      langgraph_checkpoint_messages: cada gravação envia só as mensagens
+      novas e reescreve a partir da primeira alterada/removida
+    - Checkpoints antigos em multi_agent_conversations.metadata são lidos
+      quando a thread ainda não existe na tabela nova (migração sob demanda)
+    
+    A interface assíncrona (`aget_tuple`, `alist`, `aput`, `aput_writes`),
+    usada por `graph.ainvoke`, roda sobre o pool Supabase assíncrono do
+    processo; a síncrona, sobre o cliente síncrono. Ambas compartilham o cache.
     """
     
-    def __init__(self):
-        """Inicializa checkpointer com cliente Supabase e serializer"""
+    TABLE = "langgraph_checkpoints"
+    WRITES_TABLE = "langgraph_checkpoint_writes"
+    MESSAGES_TABLE = "langgraph_checkpoint_messages"
+    PUT_RPC = "put_langgraph_checkpoint"
+    LEGACY_TABLE = "multi_agent_conversations"
+    
+    def __init__(self,
+                 client: Any = None,
+                 db: Any = None,
+                 flush_delay_seconds: Optional[float] = None,
+                 max_threads: Optional[int] = None):
+        """
+        Inicializa checkpointer com cliente Supabase e serializer
+        
+        Args:
+            client: Cliente Supabase síncrono (padrão: get_supabase_client())
+            db: Executor assíncrono de acesso a dados (padrão: get_supabase_pool())
+            flush_delay_seconds: Espera sem novos checkpoints antes de gravar
+                checkpoints intermediários (padrão: env CHECKPOINT_FLUSH_DELAY_SECONDS;
+                0 grava cada checkpoint na hora)
+            max_threads: Máximo de threads no cache (padrão: env CHECKPOINT_CACHE_MAX_THREADS)
+        """
         super().__init__(serde=JsonPlusSerializer())
-        self.supabase = get_supabase_client()
-        logger.info("MultiTenantCheckpointer inicializado (usando tabela multi_agent_conversations)")
+        self.supabase = client if client is not None else get_supabase_client()
+        self.db = db if db is not None else get_supabase_pool()
+        
+        if flush_delay_seconds is None:
+            flush_delay_seconds = float(os.getenv("CHECKPOINT_FLUSH_DELAY_SECONDS", "1.0"))
+        if max_threads is None:
+            max_threads = int(os.getenv("CHECKPOINT_CACHE_MAX_THREADS", "1000"))
+        self.flush_delay_seconds = flush_delay_seconds
+        self.max_threads = max_threads
+        
+        self._cache: "OrderedDict[ThreadKey, _ThreadCheckpoint]" = OrderedDict()
+        # Writes de threads ainda sem entrada no cache (primeiro aput da
+        # thread ainda lendo o banco enquanto os nodes já rodam)
+        self._orphan_writes: "OrderedDict[ThreadKey, Dict[str, Dict[Tuple[str, int], PendingWrite]]]" = OrderedDict()
+        # Threads com gravação rejeitada: puts da execução em andamento falham
+        # até a próxima leitura (`get_tuple`) recarregar o checkpoint do banco
+        self._conflicts: Set[ThreadKey] = set()
+        self._lock = threading.RLock()
+        self._closed = False
+        
+        self.stats = {
+            "puts": 0,
+            "writes": 0,
+            "coalesced": 0,
+            "write_errors": 0,
+            "task_writes": 0,
+            "task_write_errors": 0,
+            "messages_written": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "legacy_loads": 0,
+            "conflicts": 0
+        }
+        
+        logger.info("MultiTenantCheckpointer inicializado (usando tabela langgraph_checkpoints)")
     
     def _parse_thread_id(self, thread_id: str) -> tuple[int, int]:
         """
@@ -56,10 +185,10 @@ class MultiTenantCheckpointer(BaseCheckpointSaver):
         
         Args:
             thread_id: String no formato "tenant_{tenant_id}_conv_{conversation_id}"
-            
+        
         Returns:
             Tupla (tenant_id, conversation_id)
-            
+        
         Raises:
             ValueError: Se thread_id não estiver no formato correto
         """
@@ -77,57 +206,339 @@ class MultiTenantCheckpointer(BaseCheckpointSaver):
             logger.error(f"_parse_thread_id: Erro ao parsear thread_id '{thread_id}': {e}")
             raise ValueError(f"Thread ID deve estar no formato 'tenant_{{id}}_conv_{{id}}': {thread_id}")
     
+    @staticmethod
+    def _thread_key(config: RunnableConfig) -> ThreadKey:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+    
+    @staticmethod
+    def _is_run_end(checkpoint: Checkpoint, metadata: CheckpointMetadata) -> bool:
+        """Checkpoint final da execução: nenhum node agendado para o próximo passo"""
+        updated = checkpoint.get("updated_channels")
+        if metadata.get("source") != "loop" or updated is None:
+            return False
+        return not any(channel.startswith("branch:to:") for channel in updated)
+    
+    @staticmethod
+    def _checkpoint_config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id
+            }
+        }
+    
+    def _to_tuple(self, entry: _ThreadCheckpoint) -> CheckpointTuple:
+        with self._lock:
+            return CheckpointTuple(
+                config=entry.config,
+                checkpoint=copy_checkpoint(entry.checkpoint),
+                metadata=entry.metadata,
+                parent_config=entry.parent_config,
+                pending_writes=list(entry.pending_writes.get(entry.checkpoint["id"], {}).values())
+            )
+    
+    # ------------------------------------------------------------------
+    # Serialização
+    # ------------------------------------------------------------------
+    
+    def _serialize(self, value: Any) -> Tuple[str, str]:
+        """
+        Serializa checkpoint, mensagem ou valor de write para gravação
+        
+        Returns:
+            (tipo, payload em base64); tipo com sufixo "+zlib" se comprimido
+        """
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(data)
+            if len(compressed) < len(data):
+                type_, data = type_ + COMPRESSED_SUFFIX, compressed
+        return type_, base64.b64encode(data).decode("ascii")
+    
+    def _deserialize(self, type_: str, payload: str) -> Any:
+        data = base64.b64decode(payload)
+        if type_.endswith(COMPRESSED_SUFFIX):
+            type_, data = type_[:-len(COMPRESSED_SUFFIX)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+    
+    @staticmethod
+    def _split_messages(checkpoint: Checkpoint) -> Tuple[Checkpoint, List[Any]]:
+        """Separa o histórico de mensagens do restante do checkpoint"""
+        channel_values = checkpoint["channel_values"]
+        messages = channel_values.get(MESSAGES_CHANNEL)
+        if not isinstance(messages, list) or not messages:
+            return checkpoint, []
+        
+        stored = dict(checkpoint)
+        stored["channel_values"] = {
+            channel: value for channel, value in channel_values.items() if channel != MESSAGES_CHANNEL
+        }
+        return stored, messages
+    
+    @staticmethod
+    def _common_prefix(persisted: List[Any], messages: List[Any]) -> int:
+        """Quantas mensagens do início do histórico já estão gravadas"""
+        count = 0
+        for old, new in zip(persisted, messages):
+            # Mensagens são reaproveitadas entre checkpoints; igualdade só
+            # para objetos recriados (ex.: desserializados)
+            if old is not new and old != new:
+                break
+            count += 1
+        return count
+    
+    # ------------------------------------------------------------------
+    # Queries (executadas pelo cliente síncrono ou pelo pool assíncrono)
+    # ------------------------------------------------------------------
+    
+    def _checkpoint_query(self, key: ThreadKey, tenant_id: int) -> QueryBuilder:
+        thread_id, checkpoint_ns = key
+        return lambda c: c.table(self.TABLE) \
+            .select("checkpoint_id, parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata, messages_count") \
+            .eq("thread_id", thread_id) \
+            .eq("checkpoint_ns", checkpoint_ns) \
+            .eq("tenant_id", tenant_id) \
+            .limit(1)
+    
+    def _writes_query(self, key: ThreadKey, tenant_id: int) -> QueryBuilder:
+        thread_id, checkpoint_ns = key
+        return lambda c: c.table(self.WRITES_TABLE) \
+            .select("checkpoint_id, task_id, idx, channel, value_type, value") \
+            .eq("thread_id", thread_id) \
+            .eq("checkpoint_ns", checkpoint_ns) \
+            .eq("tenant_id", tenant_id)
+    
+    def _messages_query(self, key: ThreadKey, tenant_id: int) -> QueryBuilder:
+        thread_id, checkpoint_ns = key
+        return lambda c: c.table(self.MESSAGES_TABLE) \
+            .select("seq, value_type, value") \
+            .eq("thread_id", thread_id) \
+            .eq("checkpoint_ns", checkpoint_ns) \
+            .eq("tenant_id", tenant_id) \
+            .order("seq")
+    
+    def _legacy_query(self, tenant_id: int, conversation_id: int) -> QueryBuilder:
+        return lambda c: c.table(self.LEGACY_TABLE) \
+            .select("metadata") \
+            .eq("tenant_id", tenant_id) \
+            .eq("id", conversation_id) \
+            .limit(1)
+    
+    def _execute(self, build: QueryBuilder) -> Any:
+        """Executa query no cliente síncrono"""
+        return build(self.supabase).execute()
+    
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    
+    def _entry_from_row(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                        row: Dict[str, Any], write_rows: List[Dict[str, Any]],
+                        message_rows: Optional[List[Dict[str, Any]]] = None) -> _ThreadCheckpoint:
+        """Monta a entrada do cache a partir das linhas de checkpoint, writes e mensagens"""
+        thread_id, checkpoint_ns = key
+        checkpoint = self._deserialize(row["checkpoint_type"], row["checkpoint"])
+        parent_id = row.get("parent_checkpoint_id")
+        
+        # messages_count 0: sem histórico ou mensagens dentro do checkpoint
+        # (gravado antes das linhas de mensagens; convertido na próxima gravação)
+        messages_count = row.get("messages_count") or 0
+        messages: List[Any] = []
+        if messages_count:
+            messages = [
+                self._deserialize(message["value_type"], message["value"])
+                for message in sorted(message_rows or [], key=lambda m: m["seq"])
+                if message["seq"] < messages_count
+            ]
+            checkpoint["channel_values"][MESSAGES_CHANNEL] = messages
+            if len(messages) != messages_count:
+                logger.warning(
+                    f"_load: Histórico incompleto (thread {thread_id}: {len(messages)} de {messages_count} mensagens)"
+                )
+                messages = []
+        
+        pending_writes: Dict[str, Dict[Tuple[str, int], PendingWrite]] = {}
+        for write in write_rows or []:
+            if write["checkpoint_id"] < row["checkpoint_id"]:
+                continue
+            writes = pending_writes.setdefault(write["checkpoint_id"], {})
+            writes[(write["task_id"], write["idx"])] = (
+                write["task_id"],
+                write["channel"],
+                self._deserialize(write["value_type"], write["value"])
+            )
+        
+        return _ThreadCheckpoint(
+            checkpoint=checkpoint,
+            metadata=row.get("metadata") or {},
+            config=self._checkpoint_config(thread_id, checkpoint_ns, row["checkpoint_id"]),
+            parent_config=self._checkpoint_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            version=row["version"],
+            persisted_version=row["version"],
+            pending_writes=pending_writes,
+            persisted_messages=list(messages)
+        )
+    
+    def _entry_from_legacy(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                           rows: List[Dict[str, Any]], require_conversation: bool) -> Optional[_ThreadCheckpoint]:
+        """Checkpoint gravado em multi_agent_conversations.metadata (formato anterior)"""
+        thread_id, checkpoint_ns = key
+        
+        if not rows:
+            if require_conversation:
+                # A conversa deve ser criada pelo webhook antes de processar mensagens
+                raise ValueError(f"Conversa {conversation_id} não existe para tenant {tenant_id}")
+            return None
+        
+        checkpoint_data = (rows[0].get("metadata") or {}).get("langgraph_checkpoint")
+        if checkpoint_ns or not checkpoint_data or not checkpoint_data.get("checkpoint"):
+            return None
+        
+        payload = checkpoint_data["checkpoint"]
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        checkpoint = self.serde.loads_typed(("json", payload))
+        self.stats["legacy_loads"] += 1
+        
+        # Versão 0: o próximo checkpoint da thread vai para a tabela nova
+        return _ThreadCheckpoint(
+            checkpoint=checkpoint,
+            metadata=checkpoint_data.get("metadata", {}),
+            config=self._checkpoint_config(thread_id, "", checkpoint.get("id")),
+            parent_config=None,
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            version=0,
+            persisted_version=0
+        )
+    
+    def _load(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+              require_conversation: bool = False) -> Optional[_ThreadCheckpoint]:
+        """
+        Lê o checkpoint da thread do banco (tabela nova ou metadata antiga)
+        
+        Args:
+            key: (thread_id, checkpoint_ns)
+            tenant_id: ID do tenant
+            conversation_id: ID da conversa
+            require_conversation: Exigir que a conversa exista para o tenant
+        
+        Returns:
+            Checkpoint da thread ou None
+        
+        Raises:
+            ValueError: Se require_conversation e a conversa não existir para o tenant
+        """
+        rows = self._execute(self._checkpoint_query(key, tenant_id)).data
+        if rows:
+            write_rows = self._execute(self._writes_query(key, tenant_id)).data
+            message_rows = None
+            if rows[0].get("messages_count"):
+                message_rows = self._execute(self._messages_query(key, tenant_id)).data
+            return self._entry_from_row(key, tenant_id, conversation_id, rows[0], write_rows, message_rows)
+        
+        if key[1] and not require_conversation:
+            return None
+        legacy_rows = self._execute(self._legacy_query(tenant_id, conversation_id)).data
+        return self._entry_from_legacy(key, tenant_id, conversation_id, legacy_rows, require_conversation)
+    
+    async def _aload(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                     require_conversation: bool = False) -> Optional[_ThreadCheckpoint]:
+        """Versão assíncrona de `_load` (checkpoint, writes e mensagens lidos em paralelo)"""
+        checkpoint_response, writes_response, messages_response = await asyncio.gather(
+            self.db.run(self._checkpoint_query(key, tenant_id)),
+            self.db.run(self._writes_query(key, tenant_id)),
+            self.db.run(self._messages_query(key, tenant_id))
+        )
+        if checkpoint_response.data:
+            return self._entry_from_row(
+                key, tenant_id, conversation_id, checkpoint_response.data[0],
+                writes_response.data, messages_response.data
+            )
+        
+        if key[1] and not require_conversation:
+            return None
+        legacy_response = await self.db.run(self._legacy_query(tenant_id, conversation_id))
+        return self._entry_from_legacy(key, tenant_id, conversation_id, legacy_response.data, require_conversation)
+    
+    def _cached(self, key: ThreadKey) -> Optional[_ThreadCheckpoint]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+            else:
+                self.stats["cache_misses"] += 1
+            return entry
+    
+    def _store_loaded(self, key: ThreadKey, loaded: _ThreadCheckpoint) -> _ThreadCheckpoint:
+        with self._lock:
+            # put concorrente durante a leitura tem o checkpoint mais novo
+            entry = self._cache.setdefault(key, loaded)
+            self._cache.move_to_end(key)
+            self._merge_orphan_writes(key, entry)
+            return entry
+    
+    def _get_entry(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                   require_conversation: bool = False) -> Optional[_ThreadCheckpoint]:
+        """Checkpoint da thread do cache ou, na falta, do banco"""
+        entry = self._cached(key)
+        if entry is not None:
+            return entry
+        
+        loaded = self._load(key, tenant_id, conversation_id, require_conversation)
+        if loaded is None:
+            return None
+        entry = self._store_loaded(key, loaded)
+        self._evict()
+        return entry
+    
+    async def _aget_entry(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                          require_conversation: bool = False) -> Optional[_ThreadCheckpoint]:
+        """Versão assíncrona de `_get_entry`"""
+        entry = self._cached(key)
+        if entry is not None:
+            return entry
+        
+        loaded = await self._aload(key, tenant_id, conversation_id, require_conversation)
+        if loaded is None:
+            return None
+        entry = self._store_loaded(key, loaded)
+        await self._aevict()
+        return entry
+    
+    def _select_tuple(self, config: RunnableConfig, entry: Optional[_ThreadCheckpoint]) -> Optional[CheckpointTuple]:
+        """Tupla do checkpoint pedido (apenas o mais recente é mantido)"""
+        if entry is None:
+            return None
+        
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        if checkpoint_id and checkpoint_id != entry.checkpoint.get("id"):
+            logger.debug(f"get_tuple: Checkpoint {checkpoint_id} não é o mais recente da thread")
+            return None
+        
+        return self._to_tuple(entry)
+    
     def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
         """
         Recupera checkpoint específico com isolamento de tenant.
         
         Args:
             config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
-            
+        
         Returns:
             CheckpointTuple ou None se não existir
         """
         try:
-            thread_id = config["configurable"]["thread_id"]
-            tenant_id, conversation_id = self._parse_thread_id(thread_id)
-            
-            logger.info(f"get_tuple: Recuperando checkpoint para tenant {tenant_id}, conversation {conversation_id}")
-            
-            # Buscar conversa com filtro de tenant_id (isolamento)
-            response = self.supabase.table("multi_agent_conversations") \
-                .select("id, tenant_id, metadata, created_at, updated_at") \
-                .eq("tenant_id", tenant_id) \
-                .eq("id", conversation_id) \
-                .single() \
-                .execute()
-            
-            if not response.data:
-                logger.info("get_tuple: Nenhuma conversa encontrada")
-                return None
-            
-            row = response.data
-            metadata_field = row.get("metadata", {})
-            
-            # Checkpoint armazenado em metadata.langgraph_checkpoint
-            checkpoint_data = metadata_field.get("langgraph_checkpoint")
-            if not checkpoint_data:
-                logger.info("get_tuple: Conversa existe mas sem checkpoint LangGraph")
-                return None
-            
-            # Deserializar checkpoint
-            checkpoint = self.serde.loads(checkpoint_data.get("checkpoint", "{}"))
-            metadata = checkpoint_data.get("metadata", {})
-            
-            checkpoint_tuple = CheckpointTuple(
-                config=config,
-                checkpoint=checkpoint,
-                metadata=metadata,
-                parent_config=None  # Não usamos parent por enquanto
-            )
-            
-            logger.info(f"get_tuple: Checkpoint recuperado (tenant: {tenant_id}, conversation: {conversation_id})")
-            return checkpoint_tuple
-            
+            key = self._thread_key(config)
+            tenant_id, conversation_id = self._parse_thread_id(key[0])
+            # Nova execução: parte do checkpoint vigente no banco
+            self._conflicts.discard(key)
+            return self._select_tuple(config, self._get_entry(key, tenant_id, conversation_id))
         except ValueError as e:
             logger.error(f"get_tuple: Thread ID inválido: {e}")
             return None
@@ -135,156 +546,651 @@ class MultiTenantCheckpointer(BaseCheckpointSaver):
             logger.error(f"get_tuple: Erro ao recuperar checkpoint: {e}")
             return None
     
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Recupera checkpoint específico com isolamento de tenant (assíncrono).
+        
+        Args:
+            config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
+        
+        Returns:
+            CheckpointTuple ou None se não existir
+        """
+        try:
+            key = self._thread_key(config)
+            tenant_id, conversation_id = self._parse_thread_id(key[0])
+            # Nova execução: parte do checkpoint vigente no banco
+            self._conflicts.discard(key)
+            return self._select_tuple(config, await self._aget_entry(key, tenant_id, conversation_id))
+        except ValueError as e:
+            logger.error(f"aget_tuple: Thread ID inválido: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"aget_tuple: Erro ao recuperar checkpoint: {e}")
+            return None
+    
+    @staticmethod
+    def _latest_config(config: RunnableConfig) -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", "")
+            }
+        }
+    
+    @staticmethod
+    def _matches(checkpoint_tuple: Optional[CheckpointTuple],
+                 filter: Optional[Dict[str, Any]],
+                 before: Optional[RunnableConfig]) -> bool:
+        if checkpoint_tuple is None:
+            return False
+        if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+            return False
+        before_id = before["configurable"].get("checkpoint_id") if before else None
+        return not (before_id and checkpoint_tuple.checkpoint["id"] >= before_id)
+    
     def list(
         self,
-        config: RunnableConfig,
+        config: Optional[RunnableConfig],
         *,
+        filter: Optional[Dict[str, Any]] = None,
         before: Optional[RunnableConfig] = None,
         limit: Optional[int] = None
     ) -> Iterator[CheckpointTuple]:
         """
         Lista checkpoints que correspondem aos critérios com isolamento de tenant.
         
+        Apenas o checkpoint mais recente de cada thread é armazenado.
+        
         Args:
             config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
+            filter: Filtro por campos da metadata
             before: Filtrar checkpoints antes deste config
             limit: Limitar número de resultados
-            
+        
         Yields:
             CheckpointTuples apenas do tenant especificado
         """
-        try:
-            thread_id = config["configurable"]["thread_id"]
-            tenant_id, conversation_id = self._parse_thread_id(thread_id)
-            
-            logger.info(f"list: Listando checkpoints para tenant {tenant_id}, conversation {conversation_id}")
-            
-            # Buscar apenas conversas do tenant (isolamento)
-            query = self.supabase.table("multi_agent_conversations") \
-                .select("id, tenant_id, metadata, created_at, updated_at") \
-                .eq("tenant_id", tenant_id) \
-                .eq("id", conversation_id) \
-                .order("updated_at", desc=True)
-            
-            if limit:
-                query = query.limit(limit)
-            
-            response = query.execute()
-            
-            count = 0
-            for row in response.data:
-                metadata_field = row.get("metadata", {})
-                checkpoint_data = metadata_field.get("langgraph_checkpoint")
-                
-                if not checkpoint_data:
-                    continue
-                
-                checkpoint = self.serde.loads(checkpoint_data.get("checkpoint", "{}"))
-                metadata = checkpoint_data.get("metadata", {})
-                
-                yield CheckpointTuple(
-                    config=config,
+        if config is None or limit == 0:
+            return
+        
+        checkpoint_tuple = self.get_tuple(self._latest_config(config))
+        if self._matches(checkpoint_tuple, filter, before):
+            yield checkpoint_tuple
+    
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        """
+        Lista checkpoints que correspondem aos critérios com isolamento de tenant (assíncrono).
+        
+        Args:
+            config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
+            filter: Filtro por campos da metadata
+            before: Filtrar checkpoints antes deste config
+            limit: Limitar número de resultados
+        
+        Yields:
+            CheckpointTuples apenas do tenant especificado
+        """
+        if config is None or limit == 0:
+            return
+        
+        checkpoint_tuple = await self.aget_tuple(self._latest_config(config))
+        if self._matches(checkpoint_tuple, filter, before):
+            yield checkpoint_tuple
+    
+    # ------------------------------------------------------------------
+    # Gravação de checkpoints
+    # ------------------------------------------------------------------
+    
+    def _apply_put(self, key: ThreadKey, tenant_id: int, conversation_id: int,
+                   current: Optional[_ThreadCheckpoint], config: RunnableConfig,
+                   checkpoint: Checkpoint, metadata: CheckpointMetadata) -> Tuple[RunnableConfig, bool]:
+        """
+        Atualiza o cache da thread com o novo checkpoint
+        
+        Returns:
+            (config do novo checkpoint, se deve ser gravado imediatamente)
+        """
+        new_config = self._checkpoint_config(key[0], key[1], checkpoint["id"])
+        parent_id = config["configurable"].get("checkpoint_id")
+        run_end = self._is_run_end(checkpoint, metadata)
+        
+        with self._lock:
+            entry = self._cache.get(key) or current
+            if entry is None:
+                entry = _ThreadCheckpoint(
                     checkpoint=checkpoint,
                     metadata=metadata,
-                    parent_config=None
+                    config=new_config,
+                    parent_config=None,
+                    tenant_id=tenant_id,
+                    conversation_id=conversation_id,
+                    version=0,
+                    persisted_version=0
                 )
-                count += 1
+            elif entry.dirty:
+                self.stats["coalesced"] += 1
+            self._merge_orphan_writes(key, entry)
             
-            logger.info(f"list: {count} checkpoints listados para tenant {tenant_id}")
+            entry.checkpoint = copy_checkpoint(checkpoint)
+            entry.metadata = dict(metadata)
+            entry.config = new_config
+            entry.parent_config = self._checkpoint_config(key[0], key[1], parent_id) if parent_id else None
+            # IDs de checkpoint são ordenáveis pelo tempo
+            entry.pending_writes = {
+                checkpoint_id: writes for checkpoint_id, writes in entry.pending_writes.items()
+                if checkpoint_id >= checkpoint["id"]
+            }
+            entry.version += 1
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            self.stats["puts"] += 1
             
-        except ValueError as e:
-            logger.error(f"list: Thread ID inválido: {e}")
-        except Exception as e:
-            logger.error(f"list: Erro ao listar checkpoints: {e}")
+            write_now = run_end or self.flush_delay_seconds <= 0 or self._closed
+            if write_now:
+                self._take_timer(entry)
+            else:
+                # Adia a gravação enquanto a execução gera novos checkpoints
+                self._schedule_flush(key, entry)
+        
+        return new_config, write_now
     
     def put(
         self,
         config: RunnableConfig,
         checkpoint: Checkpoint,
-        metadata: CheckpointMetadata
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
     ) -> RunnableConfig:
         """
         Salva checkpoint com isolamento de tenant.
         
+        Atualiza o cache da thread; a gravação no banco é agrupada (ver classe).
+        
         Args:
             config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
             checkpoint: Checkpoint a salvar
             metadata: Metadata do checkpoint
-            
+            new_versions: Versões dos canais alterados neste checkpoint
+        
         Returns:
             Configuração atualizada
-            
+        
+        Raises:
+            ValueError: Se thread_id inválido ou a conversa não existir para o tenant
+            CheckpointConflictError: Se outra réplica gravou a thread durante a execução
+        """
+        key = self._thread_key(config)
+        tenant_id, conversation_id = self._parse_thread_id(key[0])
+        if key in self._conflicts:
+            raise self._conflict_error(key)
+        
+        # Versão já gravada da thread e existência da conversa (leitura só
+        # se a thread não está no cache)
+        current = self._get_entry(key, tenant_id, conversation_id, require_conversation=True)
+        
+        new_config, write_now = self._apply_put(
+            key, tenant_id, conversation_id, current, config, checkpoint, metadata
+        )
+        if write_now:
+            self._flush_key(key, raise_errors=True)
+        self._evict()
+        
+        return new_config
+    
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """
+        Salva checkpoint com isolamento de tenant (assíncrono).
+        
+        Args:
+            config: Configuração com thread_id no formato "tenant_{id}_conv_{id}"
+            checkpoint: Checkpoint a salvar
+            metadata: Metadata do checkpoint
+            new_versions: Versões dos canais alterados neste checkpoint
+        
+        Returns:
+            Configuração atualizada
+        
         Raises:
-            ValueError: Se thread_id inválido ou tenant_id não corresponder
+            ValueError: Se thread_id inválido ou a conversa não existir para o tenant
+            CheckpointConflictError: Se outra réplica gravou a thread durante a execução
         """
+        key = self._thread_key(config)
+        tenant_id, conversation_id = self._parse_thread_id(key[0])
+        if key in self._conflicts:
+            raise self._conflict_error(key)
+        
+        current = await self._aget_entry(key, tenant_id, conversation_id, require_conversation=True)
+        
+        new_config, write_now = self._apply_put(
+            key, tenant_id, conversation_id, current, config, checkpoint, metadata
+        )
+        if write_now:
+            await self._aflush_key(key, raise_errors=True)
+        await self._aevict()
+        
+        return new_config
+    
+    def _take_timer(self, entry: _ThreadCheckpoint) -> None:
+        """Cancela a gravação agendada da thread (exceto se for quem está gravando)"""
+        timer, entry.timer = entry.timer, None
+        if timer is None or timer is threading.current_thread():
+            return
         try:
-            thread_id = config["configurable"]["thread_id"]
-            tenant_id, conversation_id = self._parse_thread_id(thread_id)
+            if timer is asyncio.current_task():
+                return
+        except RuntimeError:
+            pass
+        timer.cancel()
+    
+    def _schedule_flush(self, key: ThreadKey, entry: _ThreadCheckpoint) -> None:
+        """(Re)agenda a gravação da thread para daqui a flush_delay_seconds"""
+        delay = max(self.flush_delay_seconds, 0.1)
+        with self._lock:
+            self._take_timer(entry)
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
             
-            logger.info(f"put: Salvando checkpoint para tenant {tenant_id}, conversation {conversation_id}")
+            if loop is not None:
+                entry.timer = loop.create_task(self._delayed_aflush(key, delay))
+            else:
+                entry.timer = threading.Timer(delay, self._flush_key, args=(key,))
+                entry.timer.daemon = True
+                entry.timer.start()
+    
+    async def _delayed_aflush(self, key: ThreadKey, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._aflush_key(key)
+    
+    def _pending_write(
+        self,
+        key: ThreadKey,
+        entry: Optional[_ThreadCheckpoint] = None
+    ) -> Optional[Tuple[_ThreadCheckpoint, Dict[str, Any], List[Any]]]:
+        """
+        Parâmetros do RPC se a thread tem checkpoint pendente
+        
+        Returns:
+            (entrada, parâmetros, histórico de mensagens gravado) ou None
+        """
+        thread_id, checkpoint_ns = key
+        with self._lock:
+            entry = entry or self._cache.get(key)
+            if entry is None:
+                return None
+            self._take_timer(entry)
+            if not entry.dirty:
+                return None
             
-            # Serializar checkpoint
-            checkpoint_data = {
-                "checkpoint": self.serde.dumps(checkpoint),
-                "metadata": metadata,
-                "saved_at": datetime.utcnow().isoformat()
+            # Snapshot consistente: put concorrente substitui os campos da entrada
+            checkpoint = entry.checkpoint
+            persisted_messages = entry.persisted_messages
+            params = {
+                "p_thread_id": thread_id,
+                "p_checkpoint_ns": checkpoint_ns,
+                "p_tenant_id": entry.tenant_id,
+                "p_conversation_id": entry.conversation_id,
+                "p_checkpoint_id": checkpoint["id"],
+                "p_parent_checkpoint_id": (
+                    entry.parent_config["configurable"]["checkpoint_id"] if entry.parent_config else None
+                ),
+                "p_version": entry.version,
+                "p_base_version": entry.persisted_version,
+                "p_writer_id": entry.writer_id,
+                "p_metadata": entry.metadata
             }
+        
+        stored, messages = self._split_messages(checkpoint)
+        start = self._common_prefix(persisted_messages, messages)
+        params["p_checkpoint_type"], params["p_checkpoint"] = self._serialize(stored)
+        params["p_messages"] = []
+        for seq in range(start, len(messages)):
+            value_type, value = self._serialize(messages[seq])
+            params["p_messages"].append({"seq": seq, "value_type": value_type, "value": value})
+        params["p_messages_count"] = len(messages)
+        return entry, params, messages
+    
+    def _write_failed(self, key: ThreadKey, entry: _ThreadCheckpoint, error: Exception) -> None:
+        self.stats["write_errors"] += 1
+        logger.error(f"put: Erro ao salvar checkpoint (thread {key[0]}): {error}")
+        if not self._closed:
+            # Checkpoint segue no cache (mesmo se removido pelo LRU): nova tentativa agendada
+            with self._lock:
+                self._cache.setdefault(key, entry)
+            self._schedule_flush(key, entry)
+    
+    def _write_done(self, key: ThreadKey, entry: _ThreadCheckpoint, params: Dict[str, Any],
+                    messages: List[Any], current: Any) -> bool:
+        """
+        Registra a gravação e trata conflito com outra réplica
+        
+        Args:
+            current: Retorno do RPC ({"applied", "version", "checkpoint_id", "writer_id"})
+        
+        Returns:
+            False se a gravação foi rejeitada por conflito (thread descartada do cache)
+        """
+        version = params["p_version"]
+        if not isinstance(current, dict):
+            current = {}
+        with self._lock:
+            self.stats["writes"] += 1
             
-            # Buscar conversa existente com filtro de tenant (isolamento)
-            existing = self.supabase.table("multi_agent_conversations") \
-                .select("id, tenant_id, metadata") \
-                .eq("tenant_id", tenant_id) \
-                .eq("id", conversation_id) \
-                .single() \
-                .execute()
-            
-            if existing.data:
-                # Validar que tenant_id corresponde (segurança adicional)
-                if existing.data["tenant_id"] != tenant_id:
-                    raise ValueError(f"Tenant ID mismatch: esperado {tenant_id}, encontrado {existing.data['tenant_id']}")
-                
-                # Atualizar conversa existente
-                current_metadata = existing.data.get("metadata", {})
-                
-                # Preservar metadata existente e adicionar checkpoint
-                current_metadata["langgraph_checkpoint"] = checkpoint_data
-                
-                self.supabase.table("multi_agent_conversations").update({
-                    "metadata": current_metadata,
-                    "updated_at": datetime.utcnow().isoformat()
-                }).eq("id", conversation_id).eq("tenant_id", tenant_id).execute()
-                
-                logger.info(f"put: Checkpoint atualizado (tenant: {tenant_id}, conversation: {conversation_id})")
-            else:
-                # Conversa não existe - isso não deveria acontecer
-                # A conversa deve ser criada pelo webhook antes de processar mensagens
-                logger.error(f"put: Conversa {conversation_id} não encontrada para tenant {tenant_id}")
-                raise ValueError(f"Conversa {conversation_id} não existe para tenant {tenant_id}")
-            
-            return config
+            if current.get("applied") is False and current.get("writer_id") != entry.writer_id:
+                # Outra réplica gravou a thread desde a versão base: o cache está
+                # obsoleto e a próxima leitura recarrega o checkpoint do banco
+                self.stats["conflicts"] += 1
+                self._conflicts.add(key)
+                self._take_timer(entry)
+                if self._cache.get(key) is entry:
+                    del self._cache[key]
+                logger.warning(
+                    f"put: Checkpoint da thread {key[0]} gravado por outra réplica "
+                    f"(versão {current.get('version')}, base local {params['p_base_version']}); "
+                    f"gravação rejeitada e cache descartado"
+                )
+                return False
             
-        except ValueError as e:
-            logger.error(f"put: Erro de validação: {e}")
-            raise
+            # applied False da mesma entrada: gravação mais nova dela chegou antes
+            if current.get("applied") is not False:
+                self.stats["messages_written"] += len(params["p_messages"])
+            if version > entry.persisted_version:
+                entry.persisted_messages = list(messages)
+            entry.persisted_version = max(entry.persisted_version, version)
+        logger.debug(f"put: Checkpoint gravado (thread {key[0]}, versão {version})")
+        return True
+    
+    def _conflict_error(self, key: ThreadKey) -> CheckpointConflictError:
+        return CheckpointConflictError(
+            f"Checkpoint da thread {key[0]} gravado por outra réplica; execução descartada"
+        )
+    
+    def _flush_key(self, key: ThreadKey, raise_errors: bool = False,
+                   entry: Optional[_ThreadCheckpoint] = None) -> bool:
+        """Grava o checkpoint pendente da thread (do cache ou `entry`), se houver"""
+        pending = self._pending_write(key, entry)
+        if pending is None:
+            return False
+        entry, params, messages = pending
+        
+        try:
+            response = self._execute(lambda c: c.rpc(self.PUT_RPC, params))
         except Exception as e:
-            logger.error(f"put: Erro ao salvar checkpoint: {e}")
-            raise
+            self._write_failed(key, entry, e)
+            if raise_errors:
+                raise
+            return False
+        
+        if not self._write_done(key, entry, params, messages, response.data):
+            if raise_errors:
+                raise self._conflict_error(key)
+            return False
+        return True
+    
+    async def _aflush_key(self, key: ThreadKey, raise_errors: bool = False,
+                          entry: Optional[_ThreadCheckpoint] = None) -> bool:
+        """Versão assíncrona de `_flush_key`"""
+        pending = self._pending_write(key, entry)
+        if pending is None:
+            return False
+        entry, params, messages = pending
+        
+        try:
+            response = await self.db.run(lambda c: c.rpc(self.PUT_RPC, params))
+        except Exception as e:
+            self._write_failed(key, entry, e)
+            if raise_errors:
+                raise
+            return False
+        
+        if not self._write_done(key, entry, params, messages, response.data):
+            if raise_errors:
+                raise self._conflict_error(key)
+            return False
+        return True
+    
+    def _pop_evicted(self) -> List[Tuple[ThreadKey, _ThreadCheckpoint]]:
+        """Remove do cache threads menos usadas acima de max_threads"""
+        evicted = []
+        with self._lock:
+            while len(self._cache) > self.max_threads:
+                key, entry = self._cache.popitem(last=False)
+                self._take_timer(entry)
+                if entry.dirty:
+                    evicted.append((key, entry))
+        return evicted
+    
+    def _evict(self) -> None:
+        """Remove threads menos usadas acima de max_threads, gravando as pendentes"""
+        for key, entry in self._pop_evicted():
+            self._flush_key(key, entry=entry)
+    
+    async def _aevict(self) -> None:
+        """Versão assíncrona de `_evict`"""
+        for key, entry in self._pop_evicted():
+            await self._aflush_key(key, entry=entry)
+    
+    def _dirty_keys(self, config: Optional[RunnableConfig]) -> List[ThreadKey]:
+        if config is not None:
+            return [self._thread_key(config)]
+        with self._lock:
+            return [key for key, entry in self._cache.items() if entry.dirty]
+    
+    def flush(self, config: Optional[RunnableConfig] = None) -> int:
+        """
+        Grava imediatamente checkpoints pendentes
+        
+        Args:
+            config: Thread a gravar (None = todas)
+        
+        Returns:
+            Número de checkpoints gravados
+        """
+        return sum(1 for key in self._dirty_keys(config) if self._flush_key(key))
+    
+    async def aflush(self, config: Optional[RunnableConfig] = None) -> int:
+        """Versão assíncrona de `flush`"""
+        results = await asyncio.gather(*[self._aflush_key(key) for key in self._dirty_keys(config)])
+        return sum(1 for written in results if written)
+    
+    def close(self) -> None:
+        """Cancela gravações agendadas e grava os checkpoints pendentes"""
+        self._closed = True
+        flushed = self.flush()
+        if flushed:
+            logger.info(f"MultiTenantCheckpointer: {flushed} checkpoints pendentes gravados no shutdown")
+    
+    async def aclose(self) -> None:
+        """Versão assíncrona de `close`"""
+        self._closed = True
+        flushed = await self.aflush()
+        if flushed:
+            logger.info(f"MultiTenantCheckpointer: {flushed} checkpoints pendentes gravados no shutdown")
+    
+    # ------------------------------------------------------------------
+    # Writes das tasks
+    # ------------------------------------------------------------------
+    
+    def _prepare_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str
+    ) -> Tuple[ThreadKey, str, List[Dict[str, Any]], bool]:
+        """
+        Linhas de langgraph_checkpoint_writes para os writes de uma task
+        
+        Returns:
+            (thread, checkpoint_id, linhas, se writes existentes devem ser mantidos)
+        """
+        key = self._thread_key(config)
+        tenant_id, _ = self._parse_thread_id(key[0])
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, payload = self._serialize(value)
+            rows.append({
+                "thread_id": key[0],
+                "checkpoint_ns": key[1],
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "tenant_id": tenant_id,
+                "channel": channel,
+                "value_type": value_type,
+                "value": payload,
+                "task_path": task_path
+            })
+        
+        # Erros/interrupções substituem o registro anterior; writes comuns
+        # repetidos (retomada) mantêm o original
+        keep_existing = all(channel not in WRITES_IDX_MAP for channel, _ in writes)
+        return key, checkpoint_id, rows, keep_existing
+    
+    def _upsert_writes(self, rows: List[Dict[str, Any]], keep_existing: bool) -> QueryBuilder:
+        return lambda c: c.table(self.WRITES_TABLE).upsert(
+            rows,
+            on_conflict="thread_id,checkpoint_ns,checkpoint_id,task_id,idx",
+            ignore_duplicates=keep_existing
+        )
+    
+    def _remember_writes(self, key: ThreadKey, checkpoint_id: str,
+                         writes: Sequence[Tuple[str, Any]], task_id: str, keep_existing: bool) -> None:
+        """
+        Anexa os writes ao checkpoint em cache (retornados por get_tuple)
+        
+        Sem entrada da thread no cache, os writes ficam em espera e são
+        anexados quando a entrada for criada (`_merge_orphan_writes`).
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                by_checkpoint = self._orphan_writes.setdefault(key, {})
+                self._orphan_writes.move_to_end(key)
+                while len(self._orphan_writes) > self.max_threads:
+                    self._orphan_writes.popitem(last=False)
+            elif checkpoint_id < entry.checkpoint.get("id", ""):
+                return
+            else:
+                by_checkpoint = entry.pending_writes
+            pending = by_checkpoint.setdefault(checkpoint_id, {})
+            for idx, (channel, value) in enumerate(writes):
+                write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if keep_existing and write_key in pending:
+                    continue
+                pending[write_key] = (task_id, channel, value)
+    
+    def _merge_orphan_writes(self, key: ThreadKey, entry: _ThreadCheckpoint) -> None:
+        """Anexa à entrada os writes recebidos antes de ela existir (chamado com o lock)"""
+        orphans = self._orphan_writes.pop(key, None)
+        if not orphans:
+            return
+        current_id = entry.checkpoint.get("id", "")
+        for checkpoint_id, writes in orphans.items():
+            if checkpoint_id >= current_id:
+                # Writes em memória são os mais recentes desta réplica
+                entry.pending_writes.setdefault(checkpoint_id, {}).update(writes)
     
     def put_writes(
         self,
         config: RunnableConfig,
-        writes: Sequence[tuple],
-        task_id: str
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Salva writes intermediários de uma task.
+        
+        Gravados na hora, em linhas próprias (sem regravar o checkpoint).
+        
+        Args:
+            config: Configuração do checkpoint a partir do qual a task rodou
+            writes: Lista de (canal, valor)
+            task_id: ID da task
+            task_path: Caminho da task
+        """
+        if not writes:
+            return
+        key, checkpoint_id, rows, keep_existing = self._prepare_writes(config, writes, task_id, task_path)
+        self._remember_writes(key, checkpoint_id, writes, task_id, keep_existing)
+        
+        try:
+            self._execute(self._upsert_writes(rows, keep_existing))
+            self.stats["task_writes"] += len(rows)
+        except Exception as e:
+            # A execução em andamento segue com os writes em memória
+            self.stats["task_write_errors"] += 1
+            logger.error(f"put_writes: Erro ao salvar writes da task {task_id}: {e}")
+    
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
     ) -> None:
         """
-        Salva writes intermediários.
+        Salva writes intermediários de uma task (assíncrono).
         
         Args:
-            config: Configuração
-            writes: Lista de writes
+            config: Configuração do checkpoint a partir do qual a task rodou
+            writes: Lista de (canal, valor)
             task_id: ID da task
+            task_path: Caminho da task
         """
-        # Para MVP, não implementamos writes intermediários
-        # Apenas checkpoints completos
-        logger.debug(f"put_writes: Ignorando {len(writes)} writes para task {task_id}")
-        pass
+        if not writes:
+            return
+        key, checkpoint_id, rows, keep_existing = self._prepare_writes(config, writes, task_id, task_path)
+        self._remember_writes(key, checkpoint_id, writes, task_id, keep_existing)
+        
+        try:
+            await self.db.run(self._upsert_writes(rows, keep_existing))
+            self.stats["task_writes"] += len(rows)
+        except Exception as e:
+            self.stats["task_write_errors"] += 1
+            logger.error(f"aput_writes: Erro ao salvar writes da task {task_id}: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do checkpointer"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cached_threads"] = len(self._cache)
+            stats["pending_threads"] = sum(1 for entry in self._cache.values() if entry.dirty)
+        return stats
+
+
+# Singleton instance
+_checkpointer: Optional[MultiTenantCheckpointer] = None
+
+
+def get_checkpointer() -> MultiTenantCheckpointer:
+    """Obtém instância singleton do MultiTenantCheckpointer (cache compartilhado entre grafos)"""
+    global _checkpointer
+    if _checkpointer is None:
+        _checkpointer = MultiTenantCheckpointer()
+    return _checkpointer
+
+
+async def shutdown_checkpointer() -> None:
+    """Grava checkpoints pendentes do singleton (shutdown)"""
+    global _checkpointer
+    if _checkpointer is not None:
+        await _checkpointer.aclose()
+        _checkpointer = None
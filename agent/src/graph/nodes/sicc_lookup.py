@@ -1,16 +1,33 @@
 """
 SICC Lookup Node - Busca contexto relevante via Memory Service + Classificação de Intent
 """
+import asyncio
+import os
+import time
 import structlog
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from ..state import AgentState
 from ...services.sicc.memory_service import get_memory_service
+from ...services.sicc.intent_classifier import INTENTS, get_intent_classifier
 
 logger = structlog.get_logger(__name__)
 
+# Cliente LLM da classificação (criado uma vez, reutilizado entre mensagens)
+_intent_llm: Optional[ChatAnthropic] = None
+
+# Prazo comum das buscas de contexto (memórias, contexto, cliente, padrões)
+LOOKUP_DEADLINE_SECONDS = float(os.getenv("SICC_LOOKUP_DEADLINE_SECONDS", "2.0"))
+
+# Contexto usado quando o histórico do cliente não pôde ser obtido
+DEFAULT_CUSTOMER_CONTEXT = {
+    "is_returning_customer": False,
+    "customer_name": None,
+    "has_purchase_history": False
+}
+
 
 async def sicc_lookup_node(state: AgentState) -> AgentState:
     """
@@ -23,6 +40,11 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
     4. Buscar padrões aplicáveis
     5. Adicionar contexto ao estado para uso pelos próximos nodes
     
+    As quatro buscas são independentes e rodam em paralelo sob um prazo
+    comum (SICC_LOOKUP_DEADLINE_SECONDS): a latência do node é a da busca
+    mais lenta. Buscas que falham ou estouram o prazo entram vazias, e a
+    duração/status de cada uma fica em sicc_context["lookup_timings"].
+    
     Args:
         state: Estado atual da conversação
         
@@ -31,64 +53,52 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
     """
     logger.info("sicc_lookup_node: Iniciando busca de contexto relevante")
     
+    # Última mensagem do usuário para busca
+    if not state["messages"]:
+        logger.info("sicc_lookup_node: Nenhuma mensagem para buscar contexto")
+        return state
+    
+    query_text = state["messages"][-1].content
+    
     try:
         # Obter Memory Service
         memory_service = get_memory_service()
         
-        # Última mensagem do usuário para busca
-        if not state["messages"]:
-            logger.info("sicc_lookup_node: Nenhuma mensagem para buscar contexto")
-            return state
-        
-        last_message = state["messages"][-1]
-        query_text = last_message.content
         customer_id = state.get("lead_id")
+        tenant_id = state.get("tenant_id")
+        conversation_id = str(state.get("conversation_id") or customer_id or "unknown")
         
         logger.info(f"sicc_lookup_node: Buscando contexto para: '{query_text[:50]}...'")
         
-        # 1. Buscar memórias similares
-        similar_memories = await memory_service.search_similar(
-            query_text=query_text,
-            limit=5,
-            similarity_threshold=0.7,
-            filters={"customer_id": customer_id} if customer_id else {}
-        )
+        lookups = {
+            # 1. Memórias similares
+            "memories": memory_service.search_similar(
+                query=query_text,
+                limit=5,
+                filters={"customer_id": customer_id} if customer_id else {},
+                tenant_id=tenant_id
+            ),
+            # 2. Contexto relevante de conversas anteriores
+            "relevant_context": memory_service.get_relevant_context(
+                conversation_id=conversation_id,
+                current_message=query_text,
+                tenant_id=tenant_id
+            ),
+            # 4. Padrões aplicáveis
+            "patterns": _find_patterns(query_text, customer_id, state.get("current_intent"))
+        }
+        # 3. Histórico do cliente
+        if customer_id:
+            lookups["customer_context"] = _load_customer_context(customer_id)
         
-        # 2. Buscar contexto relevante de conversas anteriores
-        relevant_context = await memory_service.get_relevant_context(
-            conversation_id=state.get("lead_id", "unknown"),
-            query=query_text,
-            max_memories=3
-        )
+        results, timings = await _run_lookups(lookups, LOOKUP_DEADLINE_SECONDS)
         
-        # 3. Buscar histórico do cliente
-        customer_context = {}
-        if customer_id:
-            try:
-                from ...services.customer_history_service import get_customer_history_service
-                customer_service = get_customer_history_service()
-                customer_context = await customer_service.get_customer_context(customer_id)
-                logger.info(f"sicc_lookup_node: Contexto do cliente obtido - Retornando: {customer_context.get('is_returning_customer', False)}")
-            except Exception as e:
-                logger.warning(f"sicc_lookup_node: Erro ao buscar contexto do cliente: {e}")
-                customer_context = {
-                    "is_returning_customer": False,
-                    "customer_name": None,
-                    "has_purchase_history": False
-                }
-        
-        # 4. Buscar padrões aplicáveis
-        patterns = []
-        try:
-            from ...services.sicc.behavior_service import get_behavior_service
-            behavior_service = get_behavior_service()
-            patterns = await behavior_service.find_applicable_patterns(
-                message=query_text,
-                context={"user_id": customer_id, "intent": state.get("current_intent")}
-            )
-            logger.info(f"sicc_lookup_node: {len(patterns)} padrões aplicáveis encontrados")
-        except Exception as e:
-            logger.warning(f"sicc_lookup_node: Erro ao buscar padrões: {e}")
+        similar_memories = [_memory_to_dict(m) for m in results.get("memories") or []]
+        relevant_context = [_memory_to_dict(m) for m in results.get("relevant_context") or []]
+        patterns = results.get("patterns") or []
+        customer_context = results.get("customer_context") or (
+            DEFAULT_CUSTOMER_CONTEXT.copy() if customer_id else {}
+        )
         
         # Preparar contexto SICC completo
         sicc_context = {
@@ -98,15 +108,19 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
             "lookup_query": query_text,
             "memories_found": len(similar_memories),
             "context_found": len(relevant_context),
-            "patterns_found": len(patterns)
+            "patterns_found": len(patterns),
+            "lookup_timings": timings
         }
         
         logger.info(f"sicc_lookup_node: Contexto completo - {len(similar_memories)} memórias, {len(patterns)} padrões, cliente retornando: {customer_context.get('is_returning_customer', False)}")
         
         # CLASSIFICAÇÃO DE INTENT (substituindo Router Agent)
         # Usar contexto SICC para classificar melhor
-        intent = await _classify_intent(query_text, customer_context, sicc_context)
-        logger.info(f"sicc_lookup_node: Intent classificado: {intent}")
+        intent_result = await _classify_intent(query_text, customer_context, sicc_context, tenant_id)
+        intent = intent_result.intent
+        sicc_context["intent_tier"] = intent_result.tier
+        sicc_context["intent_confidence"] = intent_result.confidence
+        logger.info(f"sicc_lookup_node: Intent classificado: {intent} (camada {intent_result.tier})")
         
         # Atualizar estado com contexto SICC E intent
         return {
@@ -123,7 +137,8 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
         
         # Em caso de erro, continuar sem contexto SICC
         # Classificar intent mesmo sem contexto (fallback)
-        intent = await _classify_intent(query_text, {}, {})
+        intent_result = await _classify_intent(query_text, {}, {}, state.get("tenant_id"))
+        intent = intent_result.intent
         
         return {
             **state,
@@ -134,7 +149,9 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
                 "patterns": [],
                 "memories_found": 0,
                 "context_found": 0,
-                "patterns_found": 0
+                "patterns_found": 0,
+                "intent_tier": intent_result.tier,
+                "intent_confidence": intent_result.confidence
             },
             "sicc_patterns": [],
             "customer_context": {},
@@ -143,6 +160,81 @@ async def sicc_lookup_node(state: AgentState) -> AgentState:
         }
 
 
+async def _run_lookups(lookups: Dict[str, Awaitable[Any]],
+                       deadline: float) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Executa as buscas em paralelo sob um prazo comum.
+    
+    Args:
+        lookups: Coroutines das buscas por nome
+        deadline: Prazo em segundos para todas as buscas
+        
+    Returns:
+        (resultados das buscas concluídas, {nome: {"ms", "status"}}) - status
+        "ok", "error" ou "timeout"; buscas sem sucesso ficam fora dos resultados
+    """
+    start = time.perf_counter()
+    timings: Dict[str, Dict[str, Any]] = {}
+    
+    def record(name: str, task: asyncio.Task) -> None:
+        # Canceladas pelo prazo já registradas como "timeout"
+        if task.cancelled():
+            return
+        timings[name] = {
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+            "status": "error" if task.exception() is not None else "ok"
+        }
+    
+    tasks = {}
+    for name, lookup in lookups.items():
+        task = asyncio.ensure_future(lookup)
+        task.add_done_callback(lambda t, name=name: record(name, t))
+        tasks[name] = task
+    
+    await asyncio.wait(tasks.values(), timeout=deadline)
+    
+    results = {}
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            timings[name] = {"ms": round((time.perf_counter() - start) * 1000, 1), "status": "timeout"}
+            logger.warning(f"sicc_lookup_node: Busca {name} excedeu o prazo de {deadline}s, seguindo sem ela")
+        elif task.exception() is not None:
+            logger.warning(f"sicc_lookup_node: Erro na busca {name}: {task.exception()}")
+        else:
+            results[name] = task.result()
+    
+    return results, timings
+
+
+async def _load_customer_context(customer_id: str) -> Dict[str, Any]:
+    """Contexto do cliente (histórico, compras) pelo CustomerHistoryService"""
+    from ...services.customer_history_service import get_customer_history_service
+    customer_service = get_customer_history_service()
+    customer_context = await customer_service.get_customer_context(customer_id)
+    logger.info(f"sicc_lookup_node: Contexto do cliente obtido - Retornando: {customer_context.get('is_returning_customer', False)}")
+    return customer_context
+
+
+async def _find_patterns(query_text: str, customer_id: Optional[str], intent: Optional[str]) -> List[Any]:
+    """Padrões aprovados aplicáveis à mensagem"""
+    from ...services.sicc.behavior_service import get_behavior_service
+    behavior_service = get_behavior_service()
+    patterns = await behavior_service.find_applicable_patterns(
+        message=query_text,
+        context={"user_id": customer_id, "intent": intent}
+    )
+    logger.info(f"sicc_lookup_node: {len(patterns)} padrões aplicáveis encontrados")
+    return patterns
+
+
+def _memory_to_dict(memory: Any) -> Dict[str, Any]:
+    """Memória como dicionário para o estado (sem o embedding)"""
+    data = memory.to_dict() if hasattr(memory, "to_dict") else dict(memory)
+    data.pop("embedding", None)
+    return data
+
+
 async def sicc_context_formatter(memories: List[Dict[str, Any]], context: List[str]) -> str:
     """
     Formata memórias e contexto em texto legível para uso pelos nodes.
@@ -173,27 +265,58 @@ async def sicc_context_formatter(memories: List[Dict[str, Any]], context: List[s
     return "\n".join(formatted_parts)
 
 
-async def _classify_intent(query_text: str, customer_context: Dict[str, Any], sicc_context: Dict[str, Any]) -> str:
+async def _classify_intent(query_text: str, customer_context: Dict[str, Any], sicc_context: Dict[str, Any],
+                           tenant_id: Optional[int] = None):
     """
     Classifica a intenção da mensagem usando contexto SICC.
     
     Substituiu o Router Agent - agora a classificação é feita diretamente
-    no sicc_lookup_node usando o contexto já carregado.
+    no sicc_lookup_node usando o contexto já carregado. Regras e centroides
+    locais (IntentClassifier) respondem primeiro; o LLM só é chamado quando
+    a confiança local é baixa.
     
     Args:
         query_text: Texto da mensagem do usuário
         customer_context: Contexto do cliente (histórico, compras, etc)
         sicc_context: Contexto SICC (memórias, padrões)
+        tenant_id: Tenant da conversa (centroides e exemplos do tenant)
         
     Returns:
-        Intent classificado: 'discovery', 'sales' ou 'support'
+        IntentResult com intent ('discovery', 'sales' ou 'support'), camada e confiança
     """
-    try:
-        # Inicializar Claude com configuração otimizada para classificação
-        llm = ChatAnthropic(
+    return await get_intent_classifier().classify(
+        query_text,
+        lambda: _classify_intent_llm(query_text, customer_context, sicc_context),
+        tenant_id=tenant_id
+    )
+
+
+def _get_intent_llm() -> ChatAnthropic:
+    """Cliente LLM da classificação de intent (singleton)"""
+    global _intent_llm
+    if _intent_llm is None:
+        _intent_llm = ChatAnthropic(
             model="gpt-4o",
             temperature=0.3  # Baixa temperatura para classificação consistente
         )
+    return _intent_llm
+
+
+async def _classify_intent_llm(query_text: str, customer_context: Dict[str, Any],
+                               sicc_context: Dict[str, Any]) -> Optional[str]:
+    """
+    Classifica a intenção da mensagem via LLM (camada final do IntentClassifier).
+    
+    Args:
+        query_text: Texto da mensagem do usuário
+        customer_context: Contexto do cliente (histórico, compras, etc)
+        sicc_context: Contexto SICC (memórias, padrões)
+        
+    Returns:
+        Intent classificado ou None se o LLM falhar ou responder fora das categorias
+    """
+    try:
+        llm = _get_intent_llm()
         
         # Construir contexto para classificação
         context_info = f"""
@@ -232,14 +355,14 @@ Retorne APENAS uma palavra: discovery, sales ou support"""
         # Extrair e validar intent
         intent = response.content.strip().lower()
         
-        if intent not in ["discovery", "sales", "support"]:
-            logger.warning(f"_classify_intent: Intent inválido '{intent}', usando 'discovery' como fallback")
-            intent = "discovery"
+        if intent not in INTENTS:
+            logger.warning(f"_classify_intent_llm: Intent inválido '{intent}', resultado do LLM descartado")
+            return None
         
-        logger.info(f"_classify_intent: Intent classificado: {intent}")
+        logger.info(f"_classify_intent_llm: Intent classificado: {intent}")
         return intent
         
     except Exception as e:
-        logger.error(f"_classify_intent: Erro ao classificar: {e}")
-        # Fallback: discovery é o mais seguro
-        return "discovery"
+        logger.error(f"_classify_intent_llm: Erro ao classificar: {e}")
+        # Fallback (discovery) aplicado pelo IntentClassifier
+        return None
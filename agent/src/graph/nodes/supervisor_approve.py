@@ -264,6 +264,24 @@ async def _save_approved_pattern_to_database(
         
         logger.info(f"Padrão {pattern_id} salvo com sucesso na tabela behavior_patterns")
         
+        # Disponibilizar o padrão imediatamente no índice do BehaviorService
+        from ...services.sicc.behavior_service import get_behavior_service
+        from ...services.sicc.learning_service import Pattern
+        
+        now = datetime.utcnow()
+        await get_behavior_service().index_pattern(Pattern(
+            id=pattern_id,
+            pattern_type=pattern_type,
+            trigger=pattern_data["trigger_condition"],
+            action=pattern_data["response_template"],
+            confidence=confidence,
+            frequency=pattern_data["usage_count"],
+            contexts=pattern_data["contexts"],
+            metadata=pattern_data["metadata"],
+            created_at=now,
+            last_seen=now
+        ))
+        
     except Exception as e:
         logger.error(f"Erro ao salvar padrão no banco: {e}")
         raise
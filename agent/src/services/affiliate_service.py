@@ -4,6 +4,7 @@ Task 1.5: Service layer para afiliados
 Requirements: 4.5
 """
 
+import asyncio
 import structlog
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
@@ -19,18 +20,18 @@ class AffiliateService:
     def __init__(self):
         """Inicializa o serviço de afiliados"""
         self._cache = {}
-        self._supabase = None
+        self._db = None
         
-    def _get_supabase_client(self):
-        """Obtém cliente Supabase (lazy loading)"""
-        if self._supabase is None:
+    def _get_db(self):
+        """Obtém pool Supabase assíncrono (lazy loading)"""
+        if self._db is None:
             try:
-                from .supabase_client import get_supabase_client
-                self._supabase = get_supabase_client()
+                from .supabase_pool import get_supabase_pool
+                self._db = get_supabase_pool()
             except Exception as e:
-                logger.error("Erro ao obter cliente Supabase", error=str(e))
+                logger.error("Erro ao obter pool Supabase", error=str(e))
                 raise
-        return self._supabase
+        return self._db
     
     async def get_dashboard_data(self, user_id: str) -> Dict[str, Any]:
         """
@@ -45,14 +46,14 @@ class AffiliateService:
         try:
             logger.info("Buscando dados do dashboard", user_id=user_id)
             
-            supabase = self._get_supabase_client()
+            db = self._get_db()
             
             # Buscar afiliado
-            affiliate_result = supabase.table('affiliates').select('''
+            affiliate_result = await db.run(lambda c: c.table('affiliates').select('''
                 id, name, email, phone, referral_code, wallet_id, status,
                 total_clicks, total_conversions, total_commissions_cents,
                 created_at, onboarding_completed
-            ''').eq('user_id', user_id).is_('deleted_at', None).single().execute()
+            ''').eq('user_id', user_id).is_('deleted_at', None).single())
             
             if not affiliate_result.data:
                 raise ValueError("Afiliado não encontrado")
@@ -60,11 +61,11 @@ class AffiliateService:
             affiliate = affiliate_result.data
             affiliate_id = affiliate['id']
             
-            # Calcular estatísticas dos últimos 30 dias
-            stats = await self._calculate_affiliate_stats(affiliate_id)
-            
-            # Buscar comissões recentes
-            recent_commissions = await self._get_recent_commissions(affiliate_id, limit=5)
+            # Estatísticas dos últimos 30 dias e comissões recentes em paralelo
+            stats, recent_commissions = await asyncio.gather(
+                self._calculate_affiliate_stats(affiliate_id),
+                self._get_recent_commissions(affiliate_id, limit=5)
+            )
             
             # Gerar link de indicação
             referral_link, utm_params = self._generate_referral_link(
@@ -97,19 +98,17 @@ class AffiliateService:
     async def _calculate_affiliate_stats(self, affiliate_id: str) -> Dict[str, Any]:
         """Calcula estatísticas do afiliado dos últimos 30 dias"""
         try:
-            supabase = self._get_supabase_client()
+            db = self._get_db()
             
-            # Cliques dos últimos 30 dias
-            clicks_result = supabase.table('referral_clicks').select('id', count='exact').eq('affiliate_id', affiliate_id).gte('clicked_at', 'now() - interval \'30 days\'').execute()
+            # Cliques, conversões e comissões dos últimos 30 dias (consultas concorrentes)
+            clicks_result, conversions_result, commissions_result = await asyncio.gather(
+                db.run(lambda c: c.table('referral_clicks').select('id', count='exact').eq('affiliate_id', affiliate_id).gte('clicked_at', 'now() - interval \'30 days\'')),
+                db.run(lambda c: c.table('referral_conversions').select('id', count='exact').eq('affiliate_id', affiliate_id).gte('converted_at', 'now() - interval \'30 days\'')),
+                db.run(lambda c: c.table('commissions').select('commission_value_cents').eq('affiliate_id', affiliate_id).gte('created_at', 'now() - interval \'30 days\''))
+            )
             total_clicks = clicks_result.count or 0
-            
-            # Conversões dos últimos 30 dias
-            conversions_result = supabase.table('referral_conversions').select('id', count='exact').eq('affiliate_id', affiliate_id).gte('converted_at', 'now() - interval \'30 days\'').execute()
             total_conversions = conversions_result.count or 0
             
-            # Comissões dos últimos 30 dias
-            commissions_result = supabase.table('commissions').select('commission_value_cents').eq('affiliate_id', affiliate_id).gte('created_at', 'now() - interval \'30 days\'').execute()
-            
             total_commissions_cents = sum(c.get('commission_value_cents', 0) for c in (commissions_result.data or []))
             total_commissions = total_commissions_cents / 100
             
@@ -140,12 +139,12 @@ class AffiliateService:
     async def _get_recent_commissions(self, affiliate_id: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Busca comissões recentes do afiliado"""
         try:
-            supabase = self._get_supabase_client()
+            db = self._get_db()
             
-            result = supabase.table('commissions').select('''
+            result = await db.run(lambda c: c.table('commissions').select('''
                 id, commission_value_cents, level, status, created_at,
                 orders!inner(id, total_cents, customer_name, status)
-            ''').eq('affiliate_id', affiliate_id).order('created_at', desc=True).limit(limit).execute()
+            ''').eq('affiliate_id', affiliate_id).order('created_at', desc=True).limit(limit))
             
             commissions = []
             for comm in (result.data or []):
@@ -199,12 +198,12 @@ class AffiliateService:
         try:
             logger.info("Gerando link de indicação", user_id=user_id)
             
-            supabase = self._get_supabase_client()
+            db = self._get_db()
             
             # Buscar afiliado
-            affiliate_result = supabase.table('affiliates').select('''
+            affiliate_result = await db.run(lambda c: c.table('affiliates').select('''
                 id, name, referral_code, status
-            ''').eq('user_id', user_id).is_('deleted_at', None).single().execute()
+            ''').eq('user_id', user_id).is_('deleted_at', None).single())
             
             if not affiliate_result.data:
                 raise ValueError("Afiliado não encontrado")
@@ -3,11 +3,23 @@ AI Service - Gerenciamento de múltiplos modelos de IA
 
 Suporta OpenAI (principal), Claude (opcional) e Gemini (fallback)
 com sistema de fallback automático em caso de falha.
+
+Todas as chamadas são assíncronas (não bloqueiam o event loop). O cliente
+OpenAI usa um pool HTTP compartilhado pelo processo e `generate_text_stream`
+permite consumir a resposta à medida que é gerada.
+
+Cada provedor tem um circuit breaker (ver provider_health): provedores com
+falhas recentes saem da rotação até o tempo de recuperação. Com hedging
+habilitado, se o provedor principal não responder até o seu p95 de
+latência, um provedor de backup é disparado e vence a primeira resposta.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, AsyncIterator, Iterator
 from enum import Enum
+import httpx
 import openai
 from langchain_anthropic import ChatAnthropic
 
@@ -21,12 +33,14 @@ except ImportError:
 
 try:
     from ..config import get_settings
+    from .provider_health import ProviderHealth
 except ImportError:
     # Fallback para importação direta quando executado como script
     import sys
     import os
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from config import get_settings
+    from services.provider_health import ProviderHealth
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +50,70 @@ class AIProvider(Enum):
     CLAUDE = "claude"
     GEMINI = "gemini"
 
+class TextStream:
+    """
+    Stream de texto gerado com fallback entre provedores
+
+    Iterar produz os trechos de texto na ordem. O fallback para o próximo
+    provedor só ocorre antes do primeiro trecho; depois disso, erros são
+    propagados. Ao final, `text` contém a resposta completa e `provider`
+    o provedor usado.
+    """
+    
+    def __init__(self, service: 'AIService', providers: List[AIProvider],
+                 prompt: str, max_tokens: int, temperature: float):
+        self._service = service
+        self._providers = providers
+        self._prompt = prompt
+        self._max_tokens = max_tokens
+        self._temperature = temperature
+        self.provider: Optional[str] = None
+        self.text = ""
+    
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+    
+    async def _iterate(self) -> AsyncIterator[str]:
+        last_error = None
+        
+        for provider in self._service._admitted_providers(self._providers):
+            health = self._service._health[provider]
+            started = False
+            started_at = time.monotonic()
+            try:
+                logger.info(f"Tentando gerar texto (stream) com {provider.value}")
+                
+                async for delta in self._service._stream_provider(
+                    provider, self._prompt, self._max_tokens, self._temperature
+                ):
+                    if not delta:
+                        continue
+                    started = True
+                    self.provider = provider.value
+                    self.text += delta
+                    yield delta
+                
+                # Duração do stream não é comparável à latência das chamadas completas
+                health.record_success()
+                self.provider = provider.value
+                logger.info(f"Stream concluído usando {provider.value}")
+                return
+                
+            except (asyncio.CancelledError, GeneratorExit):
+                health.release()
+                raise
+            except Exception as e:
+                health.record_failure((time.monotonic() - started_at) * 1000)
+                if started:
+                    # Parte da resposta já foi entregue: não misturar provedores
+                    raise
+                logger.warning(f"Falha ao iniciar stream com {provider.value}: {e}")
+                last_error = e
+                continue
+        
+        raise RuntimeError(f"Todos os provedores falharam. Último erro: {last_error}")
+
+
 class AIService:
     """
     Serviço de IA com suporte a múltiplos provedores e fallback automático
@@ -46,21 +124,47 @@ class AIService:
     3. Gemini (fallback)
     """
     
+    # Máximo de provedores consultados em paralelo no modo hedging
+    HEDGE_MAX_IN_FLIGHT = 2
+    
     def __init__(self):
         """Inicializa o serviço de IA"""
         self.settings = get_settings()
         self._clients = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._health = self._build_health()
         self._initialize_clients()
+    
+    def _build_health(self) -> Dict[AIProvider, ProviderHealth]:
+        """Cria um circuit breaker por provedor"""
+        return {
+            provider: ProviderHealth(
+                provider.value,
+                failure_threshold=self.settings.ai_breaker_failure_threshold,
+                error_rate_threshold=self.settings.ai_breaker_error_rate_threshold,
+                recovery_seconds=self.settings.ai_breaker_recovery_seconds
+            )
+            for provider in AIProvider
+        }
         
     def _initialize_clients(self):
         """Inicializa os clientes de IA disponíveis"""
         
-        # OpenAI (obrigatório)
+        # OpenAI (obrigatório) - cliente assíncrono com pool HTTP compartilhado
         try:
-            self._clients[AIProvider.OPENAI] = openai.OpenAI(
-                api_key=self.settings.openai_api_key
+            self._http_client = openai.DefaultAsyncHttpxClient(
+                timeout=httpx.Timeout(self.settings.openai_timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.settings.openai_max_connections,
+                    max_keepalive_connections=self.settings.openai_max_keepalive_connections
+                )
             )
-            logger.info("Cliente OpenAI inicializado")
+            self._clients[AIProvider.OPENAI] = openai.AsyncOpenAI(
+                api_key=self.settings.openai_api_key,
+                max_retries=self.settings.openai_max_retries,
+                http_client=self._http_client
+            )
+            logger.info("Cliente OpenAI (async) inicializado")
         except Exception as e:
             logger.error(f"Erro ao inicializar OpenAI: {e}")
             
@@ -92,6 +196,38 @@ class AIService:
         elif not GENAI_AVAILABLE:
             logger.warning("Google Generative AI não disponível - Gemini desabilitado")
     
+    def _ordered_providers(self, preferred_provider: Optional[AIProvider]) -> List[AIProvider]:
+        """Provedores disponíveis, com o preferido (se houver) em primeiro"""
+        providers = self.get_available_providers()
+        
+        if preferred_provider and preferred_provider in providers:
+            providers.remove(preferred_provider)
+            providers.insert(0, preferred_provider)
+        
+        if not providers:
+            raise RuntimeError("Nenhum provedor de IA disponível")
+        
+        return providers
+    
+    def _admitted_providers(self, providers: List[AIProvider]) -> Iterator[AIProvider]:
+        """
+        Provedores liberados pelo circuit breaker, na ordem
+        
+        Avaliado sob demanda (um provedor por vez). Se todos estiverem com o
+        circuito aberto, tenta-os mesmo assim em vez de falhar sem tentar.
+        """
+        admitted = False
+        for provider in providers:
+            if self._health[provider].allow_request():
+                admitted = True
+                yield provider
+            else:
+                logger.info(f"Circuito de {provider.value} aberto, pulando provedor")
+        
+        if not admitted:
+            logger.warning("Todos os circuitos abertos, tentando provedores mesmo assim")
+            yield from providers
+    
     def get_available_providers(self) -> List[AIProvider]:
         """Retorna lista de provedores disponíveis em ordem de prioridade"""
         providers = []
@@ -126,32 +262,17 @@ class AIService:
         Raises:
             RuntimeError: Se nenhum provedor estiver disponível
         """
-        providers = self.get_available_providers()
+        providers = self._ordered_providers(preferred_provider)
         
-        # Se provedor preferido especificado, tentar primeiro
-        if preferred_provider and preferred_provider in providers:
-            providers.remove(preferred_provider)
-            providers.insert(0, preferred_provider)
-        
-        if not providers:
-            raise RuntimeError("Nenhum provedor de IA disponível")
+        if self.settings.ai_hedging_enabled and len(providers) > 1:
+            return await self._generate_hedged(providers, prompt, max_tokens, temperature)
         
         last_error = None
         
-        for provider in providers:
+        for provider in self._admitted_providers(providers):
             try:
                 logger.info(f"Tentando gerar texto com {provider.value}")
-                
-                if provider == AIProvider.OPENAI:
-                    result = await self._generate_openai(prompt, max_tokens, temperature)
-                elif provider == AIProvider.CLAUDE:
-                    result = await self._generate_claude(prompt, max_tokens, temperature)
-                elif provider == AIProvider.GEMINI:
-                    result = await self._generate_gemini(prompt, max_tokens, temperature)
-                else:
-                    continue
-                
-                result['provider'] = provider.value
+                result = await self._call_provider(provider, prompt, max_tokens, temperature)
                 logger.info(f"Texto gerado com sucesso usando {provider.value}")
                 return result
                 
@@ -163,11 +284,166 @@ class AIService:
         # Se chegou aqui, todos os provedores falharam
         raise RuntimeError(f"Todos os provedores falharam. Último erro: {last_error}")
     
+    async def _generate_hedged(self, providers: List[AIProvider], prompt: str,
+                               max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """
+        Gera texto com hedging: dispara o próximo provedor quando o atual
+        passa do seu prazo (p95) ou falha; vence a primeira resposta
+        """
+        candidates = self._admitted_providers(providers)
+        tasks: Dict[asyncio.Task, AIProvider] = {}
+        exhausted = False
+        last_error = None
+        
+        def launch() -> bool:
+            nonlocal exhausted
+            provider = next(candidates, None)
+            if provider is None:
+                exhausted = True
+                return False
+            logger.info(f"Tentando gerar texto com {provider.value}")
+            task = asyncio.create_task(self._call_provider(provider, prompt, max_tokens, temperature))
+            tasks[task] = provider
+            return True
+        
+        launch()
+        try:
+            while tasks:
+                can_hedge = not exhausted and len(tasks) < self.HEDGE_MAX_IN_FLIGHT
+                deadline = self._hedge_delay(list(tasks.values())[-1]) if can_hedge else None
+                
+                done, _ = await asyncio.wait(
+                    tasks.keys(), timeout=deadline, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Prazo do provedor mais recente estourado: disparar backup
+                    slow = list(tasks.values())[-1]
+                    if launch():
+                        logger.info(f"{slow.value} acima de {deadline:.2f}s, disparando backup "
+                                    f"{list(tasks.values())[-1].value}")
+                    continue
+                
+                for task in done:
+                    provider = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Falha ao gerar com {provider.value}: {e}")
+                        last_error = e
+                        continue
+                    logger.info(f"Texto gerado com sucesso usando {provider.value}")
+                    return result
+                
+                # Falha: substituir imediatamente pelo próximo provedor
+                if len(tasks) < self.HEDGE_MAX_IN_FLIGHT:
+                    launch()
+        finally:
+            # Perdedores são cancelados (o cancelamento libera probes do breaker)
+            for task in tasks:
+                task.cancel()
+        
+        raise RuntimeError(f"Todos os provedores falharam. Último erro: {last_error}")
+    
+    def _hedge_delay(self, provider: AIProvider) -> float:
+        """Prazo antes do backup: p95 do provedor, limitado pelas configurações"""
+        return self._health[provider].hedge_delay_seconds(
+            self.settings.ai_hedge_delay_seconds,
+            min_seconds=self.settings.ai_hedge_min_delay_seconds,
+            max_seconds=self.settings.openai_timeout_seconds
+        )
+    
+    async def _call_provider(self, provider: AIProvider, prompt: str,
+                             max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Chama um provedor registrando latência e resultado no circuit breaker"""
+        health = self._health[provider]
+        started_at = time.monotonic()
+        
+        try:
+            if provider == AIProvider.OPENAI:
+                result = await self._generate_openai(prompt, max_tokens, temperature)
+            elif provider == AIProvider.CLAUDE:
+                result = await self._generate_claude(prompt, max_tokens, temperature)
+            else:
+                result = await self._generate_gemini(prompt, max_tokens, temperature)
+        except asyncio.CancelledError:
+            health.release()
+            raise
+        except Exception:
+            health.record_failure((time.monotonic() - started_at) * 1000)
+            raise
+        
+        health.record_success((time.monotonic() - started_at) * 1000)
+        result['provider'] = provider.value
+        return result
+    
+    def generate_text_stream(self,
+                             prompt: str,
+                             max_tokens: int = 1000,
+                             temperature: float = 0.7,
+                             preferred_provider: Optional[AIProvider] = None) -> TextStream:
+        """
+        Gera texto em streaming com fallback automático
+        
+        Args:
+            prompt: Prompt para geração
+            max_tokens: Número máximo de tokens
+            temperature: Temperatura para geração
+            preferred_provider: Provedor preferido (opcional)
+            
+        Returns:
+            TextStream: iterável assíncrono de trechos de texto
+            
+        Raises:
+            RuntimeError: Se nenhum provedor estiver disponível
+        """
+        providers = self._ordered_providers(preferred_provider)
+        return TextStream(self, providers, prompt, max_tokens, temperature)
+    
+    async def _stream_provider(self, provider: AIProvider, prompt: str,
+                               max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Produz trechos de texto de um provedor específico"""
+        client = self._clients[provider]
+        
+        if provider == AIProvider.OPENAI:
+            stream = await client.chat.completions.create(
+                model=self.settings.openai_model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            async for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        
+        elif provider == AIProvider.CLAUDE:
+            from langchain_core.messages import HumanMessage
+            
+            async for chunk in client.astream([HumanMessage(content=prompt)]):
+                if isinstance(chunk.content, str):
+                    yield chunk.content
+        
+        elif provider == AIProvider.GEMINI:
+            if not GENAI_AVAILABLE:
+                raise RuntimeError("Google Generative AI não está disponível")
+            
+            response = await client.generate_content_async(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    max_output_tokens=max_tokens,
+                    temperature=temperature
+                ),
+                stream=True
+            )
+            async for chunk in response:
+                yield chunk.text
+    
     async def _generate_openai(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
         """Gera texto usando OpenAI"""
         client = self._clients[AIProvider.OPENAI]
         
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=self.settings.openai_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
@@ -215,7 +491,7 @@ class AIService:
                 temperature=temperature
             )
             
-            response = client.generate_content(
+            response = await client.generate_content_async(
                 prompt,
                 generation_config=generation_config
             )
@@ -239,6 +515,19 @@ class AIService:
             'claude': AIProvider.CLAUDE in self._clients,
             'gemini': AIProvider.GEMINI in self._clients
         }
+    
+    def get_provider_health(self) -> Dict[str, Dict[str, Any]]:
+        """Retorna circuit breaker, médias móveis e histograma de latência por provedor"""
+        return {
+            provider.value: self._health[provider].get_stats()
+            for provider in self.get_available_providers()
+        }
+    
+    async def close(self) -> None:
+        """Fecha o pool HTTP do cliente OpenAI"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
 
 
 # Instância singleton
@@ -249,4 +538,11 @@ def get_ai_service() -> AIService:
     global _ai_service
     if _ai_service is None:
         _ai_service = AIService()
-    return _ai_service
\ No newline at end of file
+    return _ai_service
+
+async def shutdown_ai_service() -> None:
+    """Finaliza o singleton do AIService (se criado) no shutdown da aplicação"""
+    global _ai_service
+    if _ai_service is not None:
+        await _ai_service.close()
+        _ai_service = None
\ No newline at end of file
@@ -19,6 +19,8 @@ from .schemas import (
     
     # Modelos de condições e ações
     RuleCondition,
+    RuleConditionGroup,
+    ConditionItem,
     RuleAction,
     
     # Modelos de execução
@@ -57,6 +59,8 @@ from .rules_executor import (
     RulesExecutorError,
     ConditionEvaluationError,
     get_rules_executor,
+    invalidate_rule_cache,
+    shutdown_rules_executor,
     reset_rules_executor
 )
 
@@ -94,9 +98,11 @@ from .performance import (
     MemoryCache,
     CacheManager,
     PerformanceMetrics,
+    DurationSketch,
     QueryOptimizer,
     ResourceMonitor,
     get_cache_manager,
+    shutdown_cache_manager,
     get_performance_metrics,
     get_resource_monitor
 )
@@ -118,7 +124,9 @@ from .audit import (
     AuditLevel,
     AuditEvent,
     AuditService,
-    get_audit_service
+    get_audit_service,
+    start_audit_service,
+    shutdown_audit_service
 )
 
 # Versão do módulo
@@ -135,6 +143,8 @@ __all__ = [
     "get_automation_service",
     "get_rules_executor",
     "get_action_executor",
+    "invalidate_rule_cache",
+    "shutdown_rules_executor",
     
     # Funções de reset (para testes)
     "reset_automation_service",
@@ -161,9 +171,11 @@ __all__ = [
     "MemoryCache",
     "CacheManager", 
     "PerformanceMetrics",
+    "DurationSketch",
     "QueryOptimizer",
     "ResourceMonitor",
     "get_cache_manager",
+    "shutdown_cache_manager",
     "get_performance_metrics",
     "get_resource_monitor",
     
@@ -184,6 +196,8 @@ __all__ = [
     "AuditEvent",
     "AuditService",
     "get_audit_service",
+    "start_audit_service",
+    "shutdown_audit_service",
     
     # Exceções
     "AutomationServiceError",
@@ -208,6 +222,8 @@ __all__ = [
     "AutomationRuleUpdate",
     "AutomationRuleBase",
     "RuleCondition",
+    "RuleConditionGroup",
+    "ConditionItem",
     "RuleAction",
     "RuleExecution",
     "ActionResult",
@@ -2,8 +2,14 @@
 Sistema de Auditoria para Automações
 
 Implementa trilha de auditoria completa, sanitização de dados e retenção.
+
+Os eventos são gravados em background pelo AuditPipeline (write-behind em
+lote, com spill em disco quando o banco está indisponível): `log_event` não
+faz I/O no caminho da operação auditada.
 """
 
+import os
+import logging
 import structlog
 import hashlib
 from typing import Dict, Any, List, Optional, Union
@@ -11,7 +17,8 @@ from datetime import datetime, timedelta
 from enum import Enum
 import json
 
-from ..supabase_client import get_supabase_client
+from ..supabase_pool import get_supabase_pool
+from .audit_pipeline import AuditPipeline
 
 logger = structlog.get_logger(__name__)
 
@@ -50,6 +57,15 @@ class AuditLevel(str, Enum):
     SECURITY = "security"
 
 
+# Nível do log estruturado correspondente a cada nível de auditoria
+_LOG_LEVELS = {
+    AuditLevel.INFO: logging.INFO,
+    AuditLevel.WARNING: logging.WARNING,
+    AuditLevel.ERROR: logging.ERROR,
+    AuditLevel.SECURITY: logging.WARNING
+}
+
+
 # ============================================
 # MODELO DE EVENTO DE AUDITORIA
 # ============================================
@@ -157,12 +173,34 @@ class AuditEvent:
 class AuditService:
     """Serviço principal de auditoria"""
     
+    STATS_RPC = "get_audit_stats"
+    TOP_LIMIT = 10
+    
     def __init__(self):
-        self.client = get_supabase_client()
-        self._local_buffer: List[AuditEvent] = []
-        self._buffer_size = 100
+        self.db = get_supabase_pool()
+        self.pipeline = AuditPipeline(
+            self.db,
+            spill_path=os.getenv("AUDIT_SPILL_PATH", "./data/audit_spill.jsonl"),
+            batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "100")),
+            flush_interval_seconds=float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "2")),
+            max_buffer=int(os.getenv("AUDIT_MAX_BUFFER", "10000"))
+        )
+        self._stats_rpc_available = True
         logger.info("AuditService inicializado")
     
+    async def start(self):
+        """Inicia o flush em background e reenvia eventos pendentes em disco"""
+        await self.pipeline.start()
+    
+    async def flush(self):
+        """Grava imediatamente os eventos pendentes"""
+        while await self.pipeline.flush():
+            pass
+    
+    async def close(self):
+        """Grava (ou transborda para o disco) os eventos pendentes"""
+        await self.pipeline.close()
+    
     async def log_event(
         self,
         event_type: AuditEventType,
@@ -191,7 +229,7 @@ class AuditService:
         
         # Log estruturado
         logger.log(
-            level.upper(),
+            _LOG_LEVELS.get(level, logging.INFO),
             f"AUDIT: {description}",
             event_id=event.id,
             event_type=event_type,
@@ -200,56 +238,11 @@ class AuditService:
             resource_id=resource_id
         )
         
-        # Adicionar ao buffer local
-        self._local_buffer.append(event)
-        
-        # Flush se buffer estiver cheio
-        if len(self._local_buffer) >= self._buffer_size:
-            await self._flush_buffer()
-        
-        # Tentar salvar no banco (não bloquear se falhar)
-        try:
-            await self._save_to_database(event)
-        except Exception as e:
-            logger.error(f"Erro ao salvar evento de auditoria no banco: {e}")
+        # Gravação em lote pelo pipeline (uma única vez por evento)
+        self.pipeline.enqueue(event.to_dict())
         
         return event
     
-    async def _save_to_database(self, event: AuditEvent):
-        """Salva evento no banco de dados"""
-        try:
-            # Inserir na tabela audit_events
-            response = self.client.table("audit_events").insert(event.to_dict()).execute()
-            
-            if response.data:
-                logger.debug(f"Evento de auditoria salvo: {event.id}")
-            else:
-                logger.warning(f"Falha ao salvar evento de auditoria: {event.id}")
-                
-        except Exception as e:
-            logger.error(f"Erro ao inserir evento de auditoria: {e}")
-            raise
-    
-    async def _flush_buffer(self):
-        """Flush do buffer local para o banco"""
-        if not self._local_buffer:
-            return
-        
-        try:
-            # Inserir todos os eventos do buffer
-            events_data = [event.to_dict() for event in self._local_buffer]
-            
-            response = self.client.table("audit_events").insert(events_data).execute()
-            
-            if response.data:
-                logger.info(f"Buffer de auditoria flushed: {len(self._local_buffer)} eventos")
-                self._local_buffer.clear()
-            else:
-                logger.warning("Falha ao fazer flush do buffer de auditoria")
-                
-        except Exception as e:
-            logger.error(f"Erro ao fazer flush do buffer: {e}")
-    
     async def get_events(
         self,
         user_id: Optional[str] = None,
@@ -265,35 +258,36 @@ class AuditService:
         """Busca eventos de auditoria com filtros"""
         
         try:
-            query = self.client.table("audit_events").select("*")
-            
-            # Aplicar filtros
-            if user_id:
-                query = query.eq("user_id", user_id)
-            
-            if resource_type:
-                query = query.eq("resource_type", resource_type)
-            
-            if resource_id:
-                query = query.eq("resource_id", resource_id)
-            
-            if event_type:
-                query = query.eq("event_type", event_type)
-            
-            if level:
-                query = query.eq("level", level)
-            
-            if start_date:
-                query = query.gte("timestamp", start_date.isoformat())
-            
-            if end_date:
-                query = query.lte("timestamp", end_date.isoformat())
-            
-            # Paginação e ordenação
-            query = query.order("timestamp", desc=True)
-            query = query.range(offset, offset + limit - 1)
+            def build_query(client):
+                query = client.table("audit_events").select("*")
+                
+                # Aplicar filtros
+                if user_id:
+                    query = query.eq("user_id", user_id)
+                
+                if resource_type:
+                    query = query.eq("resource_type", resource_type)
+                
+                if resource_id:
+                    query = query.eq("resource_id", resource_id)
+                
+                if event_type:
+                    query = query.eq("event_type", event_type)
+                
+                if level:
+                    query = query.eq("level", level)
+                
+                if start_date:
+                    query = query.gte("timestamp", start_date.isoformat())
+                
+                if end_date:
+                    query = query.lte("timestamp", end_date.isoformat())
+                
+                # Paginação e ordenação
+                query = query.order("timestamp", desc=True)
+                return query.range(offset, offset + limit - 1)
             
-            response = query.execute()
+            response = await self.db.run(build_query)
             
             return response.data or []
             
@@ -306,12 +300,27 @@ class AuditService:
         user_id: Optional[str] = None,
         days: int = 30
     ) -> Dict[str, Any]:
-        """Obtém estatísticas de auditoria"""
+        """
+        Obtém estatísticas de auditoria
+        
+        Agregadas no banco (RPC get_audit_stats); sem a função instalada,
+        calculadas a partir dos eventos do período.
+        """
         
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
+            if self._stats_rpc_available:
+                try:
+                    return await self._get_audit_stats_rpc(user_id, start_date, end_date, days)
+                except Exception as e:
+                    if self.STATS_RPC not in str(e) and "PGRST202" not in str(e):
+                        raise
+                    # Função não instalada no banco: não tentar novamente
+                    self._stats_rpc_available = False
+                    logger.warning("RPC de estatísticas de auditoria indisponível, agregando em Python", error=str(e))
+            
             # Buscar eventos do período
             events = await self.get_events(
                 user_id=user_id,
@@ -355,17 +364,8 @@ class AuditService:
                 stats["top_users"][user] = stats["top_users"].get(user, 0) + 1
             
             # Ordenar tops
-            stats["top_resources"] = dict(sorted(
-                stats["top_resources"].items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:10])
-            
-            stats["top_users"] = dict(sorted(
-                stats["top_users"].items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:10])
+            stats["top_resources"] = self._top_counts(stats["top_resources"])
+            stats["top_users"] = self._top_counts(stats["top_users"])
             
             return stats
             
@@ -373,6 +373,45 @@ class AuditService:
             logger.error(f"Erro ao obter estatísticas de auditoria: {e}")
             return {"error": str(e)}
     
+    async def _get_audit_stats_rpc(
+        self,
+        user_id: Optional[str],
+        start_date: datetime,
+        end_date: datetime,
+        days: int
+    ) -> Dict[str, Any]:
+        """Estatísticas agregadas no banco (group-by em uma única chamada)"""
+        response = await self.db.run(lambda c: c.rpc(self.STATS_RPC, {
+            "p_start": start_date.isoformat(),
+            "p_end": end_date.isoformat(),
+            "p_user_id": user_id,
+            "p_top_limit": self.TOP_LIMIT
+        }))
+        
+        data = response.data
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        data = data or {}
+        
+        # jsonb não preserva a ordem das chaves: reordenar os tops
+        return {
+            "total_events": data.get("total_events", 0),
+            "period_days": days,
+            "events_by_type": data.get("events_by_type") or {},
+            "events_by_level": data.get("events_by_level") or {},
+            "events_by_day": dict(sorted((data.get("events_by_day") or {}).items(), reverse=True)),
+            "top_resources": self._top_counts(data.get("top_resources") or {}),
+            "top_users": self._top_counts(data.get("top_users") or {})
+        }
+    
+    def _top_counts(self, counts: Dict[str, int]) -> Dict[str, int]:
+        """Maiores contagens em ordem decrescente"""
+        return dict(sorted(
+            counts.items(), 
+            key=lambda x: x[1], 
+            reverse=True
+        )[:self.TOP_LIMIT])
+    
     async def cleanup_old_events(self, retention_days: int = 365):
         """Remove eventos antigos baseado na política de retenção"""
         
@@ -380,9 +419,9 @@ class AuditService:
             cutoff_date = datetime.now() - timedelta(days=retention_days)
             
             # Deletar eventos antigos
-            response = self.client.table("audit_events").delete().lt(
+            response = await self.db.run(lambda c: c.table("audit_events").delete().lt(
                 "timestamp", cutoff_date.isoformat()
-            ).execute()
+            ))
             
             deleted_count = len(response.data) if response.data else 0
             
@@ -401,9 +440,9 @@ class AuditService:
         
         try:
             # Buscar eventos
-            response = self.client.table("audit_events").select("*").in_(
+            response = await self.db.run(lambda c: c.table("audit_events").select("*").in_(
                 "id", event_ids
-            ).execute()
+            ))
             
             events = response.data or []
             
@@ -514,6 +553,17 @@ def get_audit_service() -> AuditService:
     return _audit_service
 
 
+async def start_audit_service():
+    """Inicia o pipeline de auditoria (reenvio do spill em disco)"""
+    await get_audit_service().start()
+
+
+async def shutdown_audit_service():
+    """Grava os eventos de auditoria pendentes (shutdown da aplicação)"""
+    if _audit_service is not None:
+        await _audit_service.close()
+
+
 # ============================================
 # FUNÇÕES DE CONVENIÊNCIA
 # ============================================
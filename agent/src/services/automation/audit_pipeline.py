@@ -0,0 +1,308 @@
+"""
+AuditPipeline - Gravação write-behind dos eventos de auditoria
+
+`enqueue` só adiciona o evento a um buffer em memória (sem I/O); uma tarefa
+em background grava os eventos em lote:
+- INSERT multi-linha a cada `batch_size` eventos ou `flush_interval_seconds`
+- Gravação idempotente por `id` (upsert ignorando duplicados), então
+  reenviar um lote nunca duplica eventos
+- Banco indisponível: o lote vai para um arquivo local append-only
+  (JSON lines) e é reenviado quando o banco volta e no próximo startup
+- Buffer acima de `max_buffer` também transborda para o arquivo, em uma
+  tarefa de background (sem event loop, o excesso é descartado e contado)
+- `close()` grava (ou transborda) tudo o que estiver pendente
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class AuditPipeline:
+    """
+    Pipeline de gravação em lote com spill em disco para `audit_events`
+    """
+
+    TABLE = "audit_events"
+
+    def __init__(self,
+                 db: Any,
+                 spill_path: str,
+                 batch_size: int = 100,
+                 flush_interval_seconds: float = 2.0,
+                 max_buffer: int = 10000,
+                 replay_retry_seconds: float = 30.0):
+        """
+        Args:
+            db: Executor de acesso a dados (ver supabase_pool)
+            spill_path: Arquivo local para eventos não gravados no banco
+            batch_size: Eventos por INSERT (e limiar de flush antecipado)
+            flush_interval_seconds: Intervalo máximo entre flushes
+            max_buffer: Máximo de eventos em memória antes de transbordar
+            replay_retry_seconds: Intervalo entre tentativas de reenvio com o banco indisponível
+        """
+        self.db = db
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffer = max_buffer
+        self.replay_retry_seconds = replay_retry_seconds
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._overflow_task: Optional[asyncio.Task] = None
+        self._db_available = True
+        self._next_replay_at = 0.0
+        self._closed = False
+        # Operações no arquivo de spill rodam em threads (asyncio.to_thread)
+        self._file_lock = threading.Lock()
+
+        self.stats = {
+            "enqueued": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+            "rows_spilled": 0,
+            "rows_replayed": 0,
+            "rows_dropped": 0
+        }
+
+    @property
+    def _replay_path(self) -> str:
+        return f"{self.spill_path}.replay"
+
+    def enqueue(self, row: Dict[str, Any]) -> None:
+        """
+        Adiciona evento ao buffer (sem I/O no caminho da chamada)
+
+        Args:
+            row: Evento serializado (`AuditEvent.to_dict()`)
+        """
+        self._buffer.append(row)
+        self.stats["enqueued"] += 1
+
+        if len(self._buffer) > self.max_buffer:
+            # Banco lento/indisponível por muito tempo: liberar memória
+            self._schedule_overflow()
+
+        self._ensure_flusher()
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _schedule_overflow(self) -> None:
+        """Transborda o excesso do buffer em background (descarta se não houver event loop)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            dropped = len(self._buffer) - self.max_buffer
+            del self._buffer[:dropped]
+            self.stats["rows_dropped"] += dropped
+            logger.warning(f"AuditPipeline: buffer cheio sem event loop, {dropped} eventos descartados")
+            return
+
+        if self._overflow_task is None or self._overflow_task.done():
+            self._overflow_task = loop.create_task(self._spill_overflow())
+
+    async def _spill_overflow(self) -> None:
+        """Move para o disco os eventos mais antigos enquanto o buffer exceder o limite"""
+        while len(self._buffer) > self.max_buffer:
+            overflow = self._buffer[:self.batch_size]
+            del self._buffer[:len(overflow)]
+            await asyncio.to_thread(self._spill, overflow)
+
+    def _ensure_flusher(self) -> None:
+        """Inicia a tarefa de flush em background (se houver event loop)"""
+        if self._closed:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if (self._flush_task is not None and not self._flush_task.done()
+                and self._flush_task.get_loop() is loop):
+            return
+
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def start(self) -> None:
+        """Inicia o flusher e reenvia eventos transbordados em execuções anteriores"""
+        self._ensure_flusher()
+        if self._has_spilled():
+            self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        """Loop de flush periódico ou por tamanho"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._buffer and not self._closed:
+                if await self.flush() == 0 or len(self._buffer) < self.batch_size:
+                    break
+
+            if self._closed or not self._has_spilled():
+                continue
+            if self._db_available or time.monotonic() >= self._next_replay_at:
+                await self.replay()
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Grava lote de forma idempotente (eventos já gravados são ignorados)"""
+        await self.db.run(
+            lambda c: c.table(self.TABLE).upsert(rows, on_conflict="id", ignore_duplicates=True)
+        )
+
+    async def flush(self) -> int:
+        """
+        Grava o próximo lote do buffer; em caso de falha, transborda para o disco
+
+        Returns:
+            Número de eventos gravados no banco
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:len(batch)]
+
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Flusher cancelado (shutdown): o lote volta para o buffer
+                self._buffer[:0] = batch
+                raise
+            except Exception as e:
+                self._db_available = False
+                self._next_replay_at = time.monotonic() + self.replay_retry_seconds
+                self.stats["flush_errors"] += 1
+                logger.warning(f"AuditPipeline: banco indisponível, {len(batch)} eventos em disco: {e}")
+                await asyncio.to_thread(self._spill, batch)
+                return 0
+
+            self._db_available = True
+            self.stats["flushes"] += 1
+            self.stats["rows_flushed"] += len(batch)
+            logger.debug(f"AuditPipeline: {len(batch)} eventos de auditoria gravados")
+            return len(batch)
+
+    def _spill(self, rows: List[Dict[str, Any]]) -> None:
+        """Anexa eventos ao arquivo local (append-only, sincronizado em disco)"""
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._file_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.stats["rows_spilled"] += len(rows)
+
+    def _has_spilled(self) -> bool:
+        return os.path.exists(self.spill_path) or os.path.exists(self._replay_path)
+
+    def _take_spilled(self) -> List[Dict[str, Any]]:
+        """Move o arquivo de spill para reenvio e lê os eventos"""
+        # Reenvio interrompido (crash) fica no arquivo .replay
+        with self._file_lock:
+            if not os.path.exists(self._replay_path):
+                if not os.path.exists(self.spill_path):
+                    return []
+                os.replace(self.spill_path, self._replay_path)
+
+        rows = []
+        with open(self._replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Linha truncada por crash durante a escrita
+                    logger.warning("AuditPipeline: linha inválida no arquivo de spill ignorada")
+        return rows
+
+    async def replay(self) -> int:
+        """
+        Reenvia ao banco os eventos transbordados para o disco
+
+        Returns:
+            Número de eventos reenviados
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            rows = await asyncio.to_thread(self._take_spilled)
+            replayed = 0
+
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start:start + self.batch_size]
+                    await self._write(batch)
+                    replayed = start + len(batch)
+            except Exception as e:
+                self._db_available = False
+                self._next_replay_at = time.monotonic() + self.replay_retry_seconds
+                logger.warning(f"AuditPipeline: reenvio interrompido, {len(rows) - replayed} eventos em disco: {e}")
+                await asyncio.to_thread(self._spill, rows[replayed:])
+
+            # Eventos reenviados ou de volta ao spill: arquivo de reenvio dispensável
+            if os.path.exists(self._replay_path):
+                os.remove(self._replay_path)
+
+            if replayed:
+                self._db_available = True
+                self.stats["rows_replayed"] += replayed
+                logger.info(f"AuditPipeline: {replayed} eventos reenviados do disco")
+            return replayed
+
+    async def close(self) -> None:
+        """Interrompe o flush periódico e grava (ou transborda) os pendentes"""
+        self._closed = True
+
+        if self._flush_task is not None and not self._flush_task.done():
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._flush_task, timeout=self.flush_interval_seconds * 2)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        self._flush_task = None
+
+        # Eventos já retirados do buffer pelo transbordo precisam chegar ao disco
+        if self._overflow_task is not None:
+            await self._overflow_task
+            self._overflow_task = None
+
+        # Cada lote é gravado ou vai para o disco: o loop sempre termina
+        while self._buffer:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pipeline"""
+        stats = dict(self.stats)
+        stats["pending"] = len(self._buffer)
+        stats["db_available"] = self._db_available
+        stats["has_spilled"] = self._has_spilled()
+        return stats
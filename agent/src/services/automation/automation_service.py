@@ -11,6 +11,7 @@ from datetime import datetime
 import uuid
 
 from ..supabase_client import get_supabase_client
+from .rules_executor import invalidate_rule_cache
 from .schemas import (
     AutomationRule,
     AutomationRuleCreate,
@@ -96,6 +97,7 @@ class AutomationService:
             
             created_rule = response.data[0]
             logger.info(f"create_rule: Regra criada com ID {created_rule['id']}")
+            invalidate_rule_cache()
             
             # Converter para modelo Pydantic
             return self._convert_db_to_model(created_rule)
@@ -246,6 +248,7 @@ class AutomationService:
             
             updated_rule = response.data[0]
             logger.info(f"update_rule: Regra {rule_id} atualizada com sucesso")
+            invalidate_rule_cache()
             
             return self._convert_db_to_model(updated_rule)
             
@@ -286,6 +289,7 @@ class AutomationService:
                 raise RuleNotFoundError(f"Regra {rule_id} não encontrada ou não pertence ao usuário")
             
             logger.info(f"delete_rule: Regra {rule_id} deletada com sucesso")
+            invalidate_rule_cache()
             return True
             
         except RuleNotFoundError:
@@ -489,9 +493,9 @@ class AutomationService:
             # Converter campos JSONB de volta para objetos
             condicoes = []
             if db_data.get("condicoes"):
-                from .schemas import RuleCondition
+                from .schemas import parse_condition_item
                 for condition_data in db_data["condicoes"]:
-                    condicoes.append(RuleCondition(**condition_data))
+                    condicoes.append(parse_condition_item(condition_data))
             
             acoes = []
             if db_data.get("acoes"):
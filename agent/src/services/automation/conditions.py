@@ -0,0 +1,296 @@
+"""
+Conditions - Árvore booleana e compilação das condições de regras
+
+As condições de uma regra (lista com lógica AND/OR entre itens e grupos
+entre parênteses) viram uma árvore com precedência usual (AND antes de
+OR), compilada em closures com:
+- Curto-circuito: AND para na primeira condição falsa, OR na primeira
+  verdadeira
+- Ordenação por custo: operadores baratos (equals, not_empty) avaliados
+  antes dos caros (contains em textos longos)
+- Caminhos de campo divididos e operandos pré-processados uma única vez
+
+As condições são puras (só leem o contexto), então reordenar os filhos
+de um AND/OR não altera o resultado.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+from .schemas import ConditionItem, ConditionOperator, RuleCondition, RuleConditionGroup
+
+logger = structlog.get_logger(__name__)
+
+ConditionPredicate = Callable[[Dict[str, Any]], bool]
+
+# Custo relativo de avaliação por operador
+OPERATOR_COSTS = {
+    ConditionOperator.EQUALS: 1.0,
+    ConditionOperator.NOT_EMPTY: 1.0,
+    ConditionOperator.IN_LIST: 2.0,
+    ConditionOperator.GREATER_THAN: 3.0,
+    ConditionOperator.LESS_THAN: 3.0,
+    ConditionOperator.CONTAINS: 10.0
+}
+# Custo adicional por nível de campo aninhado ("customer.address.city")
+NESTED_FIELD_COST = 0.5
+
+
+def compile_field_accessor(field_path: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compila acesso a campo com notação de ponto
+
+    Args:
+        field_path: Caminho do campo (ex: "customer.name")
+
+    Returns:
+        Função que extrai o valor do contexto (None se não encontrado)
+    """
+    parts = tuple(field_path.split("."))
+
+    if len(parts) == 1:
+        key = parts[0]
+
+        def get_value(context: Dict[str, Any]) -> Any:
+            return context.get(key) if isinstance(context, dict) else None
+        return get_value
+
+    def get_nested_value(context: Dict[str, Any]) -> Any:
+        value = context
+        for part in parts:
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            else:
+                return None
+        return value
+    return get_nested_value
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _never(context: Dict[str, Any]) -> bool:
+    return False
+
+
+def _always(context: Dict[str, Any]) -> bool:
+    return True
+
+
+def compile_condition(condition: RuleCondition) -> ConditionPredicate:
+    """
+    Compila uma condição em predicado
+
+    Erros durante a avaliação resultam em False.
+
+    Args:
+        condition: Condição da regra
+
+    Returns:
+        Predicado que recebe o contexto
+    """
+    get_value = compile_field_accessor(condition.field)
+    operator = condition.operator
+    operand = condition.value
+
+    if operator == ConditionOperator.EQUALS:
+        def predicate(context):
+            return get_value(context) == operand
+
+    elif operator == ConditionOperator.CONTAINS:
+        if not isinstance(operand, str):
+            return _never
+        needle = operand.lower()
+
+        def predicate(context):
+            value = get_value(context)
+            return isinstance(value, str) and needle in value.lower()
+
+    elif operator in (ConditionOperator.GREATER_THAN, ConditionOperator.LESS_THAN):
+        threshold = _to_float(operand)
+        if threshold is None:
+            return _never
+        greater = operator == ConditionOperator.GREATER_THAN
+
+        def predicate(context):
+            value = _to_float(get_value(context))
+            if value is None:
+                return False
+            return value > threshold if greater else value < threshold
+
+    elif operator == ConditionOperator.IN_LIST:
+        if not isinstance(operand, list):
+            return _never
+        try:
+            members = frozenset(operand)
+        except TypeError:
+            # Itens não hasheáveis: busca linear
+            members = operand
+
+        def predicate(context):
+            try:
+                return get_value(context) in members
+            except TypeError:
+                return False
+
+    elif operator == ConditionOperator.NOT_EMPTY:
+        def predicate(context):
+            value = get_value(context)
+            return value is not None and value != "" and value != []
+
+    else:
+        logger.warning(f"compile_condition: Operador não suportado: {operator}")
+        return _never
+
+    def safe_predicate(context: Dict[str, Any]) -> bool:
+        try:
+            return predicate(context)
+        except Exception as e:
+            logger.error(f"compile_condition: Erro na avaliação de '{condition.field}': {e}")
+            return False
+
+    return safe_predicate
+
+
+class ConditionNode(ABC):
+    """Nó da árvore de condições"""
+
+    cost: float = 0.0
+
+    @abstractmethod
+    def compile(self) -> ConditionPredicate:
+        """Compila o nó em um predicado sobre o contexto"""
+
+
+class LeafNode(ConditionNode):
+    """Condição simples (campo, operador, valor)"""
+
+    def __init__(self, condition: RuleCondition):
+        self.condition = condition
+        self.cost = (
+            OPERATOR_COSTS.get(condition.operator, 1.0)
+            + NESTED_FIELD_COST * condition.field.count(".")
+        )
+
+    def compile(self) -> ConditionPredicate:
+        return compile_condition(self.condition)
+
+    def __repr__(self) -> str:
+        return f"{self.condition.field} {self.condition.operator.value} {self.condition.value!r}"
+
+
+class _BranchNode(ConditionNode):
+    """AND/OR com filhos ordenados por custo"""
+
+    label = ""
+
+    def __init__(self, children: List[ConditionNode]):
+        flattened: List[ConditionNode] = []
+        for child in children:
+            # (a AND (b AND c)) == (a AND b AND c): mais filhos para ordenar
+            if type(child) is type(self):
+                flattened.extend(child.children)
+            else:
+                flattened.append(child)
+        self.children = sorted(flattened, key=lambda node: node.cost)
+        self.cost = sum(child.cost for child in self.children)
+
+    def __repr__(self) -> str:
+        return "(" + f" {self.label} ".join(repr(child) for child in self.children) + ")"
+
+
+class AndNode(_BranchNode):
+    """Conjunção com curto-circuito na primeira condição falsa"""
+
+    label = "AND"
+
+    def compile(self) -> ConditionPredicate:
+        predicates = tuple(child.compile() for child in self.children)
+
+        def evaluate(context: Dict[str, Any]) -> bool:
+            for predicate in predicates:
+                if not predicate(context):
+                    return False
+            return True
+
+        return evaluate
+
+
+class OrNode(_BranchNode):
+    """Disjunção com curto-circuito na primeira condição verdadeira"""
+
+    label = "OR"
+
+    def compile(self) -> ConditionPredicate:
+        predicates = tuple(child.compile() for child in self.children)
+
+        def evaluate(context: Dict[str, Any]) -> bool:
+            for predicate in predicates:
+                if predicate(context):
+                    return True
+            return False
+
+        return evaluate
+
+
+def _logic(item: ConditionItem) -> str:
+    logic = (item.logic or "AND").upper()
+    if logic not in ("AND", "OR"):
+        logger.warning(f"build_condition_tree: Operador lógico não suportado: {item.logic}")
+        return "AND"
+    return logic
+
+
+def build_condition_tree(items: List[ConditionItem]) -> Optional[ConditionNode]:
+    """
+    Monta a árvore de condições com precedência AND antes de OR
+
+    A lógica de cada item liga-o ao item seguinte; grupos
+    (`RuleConditionGroup`) equivalem a parênteses.
+
+    Args:
+        items: Condições e grupos da regra
+
+    Returns:
+        Raiz da árvore, ou None se não houver condições
+    """
+    or_terms: List[List[ConditionNode]] = [[]]
+
+    for i, item in enumerate(items):
+        if isinstance(item, RuleConditionGroup):
+            node = build_condition_tree(item.conditions)
+        else:
+            node = LeafNode(item)
+
+        if node is not None:
+            or_terms[-1].append(node)
+
+        if i < len(items) - 1 and _logic(item) == "OR":
+            or_terms.append([])
+
+    terms = [AndNode(term) if len(term) > 1 else term[0] for term in or_terms if term]
+    if not terms:
+        return None
+    return OrNode(terms) if len(terms) > 1 else terms[0]
+
+
+def compile_conditions(items: List[ConditionItem]) -> ConditionPredicate:
+    """
+    Compila as condições de uma regra
+
+    Args:
+        items: Condições e grupos da regra
+
+    Returns:
+        Predicado que retorna True se a regra deve ser executada
+    """
+    tree = build_condition_tree(items)
+    if tree is None:
+        return _always
+    return tree.compile()
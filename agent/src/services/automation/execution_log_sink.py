@@ -0,0 +1,258 @@
+"""
+ExecutionLogSink - Gravação em lote dos logs de execução de regras
+
+O RulesExecutor entrega cada `RuleExecution` ao sink, que não faz I/O no
+caminho da execução:
+- Logs acumulados em buffer e gravados com INSERT multi-linha ao atingir
+  `batch_size` ou a cada `flush_interval_seconds`
+- Buffer limitado: com o buffer cheio, o produtor aguarda espaço por até
+  `max_wait_seconds` (back-pressure) e, depois disso, o log é descartado
+- Amostragem opcional dos logs com condições não atendidas (a maior parte
+  do volume); a taxa aplicada fica em `conditions_result.sample_rate`
+- `close()` grava tudo o que estiver pendente (shutdown da aplicação)
+"""
+
+import asyncio
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+from .schemas import ExecutionStatus, RuleExecution
+
+logger = structlog.get_logger(__name__)
+
+
+class ExecutionLogSink:
+    """
+    Sink assíncrono e limitado para `rule_execution_logs`
+    """
+
+    TABLE = "rule_execution_logs"
+
+    def __init__(self,
+                 db: Any,
+                 batch_size: int = 100,
+                 flush_interval_seconds: float = 2.0,
+                 max_buffer: int = 5000,
+                 max_wait_seconds: float = 1.0,
+                 unmet_sample_rate: float = 1.0,
+                 max_retries: int = 3,
+                 sampler: Callable[[], float] = random.random):
+        """
+        Args:
+            db: Executor de acesso a dados (ver supabase_pool)
+            batch_size: Logs por INSERT (e limiar de flush antecipado)
+            flush_interval_seconds: Intervalo máximo entre flushes
+            max_buffer: Máximo de logs pendentes em memória
+            max_wait_seconds: Espera máxima por espaço com o buffer cheio
+            unmet_sample_rate: Fração dos logs sem condições atendidas a gravar (0-1)
+            max_retries: Tentativas de um lote antes de descartá-lo
+            sampler: Fonte de números aleatórios em [0, 1) para a amostragem
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffer = max_buffer
+        self.max_wait_seconds = max_wait_seconds
+        self.unmet_sample_rate = max(0.0, min(1.0, unmet_sample_rate))
+        self.max_retries = max_retries
+        self._sampler = sampler
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._batch_failures = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._closed = False
+
+        self.stats = {
+            "received": 0,
+            "sampled_out": 0,
+            "dropped": 0,
+            "waits": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0
+        }
+
+    def _to_row(self, rule_id: str, execution: RuleExecution, sample_rate: float) -> Dict[str, Any]:
+        """Converte a execução para a linha de `rule_execution_logs`"""
+        conditions_result = execution.conditions_result
+        if sample_rate < 1.0:
+            conditions_result = {**(conditions_result or {}), "sample_rate": sample_rate}
+
+        return {
+            "rule_id": rule_id,
+            "trigger_type": execution.trigger_type,
+            "trigger_data": execution.trigger_data,
+            "conditions_met": execution.conditions_met,
+            "conditions_result": conditions_result,
+            "actions_executed": [action.dict() for action in execution.actions_executed],
+            "execution_status": execution.execution_status,
+            "error_message": execution.error_message,
+            "duration_ms": execution.duration_ms,
+            "executed_at": execution.executed_at.isoformat(),
+            "actions_count": len(execution.actions_executed)
+        }
+
+    async def submit(self, rule_id: str, execution: RuleExecution) -> bool:
+        """
+        Enfileira log de execução
+
+        Args:
+            rule_id: ID da regra executada
+            execution: Resultado da execução
+
+        Returns:
+            True se o log foi enfileirado (False se descartado pela
+            amostragem, por falta de espaço ou com o sink já fechado)
+        """
+        self.stats["received"] += 1
+
+        if self._closed:
+            # Após close() nenhum flush grava o buffer
+            self.stats["dropped"] += 1
+            logger.warning("ExecutionLogSink: sink fechado, log de execução descartado", rule_id=rule_id)
+            return False
+
+        sample_rate = 1.0
+        if not execution.conditions_met and execution.execution_status != ExecutionStatus.FAILED:
+            sample_rate = self.unmet_sample_rate
+            if sample_rate < 1.0 and self._sampler() >= sample_rate:
+                self.stats["sampled_out"] += 1
+                return False
+
+        row = self._to_row(rule_id, execution, sample_rate)
+        self._ensure_flusher()
+
+        if len(self._buffer) >= self.max_buffer and self._space is not None and not self._closed:
+            # Back-pressure: aguardar o flush liberar espaço
+            self.stats["waits"] += 1
+            self._wakeup.set()
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._closed:
+            # close() liberou a espera: o dreno do buffer pode já ter terminado
+            self.stats["dropped"] += 1
+            logger.warning("ExecutionLogSink: sink fechado, log de execução descartado", rule_id=rule_id)
+            return False
+
+        if len(self._buffer) >= self.max_buffer:
+            self.stats["dropped"] += 1
+            logger.warning("ExecutionLogSink: buffer cheio, log de execução descartado", rule_id=rule_id)
+            return False
+
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _ensure_flusher(self) -> None:
+        """Inicia a tarefa de flush em background no loop atual"""
+        if self._closed:
+            return
+
+        loop = asyncio.get_running_loop()
+        if (self._flush_task is not None and not self._flush_task.done()
+                and self._flush_task.get_loop() is loop):
+            return
+
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Loop de flush periódico ou por tamanho"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            # Gravar lotes cheios em sequência; lote parcial só no intervalo
+            while self._buffer and not self._closed:
+                if await self.flush() == 0 or len(self._buffer) < self.batch_size:
+                    break
+
+    async def flush(self) -> int:
+        """
+        Grava o próximo lote (até `batch_size` logs) com um único INSERT
+
+        Returns:
+            Número de logs gravados
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:len(batch)]
+
+            try:
+                await self.db.run(lambda c: c.table(self.TABLE).insert(batch))
+
+                self._batch_failures = 0
+                self.stats["flushes"] += 1
+                self.stats["rows_flushed"] += len(batch)
+                logger.debug(f"ExecutionLogSink: {len(batch)} logs de execução gravados")
+                return len(batch)
+
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                self._batch_failures += 1
+
+                if self._batch_failures >= self.max_retries:
+                    self._batch_failures = 0
+                    self.stats["dropped"] += len(batch)
+                    logger.error(f"ExecutionLogSink: lote de {len(batch)} logs descartado após "
+                                 f"{self.max_retries} tentativas: {e}")
+                else:
+                    # Devolver ao início do buffer, respeitando o limite
+                    room = max(0, self.max_buffer - len(self._buffer))
+                    self._buffer[:0] = batch[:room]
+                    self.stats["dropped"] += len(batch) - min(room, len(batch))
+                    logger.warning(f"ExecutionLogSink: erro ao gravar lote de logs: {e}")
+                return 0
+
+            finally:
+                if self._space is not None and len(self._buffer) < self.max_buffer:
+                    self._space.set()
+
+    async def close(self) -> None:
+        """Interrompe o flush periódico e grava todos os logs pendentes"""
+        self._closed = True
+
+        if self._flush_task is not None and not self._flush_task.done():
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._flush_task, timeout=self.flush_interval_seconds * 2)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        self._flush_task = None
+
+        # Produtores aguardando espaço não devem ficar bloqueados
+        if self._space is not None:
+            self._space.set()
+
+        # Termina mesmo com o banco indisponível: cada lote é descartado
+        # após `max_retries` tentativas
+        while self._buffer:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do sink"""
+        stats = dict(self.stats)
+        stats["pending"] = len(self._buffer)
+        stats["unmet_sample_rate"] = self.unmet_sample_rate
+        return stats
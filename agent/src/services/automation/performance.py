@@ -4,10 +4,17 @@ Sistema de Performance e Otimizações para Automações
 Implementa cache, otimizações de queries e monitoramento de performance.
 """
 
+import os
+import sys
+import heapq
+import math
+import hashlib
+import uuid
 import structlog
 import time
 import asyncio
-from typing import Dict, Any, List, Optional, Callable
+from collections import OrderedDict
+from typing import Awaitable, Dict, Any, List, Optional, Callable, Tuple
 from datetime import datetime, timedelta
 from functools import wraps
 import json
@@ -16,33 +23,126 @@ logger = structlog.get_logger(__name__)
 
 
 # ============================================
-# CACHE EM MEMÓRIA (FALLBACK SEM REDIS)
+# CACHE EM MEMÓRIA (NEAR-CACHE / FALLBACK SEM REDIS)
 # ============================================
 
 class MemoryCache:
-    """Cache em memória como fallback quando Redis não está disponível"""
+    """
+    Cache em memória LRU com TTL, limitado por número de entradas e bytes
     
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._expiry: Dict[str, datetime] = {}
+    - get/set/delete em O(1) (OrderedDict na ordem de uso)
+    - Ao exceder `max_entries` ou `max_bytes`, remove as entradas menos
+      usadas recentemente
+    - Entradas expiradas removidas por uma tarefa em background (heap de
+      expiração), não apenas quando lidas
+    - Hits/misses por prefixo da chave (`prefixo:resto`)
+    """
+    
+    def __init__(self,
+                 max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 sweep_interval_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: Máximo de entradas no cache
+            max_bytes: Tamanho máximo estimado dos valores (bytes)
+            sweep_interval_seconds: Intervalo da remoção de entradas expiradas
+            clock: Relógio monotônico em segundos
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._clock = clock
+        
+        # chave -> (valor, expira_em, tamanho), do menos para o mais recente
+        self._cache: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        # (expira_em, chave); entradas regravadas/removidas ficam obsoletas no heap
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._sweep_task: Optional[asyncio.Task] = None
+        
+        self._prefix_stats: Dict[str, List[int]] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
         logger.info("MemoryCache inicializado")
     
+    @staticmethod
+    def _prefix(key: str) -> str:
+        return key.split(":", 1)[0]
+    
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Tamanho aproximado do valor serializado"""
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+    
+    def _record(self, key: str, hit: bool) -> None:
+        counters = self._prefix_stats.setdefault(self._prefix(key), [0, 0])
+        if hit:
+            self.stats["hits"] += 1
+            counters[0] += 1
+        else:
+            self.stats["misses"] += 1
+            counters[1] += 1
+    
+    def _remove(self, key: str) -> None:
+        _, _, size = self._cache.pop(key)
+        self._bytes -= size
+    
     async def get(self, key: str) -> Optional[Any]:
         """Obtém valor do cache"""
-        if key in self._cache:
-            if key in self._expiry and datetime.now() > self._expiry[key]:
-                # Expirado
-                del self._cache[key]
-                del self._expiry[key]
-                return None
-            return self._cache[key].get('value')
-        return None
+        entry = self._cache.get(key)
+        if entry is None:
+            self._record(key, hit=False)
+            return None
+        
+        if self._clock() >= entry[1]:
+            # Expirado
+            self._remove(key)
+            self.stats["expirations"] += 1
+            self._record(key, hit=False)
+            return None
+        
+        self._cache.move_to_end(key)
+        self._record(key, hit=True)
+        return entry[0]
     
     async def set(self, key: str, value: Any, ttl: int = 300) -> bool:
         """Define valor no cache com TTL em segundos"""
         try:
-            self._cache[key] = {'value': value}
-            self._expiry[key] = datetime.now() + timedelta(seconds=ttl)
+            size = self._estimate_size(value)
+            if size > self.max_bytes:
+                logger.warning(f"MemoryCache.set: valor de {key} excede o limite do cache ({size} bytes)")
+                return False
+            
+            if key in self._cache:
+                self._remove(key)
+            
+            expires_at = self._clock() + ttl
+            self._cache[key] = (value, expires_at, size)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self.stats["sets"] += 1
+            
+            # Remover as menos usadas recentemente até caber nos limites
+            while len(self._cache) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._cache))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+            
+            # Evitar que o heap cresça com entradas obsoletas (chaves regravadas)
+            if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+                self._rebuild_heap()
+            
+            self._ensure_sweeper()
             return True
         except Exception as e:
             logger.error(f"MemoryCache.set: Erro ao definir {key}: {e}")
@@ -51,28 +151,92 @@ class MemoryCache:
     async def delete(self, key: str) -> bool:
         """Remove valor do cache"""
         if key in self._cache:
-            del self._cache[key]
-            if key in self._expiry:
-                del self._expiry[key]
+            self._remove(key)
             return True
         return False
     
     async def clear(self) -> bool:
         """Limpa todo o cache"""
         self._cache.clear()
-        self._expiry.clear()
+        self._expiry_heap.clear()
+        self._bytes = 0
         return True
     
+    def _rebuild_heap(self) -> None:
+        self._expiry_heap = [(entry[1], key) for key, entry in self._cache.items()]
+        heapq.heapify(self._expiry_heap)
+    
+    def sweep(self) -> int:
+        """
+        Remove entradas expiradas
+        
+        Returns:
+            Número de entradas removidas
+        """
+        now = self._clock()
+        removed = 0
+        
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            entry = self._cache.get(key)
+            # Ignorar se a chave foi removida ou regravada com outro TTL
+            if entry is not None and entry[1] == expires_at:
+                self._remove(key)
+                removed += 1
+        
+        self.stats["expirations"] += removed
+        return removed
+    
+    def _ensure_sweeper(self) -> None:
+        """Inicia a remoção periódica de expirados (se houver event loop)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        if (self._sweep_task is not None and not self._sweep_task.done()
+                and self._sweep_task.get_loop() is loop):
+            return
+        
+        self._sweep_task = loop.create_task(self._sweep_loop())
+    
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            removed = self.sweep()
+            if removed:
+                logger.debug(f"MemoryCache: {removed} entradas expiradas removidas")
+    
+    async def close(self) -> None:
+        """Interrompe a remoção periódica de expirados"""
+        if self._sweep_task is not None and not self._sweep_task.done():
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+        self._sweep_task = None
+    
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do cache"""
-        now = datetime.now()
-        active_keys = sum(1 for key in self._expiry if self._expiry[key] > now)
+        lookups = self.stats["hits"] + self.stats["misses"]
         
         return {
             "type": "memory",
             "total_keys": len(self._cache),
-            "active_keys": active_keys,
-            "expired_keys": len(self._cache) - active_keys
+            "total_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "prefixes": {
+                prefix: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+                }
+                for prefix, (hits, misses) in self._prefix_stats.items()
+            }
         }
 
 
@@ -81,19 +245,67 @@ class MemoryCache:
 # ============================================
 
 class CacheManager:
-    """Gerenciador de cache com fallback Redis -> Memory"""
+    """
+    Cache em dois níveis: near-cache local (MemoryCache) na frente do Redis
     
-    def __init__(self):
-        self._redis_client = None
-        self._memory_cache = MemoryCache()
-        self._redis_available = False
-        self._init_redis()
+    - Leituras atendidas pelo cache local sem round-trip ao Redis; o TTL
+      local é limitado a `near_cache_ttl_seconds`
+    - set/delete publicam a chave alterada no canal de invalidação do Redis
+      e as demais réplicas removem a cópia local
+    - Sem inscrição ativa no canal, o cache local é ignorado (Redis direto)
+      para não servir valores desatualizados
+    - Sem Redis (ou com erro), o cache local é o único nível
+    - `get_or_load` agrupa misses simultâneos da mesma chave em uma única
+      carga (single-flight)
+    """
+    
+    INVALIDATION_CHANNEL = "automation:cache:invalidate"
+    REDIS_RETRY_SECONDS = 30.0
+    
+    def __init__(self,
+                 redis_client: Optional[Any] = None,
+                 near_cache_ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            redis_client: Cliente Redis assíncrono (padrão: settings.redis_url)
+            near_cache_ttl_seconds: TTL máximo das cópias locais de valores do
+                Redis (padrão: env AUTOMATION_NEAR_CACHE_TTL_SECONDS, 30)
+        """
+        if near_cache_ttl_seconds is None:
+            near_cache_ttl_seconds = float(os.getenv("AUTOMATION_NEAR_CACHE_TTL_SECONDS", "30"))
+        self.near_cache_ttl_seconds = near_cache_ttl_seconds
+        
+        self._redis_client = redis_client
+        self._memory_cache = MemoryCache(
+            max_entries=int(os.getenv("AUTOMATION_CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.getenv("AUTOMATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            sweep_interval_seconds=float(os.getenv("AUTOMATION_CACHE_SWEEP_INTERVAL_SECONDS", "30"))
+        )
+        self._redis_available = redis_client is not None
+        self._redis_retry_at = 0.0
+        if redis_client is None:
+            self._init_redis()
+        
+        self._instance_id = uuid.uuid4().hex
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._subscribed = False
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "near_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "coalesced": 0,
+            "redis_errors": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0
+        }
     
     def _init_redis(self):
         """Inicializa conexão Redis se disponível"""
         try:
             import redis.asyncio as redis
-            from ..config import get_settings
+            from ...config import get_settings
             
             settings = get_settings()
             self._redis_client = redis.from_url(settings.redis_url)
@@ -105,52 +317,196 @@ class CacheManager:
         except Exception as e:
             logger.warning(f"Erro ao conectar Redis: {e} - usando cache em memória")
     
-    async def get(self, key: str) -> Optional[Any]:
-        """Obtém valor do cache (Redis ou Memory)"""
+    def _use_redis(self) -> bool:
+        """Redis configurado e fora do intervalo de espera após erro"""
+        return (self._redis_available and self._redis_client is not None
+                and time.monotonic() >= self._redis_retry_at)
+    
+    def _redis_failed(self, operation: str, key: str, error: Exception) -> None:
+        """Usa só o cache local por `REDIS_RETRY_SECONDS` após erro no Redis"""
+        self.stats["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+        logger.error(f"CacheManager.{operation}: Erro no Redis para {key}: {error} - usando cache em memória")
+    
+    # ------------------------------------------
+    # Invalidação entre réplicas (pub/sub)
+    # ------------------------------------------
+    
+    def _ensure_subscriber(self) -> None:
+        """Inicia a inscrição no canal de invalidação no loop atual"""
         try:
-            if self._redis_available and self._redis_client:
-                value = await self._redis_client.get(key)
-                if value:
-                    return json.loads(value)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        if (self._subscriber_task is not None and not self._subscriber_task.done()
+                and self._subscriber_task.get_loop() is loop):
+            return
+        
+        self._subscribed = False
+        self._subscriber_task = loop.create_task(self._subscribe_loop())
+    
+    async def _subscribe_loop(self) -> None:
+        """Recebe invalidações das outras réplicas; reconecta após erros"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._redis_client.pubsub()
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                self._subscribed = True
+                logger.info("CacheManager: near-cache inscrito no canal de invalidação")
+                
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self._handle_invalidation(message.get("data"))
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"CacheManager: inscrição de invalidação perdida: {e}")
+            finally:
+                # Invalidações podem ter sido perdidas: descartar cópias locais
+                if self._subscribed:
+                    self._subscribed = False
+                    await self._memory_cache.clear()
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
             
-            # Fallback para memory cache
+            await asyncio.sleep(self.REDIS_RETRY_SECONDS)
+    
+    async def _handle_invalidation(self, data: Any) -> None:
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        
+        if payload.get("origin") == self._instance_id:
+            return
+        
+        self.stats["invalidations_received"] += 1
+        await self._memory_cache.delete(payload.get("key", ""))
+    
+    async def _publish_invalidation(self, key: str) -> None:
+        await self._redis_client.publish(
+            self.INVALIDATION_CHANNEL,
+            json.dumps({"key": key, "origin": self._instance_id})
+        )
+        self.stats["invalidations_sent"] += 1
+    
+    # ------------------------------------------
+    # Operações
+    # ------------------------------------------
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Obtém valor do cache (local, depois Redis)"""
+        if not self._use_redis():
             return await self._memory_cache.get(key)
-            
+        
+        self._ensure_subscriber()
+        if self._subscribed:
+            value = await self._memory_cache.get(key)
+            if value is not None:
+                self.stats["near_hits"] += 1
+                return value
+        
+        try:
+            value = await self._redis_client.get(key)
         except Exception as e:
-            logger.error(f"CacheManager.get: Erro ao obter {key}: {e}")
+            self._redis_failed("get", key, e)
+            return await self._memory_cache.get(key)
+        
+        if not value:
+            self.stats["misses"] += 1
             return None
+        
+        self.stats["redis_hits"] += 1
+        result = json.loads(value)
+        if self._subscribed:
+            await self._memory_cache.set(key, result, self.near_cache_ttl_seconds)
+        return result
     
     async def set(self, key: str, value: Any, ttl: int = 300) -> bool:
         """Define valor no cache com TTL"""
-        try:
-            if self._redis_available and self._redis_client:
+        if self._use_redis():
+            self._ensure_subscriber()
+            try:
                 serialized = json.dumps(value, default=str)
                 await self._redis_client.setex(key, ttl, serialized)
-                return True
-            
-            # Fallback para memory cache
-            return await self._memory_cache.set(key, value, ttl)
+                await self._publish_invalidation(key)
+            except Exception as e:
+                self._redis_failed("set", key, e)
+                return await self._memory_cache.set(key, value, ttl)
             
-        except Exception as e:
-            logger.error(f"CacheManager.set: Erro ao definir {key}: {e}")
-            return False
+            if self._subscribed:
+                await self._memory_cache.set(key, value, min(ttl, self.near_cache_ttl_seconds))
+            else:
+                await self._memory_cache.delete(key)
+            return True
+        
+        return await self._memory_cache.set(key, value, ttl)
     
     async def delete(self, key: str) -> bool:
-        """Remove valor do cache"""
-        try:
-            if self._redis_available and self._redis_client:
+        """Remove valor do cache (e das cópias locais das outras réplicas)"""
+        await self._memory_cache.delete(key)
+        
+        if self._use_redis():
+            try:
                 await self._redis_client.delete(key)
-            
-            await self._memory_cache.delete(key)
-            return True
-            
+                await self._publish_invalidation(key)
+            except Exception as e:
+                self._redis_failed("delete", key, e)
+                return False
+        return True
+    
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int = 300) -> Any:
+        """
+        Obtém valor do cache ou carrega com `loader` (uma carga por chave)
+        
+        Chamadas simultâneas com a mesma chave aguardam a carga em andamento
+        em vez de repeti-la.
+        
+        Args:
+            key: Chave do cache
+            loader: Função assíncrona que produz o valor
+            ttl: Time to live em segundos
+        
+        Returns:
+            Valor do cache ou carregado
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            self.stats["loads"] += 1
+            if value is not None:
+                await self.set(key, value, ttl)
+            future.set_result(value)
+            return value
         except Exception as e:
-            logger.error(f"CacheManager.delete: Erro ao remover {key}: {e}")
-            return False
+            future.set_exception(e)
+            # Marcar como lida: pode não haver chamadas aguardando
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
     
     async def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do cache"""
-        if self._redis_available and self._redis_client:
+        if self._use_redis():
             try:
                 info = await self._redis_client.info()
                 return {
@@ -158,12 +514,35 @@ class CacheManager:
                     "connected_clients": info.get("connected_clients", 0),
                     "used_memory": info.get("used_memory_human", "0B"),
                     "keyspace_hits": info.get("keyspace_hits", 0),
-                    "keyspace_misses": info.get("keyspace_misses", 0)
+                    "keyspace_misses": info.get("keyspace_misses", 0),
+                    "near_cache": {
+                        **self.stats,
+                        "subscribed": self._subscribed,
+                        "ttl_seconds": self.near_cache_ttl_seconds
+                    },
+                    "local": self._memory_cache.get_stats()
                 }
             except Exception:
                 pass
         
         return self._memory_cache.get_stats()
+    
+    async def close(self):
+        """Finaliza o cache local, a inscrição de invalidação e a conexão Redis"""
+        if self._subscriber_task is not None and not self._subscriber_task.done():
+            self._subscriber_task.cancel()
+            try:
+                await self._subscriber_task
+            except asyncio.CancelledError:
+                pass
+        self._subscriber_task = None
+        
+        await self._memory_cache.close()
+        if self._redis_client is not None:
+            try:
+                await self._redis_client.aclose()
+            except Exception as e:
+                logger.warning(f"CacheManager.close: Erro ao fechar Redis: {e}")
 
 
 # Singleton instance
@@ -178,6 +557,14 @@ def get_cache_manager() -> CacheManager:
     return _cache_manager
 
 
+async def shutdown_cache_manager():
+    """Finaliza o CacheManager (shutdown da aplicação)"""
+    global _cache_manager
+    if _cache_manager is not None:
+        await _cache_manager.close()
+        _cache_manager = None
+
+
 # ============================================
 # DECORADORES DE PERFORMANCE
 # ============================================
@@ -241,25 +628,16 @@ def cache_result(key_prefix: str, ttl: int = 300):
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Gerar chave do cache baseada nos argumentos
-            cache_key = f"{key_prefix}:{hash(str(args) + str(sorted(kwargs.items())))}"
+            # Gerar chave do cache baseada nos argumentos (estável entre réplicas)
+            arguments = str(args) + str(sorted(kwargs.items()))
+            cache_key = f"{key_prefix}:{hashlib.sha256(arguments.encode()).hexdigest()[:32]}"
             
-            cache_manager = get_cache_manager()
-            
-            # Tentar obter do cache
-            cached_result = await cache_manager.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache HIT: {cache_key}")
-                return cached_result
-            
-            # Executar função e cachear resultado
-            logger.debug(f"Cache MISS: {cache_key}")
-            result = await func(*args, **kwargs)
-            
-            # Cachear resultado
-            await cache_manager.set(cache_key, result, ttl)
-            
-            return result
+            # Cache local/Redis; misses simultâneos executam a função uma vez
+            return await get_cache_manager().get_or_load(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl
+            )
         
         return wrapper
     return decorator
@@ -269,14 +647,153 @@ def cache_result(key_prefix: str, ttl: int = 300):
 # MÉTRICAS DE PERFORMANCE
 # ============================================
 
-class PerformanceMetrics:
-    """Coleta e armazena métricas de performance"""
+class DurationSketch:
+    """
+    Histograma log-linear de durações (estilo HDR) com memória fixa
+    
+    Cada potência de 2 é dividida em `SUB_BUCKETS` buckets lineares: erro
+    relativo dos percentis de até ~3%, com no máximo
+    `1 + MAX_EXPONENT * SUB_BUCKETS` buckets independente do volume.
+    Sketches são combináveis (`merge`), entre janelas de tempo e entre
+    workers (`to_dict`/`from_dict`).
+    """
+    
+    SUB_BUCKETS = 16
+    MAX_EXPONENT = 32
     
     def __init__(self):
-        self._metrics: Dict[str, List[Dict[str, Any]]] = {}
-        self._max_metrics_per_operation = 1000  # Limitar memória
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.success = 0
+        self.sum_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+    
+    @classmethod
+    def _index(cls, value: float) -> int:
+        if value < 1:
+            return 0
+        mantissa, exponent = math.frexp(value)
+        exponent = min(exponent - 1, cls.MAX_EXPONENT - 1)
+        sub = min(int((mantissa * 2 - 1) * cls.SUB_BUCKETS), cls.SUB_BUCKETS - 1)
+        return 1 + exponent * cls.SUB_BUCKETS + sub
+    
+    @classmethod
+    def _bucket_value(cls, index: int) -> float:
+        """Ponto médio do bucket"""
+        if index == 0:
+            return 0.0
+        exponent, sub = divmod(index - 1, cls.SUB_BUCKETS)
+        return (2 ** exponent) * (1 + (sub + 0.5) / cls.SUB_BUCKETS)
+    
+    def record(self, duration_ms: float, success: bool = True) -> None:
+        """Registra uma amostra em O(1)"""
+        index = self._index(duration_ms)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.success += 1 if success else 0
+        self.sum_ms += duration_ms
+        self.min_ms = duration_ms if self.min_ms is None else min(self.min_ms, duration_ms)
+        self.max_ms = duration_ms if self.max_ms is None else max(self.max_ms, duration_ms)
+    
+    def merge(self, other: "DurationSketch") -> "DurationSketch":
+        """Acumula as amostras de outro sketch neste"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.success += other.success
+        self.sum_ms += other.sum_ms
+        if other.min_ms is not None:
+            self.min_ms = other.min_ms if self.min_ms is None else min(self.min_ms, other.min_ms)
+        if other.max_ms is not None:
+            self.max_ms = other.max_ms if self.max_ms is None else max(self.max_ms, other.max_ms)
+        return self
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Percentil aproximado
+        
+        Args:
+            p: Percentil entre 0 e 100
+        
+        Returns:
+            Duração estimada (ms), ou None sem amostras
+        """
+        if self.total == 0:
+            return None
+        
+        rank = max(1, math.ceil(self.total * p / 100))
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= rank:
+                value = self._bucket_value(index)
+                return round(min(max(value, self.min_ms), self.max_ms), 2)
+        return self.max_ms
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa para combinar com sketches de outros workers"""
+        return {
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "total": self.total,
+            "success": self.success,
+            "sum_ms": self.sum_ms,
+            "min_ms": self.min_ms,
+            "max_ms": self.max_ms
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DurationSketch":
+        sketch = cls()
+        sketch.counts = {int(index): count for index, count in data.get("counts", {}).items()}
+        sketch.total = data.get("total", 0)
+        sketch.success = data.get("success", 0)
+        sketch.sum_ms = data.get("sum_ms", 0.0)
+        sketch.min_ms = data.get("min_ms")
+        sketch.max_ms = data.get("max_ms")
+        return sketch
+
+
+class PerformanceMetrics:
+    """
+    Coleta métricas de performance por operação
+    
+    Cada operação mantém um `DurationSketch` por janela de tempo
+    (`window_seconds`); janelas além da retenção são descartadas. Registro
+    em O(1) e estatísticas em O(janelas), independente do volume.
+    """
+    
+    def __init__(self,
+                 window_seconds: Optional[int] = None,
+                 retention_seconds: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            window_seconds: Duração de cada janela (padrão: env
+                AUTOMATION_METRICS_WINDOW_SECONDS, 60)
+            retention_seconds: Período mantido em memória (padrão: env
+                AUTOMATION_METRICS_RETENTION_SECONDS, 3600)
+            clock: Relógio em segundos (epoch)
+        """
+        if window_seconds is None:
+            window_seconds = int(os.getenv("AUTOMATION_METRICS_WINDOW_SECONDS", "60"))
+        if retention_seconds is None:
+            retention_seconds = int(os.getenv("AUTOMATION_METRICS_RETENTION_SECONDS", "3600"))
+        self.window_seconds = window_seconds
+        self.retention_seconds = retention_seconds
+        self._clock = clock
+        
+        # operação -> {início da janela: sketch}
+        self._metrics: Dict[str, Dict[int, DurationSketch]] = {}
         logger.info("PerformanceMetrics inicializado")
     
+    def _window_start(self, timestamp: float) -> int:
+        return int(timestamp // self.window_seconds) * self.window_seconds
+    
+    def _prune(self, windows: Dict[int, DurationSketch], cutoff: float) -> None:
+        for start in [start for start in windows if start + self.window_seconds <= cutoff]:
+            del windows[start]
+    
     async def record_metric(
         self, 
         operation: str, 
@@ -284,67 +801,89 @@ class PerformanceMetrics:
         success: bool,
         metadata: Optional[Dict[str, Any]] = None
     ):
-        """Registra métrica de performance"""
-        metric = {
-            "timestamp": datetime.now().isoformat(),
-            "duration_ms": duration_ms,
-            "success": success,
-            "metadata": metadata or {}
-        }
-        
-        if operation not in self._metrics:
-            self._metrics[operation] = []
+        """
+        Registra métrica de performance
         
-        self._metrics[operation].append(metric)
+        `metadata` é aceito por compatibilidade; apenas a duração e o
+        resultado entram nas estatísticas.
+        """
+        now = self._clock()
+        start = self._window_start(now)
         
-        # Limitar tamanho para evitar vazamento de memória
-        if len(self._metrics[operation]) > self._max_metrics_per_operation:
-            self._metrics[operation] = self._metrics[operation][-self._max_metrics_per_operation:]
+        windows = self._metrics.setdefault(operation, {})
+        sketch = windows.get(start)
+        if sketch is None:
+            # Nova janela: descartar as que saíram da retenção
+            self._prune(windows, now - self.retention_seconds)
+            sketch = windows[start] = DurationSketch()
+        sketch.record(duration_ms, success)
     
-    async def get_operation_stats(self, operation: str) -> Dict[str, Any]:
-        """Obtém estatísticas de uma operação"""
-        if operation not in self._metrics:
-            return {"operation": operation, "total_calls": 0}
+    def get_operation_sketch(self, operation: str, window_seconds: Optional[int] = None) -> DurationSketch:
+        """
+        Combina as janelas de uma operação em um único sketch
+        
+        Args:
+            operation: Nome da operação
+            window_seconds: Considerar apenas os últimos N segundos (padrão: retenção)
         
-        metrics = self._metrics[operation]
-        durations = [m["duration_ms"] for m in metrics]
-        successes = [m for m in metrics if m["success"]]
+        Returns:
+            Sketch com as amostras do período (serializável com `to_dict`)
+        """
+        now = self._clock()
+        cutoff = now - min(window_seconds or self.retention_seconds, self.retention_seconds)
         
-        if not durations:
+        merged = DurationSketch()
+        for start, sketch in self._metrics.get(operation, {}).items():
+            if start + self.window_seconds > cutoff:
+                merged.merge(sketch)
+        return merged
+    
+    async def get_operation_stats(self, operation: str, window_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """Obtém estatísticas de uma operação"""
+        sketch = self.get_operation_sketch(operation, window_seconds)
+        return self.sketch_stats(operation, sketch)
+    
+    @staticmethod
+    def sketch_stats(operation: str, sketch: DurationSketch) -> Dict[str, Any]:
+        """Estatísticas de um sketch (local ou combinado de vários workers)"""
+        if sketch.total == 0:
             return {"operation": operation, "total_calls": 0}
         
         return {
             "operation": operation,
-            "total_calls": len(metrics),
-            "success_calls": len(successes),
-            "success_rate": len(successes) / len(metrics) * 100,
-            "avg_duration_ms": sum(durations) / len(durations),
-            "min_duration_ms": min(durations),
-            "max_duration_ms": max(durations),
-            "p95_duration_ms": sorted(durations)[int(len(durations) * 0.95)] if len(durations) > 1 else durations[0]
+            "total_calls": sketch.total,
+            "success_calls": sketch.success,
+            "success_rate": sketch.success / sketch.total * 100,
+            "avg_duration_ms": sketch.sum_ms / sketch.total,
+            "min_duration_ms": sketch.min_ms,
+            "max_duration_ms": sketch.max_ms,
+            "p50_duration_ms": sketch.percentile(50),
+            "p95_duration_ms": sketch.percentile(95),
+            "p99_duration_ms": sketch.percentile(99)
         }
     
     async def get_all_stats(self) -> Dict[str, Any]:
         """Obtém estatísticas de todas as operações"""
         stats = {}
-        for operation in self._metrics:
+        for operation in list(self._metrics):
             stats[operation] = await self.get_operation_stats(operation)
         
         return {
             "operations": stats,
             "total_operations": len(self._metrics),
+            "window_seconds": self.window_seconds,
+            "retention_seconds": self.retention_seconds,
             "cache_stats": await get_cache_manager().get_stats()
         }
     
     async def clear_old_metrics(self, hours: int = 24):
-        """Remove métricas antigas para liberar memória"""
-        cutoff = datetime.now() - timedelta(hours=hours)
-        
-        for operation in self._metrics:
-            self._metrics[operation] = [
-                m for m in self._metrics[operation]
-                if datetime.fromisoformat(m["timestamp"]) > cutoff
-            ]
+        """Remove janelas de métricas antigas para liberar memória"""
+        cutoff = self._clock() - hours * 3600
+        
+        for operation in list(self._metrics):
+            self._prune(self._metrics[operation], cutoff)
+            if not self._metrics[operation]:
+                del self._metrics[operation]
         
         logger.info(f"Métricas antigas removidas (> {hours}h)")
 
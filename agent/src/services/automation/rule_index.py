@@ -0,0 +1,135 @@
+"""
+RuleIndex - Índice em memória de regras ativas compiladas
+
+Mantém as regras ativas agrupadas por gatilho, com as condições já
+compiladas (ver conditions).
+
+O índice é recarregado por completo (uma query) quando invalidado pelo
+AutomationService ou quando o TTL expira (alterações feitas por outros
+workers).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+
+from .conditions import ConditionPredicate, compile_conditions
+from .schemas import AutomationRule
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class CompiledRule:
+    """Regra ativa com condições compiladas"""
+    rule: AutomationRule
+    matches: ConditionPredicate
+
+    @classmethod
+    def compile(cls, rule: AutomationRule) -> "CompiledRule":
+        return cls(rule=rule, matches=compile_conditions(rule.condicoes))
+
+
+class RuleIndex:
+    """
+    Índice gatilho -> regras ativas compiladas
+    """
+
+    def __init__(self,
+                 loader: Callable[[], Awaitable[List[AutomationRule]]],
+                 ttl_seconds: float = 60.0):
+        """
+        Args:
+            loader: Busca todas as regras ativas (ordenadas por prioridade)
+            ttl_seconds: Validade do índice antes de recarregar
+        """
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+
+        self._by_trigger: Dict[str, List[CompiledRule]] = {}
+        self._loaded_at: Optional[float] = None
+        self._version = 0
+        self._loaded_version = -1
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.stats = {
+            "hits": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "invalidations": 0
+        }
+
+    def invalidate(self) -> None:
+        """Marca o índice para recarga na próxima avaliação"""
+        self._version += 1
+        self.stats["invalidations"] += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_version == self._version
+            and self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl_seconds
+        )
+
+    async def _reload(self) -> None:
+        version = self._version
+        rules = await self.loader()
+
+        by_trigger: Dict[str, List[CompiledRule]] = {}
+        for rule in rules:
+            trigger = rule.gatilho.value if hasattr(rule.gatilho, "value") else str(rule.gatilho)
+            by_trigger.setdefault(trigger, []).append(CompiledRule.compile(rule))
+
+        self._by_trigger = by_trigger
+        self._loaded_at = time.monotonic()
+        # Invalidação durante a carga: manter como desatualizado
+        self._loaded_version = version
+        self.stats["loads"] += 1
+        logger.info(f"RuleIndex: {len(rules)} regras ativas indexadas em {len(by_trigger)} gatilhos")
+
+    async def get_rules(self, trigger_type: str, user_id: Optional[str] = None) -> List[CompiledRule]:
+        """
+        Retorna regras ativas compiladas para um gatilho
+
+        Args:
+            trigger_type: Tipo de gatilho
+            user_id: Filtrar por criador da regra (opcional)
+
+        Returns:
+            Regras do gatilho, na ordem de prioridade
+        """
+        if self._is_fresh():
+            self.stats["hits"] += 1
+        else:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                # Outra coroutine pode ter recarregado enquanto aguardávamos
+                if not self._is_fresh():
+                    try:
+                        await self._reload()
+                    except Exception as e:
+                        self.stats["load_errors"] += 1
+                        if self._loaded_at is None:
+                            raise
+                        # Manter o índice anterior por mais um TTL em vez de
+                        # repetir a carga a cada gatilho
+                        self._loaded_at = time.monotonic()
+                        self._loaded_version = self._version
+                        logger.error(f"RuleIndex: Erro ao recarregar, usando índice anterior: {e}")
+
+        rules = self._by_trigger.get(trigger_type, [])
+        if user_id:
+            rules = [compiled for compiled in rules if compiled.rule.created_by == user_id]
+        return rules
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do índice"""
+        stats = dict(self.stats)
+        stats["triggers"] = len(self._by_trigger)
+        stats["rules"] = sum(len(rules) for rules in self._by_trigger.values())
+        stats["fresh"] = self._is_fresh()
+        return stats
@@ -3,24 +3,34 @@ RulesExecutor - Avaliação e execução de regras de automação
 
 Responsável por avaliar condições e executar regras durante conversas.
 Integra com ActionExecutor para executar ações específicas.
+
+As regras ativas ficam em um índice em memória (ver rule_index), com as
+condições compiladas; o banco só é consultado quando o índice é
+invalidado ou expira. Os logs de execução são gravados em lote (ver
+execution_log_sink).
 """
 
+import os
 import structlog
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import time
 import asyncio
 
-from ..supabase_client import get_supabase_client
+from ..supabase_pool import get_supabase_pool
+from .conditions import ConditionPredicate, compile_conditions
+from .rule_index import RuleIndex, CompiledRule
+from .execution_log_sink import ExecutionLogSink
 from .schemas import (
     AutomationRule,
-    RuleCondition,
+    ConditionItem,
     RuleExecution,
     ActionResult,
     ExecutionStatus,
     ConditionOperator,
     TriggerType,
-    AutomationContext
+    AutomationContext,
+    parse_condition_item
 )
 
 logger = structlog.get_logger(__name__)
@@ -49,9 +59,24 @@ class RulesExecutor:
     
     def __init__(self):
         """Inicializa o executor"""
-        self.client = get_supabase_client()
+        self.db = get_supabase_pool()
+        self.rule_index = RuleIndex(
+            self._load_active_rules,
+            ttl_seconds=float(os.getenv("AUTOMATION_RULES_CACHE_TTL_SECONDS", "60"))
+        )
+        self.log_sink = ExecutionLogSink(
+            self.db,
+            batch_size=int(os.getenv("AUTOMATION_LOG_BATCH_SIZE", "100")),
+            flush_interval_seconds=float(os.getenv("AUTOMATION_LOG_FLUSH_INTERVAL_SECONDS", "2")),
+            max_buffer=int(os.getenv("AUTOMATION_LOG_MAX_BUFFER", "5000")),
+            unmet_sample_rate=float(os.getenv("AUTOMATION_LOG_UNMET_SAMPLE_RATE", "1.0"))
+        )
         logger.info("RulesExecutor inicializado")
     
+    def invalidate_rules(self) -> None:
+        """Invalida o índice de regras (chamado após criar/alterar regras)"""
+        self.rule_index.invalidate()
+    
     async def evaluate_rules(
         self, 
         trigger_type: str, 
@@ -82,8 +107,8 @@ class RulesExecutor:
             
             # Executar regras em paralelo para performance
             tasks = []
-            for rule in active_rules:
-                task = self.execute_rule(rule, context)
+            for compiled in active_rules:
+                task = self.execute_rule(compiled.rule, context, compiled.matches)
                 tasks.append(task)
             
             # Aguardar todas as execuções
@@ -93,7 +118,7 @@ class RulesExecutor:
             valid_executions = []
             for i, execution in enumerate(executions):
                 if isinstance(execution, Exception):
-                    logger.error(f"evaluate_rules: Erro na execução da regra {active_rules[i].id}: {execution}")
+                    logger.error(f"evaluate_rules: Erro na execução da regra {active_rules[i].rule.id}: {execution}")
                 else:
                     valid_executions.append(execution)
             
@@ -108,13 +133,19 @@ class RulesExecutor:
             logger.error(f"evaluate_rules: Erro geral na avaliação: {e} (tempo: {duration_ms}ms)")
             raise RulesExecutorError(f"Erro na avaliação de regras: {e}")
     
-    async def execute_rule(self, rule: AutomationRule, context: Dict[str, Any]) -> RuleExecution:
+    async def execute_rule(
+        self,
+        rule: AutomationRule,
+        context: Dict[str, Any],
+        matches: Optional[ConditionPredicate] = None
+    ) -> RuleExecution:
         """
         Executa uma regra específica
         
         Args:
             rule: Regra a ser executada
             context: Contexto com dados para avaliação
+            matches: Condições já compiladas (opcional, compiladas sob demanda)
             
         Returns:
             Resultado da execução da regra
@@ -128,7 +159,9 @@ class RulesExecutor:
             conditions_result = {}
             
             if rule.condicoes:
-                conditions_met = await self.evaluate_conditions(rule.condicoes, context)
+                if matches is None:
+                    matches = compile_conditions(rule.condicoes)
+                conditions_met = matches(context)
                 conditions_result = {
                     "total_conditions": len(rule.condicoes),
                     "conditions_met": conditions_met,
@@ -210,7 +243,7 @@ class RulesExecutor:
     
     async def evaluate_conditions(
         self, 
-        conditions: List[RuleCondition], 
+        conditions: List[ConditionItem], 
         context: Dict[str, Any]
     ) -> bool:
         """
@@ -229,16 +262,7 @@ class RulesExecutor:
         logger.debug(f"evaluate_conditions: Avaliando {len(conditions)} condições")
         
         try:
-            # Avaliar cada condição
-            results = []
-            for i, condition in enumerate(conditions):
-                result = await self._evaluate_single_condition(condition, context)
-                results.append(result)
-                
-                logger.debug(f"evaluate_conditions: Condição {i+1} - {condition.field} {condition.operator} {condition.value} = {result}")
-            
-            # Aplicar lógica AND/OR
-            final_result = self._apply_logic_operators(conditions, results)
+            final_result = compile_conditions(conditions)(context)
             
             logger.debug(f"evaluate_conditions: Resultado final: {final_result}")
             return final_result
@@ -258,200 +282,62 @@ class RulesExecutor:
         logger.debug(f"log_execution: Registrando log para regra {rule_id}")
         
         try:
-            # Preparar dados do log
-            log_data = {
-                "rule_id": rule_id,
-                "trigger_type": execution.trigger_type,
-                "trigger_data": execution.trigger_data,
-                "conditions_met": execution.conditions_met,
-                "conditions_result": execution.conditions_result,
-                "actions_executed": [action.dict() for action in execution.actions_executed],
-                "execution_status": execution.execution_status,
-                "error_message": execution.error_message,
-                "duration_ms": execution.duration_ms,
-                "executed_at": execution.executed_at.isoformat(),
-                "actions_count": len(execution.actions_executed)
-            }
+            # Gravação em lote em background (não bloqueia a execução)
+            await self.log_sink.submit(rule_id, execution)
             
-            # Inserir no banco
-            response = self.client.table("rule_execution_logs").insert(log_data).execute()
-            
-            if response.data:
-                logger.debug(f"log_execution: Log registrado com ID {response.data[0]['id']}")
-            else:
-                logger.warning("log_execution: Resposta vazia ao inserir log")
-                
         except Exception as e:
             logger.error(f"log_execution: Erro ao registrar log: {e}")
             # Não propagar erro de log para não afetar execução principal
     
+    async def close(self) -> None:
+        """Grava os logs de execução pendentes (shutdown da aplicação)"""
+        await self.log_sink.close()
+    
     async def _get_active_rules(
         self, 
         trigger_type: str, 
         user_id: Optional[str] = None
-    ) -> List[AutomationRule]:
+    ) -> List[CompiledRule]:
         """
-        Busca regras ativas para um tipo de gatilho
+        Busca regras ativas compiladas para um tipo de gatilho
         
         Args:
             trigger_type: Tipo de gatilho
             user_id: ID do usuário (opcional)
             
         Returns:
-            Lista de regras ativas
+            Lista de regras ativas, mais recentes primeiro
         """
         try:
-            # Query otimizada com índices
-            query = self.client.table("automation_rules").select("*").eq("status", "ativa").eq("gatilho", trigger_type).is_("deleted_at", "null")
-            
-            # Filtrar por usuário se fornecido
-            if user_id:
-                query = query.eq("created_by", user_id)
-            
-            # Ordenar por data de atualização para priorizar regras mais recentes
-            query = query.order("updated_at", desc=True)
-            
-            response = query.execute()
-            
-            if not response.data:
-                return []
-            
-            # Converter dados do banco para modelos
-            rules = []
-            for rule_data in response.data:
-                try:
-                    rule = self._convert_db_to_rule(rule_data)
-                    rules.append(rule)
-                except Exception as e:
-                    logger.error(f"_get_active_rules: Erro ao converter regra {rule_data.get('id')}: {e}")
-                    continue
-            
-            return rules
-            
+            return await self.rule_index.get_rules(trigger_type, user_id)
         except Exception as e:
             logger.error(f"_get_active_rules: Erro ao buscar regras: {e}")
             return []
     
-    async def _evaluate_single_condition(
-        self, 
-        condition: RuleCondition, 
-        context: Dict[str, Any]
-    ) -> bool:
-        """
-        Avalia uma única condição
-        
-        Args:
-            condition: Condição a avaliar
-            context: Contexto com dados
-            
-        Returns:
-            True se condição é atendida, False caso contrário
-        """
-        try:
-            # Extrair valor do contexto usando notação de ponto
-            field_value = self._extract_field_value(condition.field, context)
-            
-            # Aplicar operador
-            if condition.operator == ConditionOperator.EQUALS:
-                return field_value == condition.value
-            
-            elif condition.operator == ConditionOperator.CONTAINS:
-                if isinstance(field_value, str) and isinstance(condition.value, str):
-                    return condition.value.lower() in field_value.lower()
-                return False
-            
-            elif condition.operator == ConditionOperator.GREATER_THAN:
-                try:
-                    return float(field_value) > float(condition.value)
-                except (ValueError, TypeError):
-                    return False
-            
-            elif condition.operator == ConditionOperator.LESS_THAN:
-                try:
-                    return float(field_value) < float(condition.value)
-                except (ValueError, TypeError):
-                    return False
-            
-            elif condition.operator == ConditionOperator.IN_LIST:
-                if isinstance(condition.value, list):
-                    return field_value in condition.value
-                return False
-            
-            elif condition.operator == ConditionOperator.NOT_EMPTY:
-                return field_value is not None and field_value != "" and field_value != []
-            
-            else:
-                logger.warning(f"_evaluate_single_condition: Operador não suportado: {condition.operator}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"_evaluate_single_condition: Erro na avaliação: {e}")
-            return False
-    
-    def _extract_field_value(self, field_path: str, context: Dict[str, Any]) -> Any:
+    async def _load_active_rules(self) -> List[AutomationRule]:
         """
-        Extrai valor de um campo usando notação de ponto
+        Carrega todas as regras ativas do banco (usado pelo índice)
         
-        Args:
-            field_path: Caminho do campo (ex: "customer.name")
-            context: Contexto com dados
-            
         Returns:
-            Valor do campo ou None se não encontrado
+            Regras ativas ordenadas por data de atualização
         """
-        try:
-            parts = field_path.split(".")
-            value = context
-            
-            for part in parts:
-                if isinstance(value, dict) and part in value:
-                    value = value[part]
-                else:
-                    return None
-            
-            return value
-            
-        except Exception as e:
-            logger.error(f"_extract_field_value: Erro ao extrair campo '{field_path}': {e}")
-            return None
-    
-    def _apply_logic_operators(
-        self, 
-        conditions: List[RuleCondition], 
-        results: List[bool]
-    ) -> bool:
-        """
-        Aplica operadores lógicos AND/OR entre condições
-        
-        Args:
-            conditions: Lista de condições
-            results: Lista de resultados das condições
-            
-        Returns:
-            Resultado final da avaliação lógica
-        """
-        if not results:
-            return True
-        
-        if len(results) == 1:
-            return results[0]
+        def build_query(client):
+            # Ordenar por data de atualização para priorizar regras mais recentes
+            return client.table("automation_rules").select("*").eq("status", "ativa") \
+                .is_("deleted_at", "null").order("updated_at", desc=True)
         
-        # Aplicar lógica sequencial
-        final_result = results[0]
+        response = await self.db.run(build_query)
         
-        for i in range(1, len(results)):
-            logic_operator = conditions[i-1].logic or "AND"
-            
-            if logic_operator == "AND":
-                final_result = final_result and results[i]
-            elif logic_operator == "OR":
-                final_result = final_result or results[i]
-            else:
-                logger.warning(f"_apply_logic_operators: Operador lógico não suportado: {logic_operator}")
-                # Default para AND
-                final_result = final_result and results[i]
+        # Converter dados do banco para modelos
+        rules = []
+        for rule_data in response.data or []:
+            try:
+                rules.append(self._convert_db_to_rule(rule_data))
+            except Exception as e:
+                logger.error(f"_load_active_rules: Erro ao converter regra {rule_data.get('id')}: {e}")
+                continue
         
-        return final_result
+        return rules
     
     def _determine_execution_status(self, actions_executed: List[ActionResult]) -> ExecutionStatus:
         """
@@ -491,7 +377,7 @@ class RulesExecutor:
             condicoes = []
             if db_data.get("condicoes"):
                 for condition_data in db_data["condicoes"]:
-                    condicoes.append(RuleCondition(**condition_data))
+                    condicoes.append(parse_condition_item(condition_data))
             
             acoes = []
             if db_data.get("acoes"):
@@ -542,6 +428,24 @@ def get_rules_executor() -> RulesExecutor:
     return _rules_executor_instance
 
 
+def invalidate_rule_cache() -> None:
+    """
+    Invalida o índice de regras ativas do processo
+    
+    Chamado pelo AutomationService após criar, alterar ou remover regras.
+    """
+    if _rules_executor_instance is not None:
+        _rules_executor_instance.invalidate_rules()
+
+
+async def shutdown_rules_executor() -> None:
+    """Finaliza o RulesExecutor (se criado), gravando logs pendentes"""
+    global _rules_executor_instance
+    if _rules_executor_instance is not None:
+        await _rules_executor_instance.close()
+        _rules_executor_instance = None
+
+
 # Função auxiliar para reset (útil para testes)
 def reset_rules_executor():
     """Reset da instância singleton (usado principalmente em testes)"""
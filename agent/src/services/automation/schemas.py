@@ -49,6 +49,20 @@ class RuleCondition(BaseModel):
     value: Any = Field(..., description="Valor para comparação")
     logic: Optional[str] = Field("AND", description="Lógica com próxima condição")
 
+class RuleConditionGroup(BaseModel):
+    conditions: List[Union[RuleCondition, "RuleConditionGroup"]] = Field(..., min_items=1, description="Condições entre parênteses")
+    logic: Optional[str] = Field("AND", description="Lógica com próxima condição")
+
+RuleConditionGroup.model_rebuild()
+
+ConditionItem = Union[RuleCondition, RuleConditionGroup]
+
+def parse_condition_item(data: Dict[str, Any]) -> ConditionItem:
+    """Converte condição (ou grupo de condições) vinda do banco"""
+    if "conditions" in data:
+        return RuleConditionGroup(**data)
+    return RuleCondition(**data)
+
 class RuleAction(BaseModel):
     type: ActionType = Field(..., description="Tipo da ação")
     config: Dict[str, Any] = Field(..., description="Configuração da ação")
@@ -63,7 +77,7 @@ class AutomationRuleBase(BaseModel):
     descricao: Optional[str] = Field(None)
     gatilho: TriggerType = Field(...)
     gatilho_config: Dict[str, Any] = Field(default_factory=dict)
-    condicoes: List[RuleCondition] = Field(default_factory=list)
+    condicoes: List[ConditionItem] = Field(default_factory=list)
     acoes: List[RuleAction] = Field(..., min_items=1)
 
 class AutomationRuleCreate(AutomationRuleBase):
@@ -74,7 +88,7 @@ class AutomationRuleUpdate(BaseModel):
     descricao: Optional[str] = None
     gatilho: Optional[TriggerType] = None
     gatilho_config: Optional[Dict[str, Any]] = None
-    condicoes: Optional[List[RuleCondition]] = None
+    condicoes: Optional[List[ConditionItem]] = None
     acoes: Optional[List[RuleAction]] = None
     status: Optional[RuleStatus] = None
 
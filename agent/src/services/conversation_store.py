@@ -0,0 +1,361 @@
+"""
+Conversation Store - Persistência de mensagens de WhatsApp e site
+
+Grava cada mensagem recebida/enviada na conversa aberta do cliente usando
+o pool Supabase compartilhado.
+
+- Cache TTL (LRU) de telefone/sessão -> (customer_id, conversation_id):
+  com cache quente, cada mensagem custa uma única RPC
+  (`insert_open_conversation_message`) que só grava se a conversa ainda
+  estiver aberta; conversa encerrada volta ao caminho de cache frio
+- Cache frio: uma única RPC (`save_conversation_message`) localiza ou cria
+  customer e conversa e insere a mensagem
+- Misses concorrentes para o mesmo cliente são resolvidos uma única vez
+- Fallback para as queries sequenciais se a RPC não estiver instalada
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+
+from .supabase_pool import get_supabase_pool
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ConversationIdentity:
+    """Identidade do interlocutor derivada do telefone (ou `site_<sessionId>`)"""
+    key: str
+    channel: str
+    session_id: Optional[str]
+    customer_name: str
+    customer_email: str
+    customer_phone: Optional[str]
+    subject: str
+
+
+@dataclass
+class ConversationRef:
+    """Par customer/conversa em cache"""
+    customer_id: str
+    conversation_id: str
+    expires_at: float
+
+
+def resolve_identity(phone: str) -> ConversationIdentity:
+    """
+    Deriva canal e dados do customer a partir do identificador recebido
+
+    Args:
+        phone: Telefone do WhatsApp ou `site_<sessionId>` para o chat do site
+
+    Returns:
+        Identidade usada para localizar/criar customer e conversa
+    """
+    if phone.startswith('site_'):
+        session_id = phone.replace('site_', '')
+        return ConversationIdentity(
+            key=phone,
+            channel='site',
+            session_id=session_id,
+            customer_name=f'Visitante Site {session_id[-8:]}',
+            customer_email=f'site_{session_id}@slimquality.temp',
+            customer_phone=None,
+            subject=f'Site {session_id[-8:]}'
+        )
+
+    return ConversationIdentity(
+        key=phone,
+        channel='whatsapp',
+        session_id=None,
+        customer_name=f'Cliente WhatsApp {phone[-4:]}',
+        customer_email=f'whatsapp_{phone}@slimquality.temp',
+        customer_phone=phone,
+        subject=f'Whatsapp {phone[-8:]}'
+    )
+
+
+class ConversationStore:
+    """
+    Persistência de mensagens com cache de customer/conversa
+    """
+
+    SAVE_RPC = "save_conversation_message"
+    INSERT_RPC = "insert_open_conversation_message"
+
+    def __init__(self, db: Any, ttl_seconds: float = 300.0, max_entries: int = 10000):
+        """
+        Args:
+            db: Executor de acesso a dados (ver supabase_pool)
+            ttl_seconds: Validade das entradas do cache
+            max_entries: Máximo de clientes em cache (LRU)
+        """
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._cache: "OrderedDict[str, ConversationRef]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._rpc_available = True
+        self._insert_rpc_available = True
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "rpc_calls": 0,
+            "fallback_calls": 0,
+            "invalidations": 0,
+            "closed_conversations": 0
+        }
+
+    def _get_cached(self, key: str) -> Optional[ConversationRef]:
+        """Retorna entrada válida do cache (remove se expirada)"""
+        ref = self._cache.get(key)
+        if ref is None:
+            return None
+        if ref.expires_at <= time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return ref
+
+    def _put(self, key: str, customer_id: str, conversation_id: str) -> ConversationRef:
+        """Armazena par customer/conversa no cache"""
+        ref = ConversationRef(
+            customer_id=customer_id,
+            conversation_id=conversation_id,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        self._cache[key] = ref
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return ref
+
+    def invalidate(self, phone: str) -> None:
+        """Remove do cache o cliente (ex.: conversa encerrada)"""
+        if self._cache.pop(phone, None) is not None:
+            self.stats["invalidations"] += 1
+
+    async def save_message(self, phone: str, message: str,
+                           sender_type: str = 'customer') -> str:
+        """
+        Grava mensagem na conversa aberta do cliente
+
+        Args:
+            phone: Telefone do WhatsApp ou `site_<sessionId>`
+            message: Conteúdo da mensagem
+            sender_type: 'customer' ou 'agent'
+
+        Returns:
+            ID da conversa onde a mensagem foi gravada
+
+        Raises:
+            RuntimeError: Se não foi possível gravar a mensagem
+        """
+        identity = resolve_identity(phone)
+
+        ref = self._get_cached(identity.key)
+        if ref is not None:
+            try:
+                if await self._insert_if_open(ref, message, sender_type):
+                    self.stats["hits"] += 1
+                    return ref.conversation_id
+            except Exception as e:
+                logger.warning("Falha ao gravar na conversa em cache", error=str(e))
+            # Conversa encerrada, removida ou inválida: resolver novamente
+            self.invalidate(identity.key)
+
+        lock = self._locks.setdefault(identity.key, asyncio.Lock())
+        try:
+            async with lock:
+                # Outro coroutine pode ter resolvido enquanto aguardávamos
+                ref = self._get_cached(identity.key)
+                if ref is not None:
+                    if await self._insert_if_open(ref, message, sender_type):
+                        self.stats["hits"] += 1
+                        return ref.conversation_id
+                    self.invalidate(identity.key)
+
+                self.stats["misses"] += 1
+                customer_id, conversation_id = await self._resolve_and_insert(
+                    identity, message, sender_type
+                )
+                self._put(identity.key, customer_id, conversation_id)
+                return conversation_id
+        finally:
+            if not lock.locked():
+                self._locks.pop(identity.key, None)
+
+    @staticmethod
+    def _rpc_missing(rpc: str, error: Exception) -> bool:
+        """Erro indica função não instalada no banco"""
+        return rpc in str(error) or "PGRST202" in str(error)
+
+    async def _insert_if_open(self, ref: ConversationRef, message: str, sender_type: str) -> bool:
+        """
+        Insere mensagem na conversa em cache se ela ainda estiver aberta
+
+        Returns:
+            False se a conversa foi encerrada (mensagem não gravada)
+        """
+        if self._insert_rpc_available:
+            try:
+                result = await self.db.run(lambda c: c.rpc(self.INSERT_RPC, {
+                    "p_conversation_id": ref.conversation_id,
+                    "p_sender_id": ref.customer_id,
+                    "p_content": message,
+                    "p_sender_type": sender_type
+                }))
+                inserted = bool(result.data)
+            except Exception as e:
+                if not self._rpc_missing(self.INSERT_RPC, e):
+                    raise
+                # Função não instalada no banco: não tentar novamente
+                self._insert_rpc_available = False
+                logger.warning("RPC de mensagem em conversa aberta indisponível, conferindo status antes do INSERT",
+                               error=str(e))
+
+        if not self._insert_rpc_available:
+            result = await self.db.run(
+                lambda c: c.table('conversations').select('id').eq('id', ref.conversation_id).eq('status', 'open')
+            )
+            inserted = bool(result.data)
+            if inserted:
+                await self._insert_message(ref.customer_id, ref.conversation_id, message, sender_type)
+
+        if not inserted:
+            self.stats["closed_conversations"] += 1
+            logger.info("Conversa em cache encerrada, localizando conversa aberta",
+                        conversation_id=ref.conversation_id)
+        return inserted
+
+    async def _insert_message(self, customer_id: str, conversation_id: str,
+                              message: str, sender_type: str) -> None:
+        """Insere mensagem em conversa conhecida (um round-trip)"""
+        result = await self.db.run(lambda c: c.table('messages').insert({
+            'conversation_id': conversation_id,
+            'content': message,
+            'sender_type': sender_type,
+            'sender_id': customer_id  # customer_id para ambos (customer e agent)
+        }))
+        if not result.data:
+            raise RuntimeError("Erro ao salvar mensagem")
+
+    async def _resolve_and_insert(self, identity: ConversationIdentity, message: str,
+                                  sender_type: str) -> Tuple[str, str]:
+        """Localiza/cria customer e conversa e grava a mensagem"""
+        if self._rpc_available:
+            try:
+                result = await self.db.run(lambda c: c.rpc(self.SAVE_RPC, {
+                    "p_channel": identity.channel,
+                    "p_phone": identity.customer_phone,
+                    "p_email": identity.customer_email,
+                    "p_customer_name": identity.customer_name,
+                    "p_session_id": identity.session_id,
+                    "p_subject": identity.subject,
+                    "p_content": message,
+                    "p_sender_type": sender_type
+                }))
+                self.stats["rpc_calls"] += 1
+
+                row = result.data[0] if isinstance(result.data, list) and result.data else None
+                if not row:
+                    raise RuntimeError("RPC de persistência não retornou IDs")
+                return row["customer_id"], row["conversation_id"]
+
+            except Exception as e:
+                if not self._rpc_missing(self.SAVE_RPC, e):
+                    raise
+                # Função não instalada no banco: não tentar novamente
+                self._rpc_available = False
+                logger.warning("RPC de persistência indisponível, usando queries sequenciais", error=str(e))
+
+        self.stats["fallback_calls"] += 1
+        customer_id = await self._find_or_create_customer(identity)
+        conversation_id = await self._find_or_create_conversation(identity, customer_id)
+        await self._insert_message(customer_id, conversation_id, message, sender_type)
+        return customer_id, conversation_id
+
+    async def _find_or_create_customer(self, identity: ConversationIdentity) -> str:
+        """Busca customer por email (site) ou telefone (WhatsApp), criando se necessário"""
+        if identity.channel == 'site':
+            result = await self.db.run(
+                lambda c: c.table('customers').select('id').eq('email', identity.customer_email)
+            )
+        else:
+            result = await self.db.run(
+                lambda c: c.table('customers').select('id').eq('phone', identity.customer_phone)
+            )
+        if result.data:
+            return result.data[0]['id']
+
+        result = await self.db.run(lambda c: c.table('customers').insert({
+            'name': identity.customer_name,
+            'email': identity.customer_email,
+            'phone': identity.customer_phone,
+            'source': identity.channel,
+            'status': 'active'
+        }))
+        if not result.data:
+            raise RuntimeError(f"Erro ao criar customer para {identity.channel}")
+
+        logger.info("Customer criado", channel=identity.channel, customer_id=result.data[0]['id'])
+        return result.data[0]['id']
+
+    async def _find_or_create_conversation(self, identity: ConversationIdentity,
+                                           customer_id: str) -> str:
+        """Busca conversa aberta do canal, criando se necessário"""
+        result = await self.db.run(
+            lambda c: c.table('conversations').select('id').eq('customer_id', customer_id)
+            .eq('channel', identity.channel).eq('status', 'open')
+        )
+        if result.data:
+            return result.data[0]['id']
+
+        result = await self.db.run(lambda c: c.table('conversations').insert({
+            'customer_id': customer_id,
+            'channel': identity.channel,
+            'status': 'open',
+            'subject': identity.subject,
+            'session_id': identity.session_id
+        }))
+        if not result.data:
+            raise RuntimeError(f"Erro ao criar conversa para customer {customer_id}")
+
+        logger.info("Conversa criada", channel=identity.channel, conversation_id=result.data[0]['id'])
+        return result.data[0]['id']
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do store"""
+        stats = dict(self.stats)
+        stats["cached"] = len(self._cache)
+        stats["rpc_available"] = self._rpc_available
+        return stats
+
+
+# Singleton instance
+_conversation_store: Optional[ConversationStore] = None
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    Obtém instância singleton do ConversationStore
+
+    Configuração via ambiente:
+    - CONVERSATION_CACHE_TTL_SECONDS (padrão 300)
+    - CONVERSATION_CACHE_SIZE (padrão 10000)
+    """
+    global _conversation_store
+    if _conversation_store is None:
+        _conversation_store = ConversationStore(
+            get_supabase_pool(),
+            ttl_seconds=float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("CONVERSATION_CACHE_SIZE", "10000"))
+        )
+    return _conversation_store
@@ -0,0 +1,253 @@
+"""
+Provider Health - Circuit breaker e latência por provedor de IA
+
+Cada provedor do AIService tem um `ProviderHealth` que:
+- Mantém médias móveis exponenciais (EWMA) de latência e taxa de erro
+- Abre o circuito após falhas consecutivas ou taxa de erro alta, deixando
+  o provedor fora da rotação até o tempo de recuperação
+- Após a recuperação, libera uma única requisição de teste (half-open)
+- Registra um histograma de latência usado para o prazo de hedging (p95)
+"""
+
+import bisect
+import logging
+import time
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """Estados do circuit breaker"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class LatencyHistogram:
+    """
+    Histograma de latência com buckets fixos (em ms)
+
+    Memória constante; percentis retornam o limite superior do bucket.
+    """
+
+    DEFAULT_BUCKETS_MS = (50, 100, 250, 500, 750, 1000, 1500, 2000, 3000,
+                          5000, 8000, 12000, 20000, 30000, 60000)
+
+    def __init__(self, buckets_ms: Optional[List[float]] = None):
+        """
+        Args:
+            buckets_ms: Limites superiores dos buckets, em ordem crescente
+        """
+        self.buckets_ms = list(buckets_ms or self.DEFAULT_BUCKETS_MS)
+        # Último bucket acumula valores acima do maior limite
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        """Registra uma amostra"""
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Percentil aproximado
+
+        Args:
+            p: Percentil entre 0 e 100
+
+        Returns:
+            Limite superior do bucket que contém o percentil, ou None sem amostras
+        """
+        if self.total == 0:
+            return None
+
+        rank = max(1, round(self.total * p / 100))
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self.buckets_ms[-1]
+        return self.buckets_ms[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Contagens por bucket e percentis principais"""
+        labels = [f"le_{int(b)}" for b in self.buckets_ms] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99)
+        }
+
+
+class ProviderHealth:
+    """
+    Circuit breaker de um provedor com EWMA de latência e erros
+    """
+
+    def __init__(self,
+                 name: str,
+                 failure_threshold: int = 5,
+                 error_rate_threshold: float = 0.5,
+                 recovery_seconds: float = 30.0,
+                 ewma_alpha: float = 0.2,
+                 min_samples: int = 10):
+        """
+        Args:
+            name: Nome do provedor
+            failure_threshold: Falhas consecutivas que abrem o circuito
+            error_rate_threshold: Taxa de erro (EWMA) que abre o circuito
+            recovery_seconds: Tempo com o circuito aberto antes do teste
+            ewma_alpha: Peso da amostra mais recente nas médias móveis
+            min_samples: Amostras mínimas para avaliar taxa de erro e p95
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.recovery_seconds = recovery_seconds
+        self.ewma_alpha = ewma_alpha
+        self.min_samples = min_samples
+
+        self.state = CircuitState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+        self.consecutive_failures = 0
+        self.samples = 0
+        self.latency_ewma_ms: Optional[float] = None
+        self.error_ewma = 0.0
+        self.histogram = LatencyHistogram()
+
+        self.stats = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0
+        }
+
+    def allow_request(self) -> bool:
+        """
+        Verifica se o provedor pode receber uma requisição
+
+        Com o circuito aberto, após `recovery_seconds` libera uma única
+        requisição de teste; o resultado dela fecha ou reabre o circuito.
+        """
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                self.stats["rejected"] += 1
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self.probe_in_flight = False
+
+        # HALF_OPEN: apenas uma requisição de teste por vez
+        if self.probe_in_flight:
+            self.stats["rejected"] += 1
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """Libera a requisição de teste sem resultado (ex.: cancelada pelo hedging)"""
+        self.probe_in_flight = False
+
+    def _update_ewma(self, latency_ms: Optional[float], error: float) -> None:
+        self.samples += 1
+        self.error_ewma += self.ewma_alpha * (error - self.error_ewma)
+        if latency_ms is not None:
+            if self.latency_ewma_ms is None:
+                self.latency_ewma_ms = latency_ms
+            else:
+                self.latency_ewma_ms += self.ewma_alpha * (latency_ms - self.latency_ewma_ms)
+
+    def record_success(self, latency_ms: Optional[float] = None) -> None:
+        """
+        Registra resposta bem-sucedida
+
+        Args:
+            latency_ms: Latência da chamada (None quando não comparável, ex.: stream)
+        """
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        self._update_ewma(latency_ms, 0.0)
+        if latency_ms is not None:
+            self.histogram.record(latency_ms)
+
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuito de {self.name} fechado")
+        self.state = CircuitState.CLOSED
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self, latency_ms: Optional[float] = None) -> None:
+        """
+        Registra falha (erro ou timeout) e abre o circuito se necessário
+
+        Args:
+            latency_ms: Tempo até a falha
+        """
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        self._update_ewma(latency_ms, 1.0)
+
+        should_open = (
+            self.state == CircuitState.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+            or (self.samples >= self.min_samples and self.error_ewma >= self.error_rate_threshold)
+        )
+        if should_open:
+            self._open()
+
+    def _open(self) -> None:
+        if self.state != CircuitState.OPEN:
+            self.stats["opened"] += 1
+            logger.warning(
+                f"Circuito de {self.name} aberto por {self.recovery_seconds}s "
+                f"(falhas consecutivas: {self.consecutive_failures}, "
+                f"taxa de erro: {self.error_ewma:.2f})"
+            )
+        self.state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def hedge_delay_seconds(self, default_seconds: float,
+                            min_seconds: float = 0.0,
+                            max_seconds: Optional[float] = None) -> float:
+        """
+        Prazo antes de disparar a requisição de backup (hedging)
+
+        Usa o p95 do histograma quando há amostras suficientes.
+
+        Args:
+            default_seconds: Prazo sem histórico suficiente
+            min_seconds: Prazo mínimo
+            max_seconds: Prazo máximo (opcional)
+
+        Returns:
+            Prazo em segundos
+        """
+        p95 = self.histogram.percentile(95) if self.histogram.total >= self.min_samples else None
+        delay = p95 / 1000 if p95 is not None else default_seconds
+        delay = max(delay, min_seconds)
+        if max_seconds is not None:
+            delay = min(delay, max_seconds)
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estado do circuito, médias móveis e histograma"""
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma_ms": round(self.latency_ewma_ms, 2) if self.latency_ewma_ms is not None else None,
+            "error_rate_ewma": round(self.error_ewma, 4),
+            "latency": self.histogram.to_dict(),
+            **self.stats
+        }
@@ -0,0 +1,168 @@
+"""
+Service Container - Ciclo de vida dos serviços compartilhados do processo
+
+Centraliza a criação (startup) e a finalização (shutdown) dos serviços que
+devem existir uma única vez por worker: SICCService e seus sub-serviços,
+modelo de embeddings, caches, cliente de IA e o pool Supabase.
+
+Os handlers obtêm os serviços pelo container (ou pelos singletons
+`get_*_service()`), nunca instanciando-os por requisição.
+"""
+import os
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+import structlog
+
+if TYPE_CHECKING:
+    from .sicc.sicc_service import SICCService
+
+logger = structlog.get_logger(__name__)
+
+
+class ServiceContainer:
+    """
+    Container de serviços com escopo de processo
+
+    `startup` e `shutdown` são idempotentes e chamados pelo lifespan da
+    aplicação FastAPI.
+    """
+
+    def __init__(self, preload_embedding_model: Optional[bool] = None):
+        """
+        Args:
+            preload_embedding_model: Carregar o modelo de embeddings no startup
+                (padrão: env SICC_PRELOAD_EMBEDDING_MODEL, "true")
+        """
+        if preload_embedding_model is None:
+            preload_embedding_model = os.getenv("SICC_PRELOAD_EMBEDDING_MODEL", "true").lower() == "true"
+        self.preload_embedding_model = preload_embedding_model
+        self.started = False
+
+    @property
+    def sicc(self) -> 'SICCService':
+        """SICCService compartilhado do processo"""
+        from .sicc.sicc_service import get_sicc_service
+        return get_sicc_service()
+
+    async def startup(self) -> None:
+        """Inicializa os serviços compartilhados uma única vez"""
+        if self.started:
+            return
+
+        logger.info("Inicializando serviços compartilhados")
+
+        sicc = self.sicc
+        if not await sicc.initialize():
+            # process_message tentará novamente sob demanda
+            logger.warning("SICC não inicializado no startup")
+
+        if self.preload_embedding_model:
+            try:
+                await sicc.memory_service._get_embedding_model()
+            except Exception as e:
+                logger.warning(f"Falha ao pré-carregar modelo de embeddings: {e}")
+
+        # Eventos de auditoria que ficaram em disco na execução anterior
+        try:
+            from .automation.audit import start_audit_service
+            await start_audit_service()
+        except Exception as e:
+            logger.warning(f"Falha ao iniciar pipeline de auditoria: {e}")
+
+        self.started = True
+        logger.info("Serviços compartilhados prontos")
+
+    async def shutdown(self) -> None:
+        """Finaliza os serviços na ordem inversa de dependência"""
+        from .sicc.sicc_service import _sicc_service_instance
+        from .sicc.memory_service import shutdown_memory_service
+        from .supabase_pool import close_supabase_pool
+
+        logger.info("Finalizando serviços compartilhados")
+
+        # SICC primeiro: encerra conversas ativas e workers assíncronos
+        if _sicc_service_instance is not None:
+            try:
+                await _sicc_service_instance.shutdown()
+            except Exception as e:
+                logger.warning(f"Erro ao finalizar SICCService: {e}")
+
+        # Checkpoints do grafo ainda não gravados
+        try:
+            from ..graph.checkpointer import shutdown_checkpointer
+            await shutdown_checkpointer()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar checkpointer: {e}")
+
+        # Logs de execução de automações pendentes
+        try:
+            from .automation.rules_executor import shutdown_rules_executor
+            await shutdown_rules_executor()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar RulesExecutor: {e}")
+
+        # Eventos de auditoria pendentes (gravados ou transbordados para o disco)
+        try:
+            from .automation.audit import shutdown_audit_service
+            await shutdown_audit_service()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar AuditService: {e}")
+
+        # Cache das automações (expiração em background e conexão Redis)
+        try:
+            from .automation.performance import shutdown_cache_manager
+            await shutdown_cache_manager()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar CacheManager: {e}")
+
+        # Pool HTTP dos provedores de IA
+        try:
+            from .ai_service import shutdown_ai_service
+            await shutdown_ai_service()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar AIService: {e}")
+
+        # Exemplos rotulados do classificador de intent ainda não gravados
+        try:
+            from .sicc.intent_classifier import shutdown_intent_classifier
+            await shutdown_intent_classifier()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar IntentClassifier: {e}")
+
+        # Boosts de relevância pendentes e cache de embeddings
+        try:
+            await shutdown_memory_service()
+        except Exception as e:
+            logger.warning(f"Erro ao finalizar MemoryService: {e}")
+
+        # Conexões por último, após os flushes
+        try:
+            await close_supabase_pool()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar pool Supabase: {e}")
+
+        self.started = False
+        logger.info("Serviços compartilhados finalizados")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna estado do container"""
+        from .sicc.sicc_service import _sicc_service_instance
+        return {
+            "started": self.started,
+            "sicc_initialized": bool(_sicc_service_instance and _sicc_service_instance.is_initialized),
+            "active_conversations": (
+                len(_sicc_service_instance.active_conversations) if _sicc_service_instance else 0
+            )
+        }
+
+
+# Singleton instance
+_service_container: Optional[ServiceContainer] = None
+
+
+def get_service_container() -> ServiceContainer:
+    """Obtém instância singleton do ServiceContainer"""
+    global _service_container
+    if _service_container is None:
+        _service_container = ServiceContainer()
+    return _service_container
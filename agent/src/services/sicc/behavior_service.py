@@ -40,6 +40,8 @@ except ImportError:
     from ..supabase_client import get_supabase_client
     from ..ai_service import get_ai_service, AIProvider
 
+from .pattern_index import PatternIndex, DEFAULT_SUCCESS_RATE
+
 # Importações locais para evitar circular imports
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -111,6 +113,12 @@ class BehaviorService:
         self.template_cache = {}  # Cache de templates
         self.pattern_usage_tracking = True  # Rastrear uso de padrões
         
+        # Índice vetorizado de padrões aprovados
+        self.pattern_index = PatternIndex()
+        self.pattern_index_ttl_seconds = int(os.getenv("PATTERN_INDEX_TTL_SECONDS", "300"))
+        self._pattern_index_synced_at: Optional[datetime] = None
+        self._pattern_index_lock = asyncio.Lock()
+        
         logger.info("BehaviorService inicializado")
     
     @property
@@ -152,38 +160,42 @@ class BehaviorService:
         try:
             logger.info(f"Buscando padrões aplicáveis para mensagem: {message[:50]}...")
             
-            # 1. Buscar padrões aprovados no banco
-            approved_patterns = await self._get_approved_patterns()
+            # 1. Garantir índice de padrões aprovados sincronizado
+            await self._ensure_pattern_index()
             
-            if not approved_patterns:
+            if len(self.pattern_index) == 0:
                 logger.info("Nenhum padrão aprovado encontrado")
                 return []
             
-            # 2. Calcular relevância de cada padrão para o contexto atual
+            # 2. Pontuar todos os padrões de uma vez (produto matricial + top-k)
+            query_embedding = await self._get_message_embedding(message)
+            top_patterns = self.pattern_index.top_k(
+                query_embedding,
+                message,
+                context,
+                min_relevance=self.min_relevance_threshold,
+                k=self.max_patterns_per_search
+            )
+            
             applicable_patterns = []
             
-            for pattern in approved_patterns:
-                relevance_score = await self._calculate_pattern_relevance(
+            for pattern, relevance_score in top_patterns:
+                # 3. Buscar template associado (se houver)
+                template = await self._get_pattern_template(pattern)
+                
+                # 4. Preparar contexto de aplicação
+                application_context = await self._prepare_application_context(
                     pattern, message, context
                 )
                 
-                if relevance_score >= self.min_relevance_threshold:
-                    # 3. Buscar template associado (se houver)
-                    template = await self._get_pattern_template(pattern)
-                    
-                    # 4. Preparar contexto de aplicação
-                    application_context = await self._prepare_application_context(
-                        pattern, message, context
-                    )
-                    
-                    applicable_pattern = ApplicablePattern(
-                        pattern=pattern,
-                        relevance_score=relevance_score,
-                        template=template,
-                        application_context=application_context
-                    )
-                    
-                    applicable_patterns.append(applicable_pattern)
+                applicable_pattern = ApplicablePattern(
+                    pattern=pattern,
+                    relevance_score=relevance_score,
+                    template=template,
+                    application_context=application_context
+                )
+                
+                applicable_patterns.append(applicable_pattern)
             
             # 5. Priorizar padrões
             prioritized_patterns = await self.prioritize_patterns(applicable_patterns)
@@ -352,6 +364,109 @@ class BehaviorService:
             logger.error(f"Erro ao adaptar resposta: {e}")
             return template  # Retornar template original em caso de erro
     
+    async def refresh_pattern_index(self) -> int:
+        """
+        Sincroniza o índice com os padrões aprovados no banco
+        
+        Apenas padrões novos ou alterados têm o trigger re-embeddado (em um
+        único lote); padrões que deixaram de estar aprovados são removidos.
+        
+        Returns:
+            Número de padrões no índice após a sincronização
+        """
+        async with self._pattern_index_lock:
+            approved_patterns = await self._get_approved_patterns()
+            approved_ids = {p.id for p in approved_patterns}
+            
+            for pattern_id in self.pattern_index.ids():
+                if pattern_id not in approved_ids:
+                    self.pattern_index.remove(pattern_id)
+            
+            changed = []
+            for pattern in approved_patterns:
+                entry = self.pattern_index.get(pattern.id)
+                if (entry is None
+                        or entry.pattern.trigger != pattern.trigger
+                        or entry.pattern.last_seen != pattern.last_seen):
+                    changed.append(pattern)
+            
+            embeddings = await self._embed_triggers(changed)
+            for pattern, embedding in zip(changed, embeddings):
+                self.pattern_index.upsert(pattern, embedding)
+            
+            success_rates = await self._get_pattern_success_rates(list(approved_ids))
+            self.pattern_index.update_success_rates(success_rates)
+            
+            self._pattern_index_synced_at = datetime.utcnow()
+            logger.debug(
+                f"Índice de padrões sincronizado: {len(self.pattern_index)} padrões, "
+                f"{len(changed)} atualizados"
+            )
+            return len(self.pattern_index)
+    
+    async def index_pattern(self, pattern: Any) -> None:
+        """
+        Adiciona ou atualiza um padrão recém-aprovado no índice
+        
+        Args:
+            pattern: Objeto Pattern aprovado
+        """
+        try:
+            embeddings = await self._embed_triggers([pattern])
+            success_rates = await self._get_pattern_success_rates([pattern.id])
+            self.pattern_index.upsert(
+                pattern, embeddings[0], success_rates.get(pattern.id, DEFAULT_SUCCESS_RATE)
+            )
+            logger.debug(f"Padrão {pattern.id} adicionado ao índice")
+        except Exception as e:
+            logger.warning(f"Erro ao indexar padrão {getattr(pattern, 'id', None)}: {e}")
+    
+    def remove_pattern_from_index(self, pattern_id: str) -> bool:
+        """
+        Remove padrão rejeitado ou desativado do índice
+        
+        Args:
+            pattern_id: ID do padrão
+            
+        Returns:
+            True se o padrão estava indexado
+        """
+        self.template_cache.pop(f"template_{pattern_id}", None)
+        return self.pattern_index.remove(pattern_id)
+    
+    async def _ensure_pattern_index(self) -> None:
+        """Sincroniza o índice se ainda não carregado ou expirado"""
+        synced_at = self._pattern_index_synced_at
+        if synced_at is None or (
+            datetime.utcnow() - synced_at
+        ).total_seconds() >= self.pattern_index_ttl_seconds:
+            await self.refresh_pattern_index()
+    
+    async def _embed_triggers(self, patterns: List[Any]) -> List[Optional[List[float]]]:
+        """Gera embeddings dos triggers em lote (None quando indisponível)"""
+        if not patterns:
+            return []
+        
+        valid = [p for p in patterns if p.trigger and p.trigger.strip()]
+        embeddings_by_id: Dict[str, List[float]] = {}
+        
+        if valid and hasattr(self.memory_service, "generate_embeddings"):
+            try:
+                embeddings = await self.memory_service.generate_embeddings([p.trigger for p in valid])
+                embeddings_by_id = {p.id: e for p, e in zip(valid, embeddings)}
+            except Exception as e:
+                logger.warning(f"Erro ao gerar embeddings dos triggers: {e}")
+        
+        return [embeddings_by_id.get(p.id) for p in patterns]
+    
+    async def _get_message_embedding(self, message: str) -> Optional[List[float]]:
+        """Gera embedding da mensagem (None desativa a similaridade vetorial)"""
+        try:
+            return await self.memory_service.generate_embedding(message)
+        except Exception as e:
+            logger.warning(f"Erro ao gerar embedding da mensagem: {e}")
+            return None
+    
     # Métodos auxiliares privados
     
     async def _get_approved_patterns(self) -> List[Any]:
@@ -514,21 +629,34 @@ class BehaviorService:
     
     async def _get_pattern_success_rate(self, pattern_id: str) -> float:
         """Obtém taxa de sucesso do padrão baseada em métricas"""
+        success_rates = await self._get_pattern_success_rates([pattern_id])
+        # Se não há métricas, assumir taxa neutra
+        return success_rates.get(pattern_id, DEFAULT_SUCCESS_RATE)
+    
+    async def _get_pattern_success_rates(self, pattern_ids: List[str]) -> Dict[str, float]:
+        """
+        Obtém a taxa de sucesso mais recente de vários padrões em uma consulta
+        
+        A RPC `get_pattern_success_rates` retorna uma linha por padrão
+        (DISTINCT ON no banco), sem sujeitar o resultado ao limite de linhas.
+        """
+        if not pattern_ids:
+            return {}
+        
         try:
-            # Buscar métricas de performance do padrão
-            result = self.supabase.table("agent_performance_metrics").select(
-                "success_rate"
-            ).eq("pattern_id", pattern_id).order("created_at", desc=True).limit(1).execute()
-            
-            if result.data and len(result.data) > 0:
-                return result.data[0]["success_rate"]
-            
-            # Se não há métricas, assumir taxa neutra
-            return 0.7
+            result = self.supabase.rpc(
+                "get_pattern_success_rates", {"p_pattern_ids": list(pattern_ids)}
+            ).execute()
+            
+            return {
+                row["pattern_id"]: row["success_rate"]
+                for row in result.data or []
+                if row.get("success_rate") is not None
+            }
             
         except Exception as e:
-            logger.warning(f"Erro ao obter taxa de sucesso do padrão: {e}")
-            return 0.7
+            logger.warning(f"Erro ao obter taxas de sucesso dos padrões: {e}")
+            return {}
     
     async def _get_pattern_template(self, pattern: Any) -> Optional[Dict[str, Any]]:
         """Busca template associado ao padrão"""
@@ -0,0 +1,315 @@
+"""
+Embedding Cache - SICC
+
+Cache LRU de embeddings indexado por nome do modelo + hash do texto normalizado.
+
+Camadas:
+- Memória: OrderedDict limitado por número de entradas (LRU)
+- Disco (opcional): array float32 memory-mapped + arquivo de chaves, que
+  sobrevivem a reinícios do processo
+
+Contadores de hit, miss e eviction são reportados ao MetricsService.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..metrics_service import get_metrics_service
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+KEY_BYTES = 16
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza texto para composição da chave (NFC + espaços colapsados)"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class DiskEmbeddingStore:
+    """
+    Camada persistente do cache de embeddings
+
+    Arquivos (por modelo):
+    - <nome>.vectors.f32: matriz float32 (capacity x dimensions) memory-mapped
+    - <nome>.keys.bin: digest de 16 bytes da chave gravada em cada slot
+    - <nome>.meta.json: dimensões, capacidade e próximo slot de escrita
+
+    Os slots são reaproveitados em ordem circular. O digest gravado em cada
+    slot é conferido na leitura, então um índice desatualizado nunca devolve
+    o vetor de outra chave.
+    """
+
+    def __init__(self, directory: str, model_name: str, dimensions: int,
+                 capacity: int = 100000, flush_every: int = 100):
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self._writes_since_flush = 0
+
+        os.makedirs(directory, exist_ok=True)
+        base_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self._vectors_path = os.path.join(directory, f"{base_name}.vectors.f32")
+        self._keys_path = os.path.join(directory, f"{base_name}.keys.bin")
+        self._meta_path = os.path.join(directory, f"{base_name}.meta.json")
+
+        meta = self._load_meta()
+        reuse = (
+            meta is not None
+            and meta.get("dimensions") == dimensions
+            and meta.get("capacity") == capacity
+            and os.path.exists(self._vectors_path)
+            and os.path.exists(self._keys_path)
+        )
+        mode = "r+" if reuse else "w+"
+
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dimensions)
+        )
+        self._keys = np.memmap(
+            self._keys_path, dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES)
+        )
+        self._next_slot = int(meta.get("next_slot", 0)) % capacity if reuse else 0
+
+        # Reconstruir índice digest -> slot a partir do arquivo de chaves
+        self._index: Dict[bytes, int] = {}
+        if reuse:
+            for slot in np.flatnonzero(self._keys.any(axis=1)):
+                self._index[self._keys[slot].tobytes()] = int(slot)
+        else:
+            self.flush()
+
+        logger.info(
+            f"Cache de embeddings em disco pronto: {len(self._index)} entradas "
+            f"({self._vectors_path})"
+        )
+
+    def _load_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, digest: bytes) -> Optional[np.ndarray]:
+        """Busca vetor pelo digest da chave"""
+        slot = self._index.get(digest)
+        if slot is None:
+            return None
+        if self._keys[slot].tobytes() != digest:
+            del self._index[digest]
+            return None
+        return np.array(self._vectors[slot], dtype=np.float32)
+
+    def put(self, digest: bytes, vector: np.ndarray) -> bool:
+        """
+        Grava vetor no próximo slot circular
+
+        Returns:
+            True se uma entrada existente foi sobrescrita (eviction)
+        """
+        if digest in self._index:
+            return False
+
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.capacity
+
+        previous = self._keys[slot].tobytes()
+        evicted = previous in self._index and self._index[previous] == slot
+        if evicted:
+            del self._index[previous]
+
+        # Limpar chave antes de escrever o vetor: um crash no meio da escrita
+        # deixa o slot vazio em vez de associado a um vetor parcial
+        self._keys[slot] = 0
+        self._vectors[slot] = vector
+        self._keys[slot] = np.frombuffer(digest, dtype=np.uint8)
+        self._index[digest] = slot
+
+        self._writes_since_flush += 1
+        if self._writes_since_flush >= self.flush_every:
+            self.flush()
+
+        return evicted
+
+    def flush(self) -> None:
+        """Persiste vetores, chaves e metadados"""
+        self._vectors.flush()
+        self._keys.flush()
+
+        meta = {
+            "dimensions": self.dimensions,
+            "capacity": self.capacity,
+            "next_slot": self._next_slot
+        }
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+        self._writes_since_flush = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class EmbeddingCache:
+    """
+    Cache LRU de embeddings com camada opcional em disco
+
+    A chave é o hash (blake2b, 16 bytes) de `model_name + texto normalizado`,
+    então trocar de modelo nunca reaproveita vetores antigos.
+    """
+
+    METRICS_SERVICE_NAME = "embedding"
+
+    def __init__(self, model_name: str, dimensions: int, max_entries: int = 10000,
+                 disk_dir: Optional[str] = None, disk_capacity: int = 100000):
+        """
+        Inicializa o cache
+
+        Args:
+            model_name: Nome do modelo de embedding (faz parte da chave)
+            dimensions: Dimensões dos vetores
+            max_entries: Máximo de entradas na camada em memória
+            disk_dir: Diretório da camada em disco (None desativa)
+            disk_capacity: Máximo de entradas na camada em disco
+        """
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = get_metrics_service()
+
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_evictions": 0
+        }
+
+        self._disk: Optional[DiskEmbeddingStore] = None
+        if disk_dir:
+            try:
+                self._disk = DiskEmbeddingStore(disk_dir, model_name, dimensions, disk_capacity)
+            except Exception as e:
+                logger.warning(f"Cache de embeddings em disco desativado: {e}")
+
+    def make_key(self, text: str) -> bytes:
+        """Gera digest da chave para um texto"""
+        raw = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=KEY_BYTES).digest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Busca embedding em cache
+
+        Args:
+            text: Texto original
+
+        Returns:
+            Vetor float32 normalizado ou None em caso de miss
+        """
+        start_time = time.time()
+        key = self.make_key(text)
+        operation = "miss"
+
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                operation = "hit"
+            elif self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    operation = "hit"
+                    self._store_in_memory(key, vector)
+
+            if vector is None:
+                self.stats["misses"] += 1
+
+        self._report(operation, key, start_time)
+        return vector
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        """
+        Armazena embedding nas camadas de memória e disco
+
+        Args:
+            text: Texto original
+            vector: Vetor normalizado
+        """
+        start_time = time.time()
+        key = self.make_key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+
+        with self._lock:
+            self._store_in_memory(key, vector)
+
+            if self._disk is not None:
+                try:
+                    if self._disk.put(key, vector):
+                        self.stats["disk_evictions"] += 1
+                        self._report("evict", key, None)
+                except Exception as e:
+                    logger.warning(f"Erro ao gravar embedding em disco: {e}")
+
+        self._report("set", key, start_time)
+
+    def _store_in_memory(self, key: bytes, vector: np.ndarray) -> None:
+        """Insere na camada em memória aplicando LRU (chamar com lock)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_entries:
+            evicted_key, _ = self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+            self._report("evict", evicted_key, None)
+
+    def _report(self, operation: str, key: bytes, start_time: Optional[float]) -> None:
+        """Reporta operação ao MetricsService"""
+        duration_ms = (time.time() - start_time) * 1000 if start_time else 0.0
+        self._metrics.record_cache_metric(
+            service=self.METRICS_SERVICE_NAME,
+            operation=operation,
+            key=key.hex()[:12],
+            duration_ms=duration_ms
+        )
+
+    def flush(self) -> None:
+        """Persiste a camada em disco (se ativa)"""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.flush()
+
+    def clear(self) -> None:
+        """Limpa a camada em memória"""
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache"""
+        with self._lock:
+            stats = dict(self.stats)
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / total if total else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = len(self._disk) if self._disk is not None else 0
+            stats["disk_enabled"] = self._disk is not None
+        return stats
@@ -0,0 +1,173 @@
+"""
+Embedding Engine - SICC
+
+Agrupa pedidos concorrentes de embedding em micro-lotes para que o modelo
+SentenceTransformer execute um único `encode` por lote, em vez de um por texto.
+Textos idênticos dentro do mesmo lote são codificados apenas uma vez.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingEngine:
+    """
+    Motor de embeddings com micro-batching e deduplicação
+
+    Funcionamento:
+    - Cada chamada registra seus textos em um lote pendente
+    - O lote é enviado ao modelo quando atinge `max_batch_size` textos únicos
+      ou após `max_wait_ms` milissegundos, o que ocorrer primeiro
+    - Os vetores retornados já estão normalizados (norma L2 = 1)
+    """
+
+    def __init__(self, model_loader: Callable[[], Awaitable[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Inicializa o motor de embeddings
+
+        Args:
+            model_loader: Corrotina que retorna o modelo SentenceTransformer carregado
+            max_batch_size: Máximo de textos únicos por chamada ao modelo
+            max_wait_ms: Tempo máximo de espera para completar um lote
+        """
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size deve ser maior que zero")
+
+        self._model_loader = model_loader
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000.0
+
+        # Texto normalizado -> futures aguardando o resultado
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running_batches: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "encoded_texts": 0,
+            "deduplicated": 0
+        }
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Gera embedding normalizado para um único texto
+
+        Args:
+            text: Texto a ser codificado
+
+        Returns:
+            Vetor numpy float32 normalizado
+        """
+        results = await self.encode_many([text])
+        return results[0]
+
+    async def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Gera embeddings normalizados para vários textos
+
+        Args:
+            texts: Lista de textos (a ordem do resultado acompanha a entrada)
+
+        Returns:
+            Lista de vetores numpy float32 normalizados
+        """
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+        futures = []
+
+        for text in texts:
+            key = text.strip()
+            future = loop.create_future()
+            waiters = self._pending.get(key)
+            if waiters is None:
+                self._pending[key] = [future]
+            else:
+                waiters.append(future)
+                self.stats["deduplicated"] += 1
+            futures.append(future)
+
+        self.stats["requests"] += len(texts)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_seconds, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self) -> None:
+        """Despacha o lote pendente para execução no modelo"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = {}
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._running_batches.add(task)
+        task.add_done_callback(self._running_batches.discard)
+
+    async def _run_batch(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        """Executa um único encode para todos os textos únicos do lote"""
+        texts = list(batch.keys())
+
+        try:
+            model = await self._model_loader()
+
+            loop = asyncio.get_running_loop()
+            raw = await loop.run_in_executor(
+                None,
+                lambda: model.encode(texts, batch_size=self.max_batch_size)
+            )
+
+            matrix = np.asarray(raw, dtype=np.float32)
+            if matrix.ndim == 1:
+                matrix = matrix.reshape(1, -1)
+
+            if matrix.shape[0] != len(texts):
+                raise RuntimeError(
+                    f"Modelo retornou {matrix.shape[0]} embeddings para {len(texts)} textos"
+                )
+
+            # Normalizar para busca por similaridade coseno
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+
+            self.stats["batches"] += 1
+            self.stats["encoded_texts"] += len(texts)
+            logger.debug(f"Lote de embeddings processado: {len(texts)} textos únicos")
+
+            for row, text in zip(matrix, texts):
+                for future in batch[text]:
+                    if not future.done():
+                        future.set_result(row)
+
+        except Exception as e:
+            logger.error(f"Erro ao processar lote de embeddings: {e}")
+            for waiters in batch.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso do motor"""
+        stats = dict(self.stats)
+        stats["avg_batch_size"] = (
+            stats["encoded_texts"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        stats["pending"] = len(self._pending)
+        return stats
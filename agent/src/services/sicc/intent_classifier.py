@@ -0,0 +1,518 @@
+"""
+Intent Classifier - SICC
+
+Classificação local da intenção da mensagem (discovery | sales | support)
+usada pelo sicc_lookup_node antes de recorrer ao LLM.
+
+Camadas, da mais barata para a mais cara:
+1. Regras: palavras-chave/regex por intenção; responde quando só uma
+   intenção casa com a mensagem
+2. Centroides: embedding MiniLM da mensagem (o mesmo da busca de memórias,
+   servido pelo EmbeddingCache) comparado ao centroide de cada intenção,
+   treinado com turnos rotulados em sicc_intent_examples
+3. LLM: apenas quando as camadas locais não atingem a confiança mínima;
+   a resposta vira um novo exemplo rotulado (tabela e centroides)
+
+Os exemplos são textos de clientes: cada tenant treina seus centroides só
+com os próprios exemplos mais os compartilhados (tenant_id NULL, rótulos
+manuais), e exemplos do LLM são removidos após a retenção configurada.
+O re-treino periódico só relê e re-embeda os exemplos quando há exemplo
+mais novo que o último treino.
+"""
+
+import asyncio
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Set, Tuple
+
+import numpy as np
+import structlog
+
+from ..supabase_pool import get_supabase_pool
+
+logger = structlog.get_logger(__name__)
+
+INTENTS = ("discovery", "sales", "support")
+DEFAULT_INTENT = "discovery"
+
+# Temperatura do softmax sobre as similaridades de cosseno aos centroides
+CENTROID_TEMPERATURE = 0.05
+
+# Regras por intenção (texto normalizado: minúsculas, sem acentos)
+_RULES: Dict[str, List[Pattern]] = {
+    "support": [
+        re.compile(r"\b(garantia|defeit\w*|troca[rs]?|trocar|devolu\w*|devolver|reembols\w*|estorn\w*)\b"),
+        re.compile(r"\b(rastre\w*|nao chegou|ainda nao recebi|atras\w*|reclama\w*|quebr\w*|rasg\w*|assistencia)\b"),
+        re.compile(r"\b(meu pedido|numero do pedido|nota fiscal|cancelar (o |meu )?pedido)\b"),
+    ],
+    "sales": [
+        re.compile(r"\b(preco|precos|valor|valores|quanto custa|quanto fica|quanto sai|quanto e)\b"),
+        re.compile(r"\b(comprar|compro|quero o|quero um|fechar|parcel\w*|desconto|promoc\w*|orcamento)\b"),
+        re.compile(r"\b(pix|boleto|cartao|a vista|link de pagamento)\b"),
+    ],
+    "discovery": [
+        re.compile(r"^(oi|ola|opa|bom dia|boa tarde|boa noite|e ai|tudo bem|tudo bom)([\s,!.?]+(oi|ola|tudo bem|tudo bom))*[\s,!.?]*$"),
+        re.compile(r"\b(como funciona|quero conhecer|quero saber mais|me explica|o que e)\b"),
+    ],
+}
+
+RULE_CONFIDENCE = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados (entrada das regras)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(without_accents.split())
+
+
+@dataclass
+class IntentResult:
+    """Intenção classificada e a camada que respondeu"""
+    intent: str
+    tier: str
+    confidence: float
+
+
+@dataclass
+class _TenantCentroids:
+    """Centroides de intenção de um tenant (exemplos do tenant + compartilhados)"""
+    # Soma dos embeddings normalizados e contagem por intenção
+    sums: Dict[str, np.ndarray] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+    centroids: Optional[np.ndarray] = None
+    intents: List[str] = field(default_factory=list)
+    trained_at: Optional[datetime] = None
+    # created_at do exemplo mais recente usado no último treino
+    newest_example_at: Optional[str] = None
+    training_task: Optional[asyncio.Task] = None
+
+
+class IntentClassifier:
+    """
+    Classificador de intenção em camadas (regras → centroides → LLM)
+
+    Características:
+    - Regras e centroides não fazem I/O além do embedding da mensagem
+    - Centroides por tenant, treinados em background a partir de
+      sicc_intent_examples (a classificação nunca espera o treino; até lá,
+      só regras e LLM)
+    - Respostas do LLM atualizam os centroides na hora e são gravadas como
+      exemplos rotulados fora do caminho crítico
+    - Estatísticas de quantas vezes cada camada respondeu (`get_stats`)
+    """
+
+    EXAMPLES_TABLE = "sicc_intent_examples"
+
+    def __init__(self,
+                 memory_service: Any = None,
+                 db: Any = None,
+                 min_confidence: Optional[float] = None,
+                 min_examples_per_intent: Optional[int] = None,
+                 max_training_examples: Optional[int] = None,
+                 refresh_seconds: Optional[int] = None,
+                 retention_days: Optional[int] = None,
+                 max_tenants: Optional[int] = None):
+        """
+        Inicializa o classificador
+
+        Args:
+            memory_service: Serviço de embeddings (padrão: get_memory_service())
+            db: Executor de acesso a dados (padrão: get_supabase_pool())
+            min_confidence: Confiança mínima dos centroides para dispensar o LLM
+                (padrão: env INTENT_CENTROID_MIN_CONFIDENCE)
+            min_examples_per_intent: Exemplos necessários para usar o centroide
+                de uma intenção (padrão: env INTENT_MIN_EXAMPLES_PER_INTENT)
+            max_training_examples: Exemplos mais recentes lidos no treino
+                (padrão: env INTENT_TRAINING_MAX_EXAMPLES)
+            refresh_seconds: Intervalo entre re-treinos a partir do banco
+                (padrão: env INTENT_CLASSIFIER_REFRESH_SECONDS)
+            retention_days: Dias de retenção dos exemplos gravados pelo LLM
+                (padrão: env INTENT_EXAMPLES_RETENTION_DAYS)
+            max_tenants: Máximo de tenants com centroides em memória; os menos
+                usados são descartados (padrão: env INTENT_CLASSIFIER_MAX_TENANTS)
+        """
+        self._memory_service = memory_service
+        self.db = db if db is not None else get_supabase_pool()
+
+        if min_confidence is None:
+            min_confidence = float(os.getenv("INTENT_CENTROID_MIN_CONFIDENCE", "0.6"))
+        if min_examples_per_intent is None:
+            min_examples_per_intent = int(os.getenv("INTENT_MIN_EXAMPLES_PER_INTENT", "10"))
+        if max_training_examples is None:
+            max_training_examples = int(os.getenv("INTENT_TRAINING_MAX_EXAMPLES", "2000"))
+        if refresh_seconds is None:
+            refresh_seconds = int(os.getenv("INTENT_CLASSIFIER_REFRESH_SECONDS", "3600"))
+        if retention_days is None:
+            retention_days = int(os.getenv("INTENT_EXAMPLES_RETENTION_DAYS", "90"))
+        if max_tenants is None:
+            max_tenants = int(os.getenv("INTENT_CLASSIFIER_MAX_TENANTS", "500"))
+        self.min_confidence = min_confidence
+        self.min_examples_per_intent = min_examples_per_intent
+        self.max_training_examples = max_training_examples
+        self.refresh_seconds = refresh_seconds
+        self.retention_days = retention_days
+        self.max_tenants = max_tenants
+
+        # Centroides por tenant, em ordem de uso (None = conversa sem tenant:
+        # só exemplos compartilhados)
+        self._tenants: "OrderedDict[Optional[int], _TenantCentroids]" = OrderedDict()
+        self._background: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "rules": 0,
+            "centroid": 0,
+            "llm": 0,
+            "default": 0,
+            "embedding_errors": 0,
+            "examples_recorded": 0,
+            "example_errors": 0,
+            "examples_purged": 0,
+            "trainings": 0,
+            "trainings_skipped": 0
+        }
+
+    @property
+    def memory_service(self):
+        """Lazy loading do MemoryService (evita import circular)"""
+        if self._memory_service is None:
+            from .memory_service import get_memory_service
+            self._memory_service = get_memory_service()
+        return self._memory_service
+
+    def _model(self, tenant_id: Optional[int]) -> _TenantCentroids:
+        """Centroides do tenant (criados vazios), descartando os tenants menos usados acima de max_tenants"""
+        model = self._tenants.get(tenant_id)
+        if model is None:
+            model = self._tenants[tenant_id] = _TenantCentroids()
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+        else:
+            self._tenants.move_to_end(tenant_id)
+        return model
+
+    # ------------------------------------------------------------------
+    # Camadas
+    # ------------------------------------------------------------------
+
+    def classify_rules(self, text: str) -> Optional[IntentResult]:
+        """
+        Camada de regras
+
+        Args:
+            text: Mensagem do usuário
+
+        Returns:
+            Resultado se exatamente uma intenção casou, senão None
+        """
+        normalized = normalize_text(text)
+        matched = [
+            intent for intent, patterns in _RULES.items()
+            if any(pattern.search(normalized) for pattern in patterns)
+        ]
+        if len(matched) != 1:
+            return None
+        return IntentResult(intent=matched[0], tier="rules", confidence=RULE_CONFIDENCE)
+
+    def classify_embedding(self, embedding: List[float],
+                           tenant_id: Optional[int] = None) -> Optional[IntentResult]:
+        """
+        Camada de centroides
+
+        Args:
+            embedding: Embedding da mensagem
+            tenant_id: Tenant cujos centroides são usados
+
+        Returns:
+            Intenção do centroide mais próximo (confiança = softmax das
+            similaridades) ou None se os centroides ainda não estão treinados
+        """
+        model = self._tenants.get(tenant_id)
+        if model is None or model.centroids is None:
+            return None
+        centroids, intents = model.centroids, model.intents
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+
+        similarities = centroids @ (vector / norm)
+        weights = np.exp((similarities - similarities.max()) / CENTROID_TEMPERATURE)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+        return IntentResult(intent=intents[best], tier="centroid", confidence=float(probabilities[best]))
+
+    async def classify(self, text: str,
+                       llm_fallback: Callable[[], Awaitable[Optional[str]]],
+                       tenant_id: Optional[int] = None) -> IntentResult:
+        """
+        Classifica a mensagem pela primeira camada confiante
+
+        Args:
+            text: Mensagem do usuário
+            llm_fallback: Classificação via LLM, chamada só se as camadas
+                locais não atingirem a confiança mínima (None em caso de erro)
+            tenant_id: Tenant da conversa (centroides e exemplo gravado)
+
+        Returns:
+            IntentResult com intenção, camada e confiança; camada "default"
+            (DEFAULT_INTENT) se o LLM falhar
+        """
+        model = self._model(tenant_id)
+        self._ensure_trained(tenant_id, model)
+
+        result = self.classify_rules(text)
+        if result is not None:
+            self.stats["rules"] += 1
+            return result
+
+        embedding = None
+        if model.centroids is not None:
+            try:
+                embedding = await self.memory_service.generate_embedding(text)
+                result = self.classify_embedding(embedding, tenant_id)
+            except Exception as e:
+                self.stats["embedding_errors"] += 1
+                logger.warning("Erro ao gerar embedding para classificação de intent", error=str(e))
+            if result is not None and result.confidence >= self.min_confidence:
+                self.stats["centroid"] += 1
+                return result
+
+        intent = await llm_fallback()
+        if intent not in INTENTS:
+            # Resposta inválida ou erro do LLM não vira exemplo rotulado
+            self.stats["default"] += 1
+            return IntentResult(intent=DEFAULT_INTENT, tier="default", confidence=0.0)
+
+        self.stats["llm"] += 1
+        self._spawn(self._learn(text, intent, embedding, tenant_id))
+        return IntentResult(intent=intent, tier="llm", confidence=1.0)
+
+    # ------------------------------------------------------------------
+    # Treino
+    # ------------------------------------------------------------------
+
+    def train(self, examples: List[Tuple[str, List[float]]], tenant_id: Optional[int] = None) -> int:
+        """
+        Recalcula os centroides de um tenant a partir de exemplos rotulados
+
+        Args:
+            examples: Lista de (intenção, embedding)
+            tenant_id: Tenant dos centroides
+
+        Returns:
+            Número de intenções com centroide utilizável
+        """
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+        for intent, embedding in examples:
+            if intent not in INTENTS:
+                continue
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            sums[intent] = sums.get(intent, 0) + vector / norm
+            counts[intent] = counts.get(intent, 0) + 1
+
+        model = self._model(tenant_id)
+        model.sums, model.counts = sums, counts
+        return self._compile(model)
+
+    def add_example(self, intent: str, embedding: List[float], tenant_id: Optional[int] = None) -> None:
+        """Soma um exemplo rotulado ao centroide da intenção do tenant (atualização incremental)"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if intent not in INTENTS or norm == 0:
+            return
+        model = self._model(tenant_id)
+        model.sums[intent] = model.sums.get(intent, 0) + vector / norm
+        model.counts[intent] = model.counts.get(intent, 0) + 1
+        self._compile(model)
+
+    def _compile(self, model: _TenantCentroids) -> int:
+        """Monta a matriz de centroides (exige ao menos duas intenções treinadas)"""
+        intents = [
+            intent for intent in INTENTS
+            if model.counts.get(intent, 0) >= self.min_examples_per_intent
+        ]
+        if len(intents) < 2:
+            model.centroids, model.intents = None, []
+            return 0
+
+        rows = []
+        for intent in intents:
+            centroid = model.sums[intent] / model.counts[intent]
+            rows.append(centroid / (np.linalg.norm(centroid) or 1.0))
+        model.centroids, model.intents = np.vstack(rows), intents
+        return len(intents)
+
+    def _ensure_trained(self, tenant_id: Optional[int], model: _TenantCentroids) -> None:
+        """Agenda o treino do tenant a partir do banco se ainda não feito ou expirado"""
+        if model.training_task is not None and not model.training_task.done():
+            return
+        trained_at = model.trained_at
+        if trained_at is not None and (
+            datetime.utcnow() - trained_at
+        ).total_seconds() < self.refresh_seconds:
+            return
+        model.training_task = self._spawn(self.refresh(tenant_id))
+
+    async def refresh(self, tenant_id: Optional[int] = None) -> int:
+        """
+        Treina os centroides do tenant com os exemplos mais recentes de
+        sicc_intent_examples (do tenant e compartilhados)
+
+        Consulta antes só o created_at do exemplo mais recente: sem exemplo
+        novo desde o último treino, mantém os centroides sem reler nem
+        re-embedar os exemplos.
+
+        Args:
+            tenant_id: Tenant a treinar (None = apenas exemplos compartilhados)
+
+        Returns:
+            Número de intenções com centroide utilizável
+        """
+        def query(columns: str, limit: int):
+            def build(c):
+                builder = c.table(self.EXAMPLES_TABLE).select(columns)
+                if tenant_id is None:
+                    builder = builder.is_("tenant_id", "null")
+                else:
+                    builder = builder.or_(f"tenant_id.eq.{int(tenant_id)},tenant_id.is.null")
+                return builder.order("created_at", desc=True).limit(limit)
+            return build
+
+        model = self._model(tenant_id)
+        try:
+            latest = await self.db.run(query("created_at", 1))
+            newest = (latest.data or [{}])[0].get("created_at")
+            if model.trained_at is not None and newest == model.newest_example_at:
+                self.stats["trainings_skipped"] += 1
+                logger.debug("Classificador de intent sem exemplos novos", tenant_id=tenant_id)
+                return len(model.intents)
+
+            response = await self.db.run(query("text, intent", self.max_training_examples))
+            rows = [row for row in response.data or [] if row.get("intent") in INTENTS and row.get("text")]
+            embeddings = await self.memory_service.generate_embeddings([row["text"] for row in rows]) if rows else []
+            trained = self.train([(row["intent"], embedding) for row, embedding in zip(rows, embeddings)], tenant_id)
+            self._model(tenant_id).newest_example_at = newest
+            self.stats["trainings"] += 1
+            logger.info(
+                "Classificador de intent treinado",
+                tenant_id=tenant_id, examples=len(rows), centroids=trained
+            )
+            return trained
+        except Exception as e:
+            logger.warning("Erro ao treinar classificador de intent", tenant_id=tenant_id, error=str(e))
+            return 0
+        finally:
+            # Falha também aguarda o intervalo (sem nova tentativa a cada mensagem)
+            self._model(tenant_id).trained_at = datetime.utcnow()
+
+    async def _learn(self, text: str, intent: str, embedding: Optional[List[float]],
+                     tenant_id: Optional[int] = None) -> None:
+        """Registra a resposta do LLM como exemplo rotulado do tenant (centroides e banco)"""
+        try:
+            if embedding is None:
+                embedding = await self.memory_service.generate_embedding(text)
+            self.add_example(intent, embedding, tenant_id)
+        except Exception as e:
+            self.stats["embedding_errors"] += 1
+            logger.warning("Erro ao gerar embedding do exemplo de intent", error=str(e))
+
+        try:
+            await self.db.run(
+                lambda c: c.table(self.EXAMPLES_TABLE).insert({
+                    "text": text,
+                    "intent": intent,
+                    "source": "llm",
+                    "tenant_id": tenant_id
+                })
+            )
+            self.stats["examples_recorded"] += 1
+        except Exception as e:
+            self.stats["example_errors"] += 1
+            logger.warning("Erro ao gravar exemplo de intent", tenant_id=tenant_id, error=str(e))
+
+    async def cleanup_old_examples(self, retention_days: Optional[int] = None) -> int:
+        """
+        Remove exemplos gravados pelo LLM mais antigos que a retenção
+
+        Args:
+            retention_days: Dias para manter (padrão: self.retention_days)
+
+        Returns:
+            Número de exemplos removidos
+        """
+        days = retention_days if retention_days is not None else self.retention_days
+        try:
+            response = await self.db.run(
+                lambda c: c.rpc("cleanup_sicc_intent_examples", {"p_retention_days": days})
+            )
+            deleted = response.data if isinstance(response.data, int) else 0
+            self.stats["examples_purged"] += deleted
+            logger.info("Limpeza de exemplos de intent", deleted=deleted, retention_days=days)
+            return deleted
+        except Exception as e:
+            logger.warning("Erro na limpeza de exemplos de intent", error=str(e))
+            return 0
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def close(self) -> None:
+        """Aguarda gravações de exemplos em andamento"""
+        if self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas do classificador
+
+        Returns:
+            Respostas por camada (total e fração), exemplos por intenção
+            (somados entre tenants), tenants treinados e se há centroides ativos
+        """
+        answered = {tier: self.stats[tier] for tier in ("rules", "centroid", "llm", "default")}
+        total = sum(answered.values())
+        examples_per_intent: Dict[str, int] = {}
+        for model in self._tenants.values():
+            for intent, count in model.counts.items():
+                examples_per_intent[intent] = examples_per_intent.get(intent, 0) + count
+        return {
+            **self.stats,
+            "total": total,
+            "tier_share": {
+                tier: (count / total if total else 0.0) for tier, count in answered.items()
+            },
+            "examples_per_intent": examples_per_intent,
+            "tenants": len(self._tenants),
+            "centroids_active": any(model.centroids is not None for model in self._tenants.values())
+        }
+
+
+# Instância singleton
+_intent_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Retorna instância singleton do IntentClassifier"""
+    global _intent_classifier
+    if _intent_classifier is None:
+        _intent_classifier = IntentClassifier()
+    return _intent_classifier
+
+
+async def shutdown_intent_classifier() -> None:
+    """Aguarda exemplos pendentes do singleton (shutdown)"""
+    if _intent_classifier is not None:
+        await _intent_classifier.close()
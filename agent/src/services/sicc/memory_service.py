@@ -8,7 +8,7 @@ Utiliza embeddings GTE-small (384 dimensões) e busca vetorial com pgvector.
 import os
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -16,13 +16,17 @@ from supabase import Client
 import uuid
 
 try:
-    from ..supabase_client import get_supabase_client
+    from ..supabase_pool import get_supabase_pool, ThreadedSupabaseExecutor
 except ImportError:
     # Fallback para importação direta quando executado como script
     import sys
     import os
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-    from ..supabase_client import get_supabase_client
+    from ..supabase_pool import get_supabase_pool, ThreadedSupabaseExecutor
+
+from .embedding_engine import EmbeddingEngine
+from .embedding_cache import EmbeddingCache
+from .relevance_accumulator import RelevanceAccumulator
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -69,9 +73,16 @@ class MemoryService:
         Inicializa o Memory Service
         
         Args:
-            supabase_client: Cliente Supabase (opcional, usa padrão se None)
+            supabase_client: Cliente Supabase síncrono (opcional). Se None, usa o
+                pool assíncrono compartilhado; se informado, suas queries
+                são executadas em thread
         """
-        self.supabase = supabase_client or get_supabase_client()
+        self.supabase = supabase_client
+        self.db = (
+            ThreadedSupabaseExecutor(supabase_client)
+            if supabase_client is not None
+            else get_supabase_pool()
+        )
         self._model = None
         self._model_lock = asyncio.Lock()
         
@@ -81,6 +92,30 @@ class MemoryService:
         self.max_memories_per_conversation = 100
         self.retention_days = 90
         
+        # Motor de embeddings com micro-batching (um encode por lote)
+        self.embedding_engine = EmbeddingEngine(
+            self._get_embedding_model,
+            max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+        )
+        
+        # Cache LRU de embeddings (memória + disco opcional)
+        self.embedding_cache = EmbeddingCache(
+            model_name=self.embedding_model_name,
+            dimensions=self.embedding_dimensions,
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+            disk_dir=os.getenv("EMBEDDING_DISK_CACHE_DIR") or None,
+            disk_capacity=int(os.getenv("EMBEDDING_DISK_CACHE_SIZE", "100000"))
+        )
+        
+        # Boosts de relevância acumulados e gravados em lote (write-behind)
+        self.relevance_accumulator = RelevanceAccumulator(
+            self.db,
+            flush_interval_seconds=float(os.getenv("MEMORY_RELEVANCE_FLUSH_SECONDS", "5")),
+            max_pending=int(os.getenv("MEMORY_RELEVANCE_MAX_PENDING", "500"))
+        )
+        self._combined_context_rpc_available = True
+        
         logger.info("MemoryService inicializado")
     
     async def _get_embedding_model(self) -> SentenceTransformer:
@@ -121,30 +156,63 @@ class MemoryService:
         if not text or not text.strip():
             raise ValueError("Texto não pode estar vazio")
         
-        try:
-            model = await self._get_embedding_model()
-            
-            # Executar geração de embedding em thread separada
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                lambda: model.encode(text.strip())
-            )
-            
-            # Normalizar para busca por similaridade coseno
-            embedding = embedding / np.linalg.norm(embedding)
+        embeddings = await self.generate_embeddings([text])
+        
+        logger.debug(f"Embedding gerado para texto de {len(text)} caracteres")
+        return embeddings[0]
+    
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings vetoriais para vários textos em um único lote
+        
+        Textos já vistos são servidos pelo EmbeddingCache. Os demais são
+        agrupados pelo EmbeddingEngine em um só `encode` do modelo, e textos
+        repetidos são codificados uma única vez.
+        
+        Args:
+            texts: Lista de textos para gerar embeddings
             
-            # Converter para lista e validar dimensões
-            embedding_list = embedding.tolist()
+        Returns:
+            Lista de embeddings (384 dimensões cada), na mesma ordem da entrada
             
-            if len(embedding_list) != self.embedding_dimensions:
-                raise RuntimeError(
-                    f"Embedding gerado tem {len(embedding_list)} dimensões, "
-                    f"esperado {self.embedding_dimensions}"
-                )
+        Raises:
+            ValueError: Se algum texto estiver vazio
+            RuntimeError: Se houver erro na geração dos embeddings
+        """
+        if any(not text or not text.strip() for text in texts):
+            raise ValueError("Texto não pode estar vazio")
+        
+        try:
+            # Consultar cache antes de enviar ao modelo
+            vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+            missing: Dict[str, List[int]] = {}
+            
+            for position, text in enumerate(texts):
+                cached = self.embedding_cache.get(text)
+                if cached is not None:
+                    vectors[position] = cached
+                else:
+                    missing.setdefault(text, []).append(position)
+            
+            if missing:
+                encoded = await self.embedding_engine.encode_many(list(missing))
+                for (text, positions), vector in zip(missing.items(), encoded):
+                    self.embedding_cache.put(text, vector)
+                    for position in positions:
+                        vectors[position] = vector
+            
+            embeddings = []
+            for vector in vectors:
+                embedding_list = vector.tolist()
+                
+                if len(embedding_list) != self.embedding_dimensions:
+                    raise RuntimeError(
+                        f"Embedding gerado tem {len(embedding_list)} dimensões, "
+                        f"esperado {self.embedding_dimensions}"
+                    )
+                embeddings.append(embedding_list)
             
-            logger.debug(f"Embedding gerado para texto de {len(text)} caracteres")
-            return embedding_list
+            return embeddings
             
         except Exception as e:
             logger.error(f"Erro ao gerar embedding: {e}")
@@ -192,7 +260,9 @@ class MemoryService:
             }
             
             # Inserir no banco (tabela multi-tenant)
-            result = self.supabase.table("sicc_memory_chunks").insert(memory_data).execute()
+            result = await self.db.run(
+                lambda c: c.table("sicc_memory_chunks").insert(memory_data)
+            )
             
             if not result.data or len(result.data) == 0:
                 raise RuntimeError("Falha ao inserir memória no banco")
@@ -252,50 +322,9 @@ class MemoryService:
             # Gerar embedding da query
             query_embedding = await self.generate_embedding(query)
             
-            # Preparar filtros
-            conversation_filter = None
-            metadata_filter = None
-            
-            if filters:
-                conversation_filter = filters.get("conversation_id")
-                if "metadata" in filters:
-                    metadata_filter = filters["metadata"]
-            
-            # Executar busca vetorial usando função RPC (multi-tenant)
-            result = self.supabase.rpc("search_similar_memories_mt", {
-                "query_embedding": query_embedding,
-                "similarity_threshold": 0.1,
-                "max_results": limit,
-                "tenant_filter": tenant_id,
-                "conversation_filter": conversation_filter,
-                "metadata_filter": metadata_filter
-            }).execute()
-            
-            if not result.data:
-                logger.debug("Nenhuma memória encontrada")
-                return []
-            
-            # Converter resultados para objetos Memory
-            memories = []
-            for row in result.data:
-                try:
-                    memory = Memory(
-                        id=row["id"],
-                        conversation_id=row["conversation_id"],
-                        content=row["content"],
-                        embedding=[],  # Não carregamos embedding na busca
-                        metadata=row["metadata"] or {},
-                        relevance_score=row["similarity_score"],  # Usar similarity como relevance
-                        created_at=datetime.fromisoformat(row["created_at"].replace("Z", "+00:00"))
-                    )
-                    memories.append(memory)
-                    
-                    # Atualizar relevance_score da memória (boost por uso)
-                    await self._boost_memory_relevance(row["id"])
-                    
-                except Exception as e:
-                    logger.warning(f"Erro ao processar memória {row.get('id')}: {e}")
-                    continue
+            memories = await self._search_by_embedding(
+                query_embedding, limit, filters, tenant_id
+            )
             
             logger.debug(f"Encontradas {len(memories)} memórias similares para query")
             return memories
@@ -304,6 +333,80 @@ class MemoryService:
             logger.error(f"Erro na busca de memórias similares: {e}")
             raise RuntimeError(f"Falha na busca: {e}")
     
+    async def _search_by_embedding(self, query_embedding: List[float], limit: int,
+                                   filters: Optional[Dict[str, Any]],
+                                   tenant_id: int) -> List[Memory]:
+        """
+        Executa busca vetorial a partir de um embedding já calculado
+        
+        Args:
+            query_embedding: Embedding normalizado da consulta
+            limit: Número máximo de resultados
+            filters: Filtros opcionais (conversation_id, metadata)
+            tenant_id: ID do tenant
+            
+        Returns:
+            Lista de memórias ordenadas por similaridade
+        """
+        # Preparar filtros
+        conversation_filter = None
+        metadata_filter = None
+        
+        if filters:
+            conversation_filter = filters.get("conversation_id")
+            if "metadata" in filters:
+                metadata_filter = filters["metadata"]
+        
+        # Executar busca vetorial usando função RPC (multi-tenant)
+        result = await self.db.run(lambda c: c.rpc("search_similar_memories_mt", {
+            "query_embedding": query_embedding,
+            "similarity_threshold": 0.1,
+            "max_results": limit,
+            "tenant_filter": tenant_id,
+            "conversation_filter": conversation_filter,
+            "metadata_filter": metadata_filter
+        }))
+        
+        if not result.data:
+            logger.debug("Nenhuma memória encontrada")
+            return []
+        
+        memories = self._rows_to_memories(result.data, "similarity_score")
+        
+        # Acumular boost de relevância por uso (gravado em lote)
+        for memory in memories:
+            await self._boost_memory_relevance(memory.id)
+        
+        return memories
+    
+    def _rows_to_memories(self, rows: List[Dict[str, Any]], score_field: str) -> List[Memory]:
+        """
+        Converte linhas retornadas pelas RPCs de busca em objetos Memory
+        
+        Args:
+            rows: Linhas do resultado
+            score_field: Coluna usada como relevance_score
+            
+        Returns:
+            Lista de memórias (linhas inválidas são ignoradas)
+        """
+        memories = []
+        for row in rows:
+            try:
+                memories.append(Memory(
+                    id=row["id"],
+                    conversation_id=row["conversation_id"],
+                    content=row["content"],
+                    embedding=[],  # Não carregamos embedding na busca
+                    metadata=row["metadata"] or {},
+                    relevance_score=row[score_field],
+                    created_at=datetime.fromisoformat(row["created_at"].replace("Z", "+00:00"))
+                ))
+            except Exception as e:
+                logger.warning(f"Erro ao processar memória {row.get('id')}: {e}")
+                continue
+        return memories
+    
     async def search_hybrid(self, query: str, limit: int = 5,
                           text_weight: float = 0.3, vector_weight: float = 0.7,
                           filters: Optional[Dict[str, Any]] = None,
@@ -338,7 +441,7 @@ class MemoryService:
                 conversation_filter = filters["conversation_id"]
             
             # Executar busca híbrida (multi-tenant)
-            result = self.supabase.rpc("search_memories_hybrid_mt", {
+            result = await self.db.run(lambda c: c.rpc("search_memories_hybrid_mt", {
                 "query_text": query.strip(),
                 "query_embedding": query_embedding,
                 "similarity_threshold": 0.05,
@@ -347,32 +450,17 @@ class MemoryService:
                 "max_results": limit,
                 "tenant_filter": tenant_id,
                 "conversation_filter": conversation_filter
-            }).execute()
+            }))
             
             if not result.data:
                 return []
             
             # Converter resultados
-            memories = []
-            for row in result.data:
-                try:
-                    memory = Memory(
-                        id=row["id"],
-                        conversation_id=row["conversation_id"],
-                        content=row["content"],
-                        embedding=[],
-                        metadata=row["metadata"] or {},
-                        relevance_score=row["combined_score"],
-                        created_at=datetime.fromisoformat(row["created_at"].replace("Z", "+00:00"))
-                    )
-                    memories.append(memory)
-                    
-                    # Boost por uso
-                    await self._boost_memory_relevance(row["id"])
-                    
-                except Exception as e:
-                    logger.warning(f"Erro ao processar memória híbrida {row.get('id')}: {e}")
-                    continue
+            memories = self._rows_to_memories(result.data, "combined_score")
+            
+            # Boost por uso (gravado em lote)
+            for memory in memories:
+                await self._boost_memory_relevance(memory.id)
             
             logger.debug(f"Busca híbrida encontrou {len(memories)} memórias")
             return memories
@@ -399,26 +487,18 @@ class MemoryService:
             raise ValueError("tenant_id é obrigatório para multi-tenant")
         
         try:
-            # Buscar memórias da própria conversa
-            conversation_memories = await self.search_similar(
-                current_message,
-                limit=3,
-                filters={"conversation_id": conversation_id},
-                tenant_id=tenant_id
-            )
+            # Embedding calculado uma única vez para os dois escopos de busca
+            query_embedding = await self.generate_embedding(current_message)
             
-            # Buscar memórias similares de outras conversas (mesmo tenant)
-            global_memories = await self.search_similar(
-                current_message,
-                limit=2,
-                filters={},
-                tenant_id=tenant_id
+            conversation_memories, global_memories = await self._search_context_scopes(
+                query_embedding, conversation_id, tenant_id
             )
             
-            # Filtrar memórias globais que não sejam da conversa atual
+            # Filtrar memórias globais que não sejam da conversa atual (e duplicadas)
+            seen_ids = {m.id for m in conversation_memories}
             global_memories = [
                 m for m in global_memories 
-                if m.conversation_id != conversation_id
+                if m.conversation_id != conversation_id and m.id not in seen_ids
             ]
             
             # Combinar e ordenar por relevância
@@ -432,6 +512,57 @@ class MemoryService:
             logger.error(f"Erro ao obter contexto relevante: {e}")
             return []  # Retornar lista vazia em caso de erro
     
+    async def _search_context_scopes(self, query_embedding: List[float],
+                                     conversation_id: str,
+                                     tenant_id: int) -> Tuple[List[Memory], List[Memory]]:
+        """
+        Busca memórias da conversa e do tenant a partir de um único embedding
+        
+        Usa a RPC combinada `search_relevant_context_mt` (um round-trip para os
+        dois escopos). Se ela não estiver disponível, executa as duas buscas
+        escopadas concorrentemente.
+        
+        Returns:
+            Tupla (memórias da conversa, memórias do tenant)
+        """
+        if self._combined_context_rpc_available:
+            try:
+                result = await self.db.run(lambda c: c.rpc("search_relevant_context_mt", {
+                    "query_embedding": query_embedding,
+                    "similarity_threshold": 0.1,
+                    "conversation_limit": 3,
+                    "global_limit": 2,
+                    "tenant_filter": tenant_id,
+                    "conversation_filter": conversation_id
+                }))
+                
+                rows = result.data or []
+                conversation_memories = self._rows_to_memories(
+                    [r for r in rows if r.get("scope") == "conversation"], "similarity_score"
+                )
+                global_memories = self._rows_to_memories(
+                    [r for r in rows if r.get("scope") == "global"], "similarity_score"
+                )
+                
+                for memory_id in {m.id for m in conversation_memories + global_memories}:
+                    await self._boost_memory_relevance(memory_id)
+                
+                return conversation_memories, global_memories
+                
+            except Exception as e:
+                if "search_relevant_context_mt" in str(e) or "PGRST202" in str(e):
+                    # Função não instalada no banco: não tentar novamente
+                    self._combined_context_rpc_available = False
+                logger.warning(f"RPC combinada de contexto indisponível, usando buscas separadas: {e}")
+        
+        conversation_memories, global_memories = await asyncio.gather(
+            self._search_by_embedding(
+                query_embedding, 3, {"conversation_id": conversation_id}, tenant_id
+            ),
+            self._search_by_embedding(query_embedding, 2, {}, tenant_id)
+        )
+        return conversation_memories, global_memories
+    
     async def cleanup_old_memories(self, retention_days: int = 90,
                                  tenant_id: Optional[int] = None) -> int:
         """
@@ -446,12 +577,12 @@ class MemoryService:
         """
         try:
             # Usar função RPC para limpeza inteligente (multi-tenant)
-            result = self.supabase.rpc("cleanup_memories_intelligent_mt", {
+            result = await self.db.run(lambda c: c.rpc("cleanup_memories_intelligent_mt", {
                 "retention_days": retention_days,
                 "min_relevance_score": 0.3,
                 "max_memories_per_conversation": self.max_memories_per_conversation,
                 "tenant_filter": tenant_id
-            }).execute()
+            }))
             
             total_deleted = 0
             if result.data:
@@ -481,14 +612,16 @@ class MemoryService:
         """
         try:
             # Contar memórias da conversa (multi-tenant)
-            query = self.supabase.table("sicc_memory_chunks").select(
-                "id", count="exact"
-            ).eq("conversation_id", conversation_id).is_("deleted_at", "null")
-            
-            if tenant_id is not None:
-                query = query.eq("tenant_id", tenant_id)
+            def count_query(client):
+                query = client.table("sicc_memory_chunks").select(
+                    "id", count="exact"
+                ).eq("conversation_id", conversation_id).is_("deleted_at", "null")
+                
+                if tenant_id is not None:
+                    query = query.eq("tenant_id", tenant_id)
+                return query
             
-            count_result = query.execute()
+            count_result = await self.db.run(count_query)
             
             total_memories = count_result.count or 0
             
@@ -496,23 +629,26 @@ class MemoryService:
                 # Remover memórias mais antigas com menor relevância
                 excess = total_memories - self.max_memories_per_conversation
                 
-                old_query = self.supabase.table("sicc_memory_chunks").select("id").eq(
-                    "conversation_id", conversation_id
-                ).is_("deleted_at", "null")
-                
-                if tenant_id is not None:
-                    old_query = old_query.eq("tenant_id", tenant_id)
+                def old_query(client):
+                    query = client.table("sicc_memory_chunks").select("id").eq(
+                        "conversation_id", conversation_id
+                    ).is_("deleted_at", "null")
+                    
+                    if tenant_id is not None:
+                        query = query.eq("tenant_id", tenant_id)
+                    
+                    return query.order(
+                        "relevance_score", desc=False
+                    ).order("created_at", desc=False).limit(excess)
                 
-                old_memories = old_query.order(
-                    "relevance_score", desc=False
-                ).order("created_at", desc=False).limit(excess).execute()
+                old_memories = await self.db.run(old_query)
                 
                 if old_memories.data:
                     memory_ids = [m["id"] for m in old_memories.data]
                     
-                    self.supabase.table("sicc_memory_chunks").update({
+                    await self.db.run(lambda c: c.table("sicc_memory_chunks").update({
                         "deleted_at": datetime.utcnow().isoformat()
-                    }).in_("id", memory_ids).execute()
+                    }).in_("id", memory_ids))
                     
                     logger.debug(f"Removidas {len(memory_ids)} memórias em excesso da conversa {conversation_id}")
                     
@@ -523,24 +659,20 @@ class MemoryService:
         """
         Aumenta relevance_score de uma memória baseado no uso
         
+        O boost é apenas acumulado em memória; o RelevanceAccumulator grava
+        todos os boosts pendentes em uma única RPC periódica.
+        
         Args:
             memory_id: ID da memória para aumentar relevância
             boost: Valor do boost (padrão: 0.1)
         """
-        try:
-            # Usar função RPC para atualizar relevância
-            result = self.supabase.rpc("update_memory_relevance", {
-                "memory_id": memory_id,
-                "usage_boost": boost
-            }).execute()
-            
-            if result.data:
-                logger.debug(f"Relevância da memória {memory_id} aumentada em {boost}")
-            else:
-                logger.warning(f"Falha ao aumentar relevância da memória {memory_id}")
-                
-        except Exception as e:
-            logger.warning(f"Erro ao aumentar relevância da memória {memory_id}: {e}")
+        self.relevance_accumulator.add(memory_id, boost)
+    
+    async def close(self) -> None:
+        """Grava boosts de relevância pendentes e persiste o cache de embeddings"""
+        await self.relevance_accumulator.close()
+        self.embedding_cache.flush()
+        logger.info("MemoryService finalizado")
     
     async def _calculate_text_similarity(self, text1: str, text2: str) -> float:
         """
@@ -554,9 +686,8 @@ class MemoryService:
             Score de similaridade (0.0 a 1.0)
         """
         try:
-            # Gerar embeddings para ambos os textos
-            embedding1 = await self.generate_embedding(text1)
-            embedding2 = await self.generate_embedding(text2)
+            # Gerar embeddings para ambos os textos em um único lote
+            embedding1, embedding2 = await self.generate_embeddings([text1, text2])
             
             # Calcular similaridade coseno
             dot_product = np.dot(embedding1, embedding2)
@@ -581,4 +712,9 @@ def get_memory_service() -> MemoryService:
     global _memory_service
     if _memory_service is None:
         _memory_service = MemoryService()
-    return _memory_service
\ No newline at end of file
+    return _memory_service
+
+async def shutdown_memory_service() -> None:
+    """Finaliza o singleton do MemoryService (se criado) no shutdown da aplicação"""
+    if _memory_service is not None:
+        await _memory_service.close()
\ No newline at end of file
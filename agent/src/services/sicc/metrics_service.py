@@ -7,15 +7,20 @@ Coleta e analisa métricas de performance do sistema:
 - Taxa de sucesso por sub-agente
 - Relatórios de evolução da inteligência
 - Alertas para degradação de performance
+
+As estatísticas são calculadas a partir de janelas de tempo agregadas
+(RollingMetricWindow): registrar uma métrica é O(1) e as consultas são
+O(slots) da janela, independente do volume de métricas.
 """
 
+import math
+import time
 import structlog
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
-import statistics
-from collections import defaultdict, deque
+from collections import deque
 
 logger = structlog.get_logger(__name__)
 
@@ -102,6 +107,128 @@ class IntelligenceReport:
         }
 
 
+@dataclass
+class MetricAggregate:
+    """Contagem, soma, mínimo e máximo de valores de uma métrica"""
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def merge(self, other: "MetricAggregate") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class RollingMetricWindow:
+    """
+    Ring buffer de slots de tempo com agregados por (agente, tipo de métrica)
+    
+    Cada slot cobre `slot_seconds`; um slot reaproveitado após uma volta
+    completa do anel é zerado, então métricas além da retenção somem sem
+    varredura.
+    """
+    
+    def __init__(self, slot_seconds: int = 60, retention_hours: int = 48):
+        """
+        Args:
+            slot_seconds: Duração de cada slot
+            retention_hours: Período coberto pelo anel
+        """
+        self.slot_seconds = slot_seconds
+        self.num_slots = max(1, int(retention_hours * 3600 // slot_seconds))
+        self._slot_ids: List[int] = [-1] * self.num_slots
+        self._slots: List[Dict[Tuple[Optional[str], MetricType], MetricAggregate]] = [
+            {} for _ in range(self.num_slots)
+        ]
+    
+    def record(self, agent_type: Optional[str], metric_type: MetricType, value: float, timestamp: float) -> None:
+        """Acumula valor no slot do instante informado (O(1))"""
+        slot_id = int(timestamp // self.slot_seconds)
+        index = slot_id % self.num_slots
+        
+        if self._slot_ids[index] != slot_id:
+            # Slot de uma volta anterior do anel: descartar
+            self._slot_ids[index] = slot_id
+            self._slots[index] = {}
+        
+        key = (agent_type, metric_type)
+        aggregate = self._slots[index].get(key)
+        if aggregate is None:
+            aggregate = self._slots[index][key] = MetricAggregate()
+        aggregate.add(value)
+    
+    def query(
+        self,
+        since: float,
+        until: Optional[float] = None,
+        agent_type: Optional[str] = None,
+        metric_type: Optional[MetricType] = None
+    ) -> Dict[MetricType, MetricAggregate]:
+        """
+        Agrega os slots do intervalo [since, until)
+        
+        Args:
+            since: Início do intervalo (epoch em segundos)
+            until: Fim do intervalo, exclusivo (padrão: agora)
+            agent_type: Filtrar por sub-agente
+            metric_type: Filtrar por tipo de métrica
+        
+        Returns:
+            Agregados por tipo de métrica
+        """
+        if until is None:
+            until = time.time()
+        
+        first = int(since // self.slot_seconds)
+        last = math.ceil(until / self.slot_seconds) - 1
+        first = max(first, last - self.num_slots + 1)
+        
+        result: Dict[MetricType, MetricAggregate] = {}
+        for slot_id in range(first, last + 1):
+            index = slot_id % self.num_slots
+            if self._slot_ids[index] != slot_id:
+                continue
+            for (agent, mtype), aggregate in self._slots[index].items():
+                if agent_type is not None and agent != agent_type:
+                    continue
+                if metric_type is not None and mtype != metric_type:
+                    continue
+                result.setdefault(mtype, MetricAggregate()).merge(aggregate)
+        return result
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Libera slots fora da retenção
+        
+        Returns:
+            Número de slots liberados
+        """
+        if now is None:
+            now = time.time()
+        oldest = int(now // self.slot_seconds) - self.num_slots + 1
+        
+        freed = 0
+        for index, slot_id in enumerate(self._slot_ids):
+            if slot_id != -1 and slot_id < oldest:
+                self._slot_ids[index] = -1
+                self._slots[index] = {}
+                freed += 1
+        return freed
+
+
 class MetricsService:
     """
     Serviço para coleta e análise de métricas de performance do SICC
@@ -114,14 +241,21 @@ class MetricsService:
     - Alertas automáticos para problemas
     """
     
-    def __init__(self, max_metrics_history: int = 10000):
+    def __init__(self,
+                 max_metrics_history: int = 10000,
+                 slot_seconds: int = 60,
+                 retention_hours: int = 48):
         """
         Inicializa o serviço de métricas
         
         Args:
-            max_metrics_history: Máximo de métricas a manter em memória
+            max_metrics_history: Máximo de métricas individuais a manter em memória
+            slot_seconds: Granularidade das janelas de estatísticas
+            retention_hours: Período coberto pelas estatísticas (tendência usa 48h)
         """
         self.metrics_history: deque = deque(maxlen=max_metrics_history)
+        self.window = RollingMetricWindow(slot_seconds=slot_seconds, retention_hours=retention_hours)
+        self.total_patterns_applied = 0
         self.agent_stats: Dict[str, AgentPerformanceStats] = {}
         self.performance_thresholds = {
             "min_success_rate": 0.7,
@@ -164,6 +298,9 @@ class MetricsService:
             )
             
             self.metrics_history.append(metric)
+            self.window.record(agent_type, metric_type, value, metric.timestamp.timestamp())
+            if metric_type == MetricType.PATTERN_APPLICATION:
+                self.total_patterns_applied += 1
             
             # Atualizar estatísticas do agente se aplicável
             if agent_type:
@@ -213,9 +350,6 @@ class MetricsService:
                 current_time = stats.avg_response_time
                 stats.avg_response_time = (current_time * 0.8) + (metric.value * 0.2)
             
-            # Calcular padrões por hora
-            await self._calculate_patterns_per_hour(agent_type)
-            
         except Exception as e:
             logger.error(f"Erro ao atualizar estatísticas do agente {agent_type}: {e}")
     
@@ -223,19 +357,20 @@ class MetricsService:
         """
         Calcula padrões aplicados por hora para um agente
         
+        Chamado ao consultar as estatísticas (relatório), não a cada métrica.
+        
         Args:
             agent_type: Tipo do sub-agente
         """
         try:
             # Contar padrões aplicados na última hora
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            
-            patterns_last_hour = 0
-            for metric in self.metrics_history:
-                if (metric.agent_type == agent_type and 
-                    metric.metric_type == MetricType.PATTERN_APPLICATION and
-                    metric.timestamp >= one_hour_ago):
-                    patterns_last_hour += 1
+            last_hour = self.window.query(
+                time.time() - 3600,
+                agent_type=agent_type,
+                metric_type=MetricType.PATTERN_APPLICATION
+            )
+            aggregate = last_hour.get(MetricType.PATTERN_APPLICATION)
+            patterns_last_hour = aggregate.count if aggregate else 0
             
             if agent_type in self.agent_stats:
                 self.agent_stats[agent_type].patterns_per_hour = patterns_last_hour
@@ -259,53 +394,40 @@ class MetricsService:
             Dicionário com estatísticas de performance
         """
         try:
-            cutoff_time = datetime.now() - timedelta(hours=time_window_hours)
-            
-            # Filtrar métricas por janela de tempo
-            recent_metrics = [
-                m for m in self.metrics_history 
-                if m.timestamp >= cutoff_time
-            ]
-            
-            if agent_type:
-                recent_metrics = [
-                    m for m in recent_metrics 
-                    if m.agent_type == agent_type
-                ]
+            # Agregar slots da janela de tempo
+            metrics_by_type = self.window.query(
+                time.time() - time_window_hours * 3600,
+                agent_type=agent_type
+            )
             
             # Calcular estatísticas
             stats = {
                 "time_window_hours": time_window_hours,
-                "total_metrics": len(recent_metrics),
+                "total_metrics": sum(aggregate.count for aggregate in metrics_by_type.values()),
                 "agent_type": agent_type or "all",
                 "metrics_by_type": {},
                 "performance_summary": {}
             }
             
-            # Agrupar por tipo de métrica
-            metrics_by_type = defaultdict(list)
-            for metric in recent_metrics:
-                metrics_by_type[metric.metric_type].append(metric.value)
-            
-            # Calcular estatísticas por tipo
-            for metric_type, values in metrics_by_type.items():
-                if values:
-                    stats["metrics_by_type"][metric_type.value] = {
-                        "count": len(values),
-                        "avg": round(statistics.mean(values), 3),
-                        "min": round(min(values), 3),
-                        "max": round(max(values), 3),
-                        "median": round(statistics.median(values), 3)
-                    }
+            # Estatísticas por tipo
+            for metric_type, aggregate in metrics_by_type.items():
+                stats["metrics_by_type"][metric_type.value] = {
+                    "count": aggregate.count,
+                    "avg": round(aggregate.mean, 3),
+                    "min": round(aggregate.min, 3),
+                    "max": round(aggregate.max, 3)
+                }
             
             # Resumo de performance
             if MetricType.SUCCESS_RATE in metrics_by_type:
-                success_rates = metrics_by_type[MetricType.SUCCESS_RATE]
-                stats["performance_summary"]["avg_success_rate"] = round(statistics.mean(success_rates), 3)
+                stats["performance_summary"]["avg_success_rate"] = round(
+                    metrics_by_type[MetricType.SUCCESS_RATE].mean, 3
+                )
             
             if MetricType.RESPONSE_TIME in metrics_by_type:
-                response_times = metrics_by_type[MetricType.RESPONSE_TIME]
-                stats["performance_summary"]["avg_response_time"] = round(statistics.mean(response_times), 3)
+                stats["performance_summary"]["avg_response_time"] = round(
+                    metrics_by_type[MetricType.RESPONSE_TIME].mean, 3
+                )
             
             return stats
             
@@ -322,28 +444,26 @@ class MetricsService:
         """
         try:
             now = datetime.now()
+            now_ts = now.timestamp()
             
             # Calcular métricas gerais
-            total_patterns = len([
-                m for m in self.metrics_history 
-                if m.metric_type == MetricType.PATTERN_APPLICATION
-            ])
+            total_patterns = self.total_patterns_applied
             
             # Taxa de aprendizado nas últimas 24h
-            yesterday = now - timedelta(hours=24)
-            patterns_24h = len([
-                m for m in self.metrics_history 
-                if (m.metric_type == MetricType.PATTERN_APPLICATION and 
-                    m.timestamp >= yesterday)
-            ])
+            last_24h = self.window.query(now_ts - 24 * 3600, metric_type=MetricType.PATTERN_APPLICATION)
+            patterns_24h = last_24h[MetricType.PATTERN_APPLICATION].count if last_24h else 0
             learning_rate_24h = patterns_24h / 24.0  # padrões por hora
             
-            # Acurácia do sistema
-            accuracy_metrics = [
-                m.value for m in self.metrics_history 
-                if m.metric_type == MetricType.LEARNING_ACCURACY
-            ]
-            system_accuracy = statistics.mean(accuracy_metrics) if accuracy_metrics else 0.0
+            # Acurácia do sistema (período retido)
+            accuracy = self.window.query(
+                now_ts - self.window.num_slots * self.window.slot_seconds,
+                metric_type=MetricType.LEARNING_ACCURACY
+            )
+            system_accuracy = accuracy[MetricType.LEARNING_ACCURACY].mean if accuracy else 0.0
+            
+            # Padrões por hora atualizados na consulta
+            for agent_type in self.agent_stats:
+                await self._calculate_patterns_per_hour(agent_type)
             
             # Melhor agente performante
             top_agent = "unknown"
@@ -400,29 +520,18 @@ class MetricsService:
         """
         try:
             # Comparar últimas 24h com 24h anteriores
-            now = datetime.now()
-            last_24h = now - timedelta(hours=24)
-            previous_24h = now - timedelta(hours=48)
-            
-            # Métricas das últimas 24h
-            recent_success = [
-                m.value for m in self.metrics_history 
-                if (m.metric_type == MetricType.SUCCESS_RATE and 
-                    m.timestamp >= last_24h)
-            ]
-            
-            # Métricas das 24h anteriores
-            previous_success = [
-                m.value for m in self.metrics_history 
-                if (m.metric_type == MetricType.SUCCESS_RATE and 
-                    previous_24h <= m.timestamp < last_24h)
-            ]
+            now = time.time()
+            last_24h = now - 24 * 3600
+            previous_24h = now - 48 * 3600
+            
+            recent_success = self.window.query(last_24h, now, metric_type=MetricType.SUCCESS_RATE)
+            previous_success = self.window.query(previous_24h, last_24h, metric_type=MetricType.SUCCESS_RATE)
             
             if not recent_success or not previous_success:
                 return "stable"
             
-            recent_avg = statistics.mean(recent_success)
-            previous_avg = statistics.mean(previous_success)
+            recent_avg = recent_success[MetricType.SUCCESS_RATE].mean
+            previous_avg = previous_success[MetricType.SUCCESS_RATE].mean
             
             change_rate = (recent_avg - previous_avg) / previous_avg
             
@@ -512,6 +621,17 @@ class MetricsService:
             alerts.append(f"Erro na geração de alertas: {str(e)}")
         
         return alerts
+    
+    async def cleanup_old_metrics(self) -> Dict[str, Any]:
+        """
+        Libera os slots de estatísticas fora do período de retenção
+        
+        Returns:
+            Resumo da limpeza
+        """
+        freed = self.window.prune()
+        logger.debug(f"MetricsService: {freed} slots de métricas liberados")
+        return {"freed_slots": freed, "metrics_in_history": len(self.metrics_history)}
 
 
 # Singleton instance
@@ -0,0 +1,313 @@
+"""
+Pattern Index - SICC
+
+Índice em memória dos padrões aprovados usado pelo BehaviorService.
+
+Mantém, para cada padrão:
+- Embedding normalizado do trigger (matriz NumPy)
+- Conjunto pré-tokenizado de keywords (com índice invertido)
+- Taxa de sucesso em cache
+- Atributos de contexto e de priorização (confidence, frequência, recência)
+
+A pontuação de uma mensagem contra todos os padrões é um único produto
+matricial seguido de operações vetorizadas e seleção top-k.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\b\w+\b')
+
+DEFAULT_SUCCESS_RATE = 0.7
+
+# Pesos da relevância (mesmos de BehaviorService._calculate_pattern_relevance)
+TEXT_WEIGHT = 0.4
+CONTEXT_WEIGHT = 0.3
+KEYWORD_WEIGHT = 0.2
+SUCCESS_WEIGHT = 0.1
+
+# Pesos da priorização (mesmos de BehaviorService.prioritize_patterns)
+PRIORITY_CONFIDENCE_WEIGHT = 0.4
+PRIORITY_RELEVANCE_WEIGHT = 0.3
+PRIORITY_FREQUENCY_WEIGHT = 0.2
+PRIORITY_RECENCY_WEIGHT = 0.1
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Extrai palavras em minúsculas (mesma regra do cálculo de keywords)"""
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+
+def _timestamp(value: datetime) -> float:
+    """Converte datetime (naive = UTC) para timestamp"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass
+class IndexedPattern:
+    """Entrada do índice para um padrão aprovado"""
+    pattern: Any
+    embedding: Optional[np.ndarray]
+    keywords: FrozenSet[str]
+    success_rate: float = DEFAULT_SUCCESS_RATE
+
+
+class PatternIndex:
+    """
+    Índice vetorizado de padrões aprovados
+
+    Inserções e remoções são incrementais (só o padrão alterado é
+    reprocessado). As matrizes NumPy são recompiladas sob demanda na próxima
+    consulta após uma alteração.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self._entries: Dict[str, IndexedPattern] = {}
+        self._dirty = True
+
+        # Estruturas compiladas
+        self._ids: List[str] = []
+        self._patterns: List[Any] = []
+        self._embeddings = np.zeros((0, dimensions), dtype=np.float32)
+        self._has_embedding = np.zeros(0, dtype=bool)
+        self._keyword_sizes = np.zeros(0, dtype=np.int32)
+        self._keyword_postings: Dict[str, np.ndarray] = {}
+        self._success_rates = np.zeros(0, dtype=np.float32)
+        self._confidence = np.zeros(0, dtype=np.float32)
+        self._frequency = np.zeros(0, dtype=np.float32)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._has_contexts = np.zeros(0, dtype=bool)
+        self._context_postings: Dict[str, np.ndarray] = {}
+        self._user_types = np.zeros(0, dtype=object)
+        self._interaction_types = np.zeros(0, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, pattern_id: str) -> bool:
+        return pattern_id in self._entries
+
+    def get(self, pattern_id: str) -> Optional[IndexedPattern]:
+        """Retorna entrada indexada de um padrão"""
+        return self._entries.get(pattern_id)
+
+    def ids(self) -> List[str]:
+        """Retorna IDs dos padrões indexados"""
+        return list(self._entries.keys())
+
+    def upsert(self, pattern: Any, embedding: Optional[List[float]],
+               success_rate: Optional[float] = None) -> None:
+        """
+        Insere ou atualiza um padrão no índice
+
+        Args:
+            pattern: Objeto Pattern aprovado
+            embedding: Embedding normalizado do trigger (None se indisponível)
+            success_rate: Taxa de sucesso (mantém a anterior se None)
+        """
+        keywords = set(tokenize(pattern.trigger or ""))
+        if isinstance(pattern.metadata, dict) and "keywords" in pattern.metadata:
+            keywords.update(pattern.metadata["keywords"])
+
+        previous = self._entries.get(pattern.id)
+        if success_rate is None:
+            success_rate = previous.success_rate if previous else DEFAULT_SUCCESS_RATE
+
+        vector = None
+        if embedding is not None and len(embedding) == self.dimensions:
+            vector = np.asarray(embedding, dtype=np.float32)
+
+        self._entries[pattern.id] = IndexedPattern(
+            pattern=pattern,
+            embedding=vector,
+            keywords=frozenset(keywords),
+            success_rate=float(success_rate)
+        )
+        self._dirty = True
+
+    def remove(self, pattern_id: str) -> bool:
+        """Remove padrão do índice (ex.: rejeitado ou desativado)"""
+        if self._entries.pop(pattern_id, None) is None:
+            return False
+        self._dirty = True
+        return True
+
+    def update_success_rates(self, success_rates: Dict[str, float]) -> None:
+        """Atualiza taxas de sucesso em cache"""
+        for pattern_id, rate in success_rates.items():
+            entry = self._entries.get(pattern_id)
+            if entry is not None:
+                entry.success_rate = float(rate)
+        self._dirty = True
+
+    def _compile(self) -> None:
+        """Reconstrói as matrizes a partir das entradas"""
+        entries = list(self._entries.values())
+        count = len(entries)
+
+        self._ids = [e.pattern.id for e in entries]
+        self._patterns = [e.pattern for e in entries]
+
+        embeddings = np.zeros((count, self.dimensions), dtype=np.float32)
+        has_embedding = np.zeros(count, dtype=bool)
+        for row, entry in enumerate(entries):
+            if entry.embedding is not None:
+                embeddings[row] = entry.embedding
+                has_embedding[row] = True
+        self._embeddings = embeddings
+        self._has_embedding = has_embedding
+
+        keyword_rows: Dict[str, List[int]] = {}
+        context_rows: Dict[str, List[int]] = {}
+        for row, entry in enumerate(entries):
+            for keyword in entry.keywords:
+                keyword_rows.setdefault(keyword, []).append(row)
+            for ctx in set(entry.pattern.contexts or []):
+                context_rows.setdefault(ctx, []).append(row)
+
+        self._keyword_postings = {k: np.array(v, dtype=np.int64) for k, v in keyword_rows.items()}
+        self._context_postings = {k: np.array(v, dtype=np.int64) for k, v in context_rows.items()}
+        self._keyword_sizes = np.array([len(e.keywords) for e in entries], dtype=np.int32)
+        self._has_contexts = np.array([bool(e.pattern.contexts) for e in entries], dtype=bool)
+
+        self._success_rates = np.array([e.success_rate for e in entries], dtype=np.float32)
+        self._confidence = np.array([e.pattern.confidence for e in entries], dtype=np.float32)
+        self._frequency = np.array([e.pattern.frequency for e in entries], dtype=np.float32)
+        self._last_seen = np.array([_timestamp(e.pattern.last_seen) for e in entries], dtype=np.float64)
+
+        def metadata_values(field: str) -> np.ndarray:
+            values = np.empty(count, dtype=object)
+            for row, entry in enumerate(entries):
+                metadata = entry.pattern.metadata if isinstance(entry.pattern.metadata, dict) else {}
+                values[row] = metadata.get(field)
+            return values
+
+        self._user_types = metadata_values("user_type")
+        self._interaction_types = metadata_values("interaction_type")
+
+        self._dirty = False
+        logger.debug(f"Índice de padrões compilado: {count} padrões")
+
+    def score(self, query_embedding: Optional[List[float]], message: str,
+              context: Dict[str, Any]) -> np.ndarray:
+        """
+        Calcula relevância de todos os padrões para a mensagem
+
+        Args:
+            query_embedding: Embedding normalizado da mensagem (None desativa
+                a componente de similaridade textual)
+            message: Mensagem do usuário
+            context: Contexto da conversa
+
+        Returns:
+            Array com a relevância (0.0 a 1.0) de cada padrão, na ordem interna
+        """
+        if self._dirty:
+            self._compile()
+
+        count = len(self._ids)
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        # 1. Similaridade textual: produto escalar de vetores normalizados
+        text_similarity = np.zeros(count, dtype=np.float32)
+        if query_embedding is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            cosine = self._embeddings @ query
+            text_similarity = np.where(
+                self._has_embedding, np.clip((cosine + 1.0) / 2.0, 0.0, 1.0), 0.0
+            )
+
+        # 2. Correspondência de contexto
+        context_match = self._context_match(context, count)
+
+        # 3. Jaccard de keywords via índice invertido
+        keyword_match = np.zeros(count, dtype=np.float32)
+        message_words = tokenize(message)
+        if message_words:
+            postings = [self._keyword_postings[w] for w in message_words if w in self._keyword_postings]
+            if postings:
+                intersection = np.bincount(np.concatenate(postings), minlength=count)
+            else:
+                intersection = np.zeros(count, dtype=np.int64)
+            union = self._keyword_sizes + len(message_words) - intersection
+            keyword_match = np.where(
+                self._keyword_sizes > 0, intersection / np.maximum(union, 1), 0.0
+            )
+
+        relevance = (
+            text_similarity * TEXT_WEIGHT
+            + context_match * CONTEXT_WEIGHT
+            + keyword_match * KEYWORD_WEIGHT
+            + self._success_rates * SUCCESS_WEIGHT
+        )
+        return np.clip(relevance, 0.0, 1.0)
+
+    def _context_match(self, context: Dict[str, Any], count: int) -> np.ndarray:
+        """Versão vetorizada de BehaviorService._calculate_context_match"""
+        matches = np.zeros(count, dtype=np.float32)
+        factors = np.zeros(count, dtype=np.float32)
+
+        if "conversation_id" in context:
+            factors += self._has_contexts
+            rows = self._context_postings.get(context["conversation_id"])
+            if rows is not None:
+                matches[rows] += 1.0
+
+        for field, values in (("user_type", self._user_types),
+                              ("interaction_type", self._interaction_types)):
+            if field in context:
+                present = np.array([v is not None for v in values], dtype=bool)
+                factors += present
+                matches += present & (values == context[field])
+
+        return np.where(factors > 0, matches / np.maximum(factors, 1.0), 0.5)
+
+    def top_k(self, query_embedding: Optional[List[float]], message: str,
+              context: Dict[str, Any], min_relevance: float, k: int,
+              now: Optional[datetime] = None) -> List[Tuple[Any, float]]:
+        """
+        Seleciona os k padrões de maior prioridade acima do threshold
+
+        A prioridade segue os pesos de BehaviorService.prioritize_patterns
+        (confidence, relevância, frequência e recência).
+
+        Returns:
+            Lista de tuplas (pattern, relevance_score) em ordem de prioridade
+        """
+        relevance = self.score(query_embedding, message, context)
+        candidates = np.flatnonzero(relevance >= min_relevance)
+        if candidates.size == 0 or k <= 0:
+            return []
+
+        now_ts = _timestamp(now or datetime.utcnow())
+        days_since = np.floor((now_ts - self._last_seen[candidates]) / 86400.0)
+        recency = np.maximum(0.0, 1.0 - days_since / 30.0)
+
+        priority = (
+            self._confidence[candidates] * PRIORITY_CONFIDENCE_WEIGHT
+            + relevance[candidates] * PRIORITY_RELEVANCE_WEIGHT
+            + np.minimum(self._frequency[candidates] / 100.0, 1.0) * PRIORITY_FREQUENCY_WEIGHT
+            + recency * PRIORITY_RECENCY_WEIGHT
+        )
+
+        if candidates.size > k:
+            top = np.argpartition(-priority, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-priority[top], kind="stable")]
+
+        return [
+            (self._patterns[candidates[i]], float(relevance[candidates[i]]))
+            for i in top
+        ]
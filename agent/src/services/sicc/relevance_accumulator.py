@@ -0,0 +1,175 @@
+"""
+Relevance Accumulator - SICC
+
+Acumulador write-behind dos boosts de relevância de memórias.
+
+As buscas do MemoryService registram o uso de cada memória retornada aqui,
+sem round-trip ao banco. Os boosts são somados por memory_id e enviados
+periodicamente em uma única chamada RPC (`update_memory_relevance_bulk`),
+além de um flush final no shutdown.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RelevanceAccumulator:
+    """
+    Acumula boosts de relevância por memória e grava em lote
+
+    Características:
+    - `add` é O(1) e não faz I/O
+    - Flush periódico em background (`flush_interval_seconds`)
+    - Flush antecipado quando há `max_pending` memórias pendentes
+    - Boosts de um flush que falhou voltam para o buffer e são reenviados
+    """
+
+    BULK_RPC = "update_memory_relevance_bulk"
+
+    def __init__(self, db: Any, flush_interval_seconds: float = 5.0,
+                 max_pending: int = 500, max_boost: float = 1.0):
+        """
+        Inicializa o acumulador
+
+        Args:
+            db: Executor de acesso a dados usado no flush (ver supabase_pool)
+            flush_interval_seconds: Intervalo entre flushes automáticos
+            max_pending: Número de memórias pendentes que dispara flush imediato
+            max_boost: Limite do boost acumulado por memória entre flushes
+        """
+        self.db = db
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self.max_boost = max_boost
+
+        self._pending: Dict[str, float] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closed = False
+
+        self.stats = {
+            "boosts_received": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0
+        }
+
+    def add(self, memory_id: str, boost: float = 0.1) -> None:
+        """
+        Registra boost de relevância para uma memória
+
+        Args:
+            memory_id: ID da memória
+            boost: Valor do boost
+        """
+        if not memory_id:
+            return
+
+        current = self._pending.get(memory_id, 0.0)
+        self._pending[memory_id] = min(self.max_boost, current + boost)
+        self.stats["boosts_received"] += 1
+
+        if self._closed:
+            return
+
+        self._ensure_flusher()
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_flusher(self) -> None:
+        """Inicia a tarefa de flush em background (se houver event loop)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if (self._flush_task is not None and not self._flush_task.done()
+                and self._flush_task.get_loop() is loop):
+            return
+
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Loop de flush periódico"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self._pending:
+                await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Envia todos os boosts pendentes em uma única chamada
+
+        Returns:
+            Número de memórias atualizadas
+        """
+        if self._flush_lock is None or self._flush_task is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+
+            payload = [
+                {"memory_id": memory_id, "usage_boost": boost}
+                for memory_id, boost in batch.items()
+            ]
+
+            try:
+                result = await self.db.run(
+                    lambda c: c.rpc(self.BULK_RPC, {"boosts": payload})
+                )
+
+                self.stats["flushes"] += 1
+                self.stats["rows_flushed"] += len(payload)
+                logger.debug(
+                    f"Relevância atualizada em lote para {len(payload)} memórias "
+                    f"(resultado: {result.data})"
+                )
+                return len(payload)
+
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logger.warning(f"Erro ao gravar boosts de relevância em lote: {e}")
+
+                # Devolver ao buffer para a próxima tentativa
+                for memory_id, boost in batch.items():
+                    current = self._pending.get(memory_id, 0.0)
+                    self._pending[memory_id] = min(self.max_boost, current + boost)
+                return 0
+
+    async def close(self) -> None:
+        """Interrompe o flush periódico e grava o que estiver pendente"""
+        self._closed = True
+
+        # Acordar o loop para que ele termine após o flush em andamento
+        if self._flush_task is not None and not self._flush_task.done():
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._flush_task, timeout=self.flush_interval_seconds * 2)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        self._flush_task = None
+
+        if self._pending:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do acumulador"""
+        stats = dict(self.stats)
+        stats["pending"] = len(self._pending)
+        return stats
@@ -11,10 +11,11 @@ Este serviço integra todos os componentes SICC:
 """
 
 import structlog
-from typing import Dict, List, Optional, Any, Union, TYPE_CHECKING
+from typing import Dict, List, Optional, Any, Union, Callable, Awaitable, TYPE_CHECKING
 from dataclasses import dataclass
 from datetime import datetime
 import asyncio
+import time
 
 # Imports tardios para evitar circularidade
 if TYPE_CHECKING:
@@ -51,6 +52,13 @@ class SICCConfig:
     # Configurações de métricas
     metrics_collection_enabled: bool = True
     performance_monitoring_enabled: bool = True
+    
+    # Prazos das etapas de contexto do process_message (segundos); a etapa
+    # que estoura o prazo fica fora do prompt
+    customer_context_deadline_seconds: float = 1.5
+    personality_deadline_seconds: float = 1.0
+    memory_context_deadline_seconds: float = 2.0
+    patterns_deadline_seconds: float = 1.5
 
 
 class SICCService:
@@ -64,6 +72,9 @@ class SICCService:
     - Processamento assíncrono para não impactar conversas
     """
     
+    # Tamanho mínimo de um trecho enviado durante o streaming da resposta
+    STREAM_MIN_CHUNK_CHARS = 80
+    
     def __init__(self, config: Optional[SICCConfig] = None):
         """
         Inicializa o serviço SICC com todos os componentes
@@ -155,10 +166,9 @@ class SICCService:
             logger.info("Serviços SICC carregados (lazy loading)")
             
             # Inicializar processamento assíncrono se habilitado
-            if self.config.async_processing_enabled:
-                await self.async_processor.start_workers(
-                    max_workers=self.config.max_concurrent_embeddings
-                )
+            if self.config.async_processing_enabled and not self.async_processor.is_running:
+                self.async_processor.max_workers = self.config.max_concurrent_embeddings
+                await self.async_processor.start()
             
             # Registrar métricas de inicialização
             if self.config.metrics_collection_enabled:
@@ -213,17 +223,6 @@ class SICCService:
                                  tenant_id=tenant_id, error=str(e))
                     # personality permanece None, usará fallback no prompt
             
-            # Registrar início da conversa
-            self.active_conversations[conversation_id] = {
-                "start_time": datetime.now(),
-                "sub_agent_type": sub_agent_type or self.config.default_sub_agent,
-                "user_context": user_context,
-                "patterns_applied": [],
-                "memories_retrieved": [],
-                "tenant_id": tenant_id,  # Task 2.4 - Multi-Tenant
-                "personality": personality  # Task 2.4 - Multi-Tenant
-            }
-            
             # Buscar contexto relevante das memórias (Task 2.4 - Multi-Tenant)
             relevant_context = await self.memory_service.get_relevant_context(
                 conversation_id=conversation_id,
@@ -237,20 +236,15 @@ class SICCService:
                 context=user_context
             )
             
-            # Registrar métricas
-            if self.config.metrics_collection_enabled:
-                from .metrics_service import MetricType
-                await self.metrics_service.record_metric(
-                    MetricType.PATTERN_APPLICATION,
-                    len(applicable_patterns),
-                    agent_type=sub_agent_type
-                )
-            
-            # Armazenar informações da conversa
-            self.active_conversations[conversation_id].update({
-                "memories_retrieved": relevant_context,
-                "patterns_available": applicable_patterns
-            })
+            await self._register_conversation(
+                conversation_id=conversation_id,
+                user_context=user_context,
+                sub_agent_type=sub_agent_type,
+                tenant_id=tenant_id,
+                personality=personality,
+                relevant_context=relevant_context,
+                applicable_patterns=applicable_patterns
+            )
             
             result = {
                 "conversation_id": conversation_id,
@@ -277,6 +271,109 @@ class SICCService:
                 "error": str(e)
             }
     
+    async def _register_conversation(
+        self,
+        conversation_id: str,
+        user_context: Dict[str, Any],
+        sub_agent_type: Optional[str],
+        tenant_id: Optional[int],
+        personality: Optional[Dict[str, Any]],
+        relevant_context: List[Any],
+        applicable_patterns: List[Any]
+    ) -> None:
+        """
+        Registra conversa ativa com o contexto já carregado
+        
+        Args:
+            conversation_id: ID único da conversa
+            user_context: Contexto do usuário
+            sub_agent_type: Tipo de sub-agente especializado
+            tenant_id: ID do tenant
+            personality: Personality do tenant (None usa fallback no prompt)
+            relevant_context: Memórias relevantes
+            applicable_patterns: Padrões aplicáveis
+        """
+        self.active_conversations[conversation_id] = {
+            "start_time": datetime.now(),
+            "sub_agent_type": sub_agent_type or self.config.default_sub_agent,
+            "user_context": user_context,
+            "patterns_applied": [],
+            "memories_retrieved": relevant_context,
+            "patterns_available": applicable_patterns,
+            "tenant_id": tenant_id,  # Task 2.4 - Multi-Tenant
+            "personality": personality  # Task 2.4 - Multi-Tenant
+        }
+        
+        # Registrar métricas
+        if self.config.metrics_collection_enabled:
+            from .metrics_service import MetricType
+            await self.metrics_service.record_metric(
+                MetricType.PATTERN_APPLICATION,
+                len(applicable_patterns),
+                agent_type=sub_agent_type
+            )
+    
+    async def _run_stage(
+        self,
+        name: str,
+        awaitable: Awaitable[Any],
+        timings: Dict[str, Dict[str, Any]],
+        deadline: Optional[float] = None,
+        default: Any = None
+    ) -> Any:
+        """
+        Executa uma etapa do pipeline de process_message com prazo e medição
+        
+        Etapas não críticas (com `deadline`) que estouram o prazo ou falham
+        retornam `default`; etapas sem `deadline` propagam erros.
+        
+        Args:
+            name: Nome da etapa (chave em `timings`)
+            awaitable: Coroutine da etapa
+            timings: Dicionário que recebe duração e status da etapa
+            deadline: Prazo em segundos (None = etapa crítica, sem prazo)
+            default: Resultado usado quando a etapa não crítica é omitida
+            
+        Returns:
+            Resultado da etapa ou `default`
+        """
+        start = time.perf_counter()
+        status = "ok"
+        
+        try:
+            if deadline is None:
+                return await awaitable
+            return await asyncio.wait_for(awaitable, timeout=deadline)
+        except asyncio.TimeoutError:
+            if deadline is None:
+                status = "error"
+                raise
+            status = "timeout"
+            logger.warning(f"Etapa {name} excedeu o prazo de {deadline}s, seguindo sem ela")
+            return default
+        except Exception as e:
+            if deadline is None:
+                status = "error"
+                raise
+            status = "error"
+            logger.warning(f"Etapa {name} falhou, seguindo sem ela", error=str(e))
+            return default
+        finally:
+            timings[name] = {
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "status": status
+            }
+    
+    async def _load_customer_context(self, user_id: str) -> Dict[str, Any]:
+        """Contexto do cliente pelo histórico (user_id é o telefone)"""
+        from ..customer_history_service import get_customer_history_service
+        customer_service = get_customer_history_service()
+        customer_context = await customer_service.get_customer_context(user_id)
+        logger.info("Contexto do cliente obtido", 
+                   phone=user_id, 
+                   is_returning=customer_context.get("is_returning_customer", False))
+        return customer_context
+    
     async def apply_pattern(
         self,
         conversation_id: str,
@@ -532,10 +629,15 @@ class SICCService:
             # Limpeza de métricas antigas
             metrics_cleanup = await self.metrics_service.cleanup_old_metrics()
             
+            # Limpeza de exemplos de intent (textos de clientes) além da retenção
+            from .intent_classifier import get_intent_classifier
+            intent_examples_cleanup = await get_intent_classifier().cleanup_old_examples()
+            
             result = {
                 "memory_cleanup": memory_cleanup,
                 "behavior_cleanup": behavior_cleanup,
                 "metrics_cleanup": metrics_cleanup,
+                "intent_examples_cleanup": intent_examples_cleanup,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -551,7 +653,8 @@ class SICCService:
         message: Union[str, Dict[str, Any]],
         user_id: str,
         context: Optional[Dict[str, Any]] = None,
-        tenant_id: Optional[int] = None
+        tenant_id: Optional[int] = None,
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Processa uma mensagem usando o sistema SICC completo
@@ -560,16 +663,70 @@ class SICCService:
             message: Mensagem do usuário (str) ou dados completos da mensagem (dict)
             user_id: ID único do usuário (telefone para WhatsApp)
             context: Contexto adicional (plataforma, histórico, etc.)
+            on_chunk: Callback opcional que recebe a resposta em trechos
+                (parágrafos) à medida que é gerada. Quando usado, o retorno
+                traz `streamed=True` e a resposta completa em `response`
             
         Returns:
             Resposta processada pelo sistema SICC
+            
+        As etapas independentes rodam em paralelo, em dois estágios:
+        1. Áudio (crítica), contexto do cliente e personality do tenant
+        2. Padrões aplicáveis e memórias relevantes (dependem do texto)
+        Etapas de contexto que excedem o prazo (SICCConfig) ficam fora do
+        prompt; a duração de cada etapa vai em `stage_timings`.
         """
+        chunks_sent = 0
+        
+        async def send_chunk(chunk: str) -> None:
+            nonlocal chunks_sent
+            await on_chunk(chunk)
+            chunks_sent += 1
+        
         try:
             if not self.is_initialized:
                 await self.initialize()
             
-            # Processar áudio se necessário
-            processed_message = await self._process_audio_if_needed(message, user_id)
+            pipeline_start = time.perf_counter()
+            timings: Dict[str, Dict[str, Any]] = {}
+            
+            # Usar user_id como conversation_id para WhatsApp
+            conversation_id = f"whatsapp_{user_id}"
+            is_new_conversation = conversation_id not in self.active_conversations
+            
+            default_customer_context = {
+                "is_returning_customer": False,
+                "customer_name": None,
+                "customer_source": "organic",
+                "has_purchase_history": False,
+                "personalized_greeting": None
+            }
+            
+            # Estágio 1: áudio, histórico do cliente e personality em paralelo
+            async def no_personality():
+                return None
+            
+            personality_stage = (
+                load_personality(tenant_id)
+                if is_new_conversation and tenant_id is not None
+                else no_personality()
+            )
+            processed_message, customer_context, personality = await asyncio.gather(
+                self._run_stage("audio", self._process_audio_if_needed(message, user_id), timings),
+                self._run_stage(
+                    "customer_context",
+                    self._load_customer_context(user_id),
+                    timings,
+                    deadline=self.config.customer_context_deadline_seconds,
+                    default=default_customer_context
+                ),
+                self._run_stage(
+                    "personality",
+                    personality_stage,
+                    timings,
+                    deadline=self.config.personality_deadline_seconds
+                )
+            )
             
             # Extrair texto da mensagem
             if isinstance(processed_message, dict):
@@ -590,28 +747,6 @@ class SICCService:
                     "error": "Empty message after processing"
                 }
             
-            # Usar user_id como conversation_id para WhatsApp
-            conversation_id = f"whatsapp_{user_id}"
-            
-            # Verificar histórico do cliente (user_id é o telefone)
-            customer_context = {}
-            try:
-                from ..customer_history_service import get_customer_history_service
-                customer_service = get_customer_history_service()
-                customer_context = await customer_service.get_customer_context(user_id)
-                logger.info("Contexto do cliente obtido", 
-                           phone=user_id, 
-                           is_returning=customer_context.get("is_returning_customer", False))
-            except Exception as e:
-                logger.warning("Erro ao obter contexto do cliente, usando padrão", error=str(e))
-                customer_context = {
-                    "is_returning_customer": False,
-                    "customer_name": None,
-                    "customer_source": "organic",
-                    "has_purchase_history": False,
-                    "personalized_greeting": None
-                }
-            
             # Detectar se cliente está pedindo para ver produto
             product_requested = self._detect_product_request(message_text)
             if product_requested:
@@ -630,28 +765,59 @@ class SICCService:
                 "tenant_id": tenant_id  # Task 2.4 - Multi-Tenant
             }
             
-            # Se é uma nova conversa, inicializar (Task 2.4 - Multi-Tenant)
-            if conversation_id not in self.active_conversations:
-                await self.process_conversation_start(
+            # Estágio 2: padrões da mensagem e, em conversa nova, memórias
+            # relevantes (Task 2.4 - Multi-Tenant)
+            async def no_memories():
+                return self.active_conversations[conversation_id].get("memories_retrieved", [])
+            
+            memories_stage = (
+                self.memory_service.get_relevant_context(
+                    conversation_id=conversation_id,
+                    current_message=message_text,
+                    tenant_id=tenant_id
+                )
+                if is_new_conversation
+                else no_memories()
+            )
+            applicable_patterns, relevant_memories = await asyncio.gather(
+                self._run_stage(
+                    "patterns",
+                    self.behavior_service.find_applicable_patterns(
+                        message=message_text,
+                        context=user_context
+                    ),
+                    timings,
+                    deadline=self.config.patterns_deadline_seconds,
+                    default=[]
+                ),
+                self._run_stage(
+                    "memories",
+                    memories_stage,
+                    timings,
+                    deadline=self.config.memory_context_deadline_seconds,
+                    default=[]
+                )
+            )
+            
+            # Se é uma nova conversa, registrar com o contexto já carregado
+            if is_new_conversation:
+                await self._register_conversation(
                     conversation_id=conversation_id,
                     user_context=user_context,
                     sub_agent_type="sales_consultant",  # Tipo específico para vendas
-                    tenant_id=tenant_id  # Task 2.4 - Multi-Tenant
+                    tenant_id=tenant_id,  # Task 2.4 - Multi-Tenant
+                    personality=personality,
+                    relevant_context=relevant_memories,
+                    applicable_patterns=applicable_patterns
                 )
             
-            # Buscar padrões aplicáveis para a mensagem atual
-            applicable_patterns = await self.behavior_service.find_applicable_patterns(
-                message=message_text,
-                context=user_context
-            )
-            
             # Gerar resposta usando AI Service
             from ..ai_service import get_ai_service
             ai_service = get_ai_service()
             
             # Construir prompt com contexto SICC (Task 2.4 - Multi-Tenant)
-            relevant_memories = self.active_conversations[conversation_id].get("memories_retrieved", [])
             personality = self.active_conversations[conversation_id].get("personality")
+            context_ms = round((time.perf_counter() - pipeline_start) * 1000, 1)
             
             prompt = self._build_sicc_prompt(
                 message=message_text,
@@ -661,27 +827,46 @@ class SICCService:
                 personality=personality  # Task 2.4 - Multi-Tenant
             )
             
-            # Gerar resposta
-            ai_response = await ai_service.generate_text(
-                prompt=prompt,
-                max_tokens=500,
-                temperature=0.7
-            )
+            # Aplicar padrões relevantes antes de gerar: padrão que substitui a
+            # resposta dispensa o LLM (e nada é enviado em streaming antes dele)
+            pattern_response = None
+            for pattern in applicable_patterns[:2]:  # Máximo 2 padrões por mensagem
+                pattern_result = await self.apply_pattern(
+                    conversation_id=conversation_id,
+                    pattern_id=pattern.get('id'),
+                    context=user_context
+                )
+                
+                # Se padrão modificou a resposta, usar a nova
+                if pattern_result.get('success') and pattern_result.get('modified_response'):
+                    pattern_response = pattern_result['modified_response']
+            
+            # Gerar resposta (em streaming quando há consumidor de trechos e a
+            # resposta será texto)
+            llm_start = time.perf_counter()
+            if pattern_response is not None:
+                ai_response = {'text': pattern_response, 'provider': 'pattern'}
+            elif on_chunk is not None and original_type != "audio":
+                ai_response = await self._generate_streamed_response(ai_service, prompt, send_chunk)
+            else:
+                ai_response = await ai_service.generate_text(
+                    prompt=prompt,
+                    max_tokens=500,
+                    temperature=0.7
+                )
+            timings["llm"] = {
+                "ms": round((time.perf_counter() - llm_start) * 1000, 1),
+                "status": "skipped" if pattern_response is not None else "ok"
+            }
             
             response_text = ai_response.get('text', 'Desculpe, não consegui processar sua mensagem.')
             
-            # Aplicar padrões relevantes se houver
-            if applicable_patterns:
-                for pattern in applicable_patterns[:2]:  # Máximo 2 padrões por mensagem
-                    pattern_result = await self.apply_pattern(
+            elapsed_seconds = time.perf_counter() - pipeline_start
+            logger.info("Pipeline de mensagem concluído",
                         conversation_id=conversation_id,
-                        pattern_id=pattern.get('id'),
-                        context=user_context
-                    )
-                    
-                    # Se padrão modificou a resposta, usar a nova
-                    if pattern_result.get('success') and pattern_result.get('modified_response'):
-                        response_text = pattern_result['modified_response']
+                        total_ms=round(elapsed_seconds * 1000, 1),
+                        context_ms=context_ms,
+                        stages=timings)
             
             # ESTRATÉGIA ESPELHADA: Se cliente mandou áudio, responder com áudio
             if original_type == "audio":
@@ -695,7 +880,7 @@ class SICCService:
                     from .metrics_service import MetricType
                     await self.metrics_service.record_metric(
                         MetricType.RESPONSE_TIME,
-                        1.0,  # Placeholder - seria tempo real de processamento
+                        elapsed_seconds,
                         context={"platform": "whatsapp", "response_type": "audio"},
                         agent_type="sales_consultant"
                     )
@@ -719,7 +904,8 @@ class SICCService:
                     "success": True,
                     "original_type": original_type,
                     "response_type": "audio",
-                    "audio_being_sent": True
+                    "audio_being_sent": True,
+                    "stage_timings": timings
                 }
             else:
                 # Cliente mandou texto, responder com texto (comportamento normal)
@@ -728,7 +914,7 @@ class SICCService:
                     from .metrics_service import MetricType
                     await self.metrics_service.record_metric(
                         MetricType.RESPONSE_TIME,
-                        1.0,  # Placeholder - seria tempo real de processamento
+                        elapsed_seconds,
                         context={"platform": "whatsapp", "response_type": "text"},
                         agent_type="sales_consultant"
                     )
@@ -750,12 +936,29 @@ class SICCService:
                     "ai_provider": ai_response.get('provider', 'unknown'),
                     "success": True,
                     "original_type": original_type,
-                    "response_type": "text"
+                    "response_type": "text",
+                    "streamed": ai_response.get('streamed', False),
+                    "stage_timings": timings
                 }
             
         except Exception as e:
             logger.error(f"Erro ao processar mensagem: {e}")
             
+            # Parte da resposta já chegou ao cliente: outra resposta completa
+            # por cima dela confundiria a conversa
+            if chunks_sent:
+                logger.warning("Resposta interrompida após envio parcial; sem resposta de emergência",
+                               user_id=user_id, chunks_sent=chunks_sent)
+                return {
+                    "response": "",
+                    "conversation_id": f"whatsapp_{user_id}",
+                    "patterns_applied": 0,
+                    "ai_provider": "unknown",
+                    "success": False,
+                    "streamed": True,
+                    "error": str(e)
+                }
+            
             # Em caso de falha técnica total, tentar IA básica sem SICC
             try:
                 from ..ai_service import get_ai_service
@@ -796,6 +999,45 @@ Seja empática, educativa e focada em ajudar o cliente com problemas de saúde e
                     "error": f"SICC: {str(e)}, Emergency: {str(emergency_error)}"
                 }
     
+    async def _generate_streamed_response(
+        self,
+        ai_service: Any,
+        prompt: str,
+        on_chunk: Callable[[str], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """
+        Gera resposta em streaming, entregando parágrafos completos ao callback
+        
+        Args:
+            ai_service: AIService
+            prompt: Prompt construído
+            on_chunk: Callback que recebe cada trecho
+            
+        Returns:
+            Dict com 'text' completo, 'provider' e 'streamed'
+        """
+        stream = ai_service.generate_text_stream(prompt=prompt, max_tokens=500, temperature=0.7)
+        buffer = ""
+        
+        async for delta in stream:
+            buffer += delta
+            
+            # Entregar até o último parágrafo completo, evitando trechos curtos
+            split_at = buffer.rfind("\n\n")
+            if split_at >= self.STREAM_MIN_CHUNK_CHARS:
+                chunk, buffer = buffer[:split_at].strip(), buffer[split_at:].lstrip()
+                if chunk:
+                    await on_chunk(chunk)
+        
+        if buffer.strip():
+            await on_chunk(buffer.strip())
+        
+        return {
+            'text': stream.text,
+            'provider': stream.provider,
+            'streamed': True
+        }
+    
     def _build_sicc_prompt(
         self,
         message: str,
@@ -1165,8 +1407,8 @@ ABORDAGEM:
                 )
             
             # Parar processamento assíncrono
-            if self.config.async_processing_enabled:
-                await self.async_processor.stop_workers()
+            if self.config.async_processing_enabled and self.async_processor.is_running:
+                await self.async_processor.stop()
             
             # Registrar shutdown nas métricas
             if self.config.metrics_collection_enabled:
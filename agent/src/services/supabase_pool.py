@@ -0,0 +1,264 @@
+"""
+Pool Supabase assíncrono - Camada de acesso a dados
+
+Executa queries PostgREST sem bloquear o event loop:
+- Cliente `AsyncClient` do supabase-py sobre um único `httpx.AsyncClient`
+  (HTTP/2, keep-alive) compartilhado por todo o processo
+- Concorrência limitada por semáforo (evita saturar o PostgREST)
+- Timeout por chamada
+
+Uso:
+    db = get_supabase_pool()
+    result = await db.run(lambda c: c.table("products").select("*").limit(10))
+
+`run` recebe uma função que monta a query a partir do cliente e executa
+`.execute()` de forma assíncrona. O mesmo contrato é oferecido por
+`ThreadedSupabaseExecutor`, usado quando um cliente síncrono é injetado
+(ex.: testes e scripts).
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import structlog
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+logger = structlog.get_logger(__name__)
+
+# Função que monta a query a partir do cliente (sem chamar .execute())
+QueryBuilder = Callable[[Any], Any]
+
+
+class AsyncSupabasePool:
+    """
+    Pool de conexões assíncrono para o Supabase
+
+    O cliente é criado sob demanda no primeiro uso. Como conexões httpx e
+    semáforos pertencem a um event loop, o pool é recriado se usado a
+    partir de outro loop.
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None,
+                 max_connections: int = 20, max_keepalive_connections: int = 10,
+                 max_concurrency: int = 20, timeout_seconds: float = 10.0):
+        """
+        Inicializa o pool
+
+        Args:
+            url: URL do Supabase (padrão: SUPABASE_URL)
+            key: Service key (padrão: SUPABASE_SERVICE_KEY)
+            max_connections: Máximo de conexões HTTP abertas
+            max_keepalive_connections: Conexões mantidas ociosas para reuso
+            max_concurrency: Máximo de queries simultâneas
+            timeout_seconds: Timeout padrão por chamada
+        """
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_SERVICE_KEY")
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+
+        self._client: Optional[AsyncClient] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._init_lock: Optional[asyncio.Lock] = None
+
+        self.stats = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "in_flight": 0,
+            "total_time_ms": 0.0
+        }
+
+    def _bind_loop(self) -> None:
+        """Associa semáforo e lock ao event loop atual"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        if self._http is not None:
+            # Conexões do loop anterior não podem ser reutilizadas
+            logger.warning("Pool Supabase usado em outro event loop, recriando conexões")
+        self._loop = loop
+        self._client = None
+        self._http = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._init_lock = asyncio.Lock()
+
+    async def get_client(self) -> AsyncClient:
+        """
+        Retorna cliente assíncrono, criando-o no primeiro uso
+
+        Raises:
+            ValueError: Se SUPABASE_URL ou SUPABASE_SERVICE_KEY não estiverem definidas
+        """
+        self._bind_loop()
+        if self._client is not None:
+            return self._client
+
+        async with self._init_lock:
+            if self._client is None:
+                if not self.url or not self.key:
+                    raise ValueError("SUPABASE_URL e SUPABASE_SERVICE_KEY devem estar definidas")
+
+                logger.info(
+                    "Inicializando pool Supabase assíncrono",
+                    max_connections=self.max_connections,
+                    max_concurrency=self.max_concurrency
+                )
+                self._http = httpx.AsyncClient(
+                    http2=True,
+                    follow_redirects=True,
+                    timeout=httpx.Timeout(self.timeout_seconds),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections
+                    )
+                )
+                self._client = await acreate_client(
+                    self.url,
+                    self.key,
+                    options=AsyncClientOptions(
+                        httpx_client=self._http,
+                        postgrest_client_timeout=self.timeout_seconds
+                    )
+                )
+        return self._client
+
+    async def run(self, build: QueryBuilder, timeout: Optional[float] = None) -> Any:
+        """
+        Monta e executa uma query
+
+        Args:
+            build: Função que recebe o cliente e retorna a query (table/rpc)
+            timeout: Timeout desta chamada (padrão: timeout_seconds)
+
+        Returns:
+            Resposta do PostgREST (`.data`, `.count`)
+
+        Raises:
+            asyncio.TimeoutError: Se a chamada exceder o timeout
+        """
+        client = await self.get_client()
+        start = time.perf_counter()
+
+        async with self._semaphore:
+            self.stats["in_flight"] += 1
+            try:
+                return await asyncio.wait_for(
+                    build(client).execute(),
+                    timeout=timeout or self.timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                logger.warning("Timeout em query Supabase", timeout=timeout or self.timeout_seconds)
+                raise
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+                self.stats["calls"] += 1
+                self.stats["total_time_ms"] += (time.perf_counter() - start) * 1000
+
+    async def close(self) -> None:
+        """Fecha as conexões HTTP do pool"""
+        if self._http is not None:
+            try:
+                await self._http.aclose()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar pool Supabase: {e}")
+        self._http = None
+        self._client = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pool"""
+        stats = dict(self.stats)
+        stats["avg_time_ms"] = stats["total_time_ms"] / stats["calls"] if stats["calls"] else 0.0
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+
+class ThreadedSupabaseExecutor:
+    """
+    Executor com o mesmo contrato de AsyncSupabasePool para clientes síncronos
+
+    Cada `.execute()` roda no thread pool padrão, mantendo o event loop livre.
+    """
+
+    def __init__(self, client: Any, max_concurrency: int = 20, timeout_seconds: float = 10.0):
+        """
+        Args:
+            client: Cliente Supabase síncrono
+            max_concurrency: Máximo de queries simultâneas
+            timeout_seconds: Timeout padrão por chamada
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def get_client(self) -> Any:
+        """Retorna o cliente síncrono injetado"""
+        return self.client
+
+    async def run(self, build: QueryBuilder, timeout: Optional[float] = None) -> Any:
+        """Monta a query e executa `.execute()` em thread"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            query = build(self.client)
+            return await asyncio.wait_for(
+                loop.run_in_executor(None, query.execute),
+                timeout=timeout or self.timeout_seconds
+            )
+
+    async def close(self) -> None:
+        """Nada a liberar: o cliente pertence a quem o injetou"""
+        return None
+
+
+# Pool singleton
+_supabase_pool: Optional[AsyncSupabasePool] = None
+
+
+def get_supabase_pool() -> AsyncSupabasePool:
+    """
+    Retorna pool Supabase assíncrono singleton
+
+    Configuração via ambiente:
+    - SUPABASE_POOL_MAX_CONNECTIONS (padrão 20)
+    - SUPABASE_POOL_MAX_KEEPALIVE (padrão 10)
+    - SUPABASE_POOL_MAX_CONCURRENCY (padrão 20)
+    - SUPABASE_QUERY_TIMEOUT_SECONDS (padrão 10)
+    """
+    global _supabase_pool
+
+    if _supabase_pool is None:
+        _supabase_pool = AsyncSupabasePool(
+            max_connections=int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10")),
+            max_concurrency=int(os.getenv("SUPABASE_POOL_MAX_CONCURRENCY", "20")),
+            timeout_seconds=float(os.getenv("SUPABASE_QUERY_TIMEOUT_SECONDS", "10"))
+        )
+
+    return _supabase_pool
+
+
+async def close_supabase_pool() -> None:
+    """Fecha o pool singleton (chamado no shutdown da aplicação)"""
+    global _supabase_pool
+
+    if _supabase_pool is not None:
+        await _supabase_pool.close()
+        _supabase_pool = None
@@ -0,0 +1,230 @@
+"""
+Testes unitários para AIService
+
+Valida o caminho assíncrono da OpenAI, o streaming com fallback entre
+provedores, circuit breakers, hedging e o agrupamento de trechos em
+parágrafos no SICC.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.ai_service import AIService, AIProvider
+from agent.src.services.provider_health import ProviderHealth, CircuitState
+from agent.src.services.sicc.sicc_service import SICCService
+
+
+def make_service(clients, hedging=False):
+    """AIService com clientes injetados (sem inicializar SDKs)"""
+    service = AIService.__new__(AIService)
+    service.settings = SimpleNamespace(
+        openai_model="gpt-4o",
+        openai_timeout_seconds=30.0,
+        ai_breaker_failure_threshold=2,
+        ai_breaker_error_rate_threshold=0.5,
+        ai_breaker_recovery_seconds=60.0,
+        ai_hedging_enabled=hedging,
+        ai_hedge_delay_seconds=0.05,
+        ai_hedge_min_delay_seconds=0.0
+    )
+    service._clients = clients
+    service._http_client = None
+    service._health = service._build_health()
+    return service
+
+
+def make_openai_client(deltas=None, error=None, delay=0.0):
+    """Cliente OpenAI assíncrono falso"""
+    async def events():
+        for delta in deltas or []:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+    async def create(**kwargs):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        if kwargs.get("stream"):
+            return events()
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="resposta"))],
+            usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1, total_tokens=4)
+        )
+
+    client = Mock()
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    return client
+
+
+def make_claude_client(deltas=(), text="resposta do claude"):
+    """Cliente Claude (LangChain) falso com astream e ainvoke"""
+    async def astream(messages):
+        for delta in deltas:
+            yield SimpleNamespace(content=delta)
+
+    client = Mock()
+    client.astream = astream
+    client.ainvoke = AsyncMock(return_value=SimpleNamespace(content=text))
+    return client
+
+
+class TestAIService:
+    """Testes do serviço de IA"""
+
+    @pytest.mark.asyncio
+    async def test_generate_text_awaits_async_openai(self):
+        """generate_text usa o cliente assíncrono sem bloquear o loop"""
+        client = make_openai_client()
+        service = make_service({AIProvider.OPENAI: client})
+
+        result = await service.generate_text("olá")
+
+        assert result["text"] == "resposta"
+        assert result["provider"] == "openai"
+        client.chat.completions.create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_chunks(self):
+        """Streaming entrega os trechos na ordem e acumula o texto completo"""
+        service = make_service({AIProvider.OPENAI: make_openai_client(["Olá", ", ", "tudo bem?"])})
+
+        stream = service.generate_text_stream("olá")
+        chunks = [chunk async for chunk in stream]
+
+        assert chunks == ["Olá", ", ", "tudo bem?"]
+        assert stream.text == "Olá, tudo bem?"
+        assert stream.provider == "openai"
+
+    @pytest.mark.asyncio
+    async def test_stream_falls_back_before_first_chunk(self):
+        """Falha antes do primeiro trecho usa o próximo provedor"""
+        service = make_service({
+            AIProvider.OPENAI: make_openai_client(error=RuntimeError("timeout")),
+            AIProvider.CLAUDE: make_claude_client(["Resposta ", "do Claude"])
+        })
+
+        stream = service.generate_text_stream("olá")
+        chunks = [chunk async for chunk in stream]
+
+        assert "".join(chunks) == "Resposta do Claude"
+        assert stream.provider == "claude"
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_failing_provider(self):
+        """Após falhas consecutivas o provedor sai da rotação"""
+        openai_client = make_openai_client(error=RuntimeError("503"))
+        claude_client = make_claude_client()
+        service = make_service({AIProvider.OPENAI: openai_client, AIProvider.CLAUDE: claude_client})
+
+        for _ in range(3):
+            result = await service.generate_text("olá")
+            assert result["provider"] == "claude"
+
+        # Circuito abriu após 2 falhas: a terceira chamada nem tenta a OpenAI
+        assert openai_client.chat.completions.create.await_count == 2
+        health = service.get_provider_health()
+        assert health["openai"]["state"] == "open"
+        assert health["openai"]["rejected"] == 1
+        assert health["claude"]["latency"]["count"] == 3
+
+    @pytest.mark.asyncio
+    async def test_all_circuits_open_still_tries(self):
+        """Com todos os circuitos abertos, os provedores são tentados mesmo assim"""
+        client = make_openai_client()
+        service = make_service({AIProvider.OPENAI: client})
+        service._health[AIProvider.OPENAI].record_failure()
+        service._health[AIProvider.OPENAI].record_failure()
+
+        result = await service.generate_text("olá")
+
+        assert result["provider"] == "openai"
+
+    def test_half_open_allows_single_probe(self):
+        """Após a recuperação, apenas uma requisição de teste é liberada"""
+        health = ProviderHealth("openai", failure_threshold=1, recovery_seconds=0.0)
+        health.record_failure(100)
+        assert health.state == CircuitState.OPEN
+
+        assert health.allow_request() is True
+        assert health.state == CircuitState.HALF_OPEN
+        assert health.allow_request() is False
+
+        health.record_success(200)
+        assert health.state == CircuitState.CLOSED
+        assert health.allow_request() is True
+
+    def test_hedge_delay_uses_p95(self):
+        """Prazo de hedging segue o p95 do histograma com amostras suficientes"""
+        health = ProviderHealth("openai", min_samples=10)
+        assert health.hedge_delay_seconds(2.0) == 2.0
+
+        for _ in range(19):
+            health.record_success(400)
+        health.record_success(2500)
+
+        assert health.histogram.percentile(50) == 500
+        assert health.hedge_delay_seconds(2.0) == 0.5
+        assert health.hedge_delay_seconds(2.0, min_seconds=1.0) == 1.0
+
+    @pytest.mark.asyncio
+    async def test_hedging_fires_backup_for_slow_primary(self):
+        """Primário lento além do prazo: backup é disparado e vence"""
+        openai_client = make_openai_client(delay=1.0)
+        claude_client = make_claude_client()
+        service = make_service(
+            {AIProvider.OPENAI: openai_client, AIProvider.CLAUDE: claude_client}, hedging=True
+        )
+
+        started = asyncio.get_running_loop().time()
+        result = await service.generate_text("olá")
+        elapsed = asyncio.get_running_loop().time() - started
+
+        assert result["provider"] == "claude"
+        assert elapsed < 0.5
+        # Primário cancelado não conta como falha
+        assert service.get_provider_health()["openai"]["failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_hedging_fast_primary_no_backup(self):
+        """Primário dentro do prazo: backup não é disparado"""
+        claude_client = make_claude_client()
+        service = make_service(
+            {AIProvider.OPENAI: make_openai_client(), AIProvider.CLAUDE: claude_client}, hedging=True
+        )
+
+        result = await service.generate_text("olá")
+
+        assert result["provider"] == "openai"
+        claude_client.ainvoke.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_sicc_groups_stream_into_paragraphs(self):
+        """SICC entrega parágrafos completos ao callback"""
+        first = "Primeiro parágrafo " + "x" * SICCService.STREAM_MIN_CHUNK_CHARS
+        service = make_service({
+            AIProvider.OPENAI: make_openai_client([first[:30], first[30:], "\n\nSegundo", " parágrafo"])
+        })
+        sent = []
+
+        async def on_chunk(chunk):
+            sent.append(chunk)
+
+        sicc = SICCService.__new__(SICCService)
+        result = await sicc._generate_streamed_response(service, "prompt", on_chunk)
+
+        assert sent == [first, "Segundo parágrafo"]
+        assert result["streamed"] is True
+        assert result["text"] == first + "\n\nSegundo parágrafo"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,212 @@
+"""
+Testes unitários para AuditPipeline
+
+Valida a gravação única e em lote dos eventos de auditoria, o spill em
+disco com o banco indisponível, o reenvio no startup e as estatísticas
+agregadas no banco.
+"""
+
+import pytest
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation.audit_pipeline import AuditPipeline
+from agent.src.services.automation import audit as audit_module
+from agent.src.services.automation.audit import AuditEventType, AuditLevel
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+
+def make_client(error: Exception = None):
+    client = Mock()
+    execute = client.table.return_value.upsert.return_value.execute
+    if error:
+        execute.side_effect = error
+    else:
+        execute.return_value = Mock(data=[])
+    return client
+
+
+def written_batches(client):
+    return [c.args[0] for c in client.table.return_value.upsert.call_args_list]
+
+
+def row(i):
+    return {"id": f"evt-{i}", "event_type": "rule_created", "description": f"evento {i}"}
+
+
+class TestAuditPipeline:
+    """Testes do pipeline de auditoria"""
+
+    @pytest.mark.asyncio
+    async def test_batches_on_size_threshold(self, tmp_path):
+        """Eventos viram um único upsert multi-linha, idempotente por id"""
+        client = make_client()
+        pipeline = AuditPipeline(ThreadedSupabaseExecutor(client), str(tmp_path / "spill.jsonl"),
+                                 batch_size=5, flush_interval_seconds=60)
+
+        for i in range(5):
+            pipeline.enqueue(row(i))
+        await asyncio.sleep(0.1)
+
+        batches = written_batches(client)
+        assert len(batches) == 1
+        assert [r["id"] for r in batches[0]] == [f"evt-{i}" for i in range(5)]
+        assert client.table.return_value.upsert.call_args.kwargs == {
+            "on_conflict": "id", "ignore_duplicates": True
+        }
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_spills_on_db_failure_and_replays_on_start(self, tmp_path):
+        """Banco indisponível: eventos vão para o disco e são reenviados no startup"""
+        spill_path = str(tmp_path / "spill.jsonl")
+        failing = make_client(RuntimeError("connection refused"))
+        pipeline = AuditPipeline(ThreadedSupabaseExecutor(failing), spill_path,
+                                 batch_size=10, flush_interval_seconds=60)
+
+        for i in range(3):
+            pipeline.enqueue(row(i))
+        await pipeline.close()
+
+        with open(spill_path, encoding="utf-8") as f:
+            assert [json.loads(line)["id"] for line in f] == ["evt-0", "evt-1", "evt-2"]
+
+        client = make_client()
+        restarted = AuditPipeline(ThreadedSupabaseExecutor(client), spill_path,
+                                  batch_size=10, flush_interval_seconds=60)
+        await restarted.start()
+        await asyncio.sleep(0.1)
+
+        assert [r["id"] for r in written_batches(client)[0]] == ["evt-0", "evt-1", "evt-2"]
+        assert restarted.get_stats()["rows_replayed"] == 3
+        assert not os.path.exists(spill_path)
+        await restarted.close()
+
+    @pytest.mark.asyncio
+    async def test_overflow_spills_oldest_events(self, tmp_path):
+        """Buffer acima do limite transborda os mais antigos em background, não em enqueue"""
+        spill_path = str(tmp_path / "spill.jsonl")
+        pipeline = AuditPipeline(Mock(), spill_path, batch_size=2, max_buffer=3,
+                                 flush_interval_seconds=60)
+        # Flusher ocupado (banco lento): só o transbordo libera o buffer
+        pipeline._flush_task = asyncio.get_running_loop().create_future()
+        pipeline._wakeup = asyncio.Event()
+
+        for i in range(4):
+            pipeline.enqueue(row(i))
+        assert not os.path.exists(spill_path)
+        await pipeline._overflow_task
+
+        with open(spill_path, encoding="utf-8") as f:
+            assert [json.loads(line)["id"] for line in f] == ["evt-0", "evt-1"]
+        assert pipeline.get_stats()["pending"] == 2
+        pipeline._flush_task.cancel()
+
+    def test_overflow_without_loop_drops_oldest(self, tmp_path):
+        """Sem event loop, o excesso é descartado e contado (sem I/O em enqueue)"""
+        spill_path = str(tmp_path / "spill.jsonl")
+        pipeline = AuditPipeline(Mock(), spill_path, batch_size=2, max_buffer=3)
+
+        for i in range(5):
+            pipeline.enqueue(row(i))
+
+        assert not os.path.exists(spill_path)
+        assert [r["id"] for r in pipeline._buffer] == ["evt-2", "evt-3", "evt-4"]
+        assert pipeline.get_stats()["rows_dropped"] == 2
+
+
+class TestAuditServicePipeline:
+    """Integração do pipeline com o AuditService"""
+
+    @pytest.mark.asyncio
+    async def test_log_event_writes_once(self, tmp_path):
+        """Cada evento é gravado uma única vez, fora do caminho da chamada"""
+        client = make_client()
+        with patch.object(audit_module, "get_supabase_pool",
+                          return_value=ThreadedSupabaseExecutor(client)), \
+             patch.dict(os.environ, {"AUDIT_SPILL_PATH": str(tmp_path / "spill.jsonl")}):
+            service = audit_module.AuditService()
+
+        event = await service.log_event(
+            event_type=AuditEventType.RULE_CREATED,
+            level=AuditLevel.INFO,
+            user_id="user-1",
+            resource_type="automation_rule",
+            resource_id="rule-1",
+            description="Regra criada"
+        )
+        assert written_batches(client) == []
+
+        await service.close()
+
+        batches = written_batches(client)
+        assert len(batches) == 1
+        assert [r["id"] for r in batches[0]] == [event.id]
+
+
+class TestAuditStats:
+    """Estatísticas de auditoria agregadas no banco"""
+
+    def make_service(self, client, tmp_path):
+        with patch.object(audit_module, "get_supabase_pool",
+                          return_value=ThreadedSupabaseExecutor(client)), \
+             patch.dict(os.environ, {"AUDIT_SPILL_PATH": str(tmp_path / "spill.jsonl")}):
+            return audit_module.AuditService()
+
+    @pytest.mark.asyncio
+    async def test_stats_from_rpc(self, tmp_path):
+        """Uma chamada RPC, sem leitura de eventos brutos"""
+        client = Mock()
+        client.rpc.return_value.execute.return_value = Mock(data={
+            "total_events": 5,
+            "events_by_type": {"rule_created": 5},
+            "events_by_level": {"info": 5},
+            "events_by_day": {"2026-10-16": 2, "2026-10-17": 3},
+            "top_resources": {"automation_rule:r1": 1, "automation_rule:r2": 4},
+            "top_users": {"user-1": 5}
+        })
+        service = self.make_service(client, tmp_path)
+
+        stats = await service.get_audit_stats(user_id="user-1", days=7)
+
+        assert client.rpc.call_args.args[0] == "get_audit_stats"
+        assert client.rpc.call_args.args[1]["p_user_id"] == "user-1"
+        client.table.assert_not_called()
+        assert stats["total_events"] == 5
+        assert stats["period_days"] == 7
+        assert list(stats["top_resources"]) == ["automation_rule:r2", "automation_rule:r1"]
+
+    @pytest.mark.asyncio
+    async def test_stats_fallback_without_rpc(self, tmp_path):
+        """Função ausente no banco: agrega os eventos em Python"""
+        client = Mock()
+        client.rpc.return_value.execute.side_effect = RuntimeError(
+            "PGRST202: Could not find the function public.get_audit_stats"
+        )
+        client.table.return_value.select.return_value.gte.return_value.lte.return_value \
+            .order.return_value.range.return_value.execute.return_value = Mock(data=[
+                {"event_type": "rule_created", "level": "info", "user_id": "user-1",
+                 "resource_type": "automation_rule", "resource_id": "r1",
+                 "timestamp": "2026-10-17T10:00:00"}
+            ])
+        service = self.make_service(client, tmp_path)
+
+        for _ in range(2):
+            stats = await service.get_audit_stats()
+
+        assert client.rpc.call_count == 1
+        assert stats["total_events"] == 1
+        assert stats["events_by_day"] == {"2026-10-17": 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
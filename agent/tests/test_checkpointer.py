@@ -0,0 +1,566 @@
+"""
+Testes unitários para MultiTenantCheckpointer
+
+Valida o agrupamento dos checkpoints de uma execução do grafo em uma única
+gravação versionada, a leitura servida do cache, a gravação adiada de
+checkpoints intermediários, a leitura de checkpoints no formato anterior,
+a interface assíncrona, a gravação dos writes das tasks e o formato compacto
+(msgpack comprimido e histórico de mensagens em linhas append-only).
+"""
+
+import pytest
+import asyncio
+import json
+import operator
+import os
+import sys
+import time
+from typing import Annotated, TypedDict
+from unittest.mock import Mock
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
+
+from agent.src.graph.checkpointer import CheckpointConflictError, MultiTenantCheckpointer
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+THREAD = {"configurable": {"thread_id": "tenant_1_conv_42"}}
+
+
+class CounterState(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def build_graph(checkpointer, failing_node=None):
+    workflow = StateGraph(CounterState)
+
+    def make_node(name):
+        def node(state):
+            if name == failing_node:
+                raise RuntimeError(f"{name} indisponível")
+            return {"steps": [name]}
+        return node
+
+    for name in ("lookup", "sales", "learn"):
+        workflow.add_node(name, make_node(name))
+    workflow.set_entry_point("lookup")
+    workflow.add_edge("lookup", "sales")
+    workflow.add_edge("sales", "learn")
+    workflow.add_edge("learn", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def build_chat_graph(checkpointer):
+    workflow = StateGraph(ChatState)
+    workflow.add_node("reply", lambda state: {"messages": [AIMessage(content=f"resposta {len(state['messages'])}")]})
+    workflow.set_entry_point("reply")
+    workflow.add_edge("reply", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def make_client(rows=None, legacy_rows=None, write_rows=None, message_rows=None):
+    client = Mock()
+    select = client.table.return_value.select.return_value
+    select.eq.return_value.eq.return_value.eq.return_value.order.return_value.execute.return_value = \
+        Mock(data=message_rows or [])
+    select.eq.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = \
+        Mock(data=rows or [])
+    select.eq.return_value.eq.return_value.eq.return_value.execute.return_value = \
+        Mock(data=write_rows or [])
+    # Conversa existente em multi_agent_conversations (sem checkpoint antigo)
+    select.eq.return_value.eq.return_value.limit.return_value.execute.return_value = \
+        Mock(data=legacy_rows if legacy_rows is not None else [{"metadata": {}}])
+    # RPC retorna o checkpoint gravado como vigente (sem outra réplica)
+    client.rpc.side_effect = lambda name, params: Mock(execute=Mock(return_value=Mock(
+        data={
+            "applied": True,
+            "version": params["p_version"],
+            "checkpoint_id": params["p_checkpoint_id"],
+            "writer_id": params["p_writer_id"]
+        }
+    )))
+    return client
+
+
+class FakeQuery:
+    """Query encadeável sobre as tabelas em memória de FakeDatabase"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = {}
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, count):
+        return self
+
+    def order(self, column):
+        return self
+
+    def upsert(self, rows, **kwargs):
+        return self
+
+    def execute(self):
+        return Mock(data=self.db.select(self.table, self.filters))
+
+
+class FakeDatabase:
+    """Cliente Supabase compartilhado por duas réplicas, com a semântica do RPC de gravação"""
+
+    def __init__(self):
+        self.checkpoints = {}
+        self.messages = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def select(self, table, filters):
+        if table == "multi_agent_conversations":
+            return [{"metadata": {}}]
+        key = (filters.get("thread_id"), filters.get("checkpoint_ns"))
+        if table == "langgraph_checkpoints":
+            row = self.checkpoints.get(key)
+            return [dict(row)] if row else []
+        if table == "langgraph_checkpoint_messages":
+            return [dict(m) for _, m in sorted(self.messages.get(key, {}).items())]
+        return []
+
+    def rpc(self, name, params):
+        key = (params["p_thread_id"], params["p_checkpoint_ns"])
+        row = self.checkpoints.get(key)
+        applied = row is None or (
+            row["version"] < params["p_version"]
+            and row["tenant_id"] == params["p_tenant_id"]
+            and (
+                params.get("p_base_version") is None
+                or row["version"] == params["p_base_version"]
+                or row["writer_id"] == params.get("p_writer_id")
+            )
+        )
+        if applied:
+            self.checkpoints[key] = {
+                "tenant_id": params["p_tenant_id"],
+                "checkpoint_id": params["p_checkpoint_id"],
+                "parent_checkpoint_id": params["p_parent_checkpoint_id"],
+                "version": params["p_version"],
+                "checkpoint_type": params["p_checkpoint_type"],
+                "checkpoint": params["p_checkpoint"],
+                "metadata": params["p_metadata"],
+                "messages_count": params["p_messages_count"],
+                "writer_id": params.get("p_writer_id")
+            }
+            messages = self.messages.setdefault(key, {})
+            for seq in [seq for seq in messages if seq >= params["p_messages_count"]]:
+                del messages[seq]
+            for message in params["p_messages"]:
+                messages[message["seq"]] = dict(message)
+        row = self.checkpoints[key]
+        return Mock(execute=Mock(return_value=Mock(data={
+            "applied": applied,
+            "version": row["version"],
+            "checkpoint_id": row["checkpoint_id"],
+            "writer_id": row["writer_id"]
+        })))
+
+
+class GatedExecutor(ThreadedSupabaseExecutor):
+    """Executor cujas chamadas feitas com `gated` ligado esperam `release`"""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.gated = True
+        self.release = asyncio.Event()
+
+    async def run(self, build):
+        if self.gated:
+            await self.release.wait()
+        return await super().run(build)
+
+
+def rpc_payloads(client):
+    return [c.args[1] for c in client.rpc.call_args_list if c.args[0] == "put_langgraph_checkpoint"]
+
+
+def upserted_writes(client):
+    return [row for c in client.table.return_value.upsert.call_args_list for row in c.args[0]]
+
+
+class TestCheckpointerCoalescing:
+    """Testes da gravação agrupada"""
+
+    def test_run_persists_once_at_graph_end(self):
+        """Checkpoints de todas as transições viram uma única gravação"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=60)
+        graph = build_graph(checkpointer)
+
+        result = graph.invoke({"steps": []}, THREAD)
+
+        assert result["steps"] == ["lookup", "sales", "learn"]
+        payloads = rpc_payloads(client)
+        assert len(payloads) == 1
+        assert payloads[0]["p_tenant_id"] == 1
+        assert payloads[0]["p_conversation_id"] == 42
+        # input, __start__ e 3 nodes
+        assert payloads[0]["p_version"] == 5
+        assert checkpointer.get_stats()["pending_threads"] == 0
+        checkpointer.close()
+
+    def test_next_run_reads_from_cache(self):
+        """Nova execução na thread continua do cache, sem reler o banco"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=60)
+        graph = build_graph(checkpointer)
+
+        graph.invoke({"steps": []}, THREAD)
+        reads = client.table.return_value.select.call_count
+        result = graph.invoke({"steps": []}, THREAD)
+
+        assert result["steps"] == ["lookup", "sales", "learn"] * 2
+        assert client.table.return_value.select.call_count == reads
+        assert rpc_payloads(client)[-1]["p_version"] == 10
+        checkpointer.close()
+
+    def test_intermediate_checkpoint_written_after_delay(self):
+        """Execução interrompida: checkpoint pendente gravado após o intervalo"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=0.1)
+        checkpoint = empty_checkpoint()
+        checkpoint["updated_channels"] = ["branch:to:sales"]
+
+        checkpointer.put(THREAD, checkpoint, {"source": "loop", "step": 0}, {})
+        assert rpc_payloads(client) == []
+
+        time.sleep(0.3)
+        assert len(rpc_payloads(client)) == 1
+        checkpointer.close()
+
+    def test_stale_replica_does_not_overwrite_other_replica(self):
+        """Réplica com cache obsoleto tem a gravação rejeitada e relê a thread"""
+        db = FakeDatabase()
+        replica_a = MultiTenantCheckpointer(client=db, flush_delay_seconds=60)
+        replica_b = MultiTenantCheckpointer(client=db, flush_delay_seconds=60)
+
+        build_graph(replica_a).invoke({"steps": []}, THREAD)
+        # Próximo turno atendido pela réplica B (lê a versão 5 gravada por A)
+        build_graph(replica_b).invoke({"steps": []}, THREAD)
+        assert db.checkpoints[("tenant_1_conv_42", "")]["version"] == 10
+
+        # A ainda tem a versão 5 no cache: a execução falha sem sobrescrever B
+        with pytest.raises(CheckpointConflictError):
+            build_graph(replica_a).invoke({"steps": []}, THREAD)
+        assert replica_a.get_stats()["conflicts"] == 1
+        stored = db.checkpoints[("tenant_1_conv_42", "")]
+        assert stored["version"] == 10
+        assert replica_b._deserialize(stored["checkpoint_type"], stored["checkpoint"])[
+            "channel_values"]["steps"] == ["lookup", "sales", "learn"] * 2
+
+        # Próxima execução em A parte do turno gravado por B
+        result = build_graph(replica_a).invoke({"steps": []}, THREAD)
+        assert result["steps"] == ["lookup", "sales", "learn"] * 3
+        assert db.checkpoints[("tenant_1_conv_42", "")]["version"] == 15
+        replica_a.close()
+        replica_b.close()
+
+    def test_out_of_order_own_writes_not_conflict(self):
+        """Gravação da própria entrada superada por outra mais nova não é conflito"""
+        client = make_client()
+        client.rpc.side_effect = lambda name, params: Mock(execute=Mock(return_value=Mock(
+            data={"applied": False, "version": 99, "checkpoint_id": "mais-novo",
+                  "writer_id": params["p_writer_id"]}
+        )))
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=60)
+
+        build_graph(checkpointer).invoke({"steps": []}, THREAD)
+
+        assert checkpointer.get_stats()["conflicts"] == 0
+        assert checkpointer.get_stats()["pending_threads"] == 0
+        checkpointer.close()
+
+
+class TestCheckpointerLoad:
+    """Testes da leitura do banco"""
+
+    def test_load_versioned_row(self):
+        """Checkpoint da tabela versionada; próxima versão continua a sequência"""
+        writer = MultiTenantCheckpointer(client=make_client(), flush_delay_seconds=0)
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"steps": ["lookup"]}
+        checkpoint_type, payload = writer._serialize(checkpoint)
+
+        client = make_client(rows=[{
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": None,
+            "version": 7,
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": payload,
+            "metadata": {"step": 3}
+        }])
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=0)
+
+        loaded = checkpointer.get_tuple(THREAD)
+        assert loaded.checkpoint["channel_values"] == {"steps": ["lookup"]}
+        assert loaded.config["configurable"]["checkpoint_id"] == checkpoint["id"]
+
+        checkpointer.put(loaded.config, empty_checkpoint(), {"source": "loop", "step": 4}, {})
+        assert rpc_payloads(client)[0]["p_version"] == 8
+        assert rpc_payloads(client)[0]["p_parent_checkpoint_id"] == checkpoint["id"]
+
+    def test_load_legacy_metadata_checkpoint(self):
+        """Thread sem linha na tabela nova lê o checkpoint antigo da conversa"""
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"steps": ["legacy"]}
+        client = make_client(legacy_rows=[{
+            "metadata": {"langgraph_checkpoint": {"checkpoint": json.dumps(checkpoint), "metadata": {}}}
+        }])
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=0)
+
+        loaded = checkpointer.get_tuple(THREAD)
+
+        assert loaded.checkpoint["channel_values"] == {"steps": ["legacy"]}
+        assert checkpointer.get_stats()["legacy_loads"] == 1
+
+    def test_invalid_thread_id_rejected(self):
+        """Thread ID fora do formato multi-tenant não é lido nem gravado"""
+        checkpointer = MultiTenantCheckpointer(client=make_client(), flush_delay_seconds=0)
+        config = {"configurable": {"thread_id": "5511999999999"}}
+
+        assert checkpointer.get_tuple(config) is None
+        with pytest.raises(ValueError):
+            checkpointer.put(config, empty_checkpoint(), {}, {})
+
+
+class TestCheckpointerAsync:
+    """Testes da interface assíncrona usada por graph.ainvoke"""
+
+    @pytest.mark.asyncio
+    async def test_ainvoke_uses_async_pool_only(self):
+        """aget_tuple/aput/aput_writes rodam no pool assíncrono, nunca no cliente síncrono"""
+        sync_client = Mock()
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(
+            client=sync_client, db=ThreadedSupabaseExecutor(client), flush_delay_seconds=60
+        )
+        graph = build_graph(checkpointer)
+
+        result = await graph.ainvoke({"steps": []}, THREAD)
+
+        assert result["steps"] == ["lookup", "sales", "learn"]
+        assert len(rpc_payloads(client)) == 1
+        sync_client.table.assert_not_called()
+        sync_client.rpc.assert_not_called()
+
+        saved = await checkpointer.aget_tuple(THREAD)
+        assert saved.checkpoint["channel_values"]["steps"] == ["lookup", "sales", "learn"]
+        await checkpointer.aclose()
+
+    @pytest.mark.asyncio
+    async def test_task_writes_persisted_without_checkpoint_rewrite(self):
+        """Writes das tasks vão para linhas próprias; erro da task fica como write pendente"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(
+            client=Mock(), db=ThreadedSupabaseExecutor(client), flush_delay_seconds=60
+        )
+        graph = build_graph(checkpointer, failing_node="sales")
+
+        with pytest.raises(RuntimeError):
+            await graph.ainvoke({"steps": []}, THREAD)
+
+        writes = upserted_writes(client)
+        assert {row["channel"] for row in writes} >= {"steps", "__error__"}
+        assert all(row["tenant_id"] == 1 and row["thread_id"] == "tenant_1_conv_42" for row in writes)
+        error_row = next(row for row in writes if row["channel"] == "__error__")
+        assert error_row["idx"] == -1
+        # Execução interrompida: checkpoint intermediário ainda não gravado
+        assert rpc_payloads(client) == []
+
+        saved = await checkpointer.aget_tuple(THREAD)
+        assert error_row["checkpoint_id"] == saved.checkpoint["id"]
+        assert [write[1] for write in saved.pending_writes] == ["__error__"]
+
+        assert await checkpointer.aflush() == 1
+        assert rpc_payloads(client)[0]["p_checkpoint_id"] == saved.checkpoint["id"]
+        await checkpointer.aclose()
+
+    @pytest.mark.asyncio
+    async def test_writes_before_first_put_kept(self):
+        """Writes recebidos enquanto o primeiro aput da thread ainda lê o banco não se perdem"""
+        db = GatedExecutor(make_client())
+        checkpointer = MultiTenantCheckpointer(client=Mock(), db=db, flush_delay_seconds=60)
+        checkpoint = empty_checkpoint()
+        checkpoint["updated_channels"] = ["branch:to:sales"]
+
+        put = asyncio.create_task(checkpointer.aput(THREAD, checkpoint, {"source": "loop", "step": 0}, {}))
+        await asyncio.sleep(0.05)
+        db.gated = False
+        config = {"configurable": {"thread_id": "tenant_1_conv_42", "checkpoint_ns": "", "checkpoint_id": checkpoint["id"]}}
+        await checkpointer.aput_writes(config, [("__error__", RuntimeError("sales indisponível"))], "task-1")
+        db.release.set()
+        await put
+
+        saved = await checkpointer.aget_tuple(THREAD)
+        assert [write[1] for write in saved.pending_writes] == ["__error__"]
+        await checkpointer.aclose()
+
+    @pytest.mark.asyncio
+    async def test_pending_writes_loaded_with_checkpoint(self):
+        """Após reinício, o checkpoint volta com os writes das tasks concluídas"""
+        writer = MultiTenantCheckpointer(client=Mock(), db=Mock(), flush_delay_seconds=0)
+        checkpoint = empty_checkpoint()
+        checkpoint_type, payload = writer._serialize(checkpoint)
+        value_type, value = writer._serialize(["lookup"])
+
+        client = make_client(
+            rows=[{
+                "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": None,
+                "version": 2,
+                "checkpoint_type": checkpoint_type,
+                "checkpoint": payload,
+                "metadata": {}
+            }],
+            write_rows=[
+                {"checkpoint_id": checkpoint["id"], "task_id": "task-1", "idx": 0,
+                 "channel": "steps", "value_type": value_type, "value": value},
+                {"checkpoint_id": "00000000-checkpoint-antigo", "task_id": "task-0", "idx": 0,
+                 "channel": "steps", "value_type": value_type, "value": value}
+            ]
+        )
+        checkpointer = MultiTenantCheckpointer(client=Mock(), db=ThreadedSupabaseExecutor(client))
+
+        loaded = await checkpointer.aget_tuple(THREAD)
+
+        assert loaded.pending_writes == [("task-1", "steps", ["lookup"])]
+
+
+class TestCheckpointerCompactFormat:
+    """Testes do formato compacto (compressão e mensagens append-only)"""
+
+    def test_large_payload_compressed(self):
+        """Payloads grandes são gravados comprimidos e lidos de volta"""
+        checkpointer = MultiTenantCheckpointer(client=make_client(), flush_delay_seconds=0)
+        value = {"history": ["Olá, gostaria de saber o preço do produto"] * 200}
+
+        value_type, payload = checkpointer._serialize(value)
+
+        assert value_type == "msgpack+zlib"
+        assert len(payload) * 5 < len(checkpointer.serde.dumps_typed(value)[1])
+        assert checkpointer._deserialize(value_type, payload) == value
+        assert checkpointer._serialize(["curto"])[0] == "msgpack"
+
+    def test_only_new_messages_written_each_turn(self):
+        """Cada turno envia apenas as mensagens novas, fora do checkpoint"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=60)
+        graph = build_chat_graph(checkpointer)
+
+        graph.invoke({"messages": [HumanMessage(content="Oi")]}, THREAD)
+        graph.invoke({"messages": [HumanMessage(content="Quanto custa?")]}, THREAD)
+
+        first, second = rpc_payloads(client)
+        assert [m["seq"] for m in first["p_messages"]] == [0, 1]
+        assert [m["seq"] for m in second["p_messages"]] == [2, 3]
+        assert second["p_messages_count"] == 4
+        stored = checkpointer._deserialize(second["p_checkpoint_type"], second["p_checkpoint"])
+        assert "messages" not in stored["channel_values"]
+        assert checkpointer._deserialize(
+            second["p_messages"][0]["value_type"], second["p_messages"][0]["value"]
+        ).content == "Quanto custa?"
+        checkpointer.close()
+
+    def test_history_rewritten_from_removed_message(self):
+        """Mensagem removida: histórico regravado a partir dela"""
+        client = make_client()
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=60)
+        graph = build_chat_graph(checkpointer)
+        graph.invoke({"messages": [HumanMessage(content="Oi", id="m1")]}, THREAD)
+
+        first_reply = graph.get_state(THREAD).values["messages"][1]
+        graph.invoke({"messages": [RemoveMessage(id=first_reply.id), HumanMessage(content="Oi de novo", id="m2")]}, THREAD)
+
+        payload = rpc_payloads(client)[-1]
+        # [m1, m2, resposta]: m2 ocupa a posição da resposta removida
+        assert payload["p_messages_count"] == 3
+        assert [m["seq"] for m in payload["p_messages"]] == [1, 2]
+        checkpointer.close()
+
+    def test_load_reassembles_history(self):
+        """Histórico remontado das linhas; próxima gravação continua do fim"""
+        writer = MultiTenantCheckpointer(client=make_client(), flush_delay_seconds=0)
+        history = [HumanMessage(content="Oi", id="m1"), AIMessage(content="Olá!", id="m2")]
+        checkpoint = empty_checkpoint()
+        checkpoint_type, payload = writer._serialize(checkpoint)
+        message_rows = [
+            {"seq": seq, "value_type": value_type, "value": value}
+            for seq, (value_type, value) in enumerate(writer._serialize(message) for message in history)
+        ]
+
+        client = make_client(rows=[{
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": None,
+            "version": 3,
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": payload,
+            "metadata": {},
+            "messages_count": 2
+        }], message_rows=message_rows)
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=0)
+
+        loaded = checkpointer.get_tuple(THREAD)
+        assert loaded.checkpoint["channel_values"]["messages"] == history
+
+        next_checkpoint = empty_checkpoint()
+        next_checkpoint["channel_values"] = {
+            "messages": loaded.checkpoint["channel_values"]["messages"] + [HumanMessage(content="Tchau", id="m3")]
+        }
+        checkpointer.put(loaded.config, next_checkpoint, {"source": "input", "step": -1}, {})
+
+        payload = rpc_payloads(client)[0]
+        assert [m["seq"] for m in payload["p_messages"]] == [2]
+        assert payload["p_messages_count"] == 3
+
+    def test_inline_history_moved_to_rows_on_next_write(self):
+        """Checkpoint com mensagens embutidas (formato anterior) é convertido na próxima gravação"""
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": [HumanMessage(content="Oi", id="m1")]}
+        writer = MultiTenantCheckpointer(client=make_client(), flush_delay_seconds=0)
+        checkpoint_type, payload = writer._serialize(checkpoint)
+        client = make_client(rows=[{
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": None,
+            "version": 1,
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": payload,
+            "metadata": {}
+        }])
+        checkpointer = MultiTenantCheckpointer(client=client, flush_delay_seconds=0)
+
+        loaded = checkpointer.get_tuple(THREAD)
+        checkpointer.put(loaded.config, loaded.checkpoint, {"source": "input", "step": -1}, {})
+
+        payload = rpc_payloads(client)[0]
+        assert [m["seq"] for m in payload["p_messages"]] == [0]
+        stored = checkpointer._deserialize(payload["p_checkpoint_type"], payload["p_checkpoint"])
+        assert "messages" not in stored["channel_values"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
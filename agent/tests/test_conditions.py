@@ -0,0 +1,114 @@
+"""
+Testes unitários para a árvore de condições de automação
+
+Valida operadores, precedência AND/OR, grupos, curto-circuito e a
+ordenação por custo.
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation.schemas import (
+    RuleCondition,
+    RuleConditionGroup,
+    parse_condition_item
+)
+from agent.src.services.automation import conditions as conditions_module
+from agent.src.services.automation.conditions import build_condition_tree, compile_conditions
+
+
+def cond(field, operator, value, logic="AND"):
+    return RuleCondition(field=field, operator=operator, value=value, logic=logic)
+
+
+class TestConditions:
+    """Testes das condições compiladas"""
+
+    def test_operators(self):
+        """Operadores mantêm a semântica da avaliação interpretada"""
+        context = {"message": {"text": "Quero um COLCHÃO"}, "score": "42", "tags": ["vip"], "city": "SP"}
+
+        assert compile_conditions([cond("message.text", "contains", "colchão")])(context)
+        assert not compile_conditions([cond("message.missing", "contains", "x")])(context)
+        assert compile_conditions([cond("score", "greater_than", 10)])(context)
+        assert not compile_conditions([cond("score", "less_than", "abc")])(context)
+        assert compile_conditions([cond("city", "in_list", ["SP", "RJ"])])(context)
+        assert not compile_conditions([cond("tags", "in_list", ["vip"])])(context)
+        assert compile_conditions([cond("tags", "not_empty", None)])(context)
+        assert compile_conditions([cond("city", "equals", "SP")])(context)
+        assert compile_conditions([])({})
+
+    def test_and_binds_tighter_than_or(self):
+        """a OR b AND c == a OR (b AND c)"""
+        predicate = compile_conditions([
+            cond("a", "equals", 1, logic="OR"),
+            cond("b", "equals", 1, logic="AND"),
+            cond("c", "equals", 1)
+        ])
+
+        assert predicate({"a": 1})
+        assert predicate({"b": 1, "c": 1})
+        assert not predicate({"b": 1})
+
+    def test_groups(self):
+        """Grupos funcionam como parênteses: (a OR b) AND c"""
+        group = parse_condition_item({
+            "conditions": [
+                {"field": "a", "operator": "equals", "value": 1, "logic": "OR"},
+                {"field": "b", "operator": "equals", "value": 1}
+            ],
+            "logic": "AND"
+        })
+        assert isinstance(group, RuleConditionGroup)
+
+        predicate = compile_conditions([group, cond("c", "equals", 1)])
+
+        assert predicate({"b": 1, "c": 1})
+        assert not predicate({"a": 1})
+        assert repr(build_condition_tree([group, cond("c", "equals", 1)])) == "(c equals 1 AND (a equals 1 OR b equals 1))"
+
+    def test_short_circuit_with_cheap_conditions_first(self):
+        """Contains em texto longo não é avaliado se uma condição barata falha"""
+        items = [
+            cond("message", "contains", "comprar"),
+            cond("channel", "equals", "whatsapp")
+        ]
+        calls = []
+        original = conditions_module.compile_condition
+
+        def tracking_compile(condition):
+            predicate = original(condition)
+
+            def tracked(context):
+                calls.append(condition.field)
+                return predicate(context)
+            return tracked
+
+        with patch.object(conditions_module, "compile_condition", tracking_compile):
+            predicate = compile_conditions(items)
+
+        assert not predicate({"channel": "site", "message": "quero comprar " * 500})
+        assert calls == ["channel"]
+
+    def test_nested_and_is_flattened_for_ordering(self):
+        """AND dentro de AND é achatado para ordenar todos os filhos"""
+        group = RuleConditionGroup(conditions=[
+            cond("message", "contains", "x"),
+            cond("city", "equals", "SP")
+        ])
+
+        tree = build_condition_tree([cond("customer.tags", "in_list", ["vip"]), group])
+
+        assert [repr(child).split(" ")[0] for child in tree.children] == ["city", "customer.tags", "message"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
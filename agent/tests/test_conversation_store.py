@@ -0,0 +1,170 @@
+"""
+Testes unitários para ConversationStore
+
+Valida o cache de customer/conversa, a RPC única no cache frio, a gravação
+condicionada à conversa ainda aberta e o fallback para queries sequenciais.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import Mock
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.conversation_store import ConversationStore, resolve_identity
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+
+def make_client(rpc_error: Exception = None, open_conversations=("conv-1",)):
+    client = Mock()
+    if rpc_error:
+        client.rpc.return_value.execute.side_effect = rpc_error
+    else:
+        def rpc(name, params):
+            if name == "insert_open_conversation_message":
+                # Mensagem gravada só se a conversa ainda estiver aberta
+                opened = params["p_conversation_id"] in open_conversations
+                return Mock(execute=Mock(return_value=Mock(data="msg-2" if opened else None)))
+            return Mock(execute=Mock(return_value=Mock(data=[
+                {"customer_id": "cust-1", "conversation_id": open_conversations[-1], "message_id": "msg-1"}
+            ])))
+        client.rpc.side_effect = rpc
+    client.table.return_value.insert.return_value.execute.return_value = Mock(data=[{"id": "row-1"}])
+    client.table.return_value.select.return_value.eq.return_value.execute.return_value = Mock(data=[])
+    client.table.return_value.select.return_value.eq.return_value.eq.return_value.eq.return_value \
+        .execute.return_value = Mock(data=[])
+    return client
+
+
+def rpc_names(client):
+    return [c.args[0] for c in client.rpc.call_args_list]
+
+
+class TestConversationStore:
+    """Testes do store de conversas"""
+
+    def test_resolve_identity(self):
+        """Canal e dados do customer seguem o identificador"""
+        site = resolve_identity("site_abc12345678")
+        assert site.channel == "site"
+        assert site.customer_phone is None
+        assert site.customer_email == "site_abc12345678@slimquality.temp"
+
+        whatsapp = resolve_identity("5511999998888")
+        assert whatsapp.channel == "whatsapp"
+        assert whatsapp.customer_phone == "5511999998888"
+
+    @pytest.mark.asyncio
+    async def test_cold_miss_uses_single_rpc_then_cached_insert(self):
+        """Primeira mensagem usa a RPC completa; as seguintes apenas o INSERT condicionado"""
+        client = make_client()
+        store = ConversationStore(ThreadedSupabaseExecutor(client))
+
+        assert await store.save_message("5511999998888", "olá") == "conv-1"
+        assert await store.save_message("5511999998888", "resposta", "agent") == "conv-1"
+
+        assert rpc_names(client) == ["save_conversation_message", "insert_open_conversation_message"]
+        inserted = client.rpc.call_args.args[1]
+        assert inserted["p_conversation_id"] == "conv-1"
+        assert inserted["p_sender_type"] == "agent"
+        client.table.assert_not_called()
+        assert store.get_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_resolve_once(self):
+        """Mensagens simultâneas de um cliente novo geram uma única RPC"""
+        client = make_client()
+        store = ConversationStore(ThreadedSupabaseExecutor(client))
+
+        await asyncio.gather(*[store.save_message("5511999998888", f"msg {i}") for i in range(5)])
+
+        assert rpc_names(client).count("save_conversation_message") == 1
+        assert rpc_names(client).count("insert_open_conversation_message") == 4
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry_and_invalidation(self):
+        """Entradas expiradas ou invalidadas voltam a usar a RPC"""
+        client = make_client()
+        store = ConversationStore(ThreadedSupabaseExecutor(client), ttl_seconds=0)
+
+        await store.save_message("5511999998888", "um")
+        await store.save_message("5511999998888", "dois")
+        assert rpc_names(client).count("save_conversation_message") == 2
+
+        store.ttl_seconds = 60
+        await store.save_message("5511999998888", "três")
+        store.invalidate("5511999998888")
+        await store.save_message("5511999998888", "quatro")
+        assert rpc_names(client).count("save_conversation_message") == 4
+
+    @pytest.mark.asyncio
+    async def test_closed_conversation_in_cache_resolved_again(self):
+        """Conversa encerrada após entrar no cache não recebe mais mensagens"""
+        open_conversations = ["conv-1"]
+        client = make_client(open_conversations=open_conversations)
+        store = ConversationStore(ThreadedSupabaseExecutor(client))
+
+        assert await store.save_message("5511999998888", "olá") == "conv-1"
+        # Conversa encerrada fora do agente; a próxima aberta é conv-2
+        open_conversations[:] = ["conv-2"]
+        assert await store.save_message("5511999998888", "voltei") == "conv-2"
+        assert await store.save_message("5511999998888", "tudo bem?") == "conv-2"
+
+        assert rpc_names(client) == [
+            "save_conversation_message",
+            "insert_open_conversation_message",
+            "save_conversation_message",
+            "insert_open_conversation_message"
+        ]
+        assert store.get_stats()["closed_conversations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_when_rpc_missing(self):
+        """Sem a RPC instalada, usa as queries sequenciais e não tenta a RPC de novo"""
+        client = make_client(rpc_error=Exception("PGRST202: save_conversation_message not found"))
+        store = ConversationStore(ThreadedSupabaseExecutor(client))
+
+        await store.save_message("5511999998888", "olá")
+        store.invalidate("5511999998888")
+        await store.save_message("5511999998888", "de novo")
+
+        client.rpc.assert_called_once()
+        assert store.get_stats()["fallback_calls"] == 2
+        tables = [c.args[0] for c in client.table.call_args_list]
+        assert tables[:4] == ["customers", "customers", "conversations", "conversations"]
+        assert tables[4] == "messages"
+
+
+    @pytest.mark.asyncio
+    async def test_status_checked_when_insert_rpc_missing(self):
+        """Sem a RPC de INSERT condicionado, confere o status antes de gravar"""
+        client = make_client()
+        save_rpc = client.rpc.side_effect
+
+        def rpc(name, params):
+            if name == "insert_open_conversation_message":
+                raise Exception("PGRST202: insert_open_conversation_message not found")
+            return save_rpc(name, params)
+        client.rpc.side_effect = rpc
+        status = client.table.return_value.select.return_value.eq.return_value.eq.return_value.execute
+        status.return_value = Mock(data=[{"id": "conv-1"}])
+        store = ConversationStore(ThreadedSupabaseExecutor(client))
+
+        await store.save_message("5511999998888", "olá")
+        assert await store.save_message("5511999998888", "de novo") == "conv-1"
+        status.return_value = Mock(data=[])
+        await store.save_message("5511999998888", "encerrada")
+
+        assert rpc_names(client).count("insert_open_conversation_message") == 1
+        assert client.table.return_value.insert.call_count == 1
+        assert rpc_names(client).count("save_conversation_message") == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+"""
+Testes unitários para EmbeddingCache - SICC
+
+Valida LRU em memória, persistência em disco e contadores de métricas.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+from unittest.mock import Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc.embedding_cache import EmbeddingCache, normalize_text
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def vector(seed: int, dimensions: int = 8) -> np.ndarray:
+    v = np.arange(1, dimensions + 1, dtype=np.float32) * (seed + 1)
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def metrics():
+    with patch('agent.src.services.sicc.embedding_cache.get_metrics_service') as mock_get:
+        mock_metrics = Mock()
+        mock_get.return_value = mock_metrics
+        yield mock_metrics
+
+
+class TestEmbeddingCache:
+    """Testes do cache de embeddings"""
+
+    def test_normalized_text_shares_key(self, metrics):
+        """Variações de espaçamento devem gerar a mesma chave"""
+        cache = EmbeddingCache(MODEL, dimensions=8)
+
+        assert normalize_text("  Olá   mundo\n") == "Olá mundo"
+        assert cache.make_key("Olá mundo") == cache.make_key(" Olá  mundo ")
+
+    def test_model_name_is_part_of_key(self, metrics):
+        """Modelos diferentes não compartilham entradas"""
+        cache_a = EmbeddingCache("modelo-a", dimensions=8)
+        cache_b = EmbeddingCache("modelo-b", dimensions=8)
+
+        assert cache_a.make_key("texto") != cache_b.make_key("texto")
+
+    def test_hit_miss_and_lru_eviction(self, metrics):
+        """Entrada menos usada é removida ao exceder o limite"""
+        cache = EmbeddingCache(MODEL, dimensions=8, max_entries=2)
+
+        assert cache.get("a") is None
+        cache.put("a", vector(1))
+        cache.put("b", vector(2))
+        assert cache.get("a") is not None  # "a" passa a ser a mais recente
+        cache.put("c", vector(3))          # remove "b"
+
+        assert cache.get("b") is None
+        assert np.allclose(cache.get("c"), vector(3))
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 2
+        assert stats["evictions"] == 1
+
+        operations = [c.kwargs["operation"] for c in metrics.record_cache_metric.call_args_list]
+        assert operations.count("hit") == 2
+        assert operations.count("miss") == 2
+        assert operations.count("evict") == 1
+        assert all(
+            c.kwargs["service"] == "embedding"
+            for c in metrics.record_cache_metric.call_args_list
+        )
+
+    def test_disk_tier_survives_restart(self, metrics, tmp_path):
+        """Entradas gravadas em disco são recuperadas por uma nova instância"""
+        cache = EmbeddingCache(MODEL, dimensions=8, disk_dir=str(tmp_path))
+        cache.put("colchão magnético", vector(5))
+        cache.flush()
+
+        restarted = EmbeddingCache(MODEL, dimensions=8, disk_dir=str(tmp_path))
+        cached = restarted.get("colchão magnético")
+
+        assert cached is not None
+        assert np.allclose(cached, vector(5))
+        assert restarted.get_stats()["disk_hits"] == 1
+
+    def test_disk_tier_reuses_slots_circularly(self, metrics, tmp_path):
+        """Camada em disco sobrescreve o slot mais antigo quando cheia"""
+        cache = EmbeddingCache(
+            MODEL, dimensions=8, max_entries=1, disk_dir=str(tmp_path), disk_capacity=2
+        )
+        cache.put("a", vector(1))
+        cache.put("b", vector(2))
+        cache.put("c", vector(3))
+
+        assert cache.get("a") is None
+        assert np.allclose(cache.get("b"), vector(2))
+        assert cache.get_stats()["disk_evictions"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+"""
+Testes unitários para EmbeddingEngine - SICC
+
+Valida micro-batching e deduplicação sem carregar o modelo real.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+import numpy as np
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc.embedding_engine import EmbeddingEngine
+
+
+class FakeModel:
+    """Modelo falso que registra cada chamada de encode"""
+
+    def __init__(self, dimensions: int = 8):
+        self.dimensions = dimensions
+        self.calls = []
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        return np.array([
+            [float(len(text) + i) for i in range(self.dimensions)]
+            for text in texts
+        ])
+
+
+def make_engine(model, **kwargs):
+    async def loader():
+        return model
+    return EmbeddingEngine(loader, **kwargs)
+
+
+class TestEmbeddingEngine:
+    """Testes do motor de embeddings"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_encode(self):
+        """Chamadas concorrentes devem resultar em um único encode"""
+        model = FakeModel()
+        engine = make_engine(model, max_batch_size=32, max_wait_ms=5)
+
+        texts = [f"mensagem {i}" for i in range(10)]
+        results = await asyncio.gather(*(engine.encode(t) for t in texts))
+
+        assert len(model.calls) == 1
+        assert sorted(model.calls[0]) == sorted(texts)
+        assert len(results) == 10
+
+    @pytest.mark.asyncio
+    async def test_duplicate_texts_are_encoded_once(self):
+        """Textos idênticos no mesmo lote são codificados uma vez"""
+        model = FakeModel()
+        engine = make_engine(model)
+
+        results = await engine.encode_many(["oi", " oi ", "olá", "oi"])
+
+        assert model.calls == [["oi", "olá"]]
+        assert np.allclose(results[0], results[1])
+        assert np.allclose(results[0], results[3])
+        assert engine.get_stats()["deduplicated"] == 2
+
+    @pytest.mark.asyncio
+    async def test_embeddings_are_normalized(self):
+        """Vetores retornados devem ter norma unitária"""
+        engine = make_engine(FakeModel())
+
+        vectors = await engine.encode_many(["colchão magnético", "preço"])
+
+        for vector in vectors:
+            assert np.isclose(np.linalg.norm(vector), 1.0, atol=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_immediately(self):
+        """Lote cheio é despachado sem aguardar o timer"""
+        model = FakeModel()
+        engine = make_engine(model, max_batch_size=2, max_wait_ms=10_000)
+
+        results = await asyncio.wait_for(engine.encode_many(["a", "b"]), timeout=1)
+
+        assert len(results) == 2
+        assert len(model.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_model_error_propagates_to_all_waiters(self):
+        """Falha no modelo deve ser repassada a todos os chamadores"""
+        class BrokenModel:
+            def encode(self, texts, batch_size=32):
+                raise RuntimeError("modelo indisponível")
+
+        engine = make_engine(BrokenModel())
+
+        results = await asyncio.gather(
+            engine.encode("a"), engine.encode("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
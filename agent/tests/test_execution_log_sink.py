@@ -0,0 +1,152 @@
+"""
+Testes unitários para ExecutionLogSink
+
+Valida a gravação em lote dos logs de execução, amostragem, back-pressure
+o flush final no shutdown e o descarte de logs recebidos após o close.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime
+from unittest.mock import Mock
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation.execution_log_sink import ExecutionLogSink
+from agent.src.services.automation.schemas import RuleExecution
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+
+def make_execution(conditions_met=True, status="success"):
+    return RuleExecution(
+        rule_id="rule-1",
+        trigger_type="message_received",
+        trigger_data={"message": "oi"},
+        conditions_met=conditions_met,
+        conditions_result={"total_conditions": 1},
+        execution_status=status,
+        duration_ms=3,
+        executed_at=datetime.now()
+    )
+
+
+def make_client(error: Exception = None):
+    client = Mock()
+    execute = client.table.return_value.insert.return_value.execute
+    if error:
+        execute.side_effect = error
+    else:
+        execute.return_value = Mock(data=[{"id": "log-1"}])
+    return client
+
+
+def inserted_batches(client):
+    return [c.args[0] for c in client.table.return_value.insert.call_args_list]
+
+
+class TestExecutionLogSink:
+    """Testes do sink de logs de execução"""
+
+    @pytest.mark.asyncio
+    async def test_batches_on_size_threshold(self):
+        """Logs de um gatilho viram um único INSERT multi-linha"""
+        client = make_client()
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), batch_size=5, flush_interval_seconds=60)
+
+        await asyncio.gather(*[sink.submit(f"rule-{i}", make_execution()) for i in range(5)])
+        await asyncio.sleep(0.1)
+
+        batches = inserted_batches(client)
+        assert len(batches) == 1
+        assert [row["rule_id"] for row in batches[0]] == [f"rule-{i}" for i in range(5)]
+        await sink.close()
+
+    @pytest.mark.asyncio
+    async def test_flushes_on_interval_and_drains_on_close(self):
+        """Lote parcial gravado no intervalo; pendentes gravados no close"""
+        client = make_client()
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), batch_size=100, flush_interval_seconds=0.05)
+
+        await sink.submit("rule-1", make_execution())
+        await asyncio.sleep(0.2)
+        assert len(inserted_batches(client)) == 1
+
+        sink.flush_interval_seconds = 60
+        for _ in range(3):
+            await sink.submit("rule-1", make_execution())
+        await sink.close()
+
+        assert sum(len(batch) for batch in inserted_batches(client)) == 4
+        assert sink.get_stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_samples_unmet_conditions(self):
+        """Condições não atendidas são amostradas; falhas sempre gravadas"""
+        client = make_client()
+        samples = iter([0.9, 0.05])
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), unmet_sample_rate=0.1,
+                                flush_interval_seconds=60, sampler=lambda: next(samples))
+
+        assert await sink.submit("rule-1", make_execution(conditions_met=False)) is False
+        assert await sink.submit("rule-1", make_execution(conditions_met=False)) is True
+        assert await sink.submit("rule-1", make_execution(conditions_met=False, status="failed")) is True
+        assert await sink.submit("rule-1", make_execution()) is True
+        await sink.close()
+
+        rows = inserted_batches(client)[0]
+        assert rows[0]["conditions_result"]["sample_rate"] == 0.1
+        assert "sample_rate" not in rows[1]["conditions_result"]
+        assert sink.get_stats()["sampled_out"] == 1
+
+    @pytest.mark.asyncio
+    async def test_backpressure_then_drop_when_full(self):
+        """Buffer cheio: produtor aguarda e, sem espaço, o log é descartado"""
+        client = make_client(error=RuntimeError("db indisponível"))
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), batch_size=10, max_buffer=2,
+                                max_wait_seconds=0.05, flush_interval_seconds=60, max_retries=100)
+
+        assert await sink.submit("rule-1", make_execution()) is True
+        assert await sink.submit("rule-2", make_execution()) is True
+        assert await sink.submit("rule-3", make_execution()) is False
+
+        stats = sink.get_stats()
+        assert stats["waits"] == 1
+        assert stats["dropped"] == 1
+        assert stats["pending"] == 2
+
+    @pytest.mark.asyncio
+    async def test_close_terminates_when_db_down(self):
+        """Shutdown termina com o banco indisponível, descartando após as tentativas"""
+        client = make_client(error=RuntimeError("db indisponível"))
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), flush_interval_seconds=60, max_retries=2)
+
+        await sink.submit("rule-1", make_execution())
+        await sink.close()
+
+        assert client.table.return_value.insert.call_count == 2
+        assert sink.get_stats()["dropped"] == 1
+
+
+    @pytest.mark.asyncio
+    async def test_submit_after_close_dropped(self):
+        """Log recebido após o close não fica preso no buffer"""
+        client = make_client()
+        sink = ExecutionLogSink(ThreadedSupabaseExecutor(client), flush_interval_seconds=60)
+
+        await sink.close()
+        assert await sink.submit("rule-1", make_execution()) is False
+
+        stats = sink.get_stats()
+        assert stats["dropped"] == 1
+        assert stats["pending"] == 0
+        assert client.table.return_value.insert.call_count == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,248 @@
+"""
+Testes unitários para IntentClassifier - SICC
+
+Valida a camada de regras, os centroides treinados com exemplos rotulados
+de cada tenant, o recurso ao LLM apenas com confiança local baixa, a
+retenção dos exemplos, o re-treino só com exemplos novos, o limite de
+tenants em memória e as estatísticas por camada.
+"""
+
+import pytest
+import os
+import sys
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, call
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc.intent_classifier import IntentClassifier
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+# Embeddings de 4 dimensões (um eixo por intenção)
+EMBEDDINGS = {
+    "aquele modelo queen": [0.1, 1.0, 0.0, 0.0],
+    "minha entrega": [0.0, 0.1, 1.0, 0.0],
+    "mensagem neutra": [0.5, 0.5, 0.5, 0.5],
+}
+AXES = {"discovery": [1.0, 0.0, 0.0, 0.0], "sales": [0.0, 1.0, 0.0, 0.0], "support": [0.0, 0.0, 1.0, 0.0]}
+
+
+class FakeMemoryService:
+    def __init__(self):
+        self.calls = 0
+        self.batches = 0
+
+    async def generate_embedding(self, text):
+        self.calls += 1
+        return EMBEDDINGS[text]
+
+    async def generate_embeddings(self, texts):
+        self.batches += 1
+        return [AXES[text] for text in texts]
+
+
+def make_classifier(client=None, **kwargs):
+    client = client or Mock()
+    return IntentClassifier(
+        memory_service=FakeMemoryService(),
+        db=ThreadedSupabaseExecutor(client),
+        min_confidence=0.6,
+        min_examples_per_intent=2,
+        **kwargs
+    )
+
+
+def trained(classifier, tenant_id=1):
+    classifier.train([(intent, axis) for intent, axis in AXES.items() for _ in range(2)], tenant_id)
+    # Treino a partir do banco já feito
+    classifier._model(tenant_id).trained_at = datetime.utcnow()
+    return classifier
+
+
+class TestIntentRules:
+    """Testes da camada de regras"""
+
+    def test_single_intent_match(self):
+        """Palavras-chave de uma só intenção respondem sem embedding nem LLM"""
+        classifier = make_classifier()
+
+        assert classifier.classify_rules("Qual o PREÇO do colchão queen?").intent == "sales"
+        assert classifier.classify_rules("Meu pedido ainda não chegou").intent == "support"
+        assert classifier.classify_rules("Oi, tudo bem?").intent == "discovery"
+
+    def test_conflicting_rules_defer(self):
+        """Mensagem que casa com mais de uma intenção segue para as próximas camadas"""
+        classifier = make_classifier()
+
+        assert classifier.classify_rules("Qual o valor da troca?") is None
+        assert classifier.classify_rules("Estou com dor nas costas") is None
+
+
+class TestIntentTiers:
+    """Testes da ordem das camadas"""
+
+    @pytest.mark.asyncio
+    async def test_centroid_answers_without_llm(self):
+        """Centroide confiante dispensa o LLM"""
+        classifier = trained(make_classifier())
+        llm = AsyncMock(return_value="support")
+
+        result = await classifier.classify("aquele modelo queen", llm, tenant_id=1)
+
+        assert (result.intent, result.tier) == ("sales", "centroid")
+        assert result.confidence >= 0.6
+        llm.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_low_confidence_falls_back_to_llm_and_learns(self):
+        """Confiança baixa chama o LLM; a resposta vira exemplo rotulado"""
+        client = Mock()
+        classifier = trained(make_classifier(client))
+        llm = AsyncMock(return_value="support")
+
+        result = await classifier.classify("mensagem neutra", llm, tenant_id=1)
+        await classifier.close()
+
+        assert (result.intent, result.tier) == ("support", "llm")
+        llm.assert_awaited_once()
+        client.table.return_value.insert.assert_called_once_with(
+            {"text": "mensagem neutra", "intent": "support", "source": "llm", "tenant_id": 1}
+        )
+        assert classifier.get_stats()["examples_per_intent"]["support"] == 3
+        # Embedding da mensagem reaproveitado no aprendizado
+        assert classifier.memory_service.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_llm_failure_not_learned(self):
+        """Erro do LLM usa discovery sem gravar exemplo"""
+        client = Mock()
+        classifier = trained(make_classifier(client))
+
+        result = await classifier.classify("mensagem neutra", AsyncMock(return_value=None), tenant_id=1)
+        await classifier.close()
+
+        assert (result.intent, result.tier) == ("discovery", "default")
+        client.table.return_value.insert.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stats_report_tier_share(self):
+        """Estatísticas mostram a fração respondida por cada camada"""
+        classifier = trained(make_classifier())
+        llm = AsyncMock(return_value="discovery")
+
+        await classifier.classify("Quanto custa?", llm, tenant_id=1)
+        await classifier.classify("minha entrega", llm, tenant_id=1)
+        await classifier.classify("mensagem neutra", llm, tenant_id=1)
+        await classifier.close()
+
+        stats = classifier.get_stats()
+        assert (stats["rules"], stats["centroid"], stats["llm"]) == (1, 1, 1)
+        assert stats["tier_share"]["rules"] == pytest.approx(1 / 3)
+        assert stats["centroids_active"] is True
+
+
+class TestIntentTraining:
+    """Testes do treino a partir de sicc_intent_examples"""
+
+    @pytest.mark.asyncio
+    async def test_refresh_trains_from_examples(self):
+        """Exemplos do tenant e compartilhados formam os centroides do tenant"""
+        client = Mock()
+        select = client.table.return_value.select.return_value
+        limit = select.or_.return_value.order.return_value.limit
+        limit.return_value.execute.side_effect = [
+            Mock(data=[{"created_at": "2026-10-17T10:00:00+00:00"}]),
+            Mock(data=[
+                {"text": intent, "intent": intent} for intent in AXES for _ in range(2)
+            ] + [{"text": "sales", "intent": "inválido"}])
+        ]
+        classifier = make_classifier(client)
+
+        assert await classifier.refresh(1) == 3
+        select.or_.assert_called_with("tenant_id.eq.1,tenant_id.is.null")
+        assert limit.call_args_list == [call(1), call(2000)]
+        assert classifier.get_stats()["examples_per_intent"] == {"discovery": 2, "sales": 2, "support": 2}
+        assert classifier.classify_embedding(EMBEDDINGS["minha entrega"], 1).intent == "support"
+        assert classifier.classify_embedding(EMBEDDINGS["minha entrega"], 2) is None
+
+    @pytest.mark.asyncio
+    async def test_refresh_skipped_without_new_examples(self):
+        """Re-treino sem exemplo novo não relê nem re-embeda os exemplos"""
+        client = Mock()
+        examples = Mock(data=[{"text": intent, "intent": intent} for intent in AXES for _ in range(2)])
+        client.table.return_value.select.return_value.or_.return_value.order.return_value.limit.return_value \
+            .execute.side_effect = [
+                Mock(data=[{"created_at": "2026-10-17T10:00:00+00:00"}]), examples,
+                Mock(data=[{"created_at": "2026-10-17T10:00:00+00:00"}]),
+                Mock(data=[{"created_at": "2026-10-17T11:00:00+00:00"}]), examples,
+            ]
+        classifier = make_classifier(client)
+
+        for _ in range(3):
+            assert await classifier.refresh(1) == 3
+
+        assert classifier.memory_service.batches == 2
+        assert classifier.get_stats()["trainings"] == 2
+        assert classifier.get_stats()["trainings_skipped"] == 1
+
+    def test_least_used_tenants_evicted(self):
+        """Centroides em memória limitados a max_tenants (LRU)"""
+        classifier = make_classifier(max_tenants=2)
+        trained(classifier, tenant_id=1)
+        trained(classifier, tenant_id=2)
+        classifier._model(1)
+        trained(classifier, tenant_id=3)
+
+        assert list(classifier._tenants) == [1, 3]
+        assert classifier.get_stats()["tenants"] == 2
+
+    @pytest.mark.asyncio
+    async def test_untrained_goes_to_llm(self):
+        """Sem centroides, a mensagem vai direto ao LLM"""
+        client = Mock()
+        client.table.return_value.select.return_value.or_.return_value.order.return_value.limit.return_value \
+            .execute.return_value = Mock(data=[])
+        classifier = make_classifier(client)
+        llm = AsyncMock(return_value="sales")
+
+        result = await classifier.classify("mensagem neutra", llm, tenant_id=1)
+        await classifier.close()
+
+        assert result.tier == "llm"
+        assert classifier.get_stats()["centroids_active"] is False
+
+    @pytest.mark.asyncio
+    async def test_examples_do_not_cross_tenants(self):
+        """Centroides e exemplos aprendidos de um tenant não respondem por outro"""
+        client = Mock()
+        client.table.return_value.select.return_value.or_.return_value.order.return_value.limit.return_value \
+            .execute.return_value = Mock(data=[])
+        classifier = trained(make_classifier(client), tenant_id=1)
+        classifier._model(2).trained_at = datetime.utcnow()
+        llm = AsyncMock(return_value="sales")
+
+        result = await classifier.classify("aquele modelo queen", llm, tenant_id=2)
+        await classifier.close()
+
+        assert result.tier == "llm"
+        assert client.table.return_value.insert.call_args.args[0]["tenant_id"] == 2
+        assert classifier._model(1).counts["sales"] == 2
+
+    @pytest.mark.asyncio
+    async def test_cleanup_removes_expired_examples(self):
+        """Limpeza chama a RPC com a retenção configurada"""
+        client = Mock()
+        client.rpc.return_value.execute.return_value = Mock(data=7)
+        classifier = make_classifier(client, retention_days=30)
+
+        assert await classifier.cleanup_old_examples() == 7
+        client.rpc.assert_called_once_with("cleanup_sicc_intent_examples", {"p_retention_days": 30})
+        assert classifier.get_stats()["examples_purged"] == 7
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
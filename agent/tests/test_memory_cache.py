@@ -0,0 +1,206 @@
+"""
+Testes unitários para MemoryCache e CacheManager (automation.performance)
+
+Valida a remoção LRU por entradas e bytes, a expiração em background, as
+estatísticas por prefixo e o near-cache com invalidação entre réplicas.
+"""
+
+import pytest
+import asyncio
+import json
+import os
+import sys
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation.performance import CacheManager, MemoryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryCache:
+    """Testes do cache local LRU/TTL"""
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        """Acima de max_entries, remove a entrada menos usada recentemente"""
+        cache = MemoryCache(max_entries=2)
+
+        await cache.set("rules:a", 1)
+        await cache.set("rules:b", 2)
+        assert await cache.get("rules:a") == 1
+        await cache.set("rules:c", 3)
+
+        assert await cache.get("rules:b") is None
+        assert await cache.get("rules:a") == 1
+        assert await cache.get("rules:c") == 3
+        assert cache.get_stats()["evictions"] == 1
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_bounded_by_bytes(self):
+        """Limite de bytes remove entradas antigas e recusa valores maiores que o cache"""
+        cache = MemoryCache(max_bytes=100)
+
+        await cache.set("k:1", "x" * 40)
+        await cache.set("k:2", "x" * 40)
+        await cache.set("k:3", "x" * 40)
+
+        stats = cache.get_stats()
+        assert stats["total_keys"] == 2
+        assert stats["total_bytes"] <= 100
+        assert await cache.get("k:1") is None
+        assert await cache.set("k:big", "x" * 200) is False
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_sweep_removes_expired_without_reads(self):
+        """Expirados são removidos pela varredura, respeitando regravações"""
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+
+        await cache.set("a:1", "v", ttl=10)
+        await cache.set("a:2", "v", ttl=10)
+        await cache.set("a:2", "v2", ttl=60)
+
+        clock.now += 30
+        assert cache.sweep() == 1
+        assert cache.get_stats()["total_keys"] == 1
+        assert await cache.get("a:2") == "v2"
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_per_prefix_hit_rate(self):
+        """Hits e misses contabilizados por prefixo da chave"""
+        cache = MemoryCache()
+        await cache.set("rules:1", [1])
+
+        await cache.get("rules:1")
+        await cache.get("rules:2")
+        await cache.get("config:x")
+
+        prefixes = cache.get_stats()["prefixes"]
+        assert prefixes["rules"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        assert prefixes["config"]["hit_rate"] == 0.0
+        await cache.close()
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    """Redis em memória compartilhado entre réplicas simuladas"""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+        self.subscribers = {}
+
+    async def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value.encode()
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait({"type": "message", "data": message.encode()})
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+class TestCacheManagerNearCache:
+    """Testes do cache em dois níveis"""
+
+    @pytest.mark.asyncio
+    async def test_hot_keys_served_locally(self):
+        """Após a primeira leitura, a chave é servida sem round-trip ao Redis"""
+        redis = FakeRedis()
+        redis.data["rules:1"] = json.dumps({"id": 1}).encode()
+        manager = CacheManager(redis_client=redis, near_cache_ttl_seconds=30)
+
+        await manager.get("rules:1")
+        await asyncio.sleep(0.01)
+        for _ in range(3):
+            assert await manager.get("rules:1") == {"id": 1}
+
+        assert redis.gets == 2
+        assert manager.stats["near_hits"] == 2
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate_other_replicas(self):
+        """set em uma réplica remove a cópia local das demais"""
+        redis = FakeRedis()
+        replica_a = CacheManager(redis_client=redis)
+        replica_b = CacheManager(redis_client=redis)
+
+        await replica_a.set("config:x", "v1")
+        await asyncio.sleep(0.01)
+        await replica_b.get("config:x")
+        await asyncio.sleep(0.01)
+        await replica_b.get("config:x")
+        assert await replica_b.get("config:x") == "v1"
+        assert replica_b.stats["near_hits"] == 1
+
+        await replica_a.set("config:x", "v2")
+        await asyncio.sleep(0.01)
+
+        assert await replica_b.get("config:x") == "v2"
+        assert replica_b.stats["invalidations_received"] >= 1
+        await replica_a.close()
+        await replica_b.close()
+
+    @pytest.mark.asyncio
+    async def test_single_flight_on_miss(self):
+        """Misses simultâneos da mesma chave executam uma única carga"""
+        manager = CacheManager(redis_client=FakeRedis())
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return {"value": 42}
+
+        results = await asyncio.gather(*[manager.get_or_load("rules:hot", loader) for _ in range(10)])
+
+        assert calls == 1
+        assert all(result == {"value": 42} for result in results)
+        assert manager.stats["coalesced"] == 9
+        await manager.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -29,9 +29,8 @@ class TestMemorySearchProperties:
         limit=st.integers(min_value=1, max_value=100)
     )
     @settings(max_examples=50, deadline=30000)
-    @patch('src.services.sicc.memory_service.get_supabase_client')
     @patch('src.services.sicc.memory_service.SentenceTransformer')
-    def test_search_similar_properties(self, mock_transformer, mock_supabase, query, limit):
+    def test_search_similar_properties(self, mock_transformer, query, limit):
         """
         Feature: sicc-sistema-inteligencia-corporativa, Property 18: Efficient Vectorial Search
         
@@ -49,7 +48,6 @@ class TestMemorySearchProperties:
         
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Mock do modelo de embedding
         mock_model = Mock()
@@ -77,7 +75,7 @@ class TestMemorySearchProperties:
         mock_client.rpc.return_value = mock_rpc_response
         
         # Criar serviço e executar busca
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         async def run_test():
             memories = await service.search_similar(query, limit=limit)
@@ -119,9 +117,8 @@ class TestMemorySearchProperties:
         conversation_id=st.text(min_size=1, max_size=50)
     )
     @settings(max_examples=30, deadline=30000)
-    @patch('src.services.sicc.memory_service.get_supabase_client')
     @patch('src.services.sicc.memory_service.SentenceTransformer')
-    def test_search_with_filters_property(self, mock_transformer, mock_supabase, query, conversation_id):
+    def test_search_with_filters_property(self, mock_transformer, query, conversation_id):
         """
         Propriedade: Filtros devem ser aplicados corretamente na busca
         
@@ -135,7 +132,6 @@ class TestMemorySearchProperties:
         
         # Mock setup
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         mock_model = Mock()
         mock_embedding = [0.1] * 384
@@ -148,7 +144,7 @@ class TestMemorySearchProperties:
         mock_client.rpc.return_value = mock_rpc_response
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         async def run_test():
             # Executar busca com filtro
@@ -171,9 +167,8 @@ class TestMemorySearchProperties:
         vector_weight=st.floats(min_value=0.0, max_value=1.0)
     )
     @settings(max_examples=30, deadline=30000)
-    @patch('src.services.sicc.memory_service.get_supabase_client')
     @patch('src.services.sicc.memory_service.SentenceTransformer')
-    def test_hybrid_search_properties(self, mock_transformer, mock_supabase, query, text_weight, vector_weight):
+    def test_hybrid_search_properties(self, mock_transformer, query, text_weight, vector_weight):
         """
         Propriedade: Busca híbrida deve combinar pesos corretamente
         
@@ -188,7 +183,6 @@ class TestMemorySearchProperties:
         
         # Mock setup
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         mock_model = Mock()
         mock_embedding = [0.1] * 384
@@ -213,7 +207,7 @@ class TestMemorySearchProperties:
         mock_client.rpc.return_value = mock_rpc_response
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         async def run_test():
             # Executar busca híbrida
@@ -245,9 +239,8 @@ class TestMemorySearchProperties:
         
         asyncio.run(run_test())
     
-    @patch('src.services.sicc.memory_service.get_supabase_client')
     @patch('src.services.sicc.memory_service.SentenceTransformer')
-    def test_search_error_handling_property(self, mock_transformer, mock_supabase):
+    def test_search_error_handling_property(self, mock_transformer):
         """
         Propriedade: Tratamento de erros deve ser consistente na busca
         
@@ -255,7 +248,6 @@ class TestMemorySearchProperties:
         """
         # Mock setup
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         mock_model = Mock()
         mock_embedding = [0.1] * 384
@@ -263,7 +255,7 @@ class TestMemorySearchProperties:
         mock_transformer.return_value = mock_model
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         async def run_test():
             # Teste com query vazia
@@ -293,9 +285,8 @@ class TestMemorySearchProperties:
         current_message=st.text(min_size=1, max_size=200)
     )
     @settings(max_examples=20, deadline=30000)
-    @patch('src.services.sicc.memory_service.get_supabase_client')
     @patch('src.services.sicc.memory_service.SentenceTransformer')
-    def test_relevant_context_property(self, mock_transformer, mock_supabase, conversation_id, current_message):
+    def test_relevant_context_property(self, mock_transformer, conversation_id, current_message):
         """
         Propriedade: Contexto relevante deve combinar memórias locais e globais
         
@@ -311,7 +302,6 @@ class TestMemorySearchProperties:
         
         # Mock setup
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         mock_model = Mock()
         mock_embedding = [0.1] * 384
@@ -359,7 +349,7 @@ class TestMemorySearchProperties:
         mock_client.rpc.side_effect = mock_rpc_side_effect
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         async def run_test():
             # Executar get_relevant_context
@@ -21,15 +21,13 @@ from agent.src.services.sicc.memory_service import MemoryService, Memory
 class TestMemoryServiceUnit:
     """Testes unitários para MemoryService"""
     
-    @patch('agent.src.services.sicc.memory_service.get_supabase_client')
-    def test_memory_service_initialization(self, mock_supabase):
+    def test_memory_service_initialization(self):
         """Testa inicialização do MemoryService"""
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         # Verificar inicialização
         assert service.supabase == mock_client
@@ -37,16 +35,14 @@ class TestMemoryServiceUnit:
         assert service.max_memories_per_conversation == 100
         assert service.retention_days == 90
     
-    @patch('agent.src.services.sicc.memory_service.get_supabase_client')
     @pytest.mark.asyncio
-    async def test_generate_embedding_validation(self, mock_supabase):
+    async def test_generate_embedding_validation(self):
         """Testa validação de entrada para geração de embeddings"""
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         # Teste com texto vazio
         with pytest.raises(ValueError, match="Texto não pode estar vazio"):
@@ -60,14 +56,12 @@ class TestMemoryServiceUnit:
         with pytest.raises(ValueError, match="Texto não pode estar vazio"):
             await service.generate_embedding(None)
     
-    @patch('agent.src.services.sicc.memory_service.get_supabase_client')
     @patch('agent.src.services.sicc.memory_service.SentenceTransformer')
     @pytest.mark.asyncio
-    async def test_generate_embedding_success(self, mock_transformer, mock_supabase):
+    async def test_generate_embedding_success(self, mock_transformer):
         """Testa geração bem-sucedida de embedding"""
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Mock do modelo de embedding
         mock_model = Mock()
@@ -76,7 +70,7 @@ class TestMemoryServiceUnit:
         mock_transformer.return_value = mock_model
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         # Testar geração
         result = await service.generate_embedding("Texto de teste")
@@ -85,16 +79,14 @@ class TestMemoryServiceUnit:
         assert len(result) == 384
         assert all(isinstance(dim, (int, float)) for dim in result)
     
-    @patch('agent.src.services.sicc.memory_service.get_supabase_client')
     @pytest.mark.asyncio
-    async def test_store_memory_validation(self, mock_supabase):
+    async def test_store_memory_validation(self):
         """Testa validação de entrada para armazenamento de memória"""
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         # Teste com conversation_id vazio
         with pytest.raises(ValueError, match="conversation_id e content são obrigatórios"):
@@ -104,16 +96,14 @@ class TestMemoryServiceUnit:
         with pytest.raises(ValueError, match="conversation_id e content são obrigatórios"):
             await service.store_memory("conv_123", "")
     
-    @patch('agent.src.services.sicc.memory_service.get_supabase_client')
     @pytest.mark.asyncio
-    async def test_search_similar_validation(self, mock_supabase):
+    async def test_search_similar_validation(self):
         """Testa validação de entrada para busca similar"""
         # Mock do cliente Supabase
         mock_client = Mock()
-        mock_supabase.return_value = mock_client
         
         # Criar serviço
-        service = MemoryService()
+        service = MemoryService(supabase_client=mock_client)
         
         # Teste com query vazia
         with pytest.raises(ValueError, match="Query não pode estar vazia"):
@@ -126,6 +116,58 @@ class TestMemoryServiceUnit:
         with pytest.raises(ValueError, match="Limit deve estar entre 1 e 100"):
             await service.search_similar("query", limit=101)
     
+    @pytest.mark.asyncio
+    async def test_relevant_context_embeds_once_with_combined_rpc(self):
+        """Testa que get_relevant_context usa um embedding e uma RPC para os dois escopos"""
+        mock_client = Mock()
+        mock_client.rpc.return_value.execute.return_value = Mock(data=[
+            {"scope": "conversation", "id": "m1", "conversation_id": "conv_1", "content": "a",
+             "metadata": {}, "similarity_score": 0.6, "created_at": "2026-01-01T00:00:00Z"},
+            {"scope": "global", "id": "m2", "conversation_id": "conv_2", "content": "b",
+             "metadata": {}, "similarity_score": 0.9, "created_at": "2026-01-01T00:00:00Z"},
+            {"scope": "global", "id": "m1", "conversation_id": "conv_1", "content": "a",
+             "metadata": {}, "similarity_score": 0.6, "created_at": "2026-01-01T00:00:00Z"},
+        ])
+        
+        service = MemoryService(supabase_client=mock_client)
+        service.generate_embedding = AsyncMock(return_value=[0.1] * 384)
+        
+        memories = await service.get_relevant_context("conv_1", "qual o preço?", tenant_id=1)
+        
+        service.generate_embedding.assert_awaited_once()
+        mock_client.rpc.assert_called_once()
+        assert mock_client.rpc.call_args.args[0] == "search_relevant_context_mt"
+        assert [m.id for m in memories] == ["m2", "m1"]
+        assert service.relevance_accumulator.get_stats()["pending"] == 2
+        
+        await service.close()
+    
+    @pytest.mark.asyncio
+    async def test_relevant_context_falls_back_to_scoped_searches(self):
+        """Testa fallback para duas buscas escopadas quando a RPC combinada não existe"""
+        mock_client = Mock()
+        
+        def rpc(name, params):
+            call = Mock()
+            if name == "search_relevant_context_mt":
+                call.execute.side_effect = Exception("PGRST202: function not found")
+            else:
+                call.execute.return_value = Mock(data=[])
+            return call
+        
+        mock_client.rpc.side_effect = rpc
+        
+        service = MemoryService(supabase_client=mock_client)
+        service.generate_embedding = AsyncMock(return_value=[0.1] * 384)
+        
+        await service.get_relevant_context("conv_1", "qual o preço?", tenant_id=1)
+        await service.get_relevant_context("conv_1", "e a garantia?", tenant_id=1)
+        
+        names = [c.args[0] for c in mock_client.rpc.call_args_list]
+        assert names.count("search_relevant_context_mt") == 1
+        assert names.count("search_similar_memories_mt") == 4
+        assert service.generate_embedding.await_count == 2
+    
     def test_memory_class(self):
         """Testa a classe Memory"""
         from datetime import datetime
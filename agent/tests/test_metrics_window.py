@@ -0,0 +1,81 @@
+"""
+Testes unitários para RollingMetricWindow (SICC MetricsService)
+
+Valida a agregação por slots de tempo, o descarte de slots antigos do anel
+e as estatísticas do MetricsService calculadas a partir da janela.
+"""
+
+import pytest
+import os
+import sys
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc.metrics_service import MetricsService, MetricType, RollingMetricWindow
+
+
+class TestRollingMetricWindow:
+    """Testes do anel de slots de métricas"""
+
+    def test_query_filters_by_interval_agent_and_type(self):
+        """Agregados combinados apenas para os slots e chaves pedidos"""
+        window = RollingMetricWindow(slot_seconds=60, retention_hours=1)
+        now = 1_700_000_000
+
+        window.record("sales", MetricType.RESPONSE_TIME, 1.0, now - 600)
+        window.record("sales", MetricType.RESPONSE_TIME, 3.0, now)
+        window.record("support", MetricType.RESPONSE_TIME, 10.0, now)
+        window.record("sales", MetricType.SUCCESS_RATE, 0.9, now)
+
+        result = window.query(now - 120, now + 1, agent_type="sales")
+        assert result[MetricType.RESPONSE_TIME].count == 1
+        assert result[MetricType.SUCCESS_RATE].mean == 0.9
+
+        all_agents = window.query(now - 900, now + 1, metric_type=MetricType.RESPONSE_TIME)
+        aggregate = all_agents[MetricType.RESPONSE_TIME]
+        assert (aggregate.count, aggregate.min, aggregate.max) == (3, 1.0, 10.0)
+
+    def test_ring_wraparound_discards_old_slots(self):
+        """Slot reaproveitado após uma volta do anel começa vazio"""
+        window = RollingMetricWindow(slot_seconds=60, retention_hours=1)
+        now = 1_700_000_000
+
+        window.record("sales", MetricType.PATTERN_APPLICATION, 1.0, now)
+        window.record("sales", MetricType.PATTERN_APPLICATION, 1.0, now + 3600)
+
+        result = window.query(now - 7200, now + 3601)
+        assert result[MetricType.PATTERN_APPLICATION].count == 1
+        assert window.prune(now + 3 * 3600) == 1
+
+
+class TestMetricsServiceWindow:
+    """Estatísticas do MetricsService a partir da janela"""
+
+    @pytest.mark.asyncio
+    async def test_stats_and_report_from_window(self):
+        """Estatísticas, padrões por hora e limpeza sem varrer o histórico"""
+        service = MetricsService()
+
+        for _ in range(3):
+            await service.record_metric(MetricType.PATTERN_APPLICATION, 1.0, agent_type="sales")
+        await service.record_metric(MetricType.RESPONSE_TIME, 1.5, agent_type="sales")
+        await service.record_metric(MetricType.RESPONSE_TIME, 2.5, agent_type="support")
+
+        stats = await service.get_performance_stats(time_window_hours=1)
+        assert stats["total_metrics"] == 5
+        assert stats["metrics_by_type"]["response_time"] == {"count": 2, "avg": 2.0, "min": 1.5, "max": 2.5}
+
+        report = await service.generate_intelligence_report()
+        assert report.total_patterns_learned == 3
+        assert service.agent_stats["sales"].patterns_per_hour == 3
+
+        cleanup = await service.cleanup_old_metrics()
+        assert cleanup["freed_slots"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
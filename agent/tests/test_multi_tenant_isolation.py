@@ -4,6 +4,7 @@ Testes de Isolamento Multi-Tenant - MultiTenantCheckpointer
 Valida que o isolamento de tenant funciona corretamente:
 - Tenant A nunca acessa dados de tenant B
 - list() retorna apenas checkpoints do tenant correto
+- put() só grava em conversas existentes do tenant
 - Thread ID parsing funciona corretamente
 - Validação de tenant_id em todas as operações
 
@@ -40,7 +41,7 @@ class TestMultiTenantIsolation:
     @pytest.fixture
     def checkpointer(self, mock_supabase):
         """Instância do checkpointer com Supabase mockado"""
-        return MultiTenantCheckpointer()
+        return MultiTenantCheckpointer(flush_delay_seconds=0)
     
     def test_thread_id_parsing_valid(self, checkpointer):
         """Testa parsing de thread_id válido"""
@@ -103,7 +104,7 @@ class TestMultiTenantIsolation:
         mock_table = Mock()
         mock_table.select.return_value = mock_table
         mock_table.eq.return_value = mock_table
-        mock_table.single.return_value = mock_table
+        mock_table.limit.return_value = mock_table
         mock_table.execute = mock_execute
         
         mock_supabase.table.return_value = mock_table
@@ -129,52 +130,30 @@ class TestMultiTenantIsolation:
         Testa isolamento de tenant no método list.
         
         Cenário:
-        1. Tenant 1 tem 3 checkpoints
-        2. Tenant 2 tem 2 checkpoints
-        3. list() para tenant 1 deve retornar apenas 3 checkpoints
-        4. list() para tenant 2 deve retornar apenas 2 checkpoints
+        1. Tenant 1 tem checkpoint na conversa 100
+        2. list() para tenant 1 retorna o checkpoint mais recente da thread
+        3. Query filtra por thread e tenant_id
         """
+        checkpointer_tmp = MultiTenantCheckpointer(client=Mock(), flush_delay_seconds=0)
+        checkpoint_type, payload = checkpointer_tmp._serialize(Checkpoint(
+            v=1,
+            ts="2024-01-01T02:00:00Z",
+            id="checkpoint_3",
+            channel_values={},
+            channel_versions={},
+            versions_seen={}
+        ))
+        
         # Mock da resposta para tenant 1
         mock_response_tenant1 = Mock()
         mock_response_tenant1.data = [
             {
-                "id": 100,
-                "tenant_id": 1,
-                "metadata": {
-                    "langgraph_checkpoint": {
-                        "checkpoint": '{"v": 1, "ts": "2024-01-01T00:00:00Z", "id": "checkpoint_1", "channel_values": {}}',
-                        "metadata": {"step": 1},
-                        "saved_at": "2024-01-01T00:00:00Z"
-                    }
-                },
-                "created_at": "2024-01-01T00:00:00Z",
-                "updated_at": "2024-01-01T00:00:00Z"
-            },
-            {
-                "id": 101,
-                "tenant_id": 1,
-                "metadata": {
-                    "langgraph_checkpoint": {
-                        "checkpoint": '{"v": 1, "ts": "2024-01-01T01:00:00Z", "id": "checkpoint_2", "channel_values": {}}',
-                        "metadata": {"step": 2},
-                        "saved_at": "2024-01-01T01:00:00Z"
-                    }
-                },
-                "created_at": "2024-01-01T01:00:00Z",
-                "updated_at": "2024-01-01T01:00:00Z"
-            },
-            {
-                "id": 102,
-                "tenant_id": 1,
-                "metadata": {
-                    "langgraph_checkpoint": {
-                        "checkpoint": '{"v": 1, "ts": "2024-01-01T02:00:00Z", "id": "checkpoint_3", "channel_values": {}}',
-                        "metadata": {"step": 3},
-                        "saved_at": "2024-01-01T02:00:00Z"
-                    }
-                },
-                "created_at": "2024-01-01T02:00:00Z",
-                "updated_at": "2024-01-01T02:00:00Z"
+                "checkpoint_id": "checkpoint_3",
+                "parent_checkpoint_id": "checkpoint_2",
+                "version": 3,
+                "checkpoint_type": checkpoint_type,
+                "checkpoint": payload,
+                "metadata": {"step": 3}
             }
         ]
         
@@ -182,8 +161,9 @@ class TestMultiTenantIsolation:
         mock_table = Mock()
         mock_table.select.return_value = mock_table
         mock_table.eq.return_value = mock_table
-        mock_table.order.return_value = mock_table
-        mock_table.execute.return_value = mock_response_tenant1
+        mock_table.limit.return_value = mock_table
+        # Checkpoint da thread e writes pendentes (nenhum)
+        mock_table.execute.side_effect = [mock_response_tenant1, Mock(data=[])]
         
         mock_supabase.table.return_value = mock_table
         
@@ -196,12 +176,15 @@ class TestMultiTenantIsolation:
         
         checkpoints = list(checkpointer.list(config_tenant1))
         
-        # Deve retornar 3 checkpoints
-        assert len(checkpoints) == 3
+        # Apenas o checkpoint mais recente da thread é armazenado
+        assert len(checkpoints) == 1
+        assert checkpoints[0].checkpoint["id"] == "checkpoint_3"
+        assert checkpoints[0].parent_config["configurable"]["checkpoint_id"] == "checkpoint_2"
         
-        # Verificar que query filtrou por tenant_id=1
+        # Verificar que query filtrou por thread e tenant_id=1
+        mock_supabase.table.assert_any_call("langgraph_checkpoints")
+        mock_table.eq.assert_any_call("thread_id", "tenant_1_conv_100")
         mock_table.eq.assert_any_call("tenant_id", 1)
-        mock_table.eq.assert_any_call("id", 100)
     
     def test_tenant_isolation_put_validation(self, checkpointer, mock_supabase):
         """
@@ -210,21 +193,18 @@ class TestMultiTenantIsolation:
         Cenário:
         1. Conversa existe para tenant 1
         2. Tenant 2 tenta salvar checkpoint na conversa do tenant 1
-        3. Deve lançar ValueError (tenant_id mismatch)
+        3. Deve lançar ValueError (conversa não existe para o tenant 2)
         """
-        # Mock da resposta do Supabase (conversa existe para tenant 1)
+        # Mock da resposta do Supabase: a conversa 100 pertence ao tenant 1,
+        # então a busca filtrada por tenant_id=2 não a encontra
         mock_response = Mock()
-        mock_response.data = {
-            "id": 100,
-            "tenant_id": 1,  # Conversa pertence ao tenant 1
-            "metadata": {}
-        }
+        mock_response.data = []
         
         # Configurar mock
         mock_table = Mock()
         mock_table.select.return_value = mock_table
         mock_table.eq.return_value = mock_table
-        mock_table.single.return_value = mock_table
+        mock_table.limit.return_value = mock_table
         mock_table.execute.return_value = mock_response
         
         mock_supabase.table.return_value = mock_table
@@ -245,9 +225,12 @@ class TestMultiTenantIsolation:
         
         metadata = {"step": 1}
         
-        # Deve lançar ValueError (tenant_id mismatch)
-        with pytest.raises(ValueError, match="Tenant ID mismatch"):
-            checkpointer.put(config_tenant2, checkpoint, metadata)
+        # Deve lançar ValueError (conversa não existe para o tenant 2)
+        with pytest.raises(ValueError, match="não existe para tenant 2"):
+            checkpointer.put(config_tenant2, checkpoint, metadata, {})
+        
+        mock_table.eq.assert_any_call("tenant_id", 2)
+        mock_supabase.rpc.assert_not_called()
     
     def test_tenant_isolation_put_nonexistent_conversation(self, checkpointer, mock_supabase):
         """
@@ -259,13 +242,13 @@ class TestMultiTenantIsolation:
         """
         # Mock da resposta do Supabase (conversa não existe)
         mock_response = Mock()
-        mock_response.data = None
+        mock_response.data = []
         
         # Configurar mock
         mock_table = Mock()
         mock_table.select.return_value = mock_table
         mock_table.eq.return_value = mock_table
-        mock_table.single.return_value = mock_table
+        mock_table.limit.return_value = mock_table
         mock_table.execute.return_value = mock_response
         
         mock_supabase.table.return_value = mock_table
@@ -288,7 +271,7 @@ class TestMultiTenantIsolation:
         
         # Deve lançar ValueError
         with pytest.raises(ValueError, match="não existe para tenant"):
-            checkpointer.put(config, checkpoint, metadata)
+            checkpointer.put(config, checkpoint, metadata, {})
     
     def test_property_tenant_isolation_never_cross_access(self, checkpointer, mock_supabase):
         """
@@ -297,16 +280,16 @@ class TestMultiTenantIsolation:
         Testa múltiplos cenários de isolamento:
         - get_tuple com tenant diferente
         - list com tenant diferente
-        - put com tenant_id mismatch
+        - put em conversa de outro tenant
         """
         # Cenário 1: get_tuple com tenant diferente
         mock_response_empty = Mock()
-        mock_response_empty.data = None
+        mock_response_empty.data = []
         
         mock_table = Mock()
         mock_table.select.return_value = mock_table
         mock_table.eq.return_value = mock_table
-        mock_table.single.return_value = mock_table
+        mock_table.limit.return_value = mock_table
         mock_table.execute.return_value = mock_response_empty
         
         mock_supabase.table.return_value = mock_table
@@ -322,25 +305,10 @@ class TestMultiTenantIsolation:
         assert result is None, "Tenant 2 não deve acessar dados do tenant 1"
         
         # Cenário 2: list com tenant diferente
-        mock_response_empty_list = Mock()
-        mock_response_empty_list.data = []
-        
-        mock_table.order.return_value = mock_table
-        mock_table.execute.return_value = mock_response_empty_list
-        
         checkpoints = list(checkpointer.list(config_tenant2))
         assert len(checkpoints) == 0, "Tenant 2 não deve listar checkpoints do tenant 1"
         
-        # Cenário 3: put com tenant_id mismatch
-        mock_response_mismatch = Mock()
-        mock_response_mismatch.data = {
-            "id": 100,
-            "tenant_id": 1,  # Conversa pertence ao tenant 1
-            "metadata": {}
-        }
-        
-        mock_table.execute.return_value = mock_response_mismatch
-        
+        # Cenário 3: put em conversa de outro tenant
         checkpoint = Checkpoint(
             v=1,
             ts="2024-01-01T00:00:00Z",
@@ -350,8 +318,8 @@ class TestMultiTenantIsolation:
         
         metadata = {"step": 1}
         
-        with pytest.raises(ValueError, match="Tenant ID mismatch"):
-            checkpointer.put(config_tenant2, checkpoint, metadata)
+        with pytest.raises(ValueError, match="não existe para tenant 2"):
+            checkpointer.put(config_tenant2, checkpoint, metadata, {})
 
 
 class TestMultiTenantCheckpointerIntegration:
@@ -368,7 +336,7 @@ class TestMultiTenantCheckpointerIntegration:
         
         ATENÇÃO: Este teste requer:
         - Variáveis de ambiente SUPABASE_URL e SUPABASE_SERVICE_KEY
-        - Tabela multi_agent_conversations criada
+        - Tabelas multi_agent_conversations e langgraph_checkpoints criadas
         - RLS ativo na tabela
         
         Cenário:
@@ -0,0 +1,138 @@
+"""
+Testes unitários para PatternIndex - SICC
+
+Valida que a pontuação vetorizada reproduz as regras de relevância do
+BehaviorService, que o índice é atualizado incrementalmente e que as taxas
+de sucesso vêm de uma única RPC por lote de padrões.
+"""
+
+import pytest
+import os
+import sys
+import uuid
+import numpy as np
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc import behavior_service as behavior_module
+from agent.src.services.sicc.pattern_index import PatternIndex, tokenize, DEFAULT_SUCCESS_RATE
+from agent.src.services.sicc.learning_service import Pattern
+
+DIMENSIONS = 4
+
+
+def make_pattern(trigger, confidence=0.8, frequency=10, contexts=None, metadata=None, days_ago=0):
+    now = datetime.utcnow()
+    return Pattern(
+        id=str(uuid.uuid4()),
+        pattern_type="response",
+        trigger=trigger,
+        action=f"resposta para {trigger}",
+        confidence=confidence,
+        frequency=frequency,
+        contexts=contexts or [],
+        metadata=metadata or {},
+        created_at=now,
+        last_seen=now - timedelta(days=days_ago)
+    )
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+class TestPatternIndex:
+    """Testes do índice de padrões"""
+
+    def test_tokenize_matches_keyword_rule(self):
+        """Tokenização usa a mesma regex em minúsculas"""
+        assert tokenize("Qual o PREÇO do colchão?") == {"qual", "o", "preço", "do", "colchão"}
+
+    def test_score_matches_scalar_formula(self):
+        """Relevância vetorizada segue os pesos 0.4/0.3/0.2/0.1"""
+        index = PatternIndex(dimensions=DIMENSIONS)
+        pattern = make_pattern("preço colchão", contexts=["conv-1"])
+        index.upsert(pattern, unit(1, 0, 0, 0), success_rate=0.9)
+
+        relevance = index.score(unit(1, 0, 0, 0), "qual o preço", {"conversation_id": "conv-1"})
+
+        text_similarity = 1.0            # vetores idênticos
+        context_match = 1.0              # conversation_id presente nos contextos
+        keyword_match = 1 / 4            # {preço} / {preço, colchão, qual, o}
+        expected = text_similarity * 0.4 + context_match * 0.3 + keyword_match * 0.2 + 0.9 * 0.1
+        assert relevance[0] == pytest.approx(expected, abs=1e-5)
+
+    def test_missing_embedding_scores_zero_similarity(self):
+        """Padrão sem embedding não recebe similaridade neutra"""
+        index = PatternIndex(dimensions=DIMENSIONS)
+        index.upsert(make_pattern("xyz"), None, success_rate=0.0)
+
+        relevance = index.score(unit(1, 0, 0, 0), "abc", {})
+
+        assert relevance[0] == pytest.approx(0.5 * 0.3)  # apenas contexto neutro
+
+    def test_top_k_orders_by_priority_and_filters_threshold(self):
+        """Top-k respeita threshold, limite e ordem de prioridade"""
+        index = PatternIndex(dimensions=DIMENSIONS)
+        strong = make_pattern("colchão magnético", confidence=0.95, frequency=80)
+        weak = make_pattern("colchão", confidence=0.3, frequency=1, days_ago=60)
+        unrelated = make_pattern("boleto", confidence=0.9)
+
+        index.upsert(strong, unit(1, 0, 0, 0))
+        index.upsert(weak, unit(1, 0.2, 0, 0))
+        index.upsert(unrelated, unit(-1, 0, 0, 0))
+
+        results = index.top_k(unit(1, 0, 0, 0), "colchão magnético", {}, min_relevance=0.5, k=2)
+
+        assert [p.id for p, _ in results] == [strong.id, weak.id]
+        assert all(score >= 0.5 for _, score in results)
+
+    def test_incremental_upsert_and_remove(self):
+        """Alterações são refletidas na próxima consulta"""
+        index = PatternIndex(dimensions=DIMENSIONS)
+        pattern = make_pattern("garantia")
+        index.upsert(pattern, unit(0, 1, 0, 0))
+        assert len(index.score(None, "garantia", {})) == 1
+
+        index.update_success_rates({pattern.id: 0.1})
+        assert index.get(pattern.id).success_rate == pytest.approx(0.1)
+
+        assert index.remove(pattern.id) is True
+        assert pattern.id not in index
+        assert len(index.score(None, "garantia", {})) == 0
+
+
+
+class TestPatternSuccessRates:
+    """Testes da leitura das taxas de sucesso dos padrões"""
+
+    def make_service(self, rows):
+        client = Mock()
+        client.rpc.return_value.execute.return_value = Mock(data=rows)
+        with patch.object(behavior_module, "get_supabase_client", return_value=client), \
+                patch.object(behavior_module, "get_ai_service", return_value=Mock()):
+            return behavior_module.BehaviorService(), client
+
+    @pytest.mark.asyncio
+    async def test_latest_rate_per_pattern_from_rpc(self):
+        """Uma linha por padrão vinda da RPC; padrão sem métrica usa a taxa neutra"""
+        service, client = self.make_service([
+            {"pattern_id": "p1", "success_rate": 0.9},
+            {"pattern_id": "p2", "success_rate": None}
+        ])
+
+        assert await service._get_pattern_success_rates(["p1", "p2"]) == {"p1": 0.9}
+        client.rpc.assert_called_once_with("get_pattern_success_rates", {"p_pattern_ids": ["p1", "p2"]})
+        client.table.assert_not_called()
+        assert await service._get_pattern_success_rate("p2") == DEFAULT_SUCCESS_RATE
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
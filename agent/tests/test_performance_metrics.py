@@ -0,0 +1,112 @@
+"""
+Testes unitários para PerformanceMetrics (automation.performance)
+
+Valida os percentis do histograma por janela, a retenção e a combinação de
+sketches entre workers.
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation import performance as performance_module
+from agent.src.services.automation.performance import DurationSketch, PerformanceMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDurationSketch:
+    """Testes do histograma de durações"""
+
+    def test_percentiles_within_relative_error(self):
+        """p50/p95/p99 com erro relativo de poucos por cento"""
+        sketch = DurationSketch()
+        for duration in range(1, 1001):
+            sketch.record(duration, success=duration % 10 != 0)
+
+        assert sketch.total == 1000
+        assert sketch.success == 900
+        for p, expected in ((50, 500), (95, 950), (99, 990)):
+            assert abs(sketch.percentile(p) - expected) / expected < 0.04
+        assert len(sketch.counts) <= 1 + DurationSketch.MAX_EXPONENT * DurationSketch.SUB_BUCKETS
+
+    def test_merge_across_workers(self):
+        """Sketches serializados de workers diferentes combinam em um só"""
+        worker_a, worker_b = DurationSketch(), DurationSketch()
+        for duration in range(1, 501):
+            worker_a.record(duration)
+        for duration in range(501, 1001):
+            worker_b.record(duration)
+
+        merged = DurationSketch.from_dict(worker_a.to_dict()).merge(DurationSketch.from_dict(worker_b.to_dict()))
+
+        assert merged.total == 1000
+        assert merged.min_ms == 1 and merged.max_ms == 1000
+        assert abs(merged.percentile(50) - 500) / 500 < 0.04
+
+
+class TestPerformanceMetrics:
+    """Testes das métricas por janela de tempo"""
+
+    @pytest.mark.asyncio
+    async def test_stats_and_retention(self):
+        """Estatísticas por operação; janelas fora da retenção são descartadas"""
+        clock = FakeClock()
+        metrics = PerformanceMetrics(window_seconds=60, retention_seconds=300, clock=clock)
+
+        for duration in (100, 200, 300):
+            await metrics.record_metric("evaluate_rules", duration, True)
+        await metrics.record_metric("evaluate_rules", 400, False)
+
+        stats = await metrics.get_operation_stats("evaluate_rules")
+        assert stats["total_calls"] == 4
+        assert stats["success_rate"] == 75
+        assert stats["avg_duration_ms"] == 250
+        assert stats["max_duration_ms"] == 400
+
+        clock.now += 600
+        await metrics.record_metric("evaluate_rules", 50, True)
+
+        stats = await metrics.get_operation_stats("evaluate_rules")
+        assert stats["total_calls"] == 1
+        assert len(metrics._metrics["evaluate_rules"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_recent_window_and_clear_old(self):
+        """Consulta dos últimos N segundos e limpeza de janelas antigas"""
+        clock = FakeClock()
+        metrics = PerformanceMetrics(window_seconds=60, retention_seconds=3600, clock=clock)
+
+        await metrics.record_metric("op", 10, True)
+        clock.now += 1200
+        await metrics.record_metric("op", 20, True)
+
+        assert (await metrics.get_operation_stats("op", window_seconds=120))["total_calls"] == 1
+        assert (await metrics.get_operation_stats("op"))["total_calls"] == 2
+
+        cache_manager = AsyncMock()
+        cache_manager.get_stats.return_value = {"type": "memory"}
+        with patch.object(performance_module, "get_cache_manager", return_value=cache_manager):
+            all_stats = await metrics.get_all_stats()
+        assert all_stats["operations"]["op"]["total_calls"] == 2
+
+        clock.now += 2 * 3600
+        await metrics.clear_old_metrics(hours=1)
+        assert metrics._metrics == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,100 @@
+"""
+Testes unitários para RelevanceAccumulator - SICC
+
+Valida que os boosts de relevância são agregados por memória e gravados
+em uma única RPC, inclusive no shutdown.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import Mock
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc.relevance_accumulator import RelevanceAccumulator
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+
+def make_supabase(fail: bool = False):
+    client = Mock()
+    if fail:
+        client.rpc.return_value.execute.side_effect = RuntimeError("banco indisponível")
+    else:
+        client.rpc.return_value.execute.return_value = Mock(data=1)
+    return client
+
+
+class TestRelevanceAccumulator:
+    """Testes do acumulador de relevância"""
+
+    @pytest.mark.asyncio
+    async def test_boosts_are_aggregated_into_one_rpc(self):
+        """Vários boosts viram uma única chamada com soma por memória"""
+        supabase = make_supabase()
+        accumulator = RelevanceAccumulator(ThreadedSupabaseExecutor(supabase), flush_interval_seconds=60)
+
+        accumulator.add("mem-1")
+        accumulator.add("mem-1")
+        accumulator.add("mem-2", 0.3)
+
+        assert supabase.rpc.call_count == 0  # nada gravado no caminho da busca
+
+        flushed = await accumulator.flush()
+
+        assert flushed == 2
+        supabase.rpc.assert_called_once()
+        name, params = supabase.rpc.call_args.args
+        assert name == "update_memory_relevance_bulk"
+        boosts = {b["memory_id"]: b["usage_boost"] for b in params["boosts"]}
+        assert boosts == {"mem-1": pytest.approx(0.2), "mem-2": pytest.approx(0.3)}
+
+        await accumulator.close()
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending_boosts(self):
+        """Shutdown grava boosts ainda pendentes"""
+        supabase = make_supabase()
+        accumulator = RelevanceAccumulator(ThreadedSupabaseExecutor(supabase), flush_interval_seconds=60)
+
+        accumulator.add("mem-1")
+        await accumulator.close()
+
+        supabase.rpc.assert_called_once()
+        assert accumulator.get_stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_periodic_flush(self):
+        """Flush em background ocorre após o intervalo configurado"""
+        supabase = make_supabase()
+        accumulator = RelevanceAccumulator(ThreadedSupabaseExecutor(supabase), flush_interval_seconds=0.01)
+
+        accumulator.add("mem-1")
+        await asyncio.sleep(0.1)
+
+        supabase.rpc.assert_called_once()
+        await accumulator.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_boosts(self):
+        """Boosts de um flush com erro permanecem para nova tentativa"""
+        supabase = make_supabase(fail=True)
+        accumulator = RelevanceAccumulator(ThreadedSupabaseExecutor(supabase), flush_interval_seconds=60)
+
+        accumulator.add("mem-1", 0.2)
+        assert await accumulator.flush() == 0
+
+        stats = accumulator.get_stats()
+        assert stats["pending"] == 1
+        assert stats["flush_errors"] == 1
+
+        await accumulator.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
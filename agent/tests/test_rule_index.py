@@ -0,0 +1,124 @@
+"""
+Testes unitários para RuleIndex
+
+Valida o índice de regras por gatilho e a invalidação pelo
+AutomationService.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.automation.schemas import AutomationRule, RuleCondition
+from agent.src.services.automation.rule_index import RuleIndex
+from agent.src.services.automation import rules_executor as rules_module
+from agent.src.services.supabase_pool import ThreadedSupabaseExecutor
+
+
+def cond(field, operator, value, logic="AND"):
+    return RuleCondition(field=field, operator=operator, value=value, logic=logic)
+
+
+def make_rule(rule_id, gatilho="message_received", condicoes=None, created_by="user-1"):
+    return AutomationRule(
+        id=rule_id,
+        nome=f"Regra {rule_id}",
+        status="ativa",
+        gatilho=gatilho,
+        condicoes=condicoes or [],
+        acoes=[{"type": "apply_tag", "config": {"tag": "lead"}}],
+        created_by=created_by,
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    )
+
+
+class TestRuleIndex:
+    """Testes do índice de regras"""
+
+    @pytest.mark.asyncio
+    async def test_index_groups_by_trigger_and_caches(self):
+        """Regras agrupadas por gatilho; banco consultado uma vez"""
+        loader = AsyncMock(return_value=[
+            make_rule("r1"),
+            make_rule("r2", gatilho="lead_created"),
+            make_rule("r3", created_by="user-2")
+        ])
+        index = RuleIndex(loader, ttl_seconds=60)
+
+        rules = await index.get_rules("message_received")
+        assert [c.rule.id for c in rules] == ["r1", "r3"]
+        assert [c.rule.id for c in await index.get_rules("message_received", "user-2")] == ["r3"]
+        assert await index.get_rules("order_completed") == []
+
+        loader.assert_awaited_once()
+        assert index.get_stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_and_concurrent_reload(self):
+        """Invalidação recarrega uma única vez mesmo com gatilhos simultâneos"""
+        loader = AsyncMock(return_value=[make_rule("r1")])
+        index = RuleIndex(loader, ttl_seconds=60)
+
+        await index.get_rules("message_received")
+        index.invalidate()
+        await asyncio.gather(*[index.get_rules("message_received") for _ in range(5)])
+
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_reload_error_keeps_previous_index(self):
+        """Falha na recarga mantém o índice anterior"""
+        loader = AsyncMock(return_value=[make_rule("r1")])
+        index = RuleIndex(loader, ttl_seconds=60)
+        await index.get_rules("message_received")
+
+        loader.side_effect = RuntimeError("timeout")
+        index.invalidate()
+
+        assert [c.rule.id for c in await index.get_rules("message_received")] == ["r1"]
+        assert index.get_stats()["load_errors"] == 1
+
+
+class TestRulesExecutorIndex:
+    """Integração do índice com o RulesExecutor"""
+
+    @pytest.mark.asyncio
+    async def test_evaluate_rules_uses_index(self):
+        """Gatilhos repetidos não consultam o banco; invalidação força recarga"""
+        row = make_rule("r1", condicoes=[cond("message", "contains", "preço")]).dict()
+        row["gatilho"] = "message_received"
+        row["status"] = "ativa"
+        client = Mock()
+        client.table.return_value.select.return_value.eq.return_value.is_.return_value \
+            .order.return_value.execute.return_value = Mock(data=[row])
+
+        with patch.object(rules_module, "get_supabase_pool",
+                          return_value=ThreadedSupabaseExecutor(client)):
+            executor = rules_module.RulesExecutor()
+        executor.log_execution = AsyncMock()
+
+        for message in ("qual o preço?", "oi"):
+            executions = await executor.evaluate_rules("message_received", {"message": message})
+            assert len(executions) == 1
+
+        assert executions[0].conditions_met is False
+        assert client.table.call_count == 1
+
+        with patch.object(rules_module, "_rules_executor_instance", executor):
+            rules_module.invalidate_rule_cache()
+        await executor.evaluate_rules("message_received", {"message": "oi"})
+        assert client.table.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,88 @@
+"""
+Testes unitários para ServiceContainer
+
+Valida que os serviços compartilhados são inicializados uma única vez e
+finalizados no shutdown da aplicação.
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.service_container import ServiceContainer
+from agent.src.services.sicc import sicc_service as sicc_module
+
+
+def make_sicc():
+    sicc = Mock()
+    sicc.initialize = AsyncMock(return_value=True)
+    sicc.shutdown = AsyncMock()
+    sicc.is_initialized = True
+    sicc.active_conversations = {}
+    return sicc
+
+
+class TestServiceContainer:
+    """Testes do container de serviços"""
+
+    @pytest.mark.asyncio
+    async def test_startup_runs_once_with_shared_sicc(self):
+        """Startup inicializa o singleton do SICC uma única vez"""
+        sicc = make_sicc()
+        container = ServiceContainer(preload_embedding_model=False)
+
+        with patch.object(sicc_module, "_sicc_service_instance", sicc):
+            await container.startup()
+            await container.startup()
+
+            assert container.sicc is sicc
+            assert sicc_module.get_sicc_service() is sicc
+
+        sicc.initialize.assert_awaited_once()
+        assert container.started is True
+
+    @pytest.mark.asyncio
+    async def test_shutdown_finalizes_services(self):
+        """Shutdown encerra SICC, MemoryService e pool Supabase"""
+        sicc = make_sicc()
+        container = ServiceContainer(preload_embedding_model=False)
+
+        with patch.object(sicc_module, "_sicc_service_instance", sicc), \
+             patch("agent.src.services.sicc.memory_service.shutdown_memory_service",
+                   AsyncMock()) as shutdown_memory, \
+             patch("agent.src.services.supabase_pool.close_supabase_pool",
+                   AsyncMock()) as close_pool:
+            await container.startup()
+            await container.shutdown()
+
+        sicc.shutdown.assert_awaited_once()
+        shutdown_memory.assert_awaited_once()
+        close_pool.assert_awaited_once()
+        assert container.started is False
+
+    @pytest.mark.asyncio
+    async def test_shutdown_continues_after_errors(self):
+        """Falha em um serviço não impede a finalização dos demais"""
+        sicc = make_sicc()
+        sicc.shutdown.side_effect = RuntimeError("falha")
+        container = ServiceContainer(preload_embedding_model=False)
+
+        with patch.object(sicc_module, "_sicc_service_instance", sicc), \
+             patch("agent.src.services.sicc.memory_service.shutdown_memory_service",
+                   AsyncMock()), \
+             patch("agent.src.services.supabase_pool.close_supabase_pool",
+                   AsyncMock()) as close_pool:
+            await container.shutdown()
+
+        close_pool.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
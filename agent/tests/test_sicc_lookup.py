@@ -0,0 +1,123 @@
+"""
+Testes unitários para sicc_lookup_node
+
+Valida que as buscas de contexto rodam em paralelo sob um prazo comum, que
+uma busca lenta ou com erro entra vazia sem impedir as demais e que a
+duração de cada busca é reportada em sicc_context.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+
+from langchain_core.messages import HumanMessage
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.graph.nodes import sicc_lookup as lookup_module
+from agent.src.services import customer_history_service as customer_module
+from agent.src.services.sicc import behavior_service as behavior_module
+from agent.src.services.sicc.intent_classifier import IntentResult
+from agent.src.services.sicc.memory_service import Memory
+
+
+def delayed(seconds, value=None, error=None):
+    async def run(*args, **kwargs):
+        await asyncio.sleep(seconds)
+        if error:
+            raise error
+        return value
+    return run
+
+
+def make_memory(content):
+    return Memory(
+        id="mem-1", conversation_id="7", content=content, embedding=[0.1] * 384,
+        metadata={}, relevance_score=0.8, created_at=datetime(2026, 1, 1)
+    )
+
+
+def make_state():
+    return {
+        "tenant_id": 1,
+        "conversation_id": 7,
+        "lead_id": "5511999999999",
+        "messages": [HumanMessage(content="Quero um colchão para dor nas costas")],
+        "current_intent": "",
+        "context": {}
+    }
+
+
+async def run_node(memories_delay=0.2, context_delay=0.2, customer_delay=0.2, patterns_delay=0.2,
+                   customer_error=None, deadline=1.0):
+    memory_service = Mock()
+    memory_service.search_similar = delayed(memories_delay, [make_memory("cliente com dor lombar")])
+    memory_service.get_relevant_context = delayed(context_delay, [make_memory("preferiu o modelo firme")])
+    customer_service = Mock()
+    customer_service.get_customer_context = delayed(
+        customer_delay, {"is_returning_customer": True}, customer_error
+    )
+    behavior_service = Mock()
+    behavior_service.find_applicable_patterns = delayed(patterns_delay, [{"pattern_id": "p1"}])
+
+    with patch.object(lookup_module, "get_memory_service", return_value=memory_service), \
+            patch.object(customer_module, "get_customer_history_service", return_value=customer_service), \
+            patch.object(behavior_module, "get_behavior_service", return_value=behavior_service), \
+            patch.object(lookup_module, "LOOKUP_DEADLINE_SECONDS", deadline), \
+            patch.object(lookup_module, "_classify_intent",
+                         AsyncMock(return_value=IntentResult("sales", "rules", 0.9))):
+        start = time.perf_counter()
+        result = await lookup_module.sicc_lookup_node(make_state())
+        return result, time.perf_counter() - start
+
+
+class TestSiccLookupFanOut:
+    """Testes das buscas paralelas do sicc_lookup_node"""
+
+    @pytest.mark.asyncio
+    async def test_lookups_run_concurrently(self):
+        """Latência do node é a da busca mais lenta, não a soma"""
+        result, elapsed = await run_node()
+
+        assert elapsed < 0.5
+        sicc_context = result["sicc_context"]
+        assert set(sicc_context["lookup_timings"]) == {"memories", "relevant_context", "customer_context", "patterns"}
+        assert all(t["status"] == "ok" for t in sicc_context["lookup_timings"].values())
+        assert sicc_context["memories"][0]["content"] == "cliente com dor lombar"
+        assert "embedding" not in sicc_context["memories"][0]
+        assert sicc_context["context_found"] == 1
+        assert result["customer_context"] == {"is_returning_customer": True}
+        assert result["current_intent"] == "sales"
+
+    @pytest.mark.asyncio
+    async def test_slow_lookup_omitted_at_deadline(self):
+        """Busca que estoura o prazo comum entra vazia; as demais são usadas"""
+        result, elapsed = await run_node(patterns_delay=2.0, deadline=0.4)
+
+        assert elapsed < 1.0
+        timings = result["sicc_context"]["lookup_timings"]
+        assert timings["patterns"]["status"] == "timeout"
+        assert timings["memories"]["status"] == "ok"
+        assert result["sicc_context"]["patterns"] == []
+        assert result["sicc_context"]["memories_found"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_lookup_uses_default(self):
+        """Erro no histórico do cliente usa o contexto padrão"""
+        result, _ = await run_node(customer_delay=0.05, customer_error=RuntimeError("indisponível"))
+
+        assert result["sicc_context"]["lookup_timings"]["customer_context"]["status"] == "error"
+        assert result["customer_context"]["is_returning_customer"] is False
+        assert result["sicc_context"]["patterns_found"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,197 @@
+"""
+Testes unitários para o pipeline de process_message (SICCService)
+
+Valida que as etapas independentes de contexto rodam em paralelo, que uma
+etapa lenta é omitida ao estourar o prazo sem impedir a resposta, que a
+duração de cada etapa é reportada e que a resposta em trechos não é
+substituída por padrão nem seguida de resposta de emergência.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.sicc import sicc_service as sicc_module
+from agent.src.services.sicc.sicc_service import SICCConfig, SICCService
+from agent.src.services import customer_history_service as customer_module
+from agent.src.services import ai_service as ai_module
+
+
+def delayed(seconds, value):
+    async def run(*args, **kwargs):
+        await asyncio.sleep(seconds)
+        return value
+    return run
+
+
+def make_service(config=None, customer_delay=0.1, personality_delay=0.1,
+                 memories_delay=0.1, patterns_delay=0.1):
+    service = SICCService(config or SICCConfig())
+    service.is_initialized = True
+
+    service._memory_service = Mock()
+    service._memory_service.get_relevant_context = AsyncMock(
+        side_effect=delayed(memories_delay, [{"content": "memória"}])
+    )
+    service._behavior_service = Mock()
+    service._behavior_service.find_applicable_patterns = AsyncMock(
+        side_effect=delayed(patterns_delay, [])
+    )
+    service._metrics_service = Mock()
+    service._metrics_service.record_metric = AsyncMock()
+
+    customer_service = Mock()
+    customer_service.get_customer_context = AsyncMock(
+        side_effect=delayed(customer_delay, {"is_returning_customer": True, "customer_name": "Ana"})
+    )
+    ai = Mock()
+    ai.generate_text = AsyncMock(return_value={"text": "Olá!", "provider": "test"})
+
+    patches = [
+        patch.object(customer_module, "get_customer_history_service", return_value=customer_service),
+        patch.object(sicc_module, "load_personality",
+                     side_effect=delayed(personality_delay, {"agent_name": "Bia"})),
+        patch.object(ai_module, "get_ai_service", return_value=ai),
+    ]
+    return service, patches
+
+
+class FailingStream:
+    """Stream do LLM que falha depois de entregar um parágrafo"""
+
+    text = ""
+    provider = "test"
+
+    def __aiter__(self):
+        return self._deltas()
+
+    async def _deltas(self):
+        yield "Primeiro parágrafo da resposta, longo o bastante para ser enviado sozinho ao cliente.\n\n"
+        yield "Segundo"
+        raise RuntimeError("conexão perdida")
+
+
+class TestProcessMessagePipeline:
+    """Testes do pipeline de etapas do process_message"""
+
+    @pytest.mark.asyncio
+    async def test_context_stages_run_concurrently(self):
+        """Etapas independentes somam o tempo da mais lenta, não de todas"""
+        service, patches = make_service()
+
+        with patches[0], patches[1], patches[2]:
+            start = time.perf_counter()
+            result = await service.process_message("Oi", user_id="5511999999999", tenant_id=1)
+            elapsed = time.perf_counter() - start
+
+        assert result["success"] is True
+        assert result["response"] == "Olá!"
+        # Sequencial seriam ~0.4s (4 etapas de 0.1s)
+        assert elapsed < 0.35
+        timings = result["stage_timings"]
+        for stage in ("audio", "customer_context", "personality", "memories", "patterns", "llm"):
+            assert timings[stage]["status"] == "ok"
+
+        conversation = service.active_conversations["whatsapp_5511999999999"]
+        assert conversation["personality"] == {"agent_name": "Bia"}
+        assert conversation["memories_retrieved"] == [{"content": "memória"}]
+        service._behavior_service.find_applicable_patterns.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_slow_stage_is_dropped_after_deadline(self):
+        """Etapa que estoura o prazo fica fora do prompt e a resposta sai"""
+        config = SICCConfig(memory_context_deadline_seconds=0.05)
+        service, patches = make_service(config=config, memories_delay=1.0)
+
+        with patches[0], patches[1], patches[2]:
+            start = time.perf_counter()
+            result = await service.process_message("Oi", user_id="5511888888888", tenant_id=1)
+            elapsed = time.perf_counter() - start
+
+        assert result["success"] is True
+        assert elapsed < 0.5
+        assert result["stage_timings"]["memories"]["status"] == "timeout"
+        assert service.active_conversations["whatsapp_5511888888888"]["memories_retrieved"] == []
+
+    @pytest.mark.asyncio
+    async def test_failed_customer_context_uses_default(self):
+        """Erro no histórico do cliente não interrompe o pipeline"""
+        service, patches = make_service()
+
+        with patches[0], patches[1], patches[2]:
+            customer_module.get_customer_history_service.return_value.get_customer_context.side_effect = \
+                RuntimeError("timeout do banco")
+            result = await service.process_message("Oi", user_id="5511777777777")
+
+        assert result["success"] is True
+        assert result["stage_timings"]["customer_context"]["status"] == "error"
+        user_context = service.active_conversations["whatsapp_5511777777777"]["user_context"]
+        assert user_context["customer_context"]["is_returning_customer"] is False
+
+    @pytest.mark.asyncio
+    async def test_existing_conversation_skips_start_stages(self):
+        """Conversa já registrada não recarrega personality nem memórias"""
+        service, patches = make_service()
+
+        with patches[0], patches[1] as personality, patches[2]:
+            await service.process_message("Oi", user_id="5511666666666", tenant_id=1)
+            await service.process_message("Tudo bem?", user_id="5511666666666", tenant_id=1)
+
+            assert personality.await_count == 1
+        assert service._memory_service.get_relevant_context.await_count == 1
+        assert service._behavior_service.find_applicable_patterns.await_count == 2
+
+
+
+class TestProcessMessageStreaming:
+    """Testes da resposta em trechos"""
+
+    @pytest.mark.asyncio
+    async def test_pattern_response_not_streamed(self):
+        """Padrão que substitui a resposta é resolvido antes e dispensa o LLM"""
+        service, patches = make_service()
+        service._behavior_service.find_applicable_patterns = AsyncMock(return_value=[{"id": "p1"}])
+        service._behavior_service.apply_pattern = AsyncMock(
+            return_value={"success": True, "modified_response": "Resposta do padrão"}
+        )
+        on_chunk = AsyncMock()
+
+        with patches[0], patches[1], patches[2] as ai:
+            result = await service.process_message("Oi", user_id="5511555555555", tenant_id=1,
+                                                   on_chunk=on_chunk)
+
+        assert result["response"] == "Resposta do padrão"
+        assert not result["streamed"]
+        assert result["stage_timings"]["llm"]["status"] == "skipped"
+        on_chunk.assert_not_awaited()
+        ai.return_value.generate_text_stream.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_no_emergency_reply_after_partial_stream(self):
+        """Falha depois de um trecho enviado não gera outra resposta completa"""
+        service, patches = make_service()
+        on_chunk = AsyncMock()
+
+        with patches[0], patches[1], patches[2] as ai:
+            ai.return_value.generate_text_stream = Mock(return_value=FailingStream())
+            result = await service.process_message("Oi", user_id="5511444444444", tenant_id=1,
+                                                   on_chunk=on_chunk)
+
+        assert on_chunk.await_count == 1
+        assert result["success"] is False
+        assert result["streamed"] is True
+        assert result["response"] == ""
+        ai.return_value.generate_text.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,108 @@
+"""
+Testes unitários para o pool Supabase assíncrono
+
+Valida concorrência limitada, timeout por chamada e o executor em thread
+usado com clientes síncronos injetados.
+"""
+
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, Mock, patch
+
+# Configurar ambiente de teste
+os.environ["TESTING"] = "1"
+
+# Adicionar o diretório agent ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.src.services.supabase_pool import AsyncSupabasePool, ThreadedSupabaseExecutor
+
+
+class FakeQuery:
+    """Query assíncrona que registra concorrência"""
+
+    def __init__(self, tracker, delay):
+        self.tracker = tracker
+        self.delay = delay
+
+    async def execute(self):
+        self.tracker["active"] += 1
+        self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+        try:
+            await asyncio.sleep(self.delay)
+            return Mock(data=[{"ok": True}])
+        finally:
+            self.tracker["active"] -= 1
+
+
+def make_async_client(tracker, delay=0.01):
+    client = Mock()
+    client.table.side_effect = lambda name: FakeQuery(tracker, delay)
+    return client
+
+
+class TestAsyncSupabasePool:
+    """Testes do pool assíncrono"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Nunca há mais queries simultâneas que max_concurrency"""
+        tracker = {"active": 0, "peak": 0}
+        pool = AsyncSupabasePool(url="https://x.supabase.co", key="k", max_concurrency=2)
+
+        with patch("agent.src.services.supabase_pool.acreate_client",
+                   AsyncMock(return_value=make_async_client(tracker))) as create:
+            results = await asyncio.gather(*[
+                pool.run(lambda c: c.table("products")) for _ in range(6)
+            ])
+
+        create.assert_awaited_once()  # cliente criado uma única vez
+        assert len(results) == 6
+        assert tracker["peak"] == 2
+        assert pool.get_stats()["calls"] == 6
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_timeout_per_call(self):
+        """Chamada lenta falha com timeout sem afetar as demais"""
+        tracker = {"active": 0, "peak": 0}
+        pool = AsyncSupabasePool(url="https://x.supabase.co", key="k", timeout_seconds=5)
+
+        with patch("agent.src.services.supabase_pool.acreate_client",
+                   AsyncMock(return_value=make_async_client(tracker, delay=0.2))):
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.run(lambda c: c.table("products"), timeout=0.01)
+
+        assert pool.get_stats()["timeouts"] == 1
+        assert pool.get_stats()["in_flight"] == 0
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_missing_credentials(self):
+        """Sem URL/chave o pool falha como o cliente síncrono"""
+        with patch.dict(os.environ, {"SUPABASE_URL": "", "SUPABASE_SERVICE_KEY": ""}):
+            pool = AsyncSupabasePool()
+            with pytest.raises(ValueError, match="SUPABASE_URL"):
+                await pool.run(lambda c: c.table("products"))
+
+
+class TestThreadedSupabaseExecutor:
+    """Testes do executor para clientes síncronos"""
+
+    @pytest.mark.asyncio
+    async def test_runs_sync_execute_in_thread(self):
+        """execute() síncrono é chamado fora do event loop"""
+        client = Mock()
+        client.rpc.return_value.execute.return_value = Mock(data=[1])
+        executor = ThreadedSupabaseExecutor(client)
+
+        result = await executor.run(lambda c: c.rpc("fn", {"a": 1}))
+
+        assert result.data == [1]
+        client.rpc.assert_called_once_with("fn", {"a": 1})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,42 @@
+-- ===================================
+-- ATUALIZAÇÃO EM LOTE DE RELEVÂNCIA - SICC
+-- ===================================
+-- Aplica vários boosts de relevância em uma única chamada RPC.
+-- Usado pelo RelevanceAccumulator do MemoryService (write-behind),
+-- substituindo uma chamada de update_memory_relevance por memória retornada.
+--
+-- Formato de entrada:
+--   [{"memory_id": "<uuid>", "usage_boost": 0.2}, ...]
+
+CREATE OR REPLACE FUNCTION update_memory_relevance_bulk(
+    boosts jsonb
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_count integer;
+BEGIN
+    WITH input AS (
+        SELECT
+            (item->>'memory_id')::uuid AS memory_id,
+            SUM((item->>'usage_boost')::float) AS usage_boost
+        FROM jsonb_array_elements(boosts) AS item
+        GROUP BY 1
+    )
+    UPDATE sicc_memory_chunks mc
+    SET relevance_score = LEAST(1.0, mc.relevance_score + input.usage_boost),
+        updated_at = NOW()
+    FROM input
+    WHERE mc.id = input.memory_id
+        AND mc.deleted_at IS NULL;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+
+    RETURN updated_count;
+END;
+$$;
+
+COMMENT ON FUNCTION update_memory_relevance_bulk IS 'Aplica boosts de relevância de várias memórias em uma única chamada';
+
+GRANT EXECUTE ON FUNCTION update_memory_relevance_bulk TO authenticated, service_role;
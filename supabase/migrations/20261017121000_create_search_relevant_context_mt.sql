@@ -0,0 +1,74 @@
+-- ===================================
+-- BUSCA DE CONTEXTO EM UM ÚNICO ROUND-TRIP - SICC
+-- ===================================
+-- Retorna, para o mesmo embedding, as memórias mais similares da conversa
+-- atual e do tenant inteiro. Usada por MemoryService.get_relevant_context,
+-- que antes fazia duas chamadas a search_similar_memories_mt (e dois
+-- embeddings) por mensagem. Merge, deduplicação e ranking são feitos no agente.
+
+CREATE OR REPLACE FUNCTION search_relevant_context_mt(
+    query_embedding vector(384),
+    tenant_filter integer,
+    conversation_filter text,
+    similarity_threshold float DEFAULT 0.1,
+    conversation_limit int DEFAULT 3,
+    global_limit int DEFAULT 2
+)
+RETURNS TABLE (
+    scope text,
+    id uuid,
+    conversation_id text,
+    content text,
+    metadata jsonb,
+    relevance_score float,
+    similarity_score float,
+    created_at timestamptz
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    (
+        SELECT
+            'conversation'::text AS scope,
+            mc.id,
+            mc.conversation_id::text,
+            mc.content,
+            mc.metadata,
+            mc.relevance_score::float,
+            (1 - (mc.embedding <=> query_embedding))::float AS similarity_score,
+            mc.created_at
+        FROM sicc_memory_chunks mc
+        WHERE
+            mc.deleted_at IS NULL
+            AND mc.tenant_id = tenant_filter
+            AND mc.conversation_id::text = conversation_filter
+            AND (1 - (mc.embedding <=> query_embedding)) >= similarity_threshold
+        ORDER BY mc.embedding <=> query_embedding
+        LIMIT conversation_limit
+    )
+    UNION ALL
+    (
+        SELECT
+            'global'::text AS scope,
+            mc.id,
+            mc.conversation_id::text,
+            mc.content,
+            mc.metadata,
+            mc.relevance_score::float,
+            (1 - (mc.embedding <=> query_embedding))::float AS similarity_score,
+            mc.created_at
+        FROM sicc_memory_chunks mc
+        WHERE
+            mc.deleted_at IS NULL
+            AND mc.tenant_id = tenant_filter
+            AND (1 - (mc.embedding <=> query_embedding)) >= similarity_threshold
+        ORDER BY mc.embedding <=> query_embedding
+        LIMIT global_limit
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION search_relevant_context_mt IS 'Busca memórias da conversa e do tenant para o mesmo embedding em uma única chamada';
+
+GRANT EXECUTE ON FUNCTION search_relevant_context_mt TO authenticated, service_role;
@@ -0,0 +1,82 @@
+-- ===================================
+-- PERSISTÊNCIA DE MENSAGENS EM UM ROUND-TRIP
+-- ===================================
+-- Localiza ou cria o customer, localiza ou cria a conversa aberta do canal
+-- e insere a mensagem, tudo em uma única chamada RPC.
+-- Usado pelo ConversationStore do agente quando o par
+-- customer/conversa não está em cache (substitui 3 a 5 queries sequenciais).
+--
+-- Retorna os IDs para que o agente grave as próximas mensagens da mesma
+-- conversa com um único INSERT.
+
+CREATE OR REPLACE FUNCTION save_conversation_message(
+    p_channel text,
+    p_phone text,
+    p_email text,
+    p_customer_name text,
+    p_session_id text,
+    p_subject text,
+    p_content text,
+    p_sender_type text
+)
+RETURNS TABLE (
+    customer_id uuid,
+    conversation_id uuid,
+    message_id uuid
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_customer_id uuid;
+    v_conversation_id uuid;
+    v_message_id uuid;
+BEGIN
+    -- 1. Customer: site é identificado pelo email temporário, WhatsApp pelo telefone
+    IF p_channel = 'site' THEN
+        SELECT c.id INTO v_customer_id
+        FROM customers c
+        WHERE c.email = p_email
+        LIMIT 1;
+    ELSE
+        SELECT c.id INTO v_customer_id
+        FROM customers c
+        WHERE c.phone = p_phone
+        LIMIT 1;
+    END IF;
+
+    IF v_customer_id IS NULL THEN
+        INSERT INTO customers (name, email, phone, source, status)
+        VALUES (p_customer_name, p_email, p_phone, p_channel, 'active')
+        ON CONFLICT (email) DO UPDATE SET updated_at = NOW()
+        RETURNING id INTO v_customer_id;
+    END IF;
+
+    -- 2. Conversa aberta do canal (serializada por customer para evitar duplicatas)
+    PERFORM pg_advisory_xact_lock(hashtext(v_customer_id::text || ':' || p_channel));
+
+    SELECT cv.id INTO v_conversation_id
+    FROM conversations cv
+    WHERE cv.customer_id = v_customer_id
+        AND cv.channel = p_channel::conversation_channel
+        AND cv.status = 'open'
+    ORDER BY cv.created_at DESC
+    LIMIT 1;
+
+    IF v_conversation_id IS NULL THEN
+        INSERT INTO conversations (customer_id, channel, status, subject, session_id)
+        VALUES (v_customer_id, p_channel::conversation_channel, 'open', p_subject, p_session_id)
+        RETURNING id INTO v_conversation_id;
+    END IF;
+
+    -- 3. Mensagem
+    INSERT INTO messages (conversation_id, content, sender_type, sender_id)
+    VALUES (v_conversation_id, p_content, p_sender_type::message_sender_type, v_customer_id)
+    RETURNING id INTO v_message_id;
+
+    RETURN QUERY SELECT v_customer_id, v_conversation_id, v_message_id;
+END;
+$$;
+
+COMMENT ON FUNCTION save_conversation_message IS 'Localiza/cria customer e conversa aberta e insere a mensagem em uma única chamada';
+
+GRANT EXECUTE ON FUNCTION save_conversation_message TO service_role;
@@ -0,0 +1,81 @@
+-- ===================================
+-- ESTATÍSTICAS DE AUDITORIA AGREGADAS NO BANCO
+-- ===================================
+-- Agrupa os eventos de audit_events do período por tipo, nível, dia,
+-- recurso e usuário em uma única chamada RPC.
+-- Usado pelo AuditService.get_audit_stats do agente, substituindo a leitura
+-- de até 10.000 eventos brutos para contagem em Python.
+--
+-- Retorna o mesmo formato do agente:
+--   {"total_events": 0, "events_by_type": {}, "events_by_level": {},
+--    "events_by_day": {}, "top_resources": {}, "top_users": {}}
+
+CREATE OR REPLACE FUNCTION get_audit_stats(
+    p_start timestamptz,
+    p_end timestamptz,
+    p_user_id text DEFAULT NULL,
+    p_top_limit integer DEFAULT 10
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN (
+        WITH events AS (
+            SELECT event_type, level, user_id, resource_type, resource_id, "timestamp"
+            FROM audit_events
+            WHERE "timestamp" >= p_start
+                AND "timestamp" <= p_end
+                AND (p_user_id IS NULL OR user_id::text = p_user_id)
+        )
+        SELECT jsonb_build_object(
+            'total_events', (SELECT COUNT(*) FROM events),
+            'events_by_type', COALESCE((
+                SELECT jsonb_object_agg(key, total)
+                FROM (
+                    SELECT COALESCE(event_type::text, 'unknown') AS key, COUNT(*) AS total
+                    FROM events GROUP BY 1
+                ) t
+            ), '{}'::jsonb),
+            'events_by_level', COALESCE((
+                SELECT jsonb_object_agg(key, total)
+                FROM (
+                    SELECT COALESCE(level::text, 'unknown') AS key, COUNT(*) AS total
+                    FROM events GROUP BY 1
+                ) t
+            ), '{}'::jsonb),
+            'events_by_day', COALESCE((
+                SELECT jsonb_object_agg(key, total)
+                FROM (
+                    SELECT to_char("timestamp", 'YYYY-MM-DD') AS key, COUNT(*) AS total
+                    FROM events GROUP BY 1
+                ) t
+            ), '{}'::jsonb),
+            'top_resources', COALESCE((
+                SELECT jsonb_object_agg(key, total)
+                FROM (
+                    SELECT COALESCE(resource_type::text, 'unknown') || ':' || COALESCE(resource_id::text, 'unknown') AS key,
+                           COUNT(*) AS total
+                    FROM events GROUP BY 1
+                    ORDER BY total DESC
+                    LIMIT p_top_limit
+                ) t
+            ), '{}'::jsonb),
+            'top_users', COALESCE((
+                SELECT jsonb_object_agg(key, total)
+                FROM (
+                    SELECT COALESCE(user_id::text, 'anonymous') AS key, COUNT(*) AS total
+                    FROM events GROUP BY 1
+                    ORDER BY total DESC
+                    LIMIT p_top_limit
+                ) t
+            ), '{}'::jsonb)
+        )
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION get_audit_stats IS 'Estatísticas de auditoria do período agregadas no banco (tipo, nível, dia, recurso e usuário)';
+
+GRANT EXECUTE ON FUNCTION get_audit_stats TO authenticated, service_role;
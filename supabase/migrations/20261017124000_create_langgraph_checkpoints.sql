@@ -0,0 +1,88 @@
+-- ===================================
+-- CHECKPOINTS DO LANGGRAPH EM TABELA DEDICADA
+-- ===================================
+-- Guarda o checkpoint mais recente de cada thread do grafo multi-agente
+-- (thread_id = "tenant_{tenant_id}_conv_{conversation_id}") fora de
+-- multi_agent_conversations.metadata, que deixava de ser lido e regravado
+-- inteiro a cada transição de node.
+-- Usado pelo MultiTenantCheckpointer do agente, que agrupa os checkpoints de
+-- uma execução do grafo em uma única gravação.
+--
+-- `version` cresce a cada checkpoint da thread: put_langgraph_checkpoint
+-- ignora gravações com versão menor ou igual à já armazenada (réplica
+-- atrasada não sobrescreve um checkpoint mais novo).
+
+CREATE TABLE IF NOT EXISTS langgraph_checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    tenant_id INTEGER NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    version BIGINT NOT NULL DEFAULT 1,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint TEXT NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+
+CREATE INDEX IF NOT EXISTS idx_langgraph_checkpoints_tenant_conversation
+    ON langgraph_checkpoints(tenant_id, conversation_id);
+
+-- Acesso apenas pelo agente (service_role ignora RLS)
+ALTER TABLE langgraph_checkpoints ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE langgraph_checkpoints IS 'Checkpoint mais recente de cada thread do grafo LangGraph, versionado';
+COMMENT ON COLUMN langgraph_checkpoints.checkpoint IS 'Checkpoint serializado pelo serializer do LangGraph (base64), tipo em checkpoint_type';
+
+CREATE OR REPLACE FUNCTION put_langgraph_checkpoint(
+    p_thread_id text,
+    p_checkpoint_ns text,
+    p_tenant_id integer,
+    p_conversation_id integer,
+    p_checkpoint_id text,
+    p_parent_checkpoint_id text,
+    p_version bigint,
+    p_checkpoint_type text,
+    p_checkpoint text,
+    p_metadata jsonb
+)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_version bigint;
+BEGIN
+    INSERT INTO langgraph_checkpoints (
+        thread_id, checkpoint_ns, tenant_id, conversation_id, checkpoint_id,
+        parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata
+    )
+    VALUES (
+        p_thread_id, p_checkpoint_ns, p_tenant_id, p_conversation_id, p_checkpoint_id,
+        p_parent_checkpoint_id, p_version, p_checkpoint_type, p_checkpoint, COALESCE(p_metadata, '{}'::jsonb)
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        version = EXCLUDED.version,
+        checkpoint_type = EXCLUDED.checkpoint_type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        updated_at = NOW()
+    WHERE langgraph_checkpoints.version < EXCLUDED.version
+        AND langgraph_checkpoints.tenant_id = EXCLUDED.tenant_id;
+
+    -- Versão vigente (maior que p_version se outra réplica gravou antes)
+    SELECT version INTO v_version
+    FROM langgraph_checkpoints
+    WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+
+    RETURN v_version;
+END;
+$$;
+
+COMMENT ON FUNCTION put_langgraph_checkpoint IS 'Grava o checkpoint da thread se a versão for maior que a armazenada; retorna a versão vigente';
+
+GRANT EXECUTE ON FUNCTION put_langgraph_checkpoint TO authenticated, service_role;
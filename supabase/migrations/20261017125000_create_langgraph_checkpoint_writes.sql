@@ -0,0 +1,89 @@
+-- ===================================
+-- WRITES PENDENTES DOS CHECKPOINTS DO LANGGRAPH
+-- ===================================
+-- Guarda os writes de cada task do grafo (resultado de node, erro,
+-- interrupção) em linhas pequenas, gravadas assim que a task termina.
+-- Se o processo cair no meio da execução, as tasks já concluídas não são
+-- refeitas ao retomar a partir do checkpoint, sem regravar o checkpoint
+-- inteiro a cada node.
+-- Usado por MultiTenantCheckpointer.put_writes/aput_writes do agente.
+--
+-- put_langgraph_checkpoint passa a remover os writes de checkpoints
+-- substituídos (apenas o checkpoint mais recente de cada thread é mantido).
+
+CREATE TABLE IF NOT EXISTS langgraph_checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    tenant_id INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+
+-- Acesso apenas pelo agente (service_role ignora RLS)
+ALTER TABLE langgraph_checkpoint_writes ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE langgraph_checkpoint_writes IS 'Writes pendentes das tasks do grafo LangGraph, por checkpoint';
+
+CREATE OR REPLACE FUNCTION put_langgraph_checkpoint(
+    p_thread_id text,
+    p_checkpoint_ns text,
+    p_tenant_id integer,
+    p_conversation_id integer,
+    p_checkpoint_id text,
+    p_parent_checkpoint_id text,
+    p_version bigint,
+    p_checkpoint_type text,
+    p_checkpoint text,
+    p_metadata jsonb
+)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_version bigint;
+    v_checkpoint_id text;
+BEGIN
+    INSERT INTO langgraph_checkpoints (
+        thread_id, checkpoint_ns, tenant_id, conversation_id, checkpoint_id,
+        parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata
+    )
+    VALUES (
+        p_thread_id, p_checkpoint_ns, p_tenant_id, p_conversation_id, p_checkpoint_id,
+        p_parent_checkpoint_id, p_version, p_checkpoint_type, p_checkpoint, COALESCE(p_metadata, '{}'::jsonb)
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        version = EXCLUDED.version,
+        checkpoint_type = EXCLUDED.checkpoint_type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        updated_at = NOW()
+    WHERE langgraph_checkpoints.version < EXCLUDED.version
+        AND langgraph_checkpoints.tenant_id = EXCLUDED.tenant_id;
+
+    -- Versão vigente (maior que p_version se outra réplica gravou antes)
+    SELECT version, checkpoint_id INTO v_version, v_checkpoint_id
+    FROM langgraph_checkpoints
+    WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+
+    -- Writes de checkpoints anteriores não são mais lidos
+    DELETE FROM langgraph_checkpoint_writes
+    WHERE thread_id = p_thread_id
+        AND checkpoint_ns = p_checkpoint_ns
+        AND checkpoint_id < v_checkpoint_id;
+
+    RETURN v_version;
+END;
+$$;
+
+COMMENT ON FUNCTION put_langgraph_checkpoint IS 'Grava o checkpoint da thread se a versão for maior que a armazenada, remove writes de checkpoints anteriores e retorna a versão vigente';
+
+GRANT EXECUTE ON FUNCTION put_langgraph_checkpoint TO authenticated, service_role;
@@ -0,0 +1,122 @@
+-- ===================================
+-- MENSAGENS DOS CHECKPOINTS DO LANGGRAPH EM LINHAS APPEND-ONLY
+-- ===================================
+-- O histórico `messages` do estado do grafo cresce a cada turno e era
+-- reserializado inteiro em todo checkpoint. As mensagens passam a ficar em
+-- langgraph_checkpoint_messages (uma linha por posição do histórico) e o
+-- checkpoint guarda só o restante do estado e `messages_count`.
+-- Cada gravação envia apenas as mensagens novas; o histórico inteiro só é
+-- regravado quando deixa de ser uma extensão do anterior (mensagem editada
+-- ou removida).
+-- Usado pelo MultiTenantCheckpointer do agente. Checkpoints gravados antes
+-- desta migração (mensagens dentro do checkpoint) continuam legíveis e são
+-- convertidos na próxima gravação da thread.
+
+CREATE TABLE IF NOT EXISTS langgraph_checkpoint_messages (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    seq INTEGER NOT NULL,
+    tenant_id INTEGER NOT NULL,
+    value_type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (thread_id, checkpoint_ns, seq)
+);
+
+-- Acesso apenas pelo agente (service_role ignora RLS)
+ALTER TABLE langgraph_checkpoint_messages ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE langgraph_checkpoint_messages IS 'Histórico de mensagens das threads do grafo LangGraph, uma linha por posição';
+
+ALTER TABLE langgraph_checkpoints
+    ADD COLUMN IF NOT EXISTS messages_count INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN langgraph_checkpoints.messages_count IS 'Tamanho do histórico em langgraph_checkpoint_messages (0 = mensagens dentro do checkpoint ou sem histórico)';
+
+-- Nova assinatura: remover a anterior evita sobrecarga ambígua no PostgREST
+DROP FUNCTION IF EXISTS put_langgraph_checkpoint(text, text, integer, integer, text, text, bigint, text, text, jsonb);
+
+CREATE OR REPLACE FUNCTION put_langgraph_checkpoint(
+    p_thread_id text,
+    p_checkpoint_ns text,
+    p_tenant_id integer,
+    p_conversation_id integer,
+    p_checkpoint_id text,
+    p_parent_checkpoint_id text,
+    p_version bigint,
+    p_checkpoint_type text,
+    p_checkpoint text,
+    p_metadata jsonb,
+    p_messages jsonb DEFAULT '[]'::jsonb,
+    p_messages_count integer DEFAULT 0,
+    p_messages_reset boolean DEFAULT false
+)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_version bigint;
+    v_checkpoint_id text;
+    v_applied integer;
+BEGIN
+    INSERT INTO langgraph_checkpoints (
+        thread_id, checkpoint_ns, tenant_id, conversation_id, checkpoint_id,
+        parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata, messages_count
+    )
+    VALUES (
+        p_thread_id, p_checkpoint_ns, p_tenant_id, p_conversation_id, p_checkpoint_id,
+        p_parent_checkpoint_id, p_version, p_checkpoint_type, p_checkpoint,
+        COALESCE(p_metadata, '{}'::jsonb), p_messages_count
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        version = EXCLUDED.version,
+        checkpoint_type = EXCLUDED.checkpoint_type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        messages_count = EXCLUDED.messages_count,
+        updated_at = NOW()
+    WHERE langgraph_checkpoints.version < EXCLUDED.version
+        AND langgraph_checkpoints.tenant_id = EXCLUDED.tenant_id;
+
+    GET DIAGNOSTICS v_applied = ROW_COUNT;
+
+    -- Mensagens só acompanham um checkpoint efetivamente gravado
+    IF v_applied > 0 THEN
+        IF p_messages_reset THEN
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+        ELSE
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id
+                AND checkpoint_ns = p_checkpoint_ns
+                AND seq >= p_messages_count;
+        END IF;
+
+        INSERT INTO langgraph_checkpoint_messages (thread_id, checkpoint_ns, seq, tenant_id, value_type, value)
+        SELECT p_thread_id, p_checkpoint_ns, (m->>'seq')::integer, p_tenant_id, m->>'value_type', m->>'value'
+        FROM jsonb_array_elements(COALESCE(p_messages, '[]'::jsonb)) AS m
+        ON CONFLICT (thread_id, checkpoint_ns, seq) DO UPDATE SET
+            value_type = EXCLUDED.value_type,
+            value = EXCLUDED.value;
+    END IF;
+
+    -- Versão vigente (maior que p_version se outra réplica gravou antes)
+    SELECT version, checkpoint_id INTO v_version, v_checkpoint_id
+    FROM langgraph_checkpoints
+    WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+
+    -- Writes de checkpoints anteriores não são mais lidos
+    DELETE FROM langgraph_checkpoint_writes
+    WHERE thread_id = p_thread_id
+        AND checkpoint_ns = p_checkpoint_ns
+        AND checkpoint_id < v_checkpoint_id;
+
+    RETURN v_version;
+END;
+$$;
+
+COMMENT ON FUNCTION put_langgraph_checkpoint IS 'Grava o checkpoint da thread se a versão for maior que a armazenada, anexa as mensagens novas, remove writes de checkpoints anteriores e retorna a versão vigente';
+
+GRANT EXECUTE ON FUNCTION put_langgraph_checkpoint TO authenticated, service_role;
@@ -0,0 +1,26 @@
+-- ===================================
+-- EXEMPLOS ROTULADOS DE INTENÇÃO (SICC)
+-- ===================================
+-- Turnos de conversa com a intenção classificada (discovery | sales |
+-- support). Usados pelo IntentClassifier do agente para treinar os
+-- centroides de intenção sobre os embeddings MiniLM, que dispensam a
+-- chamada ao LLM quando a confiança local é suficiente.
+-- source = 'llm': gravado automaticamente quando o LLM classificou o turno;
+-- source = 'manual': rótulo revisado/inserido pela equipe.
+
+CREATE TABLE IF NOT EXISTS sicc_intent_examples (
+    id BIGSERIAL PRIMARY KEY,
+    text TEXT NOT NULL,
+    intent TEXT NOT NULL CHECK (intent IN ('discovery', 'sales', 'support')),
+    source TEXT NOT NULL DEFAULT 'llm' CHECK (source IN ('llm', 'manual')),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Treino lê os exemplos mais recentes
+CREATE INDEX IF NOT EXISTS idx_sicc_intent_examples_created_at
+    ON sicc_intent_examples(created_at DESC);
+
+-- Acesso apenas pelo agente (service_role ignora RLS)
+ALTER TABLE sicc_intent_examples ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE sicc_intent_examples IS 'Turnos rotulados com a intenção, usados no treino do classificador local de intent';
@@ -0,0 +1,97 @@
+-- ===================================
+-- put_langgraph_checkpoint RETORNA O CHECKPOINT VIGENTE
+-- ===================================
+-- Com mais de uma réplica do agente, a gravação de uma pode ser rejeitada
+-- porque outra já gravou versão maior da mesma thread. Só a versão não
+-- distingue esse conflito de gravações da própria réplica que chegaram fora
+-- de ordem. A função passa a retornar versão e checkpoint_id vigentes
+-- ({"version": ..., "checkpoint_id": ...}); o MultiTenantCheckpointer
+-- descarta do cache a thread cujo checkpoint vigente não foi gravado por ele.
+
+-- Tipo de retorno muda: a função precisa ser recriada
+DROP FUNCTION IF EXISTS put_langgraph_checkpoint(text, text, integer, integer, text, text, bigint, text, text, jsonb, jsonb, integer, boolean);
+
+CREATE OR REPLACE FUNCTION put_langgraph_checkpoint(
+    p_thread_id text,
+    p_checkpoint_ns text,
+    p_tenant_id integer,
+    p_conversation_id integer,
+    p_checkpoint_id text,
+    p_parent_checkpoint_id text,
+    p_version bigint,
+    p_checkpoint_type text,
+    p_checkpoint text,
+    p_metadata jsonb,
+    p_messages jsonb DEFAULT '[]'::jsonb,
+    p_messages_count integer DEFAULT 0,
+    p_messages_reset boolean DEFAULT false
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_version bigint;
+    v_checkpoint_id text;
+    v_applied integer;
+BEGIN
+    INSERT INTO langgraph_checkpoints (
+        thread_id, checkpoint_ns, tenant_id, conversation_id, checkpoint_id,
+        parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata, messages_count
+    )
+    VALUES (
+        p_thread_id, p_checkpoint_ns, p_tenant_id, p_conversation_id, p_checkpoint_id,
+        p_parent_checkpoint_id, p_version, p_checkpoint_type, p_checkpoint,
+        COALESCE(p_metadata, '{}'::jsonb), p_messages_count
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        version = EXCLUDED.version,
+        checkpoint_type = EXCLUDED.checkpoint_type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        messages_count = EXCLUDED.messages_count,
+        updated_at = NOW()
+    WHERE langgraph_checkpoints.version < EXCLUDED.version
+        AND langgraph_checkpoints.tenant_id = EXCLUDED.tenant_id;
+
+    GET DIAGNOSTICS v_applied = ROW_COUNT;
+
+    -- Mensagens só acompanham um checkpoint efetivamente gravado
+    IF v_applied > 0 THEN
+        IF p_messages_reset THEN
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+        ELSE
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id
+                AND checkpoint_ns = p_checkpoint_ns
+                AND seq >= p_messages_count;
+        END IF;
+
+        INSERT INTO langgraph_checkpoint_messages (thread_id, checkpoint_ns, seq, tenant_id, value_type, value)
+        SELECT p_thread_id, p_checkpoint_ns, (m->>'seq')::integer, p_tenant_id, m->>'value_type', m->>'value'
+        FROM jsonb_array_elements(COALESCE(p_messages, '[]'::jsonb)) AS m
+        ON CONFLICT (thread_id, checkpoint_ns, seq) DO UPDATE SET
+            value_type = EXCLUDED.value_type,
+            value = EXCLUDED.value;
+    END IF;
+
+    -- Checkpoint vigente (de outra réplica se ela gravou versão maior antes)
+    SELECT version, checkpoint_id INTO v_version, v_checkpoint_id
+    FROM langgraph_checkpoints
+    WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+
+    -- Writes de checkpoints anteriores não são mais lidos
+    DELETE FROM langgraph_checkpoint_writes
+    WHERE thread_id = p_thread_id
+        AND checkpoint_ns = p_checkpoint_ns
+        AND checkpoint_id < v_checkpoint_id;
+
+    RETURN jsonb_build_object('version', v_version, 'checkpoint_id', v_checkpoint_id);
+END;
+$$;
+
+COMMENT ON FUNCTION put_langgraph_checkpoint IS 'Grava o checkpoint da thread se a versão for maior que a armazenada, anexa as mensagens novas, remove writes de checkpoints anteriores e retorna versão e checkpoint_id vigentes';
+
+GRANT EXECUTE ON FUNCTION put_langgraph_checkpoint TO authenticated, service_role;
@@ -0,0 +1,37 @@
+-- ===================================
+-- MENSAGEM APENAS EM CONVERSA AINDA ABERTA
+-- ===================================
+-- O ConversationStore do agente guarda em cache a conversa aberta de cada
+-- cliente e grava as mensagens seguintes direto nela. A conversa pode ser
+-- encerrada fora do agente (painel, automações) enquanto está em cache.
+-- Esta função insere a mensagem somente se a conversa ainda estiver com
+-- status 'open', no mesmo round-trip do INSERT. Retorna NULL quando a
+-- conversa foi encerrada; o agente então localiza/cria a conversa aberta
+-- com save_conversation_message.
+
+CREATE OR REPLACE FUNCTION insert_open_conversation_message(
+    p_conversation_id uuid,
+    p_sender_id uuid,
+    p_content text,
+    p_sender_type text
+)
+RETURNS uuid
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_message_id uuid;
+BEGIN
+    INSERT INTO messages (conversation_id, content, sender_type, sender_id)
+    SELECT cv.id, p_content, p_sender_type::message_sender_type, p_sender_id
+    FROM conversations cv
+    WHERE cv.id = p_conversation_id
+        AND cv.status = 'open'
+    RETURNING id INTO v_message_id;
+
+    RETURN v_message_id;
+END;
+$$;
+
+COMMENT ON FUNCTION insert_open_conversation_message IS 'Insere a mensagem se a conversa ainda estiver aberta; retorna NULL se foi encerrada';
+
+GRANT EXECUTE ON FUNCTION insert_open_conversation_message TO service_role;
@@ -0,0 +1,33 @@
+-- ===================================
+-- TAXA DE SUCESSO MAIS RECENTE POR PADRÃO
+-- ===================================
+-- Retorna, para cada padrão pedido, a métrica 'success_rate' mais recente
+-- de agent_performance_metrics (DISTINCT ON por pattern_id).
+-- Usado pelo BehaviorService do agente ao montar o índice de padrões:
+-- substitui a leitura de todas as métricas dos padrões, que o limite de
+-- linhas do PostgREST truncava, deixando padrões sem taxa de sucesso.
+
+CREATE INDEX IF NOT EXISTS idx_performance_metrics_pattern_success
+    ON agent_performance_metrics(pattern_id, created_at DESC)
+    WHERE metric_type = 'success_rate';
+
+CREATE OR REPLACE FUNCTION get_pattern_success_rates(
+    p_pattern_ids uuid[]
+)
+RETURNS TABLE (
+    pattern_id uuid,
+    success_rate double precision
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT DISTINCT ON (m.pattern_id) m.pattern_id, m.metric_value
+    FROM agent_performance_metrics m
+    WHERE m.metric_type = 'success_rate'
+        AND m.pattern_id = ANY(p_pattern_ids)
+    ORDER BY m.pattern_id, m.created_at DESC;
+$$;
+
+COMMENT ON FUNCTION get_pattern_success_rates IS 'Taxa de sucesso mais recente (métrica success_rate) de cada padrão informado';
+
+GRANT EXECUTE ON FUNCTION get_pattern_success_rates TO authenticated, service_role;
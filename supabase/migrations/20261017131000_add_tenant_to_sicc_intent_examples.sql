@@ -0,0 +1,52 @@
+-- ===================================
+-- EXEMPLOS DE INTENÇÃO POR TENANT E RETENÇÃO
+-- ===================================
+-- sicc_intent_examples guarda textos de clientes. Cada exemplo passa a ter
+-- o tenant da conversa: o IntentClassifier de cada tenant treina só com os
+-- exemplos do próprio tenant mais os compartilhados (tenant_id NULL,
+-- rótulos manuais revisados pela equipe).
+-- Exemplos gravados pelo LLM antes desta migração não têm tenant conhecido
+-- e seriam lidos por todos os tenants; são removidos e voltam a ser
+-- aprendidos por tenant.
+-- cleanup_sicc_intent_examples remove exemplos do LLM mais antigos que a
+-- retenção (chamada pela limpeza periódica do SICC).
+
+ALTER TABLE sicc_intent_examples
+    ADD COLUMN IF NOT EXISTS tenant_id INTEGER;
+
+COMMENT ON COLUMN sicc_intent_examples.tenant_id IS 'Tenant da conversa de origem (NULL = exemplo manual compartilhado entre tenants)';
+
+DELETE FROM sicc_intent_examples
+WHERE source = 'llm' AND tenant_id IS NULL;
+
+-- Exemplos do LLM sempre pertencem a um tenant
+ALTER TABLE sicc_intent_examples
+    DROP CONSTRAINT IF EXISTS sicc_intent_examples_llm_tenant;
+ALTER TABLE sicc_intent_examples
+    ADD CONSTRAINT sicc_intent_examples_llm_tenant CHECK (source <> 'llm' OR tenant_id IS NOT NULL);
+
+-- Treino de cada tenant lê os exemplos mais recentes do tenant e os compartilhados
+CREATE INDEX IF NOT EXISTS idx_sicc_intent_examples_tenant_created_at
+    ON sicc_intent_examples(tenant_id, created_at DESC);
+
+CREATE OR REPLACE FUNCTION cleanup_sicc_intent_examples(
+    p_retention_days integer DEFAULT 90
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_deleted integer;
+BEGIN
+    DELETE FROM sicc_intent_examples
+    WHERE source = 'llm'
+        AND created_at < NOW() - make_interval(days => p_retention_days);
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$;
+
+COMMENT ON FUNCTION cleanup_sicc_intent_examples IS 'Remove exemplos de intenção gravados pelo LLM mais antigos que a retenção; retorna o total removido';
+
+GRANT EXECUTE ON FUNCTION cleanup_sicc_intent_examples TO authenticated, service_role;
@@ -0,0 +1,123 @@
+-- ===================================
+-- GRAVAÇÃO DE CHECKPOINT COM COMPARE-AND-SWAP
+-- ===================================
+-- Cada réplica do agente mantém o checkpoint das threads em cache e numera
+-- as próprias gravações. Manter apenas "a maior versão vence" deixa uma
+-- réplica com cache desatualizado sobrescrever o turno gravado por outra
+-- (basta numerar mais checkpoints na execução).
+-- A gravação passa a informar a versão sobre a qual foi construída
+-- (p_base_version) e o identificador da sessão de cache que grava
+-- (p_writer_id). O checkpoint só é aplicado se a versão armazenada for a
+-- base informada ou se a última gravação veio da mesma sessão (gravações
+-- da própria sessão chegando fora de ordem). Gravação rejeitada retorna
+-- applied = false com o checkpoint vigente e quem o gravou; o
+-- MultiTenantCheckpointer descarta o cache da thread e falha a execução.
+-- Chamadas sem p_base_version mantêm o comportamento anterior.
+
+ALTER TABLE langgraph_checkpoints
+    ADD COLUMN IF NOT EXISTS writer_id TEXT;
+
+COMMENT ON COLUMN langgraph_checkpoints.writer_id IS 'Sessão de cache do agente que gravou a versão vigente';
+
+-- Novos parâmetros: remover a assinatura anterior evita sobrecarga ambígua no PostgREST
+DROP FUNCTION IF EXISTS put_langgraph_checkpoint(text, text, integer, integer, text, text, bigint, text, text, jsonb, jsonb, integer, boolean);
+
+CREATE OR REPLACE FUNCTION put_langgraph_checkpoint(
+    p_thread_id text,
+    p_checkpoint_ns text,
+    p_tenant_id integer,
+    p_conversation_id integer,
+    p_checkpoint_id text,
+    p_parent_checkpoint_id text,
+    p_version bigint,
+    p_checkpoint_type text,
+    p_checkpoint text,
+    p_metadata jsonb,
+    p_messages jsonb DEFAULT '[]'::jsonb,
+    p_messages_count integer DEFAULT 0,
+    p_messages_reset boolean DEFAULT false,
+    p_base_version bigint DEFAULT NULL,
+    p_writer_id text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_version bigint;
+    v_checkpoint_id text;
+    v_writer_id text;
+    v_applied integer;
+BEGIN
+    INSERT INTO langgraph_checkpoints (
+        thread_id, checkpoint_ns, tenant_id, conversation_id, checkpoint_id,
+        parent_checkpoint_id, version, checkpoint_type, checkpoint, metadata,
+        messages_count, writer_id
+    )
+    VALUES (
+        p_thread_id, p_checkpoint_ns, p_tenant_id, p_conversation_id, p_checkpoint_id,
+        p_parent_checkpoint_id, p_version, p_checkpoint_type, p_checkpoint,
+        COALESCE(p_metadata, '{}'::jsonb), p_messages_count, p_writer_id
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        version = EXCLUDED.version,
+        checkpoint_type = EXCLUDED.checkpoint_type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        messages_count = EXCLUDED.messages_count,
+        writer_id = EXCLUDED.writer_id,
+        updated_at = NOW()
+    WHERE langgraph_checkpoints.version < EXCLUDED.version
+        AND langgraph_checkpoints.tenant_id = EXCLUDED.tenant_id
+        AND (
+            p_base_version IS NULL
+            OR langgraph_checkpoints.version = p_base_version
+            OR langgraph_checkpoints.writer_id = p_writer_id
+        );
+
+    GET DIAGNOSTICS v_applied = ROW_COUNT;
+
+    -- Mensagens só acompanham um checkpoint efetivamente gravado
+    IF v_applied > 0 THEN
+        IF p_messages_reset THEN
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+        ELSE
+            DELETE FROM langgraph_checkpoint_messages
+            WHERE thread_id = p_thread_id
+                AND checkpoint_ns = p_checkpoint_ns
+                AND seq >= p_messages_count;
+        END IF;
+
+        INSERT INTO langgraph_checkpoint_messages (thread_id, checkpoint_ns, seq, tenant_id, value_type, value)
+        SELECT p_thread_id, p_checkpoint_ns, (m->>'seq')::integer, p_tenant_id, m->>'value_type', m->>'value'
+        FROM jsonb_array_elements(COALESCE(p_messages, '[]'::jsonb)) AS m
+        ON CONFLICT (thread_id, checkpoint_ns, seq) DO UPDATE SET
+            value_type = EXCLUDED.value_type,
+            value = EXCLUDED.value;
+    END IF;
+
+    -- Checkpoint vigente (de outra sessão se a gravação foi rejeitada)
+    SELECT version, checkpoint_id, writer_id INTO v_version, v_checkpoint_id, v_writer_id
+    FROM langgraph_checkpoints
+    WHERE thread_id = p_thread_id AND checkpoint_ns = p_checkpoint_ns;
+
+    -- Writes de checkpoints anteriores não são mais lidos
+    DELETE FROM langgraph_checkpoint_writes
+    WHERE thread_id = p_thread_id
+        AND checkpoint_ns = p_checkpoint_ns
+        AND checkpoint_id < v_checkpoint_id;
+
+    RETURN jsonb_build_object(
+        'applied', v_applied > 0,
+        'version', v_version,
+        'checkpoint_id', v_checkpoint_id,
+        'writer_id', v_writer_id
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION put_langgraph_checkpoint IS 'Grava o checkpoint da thread se a versão armazenada for a base informada (ou da mesma sessão), anexa as mensagens novas, remove writes de checkpoints anteriores e retorna se foi aplicado e o checkpoint vigente';
+
+GRANT EXECUTE ON FUNCTION put_langgraph_checkpoint TO authenticated, service_role;